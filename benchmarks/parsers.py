@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Micro-benchmarks of the Perceval parsers.
+
+The benchmarks measure the throughput (items and MB per second) and
+the peak of memory of the parsing hot paths. They run offline: the
+inputs are synthetic scale-ups of the data files used by the tests,
+so the numbers are comparable between releases as long as the same
+scale is used.
+
+Results can be stored as JSON with `--output` and compared with
+a previous run using `--compare`:
+
+    $ python benchmarks/parsers.py --scale 200 --output baseline.json
+    $ python benchmarks/parsers.py --scale 200 --compare baseline.json
+"""
+
+import argparse
+import collections
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import perceval.backends.core
+from perceval.backends.core.askbot import AskbotParser
+from perceval.backends.core.bugzilla import Bugzilla
+from perceval.backends.core.gerrit import Gerrit
+from perceval.backends.core.git import GitParser
+from perceval.backends.core.mbox import MBox
+from perceval.backends.core.supybot import SupybotParser
+from perceval.utils import xml_to_dict
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        '..', 'tests', 'data')
+
+DEFAULT_SCALE = 100
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.1
+
+MB = 1024 * 1024
+
+
+Benchmark = collections.namedtuple('Benchmark', 'name setup description')
+"""A parser benchmark.
+
+`setup` receives the scale factor and a temporary directory and
+returns a tuple with a function that parses the input and returns
+the number of items produced, and the size of the input in bytes.
+"""
+
+BenchmarkResult = collections.namedtuple('BenchmarkResult',
+                                         'name items bytes seconds peak_memory')
+
+
+def read_file(*path, mode='r'):
+    with open(os.path.join(DATA_DIR, *path), mode) as f:
+        return f.read()
+
+
+def scale_text(text, scale):
+    """Repeat a text making sure every copy ends with a new line"""
+
+    if not text.endswith('\n'):
+        text += '\n'
+    return text * scale
+
+
+def text_size(text):
+    return len(text.encode('utf-8'))
+
+
+def setup_git(scale, tmpdir):
+    log = scale_text(read_file('git', 'git_log.txt'), scale)
+
+    def run():
+        stream = io.StringIO(log)
+        return sum(1 for _ in GitParser(stream).parse())
+
+    return run, text_size(log)
+
+
+def setup_supybot(scale, tmpdir):
+    log = scale_text(read_file('supybot', 'supybot_valid.log'), scale)
+
+    def run():
+        stream = io.StringIO(log)
+        return sum(1 for _ in SupybotParser(stream).parse())
+
+    return run, text_size(log)
+
+
+def setup_mbox(scale, tmpdir):
+    contents = [read_file('mbox', name, mode='rb')
+                for name in ('mbox_single.mbox', 'mbox_multipart.mbox', 'mbox_complex.mbox')]
+    sample = b'\n'.join(content.rstrip(b'\n') + b'\n' for content in contents) + b'\n'
+
+    filepath = os.path.join(tmpdir, 'benchmark.mbox')
+    with open(filepath, 'wb') as f:
+        for _ in range(scale):
+            f.write(sample)
+
+    def run():
+        return sum(1 for _ in MBox.parse_mbox(filepath))
+
+    return run, os.path.getsize(filepath)
+
+
+def setup_xml_to_dict(scale, tmpdir):
+    content = read_file('bugzilla', 'bugzilla_bugs_details.xml')
+
+    # Repeat the list of bugs inside the root element
+    start = content.index('<bug>')
+    end = content.rindex('</bug>') + len('</bug>')
+    bugs = content[start:end]
+    xml = content[:start] + '\n'.join([bugs] * scale) + content[end:]
+
+    def run():
+        tree = xml_to_dict(xml)
+        return len(tree['bug'])
+
+    return run, text_size(xml)
+
+
+def setup_bugzilla_activity(scale, tmpdir):
+    pages = [read_file('bugzilla', 'bugzilla_bug_activity.html')] * scale
+
+    def run():
+        return sum(sum(1 for _ in Bugzilla.parse_bug_activity(page)) for page in pages)
+
+    return run, sum(text_size(page) for page in pages)
+
+
+def setup_askbot(scale, tmpdir):
+    sample = [read_file('askbot', name)
+              for name in ('html_24396_multipage_openstack.html',
+                           'html_26830_comments_question_openstack.html',
+                           'html_16_multicomment_answer_1_openstack.html')]
+    pages = sample * max(1, scale // len(sample))
+
+    def run():
+        nitems = 0
+        for page in pages:
+            AskbotParser.parse_question_container(page)
+            nitems += 1 + len(AskbotParser.parse_answers(page))
+        return nitems
+
+    return run, sum(text_size(page) for page in pages)
+
+
+def setup_gerrit(scale, tmpdir):
+    raw_data = scale_text(read_file('gerrit', 'gerrit_reviews_page_1'), scale)
+
+    def run():
+        return len(Gerrit.parse_reviews(raw_data))
+
+    return run, text_size(raw_data)
+
+
+BENCHMARKS = [
+    Benchmark('git', setup_git, "GitParser.parse"),
+    Benchmark('supybot', setup_supybot, "SupybotParser.parse"),
+    Benchmark('mbox', setup_mbox, "MBox.parse_mbox and message_to_dict"),
+    Benchmark('xml_to_dict', setup_xml_to_dict, "utils.xml_to_dict"),
+    Benchmark('bugzilla_activity', setup_bugzilla_activity, "Bugzilla.parse_bug_activity"),
+    Benchmark('askbot', setup_askbot, "AskbotParser question and answers"),
+    Benchmark('gerrit', setup_gerrit, "Gerrit.parse_reviews"),
+]
+
+
+def run_benchmark(benchmark, scale, repeat, tmpdir):
+    """Run a benchmark and return its result.
+
+    The time is the best of `repeat` runs. The peak of memory is
+    measured in an extra run because tracing the allocations slows
+    down the parsers.
+    """
+    run, nbytes = benchmark.setup(scale, tmpdir)
+
+    seconds = None
+    nitems = 0
+
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        nitems = run()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(benchmark.name, nitems, nbytes, seconds, peak_memory)
+
+
+def result_to_dict(result):
+    return {
+        'items': result.items,
+        'bytes': result.bytes,
+        'seconds': result.seconds,
+        'items_per_second': result.items / result.seconds,
+        'mb_per_second': result.bytes / MB / result.seconds,
+        'peak_memory': result.peak_memory
+    }
+
+
+def run_benchmarks(names=None, scale=DEFAULT_SCALE, repeat=DEFAULT_REPEAT):
+    """Run the benchmarks and return their results as a dict"""
+
+    benchmarks = [b for b in BENCHMARKS if not names or b.name in names]
+    results = {}
+
+    tmpdir = tempfile.mkdtemp(prefix='perceval_bench_')
+    try:
+        for benchmark in benchmarks:
+            result = run_benchmark(benchmark, scale, repeat, tmpdir)
+            results[benchmark.name] = result_to_dict(result)
+            print_result(benchmark.name, results[benchmark.name])
+    finally:
+        shutil.rmtree(tmpdir)
+
+    return {
+        'perceval_version': perceval.backends.core.__version__,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'scale': scale,
+        'repeat': repeat,
+        'benchmarks': results
+    }
+
+
+def print_result(name, result):
+    print("{:<20} {:>9} items {:>12.1f} items/s {:>8.2f} MB/s {:>10.1f} KiB peak".format(
+          name, result['items'], result['items_per_second'],
+          result['mb_per_second'], result['peak_memory'] / 1024))
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare two runs and return the names of the regressed benchmarks.
+
+    A benchmark regresses when its throughput drops or its peak of
+    memory grows by more than `threshold` (a ratio).
+    """
+    if current['scale'] != baseline['scale']:
+        print("Warning: scales differ (%s != %s); results are not comparable"
+              % (current['scale'], baseline['scale']))
+
+    regressions = []
+
+    for name, result in current['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+
+        previous = baseline['benchmarks'][name]
+        speed = result['items_per_second'] / previous['items_per_second'] - 1
+        memory = result['peak_memory'] / previous['peak_memory'] - 1 if previous['peak_memory'] else 0
+
+        regressed = speed < -threshold or memory > threshold
+        if regressed:
+            regressions.append(name)
+
+        print("{:<20} throughput {:>+7.1%} peak memory {:>+7.1%}{}".format(
+              name, speed, memory, "  REGRESSION" if regressed else ""))
+
+    return regressions
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Run the Perceval parser benchmarks")
+    parser.add_argument('benchmarks', nargs='*',
+                        help="benchmarks to run: %s (default: all)"
+                             % ', '.join(b.name for b in BENCHMARKS))
+    parser.add_argument('--scale', type=int, default=DEFAULT_SCALE,
+                        help="times the test data is replicated (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="runs of each benchmark; the best one is taken (default: %(default)s)")
+    parser.add_argument('-o', '--output', dest='output', default=None,
+                        help="write the results to this JSON file")
+    parser.add_argument('--compare', dest='compare', default=None,
+                        help="JSON file with the results of a previous run to compare with")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="change ratio considered a regression (default: %(default)s)")
+
+    parsed_args = parser.parse_args(args)
+
+    unknown = set(parsed_args.benchmarks) - {b.name for b in BENCHMARKS}
+    if unknown:
+        parser.error("unknown benchmarks: %s" % ', '.join(sorted(unknown)))
+
+    return parsed_args
+
+
+def main(args=None):
+    args = parse_args(sys.argv[1:] if args is None else args)
+
+    results = run_benchmarks(args.benchmarks, scale=args.scale, repeat=args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare_results(results, baseline, threshold=args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
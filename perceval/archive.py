@@ -21,24 +21,62 @@
 #     Jesus M. Gonzalez-Barahona <jgb@gsyc.es>
 #
 
+import argparse
+import collections
+import datetime
 import hashlib
 import json
 import logging
 import os
 import pickle
 import sqlite3
+import struct
+import threading
+import time
 import uuid
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import requests
+
 from grimoirelab_toolkit.datetime import (datetime_utcnow,
                                           datetime_to_utc,
                                           str_to_datetime)
 
 from .errors import ArchiveError, ArchiveManagerError
+from .utils import SQLITE_TIMEOUT, sqlite_connect, sqlite_transaction
 
 
 logger = logging.getLogger(__name__)
 
 
+ARCHIVES_DEFAULT_PATH = '~/.perceval/archives/'
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSIONS = [COMPRESSION_NONE, COMPRESSION_ZSTD]
+
+# Archive records
+RECORD_MAGIC = b'\x00PRCV'
+RECORD_VERSION = 1
+# Version of the records whose body is kept in a blob store
+RECORD_VERSION_BLOB = 2
+RECORD_RESPONSE = 'response'
+RECORD_HTTP_ERROR = 'http_error'
+
+# Bodies smaller than this size are never compressed
+MIN_COMPRESSION_SIZE = 256
+
+# Bodies smaller than this size are never stored in a blob store
+MIN_BLOB_SIZE = 1024
+
+# Fetch parameters that set the range of the data fetched
+RANGE_PARAMS = ('from_date', 'offset', 'to_date')
+
+
 class Archive:
     """Basic class for archiving raw items fetched by Perceval.
 
@@ -56,13 +94,68 @@ class Archive:
     initialized calling to `init_metadata` method after creating
     a new archive.
 
-    :param archive_path: path where this archive is stored
+    By default, every item stored is committed to the archive file
+    right away. Writes can be batched setting `commit_every` and/or
+    `commit_interval`: stored items are committed once there are
+    `commit_every` of them pending or `commit_interval` seconds passed
+    since the last commit, whatever happens first. Call `flush` or
+    `close` to commit the pending items. The file stays consistent
+    when the process is interrupted; only the pending items are lost.
+
+    Set `wal` to use the write-ahead log journal of SQLite, which
+    makes commits cheaper. Take into account SQLite does not support
+    this mode on network file systems.
+
+    HTTP responses, and the HTTP errors raised for them, are stored
+    as compact records (see `encode_record`). Their bodies can be
+    compressed with zstd setting `compression`; this requires the
+    `zstandard` package. Any other data is pickled. Archives with
+    responses stored as pickles by older versions can be read too,
+    and updated with the method `convert`.
+
+    When `blob_store` is given, bodies of the responses with at
+    least `MIN_BLOB_SIZE` bytes are stored in that `BlobStore` and
+    the records only keep a reference to them. Identical bodies
+    are stored once, whatever the archive they belong to. The
+    records referencing bodies are read using that store or, when
+    it is not given, the store of the `ArchiveManager` where the
+    archive is kept.
+
+    Entries are usually retrieved in the same order they were
+    stored. To avoid a lookup per entry, `retrieve` reads the
+    entries in that order, `REPLAY_READ_AHEAD` at a time, and
+    only looks for an entry by its hash code when the request
+    does not match the next entry read.
+
+    Archives merging the data of several fetches keep the
+    parameters of each of them in `fetches`, in the order they
+    must be replayed. For the rest of archives, `fetches` only
+    has `backend_params`.
 
-    :raises ArchiveError: when the archive does not exist or is invalid
+    :param archive_path: path where this archive is stored
+    :param commit_every: maximum number of items pending to be
+        committed; `None` for no limit
+    :param commit_interval: maximum number of seconds between commits;
+        `None` for no limit
+    :param wal: use the write-ahead log journal mode
+    :param compression: compression of the bodies of the responses
+        stored; one of `COMPRESSIONS`
+    :param blob_store: `BlobStore` where the bodies of the responses
+        are stored
+    :param check_same_thread: only allow the thread that opened the
+        archive to use it; when `False`, callers must not use it from
+        several threads at the same time
+
+    :raises ArchiveError: when the archive does not exist or is invalid,
+        or when the compression is not supported
     """
 
     ARCHIVE_TABLE = "archive"
     METADATA_TABLE = "metadata"
+    FETCHES_TABLE = "fetches"
+
+    CONVERT_CHUNK_SIZE = 100
+    REPLAY_READ_AHEAD = 100
 
     # Table structure
     ARCHIVE_CREATE_STMT = "CREATE TABLE " + ARCHIVE_TABLE + " ( " \
@@ -81,30 +174,57 @@ class Archive:
                            "backend_params BLOB, " \
                            "created_on TEXT)"
 
-    def __init__(self, archive_path):
+    FETCHES_CREATE_STMT = "CREATE TABLE " + FETCHES_TABLE + " ( " \
+                          "id INTEGER PRIMARY KEY AUTOINCREMENT, " \
+                          "backend_params BLOB)"
+
+    def __init__(self, archive_path, commit_every=1, commit_interval=None, wal=False,
+                 compression=COMPRESSION_NONE, blob_store=None, check_same_thread=True):
         if not os.path.exists(archive_path):
             raise ArchiveError(cause="archive %s does not exist" % (archive_path))
 
+        _check_compression(compression)
+
         self.archive_path = archive_path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.wal = wal
+        self.compression = compression
+        self.blob_store = blob_store
+        self.check_same_thread = check_same_thread
         self.origin = None
         self.backend_name = None
         self.backend_version = None
         self.category = None
         self.backend_params = None
+        self.fetches = None
         self.created_on = None
 
-        self._db = sqlite3.connect(self.archive_path)
+        self._db = sqlite3.connect(self.archive_path, check_same_thread=check_same_thread)
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._replay_rows = collections.deque()
+        self._replay_last_id = 0
+        self._manager_blob_store = None
+
+        if self.wal:
+            self._set_wal_mode()
 
         self._verify_archive()
         self._load_metadata()
 
     def __del__(self):
         conn = getattr(self, '_db', None)
-        if conn:
+        if not conn:
+            return
+
+        try:
+            self.close()
+        except ArchiveError:
             conn.close()
 
     def init_metadata(self, origin, backend_name, backend_version,
-                      category, backend_params):
+                      category, backend_params, created_on=None, fetches=None):
         """Init metadata information.
 
         Metatada is composed by basic information needed to identify
@@ -116,10 +236,14 @@ class Archive:
         :param: backend_version: version of the backend
         :param: category: category of the items fetched
         :param: backend_params: dict representation of the fetch parameters
+        :param: created_on: date of creation of the archive; by default, now
+        :param: fetches: list with the parameters of each fetch whose data
+            is stored in the archive, in the order they must be replayed;
+            by default, only `backend_params`
 
         raises ArchiveError: when an error occurs initializing the metadata
         """
-        created_on = datetime_to_utc(datetime_utcnow())
+        created_on = datetime_to_utc(created_on or datetime_utcnow())
         created_on_dumped = created_on.isoformat()
         backend_params_dumped = pickle.dumps(backend_params, 0)
 
@@ -134,6 +258,11 @@ class Archive:
                           "VALUES (?, ?, ?, ?, ?, ?)"
             cursor.execute(insert_stmt, metadata)
 
+            if fetches:
+                cursor.execute(self.FETCHES_CREATE_STMT)
+                insert_stmt = "INSERT INTO " + self.FETCHES_TABLE + " (backend_params) VALUES (?)"
+                cursor.executemany(insert_stmt, ((pickle.dumps(params, 0),) for params in fetches))
+
             self._db.commit()
             cursor.close()
         except sqlite3.DatabaseError as e:
@@ -145,6 +274,7 @@ class Archive:
         self.backend_version = backend_version
         self.category = category
         self.backend_params = backend_params
+        self.fetches = list(fetches) if fetches else [backend_params]
         self.created_on = created_on
 
         logger.debug("Metadata of archive %s initialized to %s",
@@ -167,7 +297,8 @@ class Archive:
         hashcode = self.make_hashcode(uri, payload, headers)
         payload_dump = pickle.dumps(payload, 0)
         headers_dump = pickle.dumps(headers, 0)
-        data_dump = pickle.dumps(data, 0)
+        data_dump = encode_record(data, compression=self.compression,
+                                  blob_store=self.blob_store)
 
         logger.debug("Archiving %s with %s %s %s in %s",
                      hashcode, uri, payload, headers, self.archive_path)
@@ -179,22 +310,187 @@ class Archive:
                           "VALUES(?,?,?,?,?,?)"
             cursor.execute(insert_stmt, (None, hashcode, uri,
                                          payload_dump, headers_dump, data_dump))
-            self._db.commit()
             cursor.close()
         except sqlite3.IntegrityError as e:
+            self._release_blob(data_dump)
             msg = "data storage error; cause: duplicated entry %s" % hashcode
             raise ArchiveError(cause=msg)
         except sqlite3.DatabaseError as e:
+            self._release_blob(data_dump)
             msg = "data storage error; cause: %s" % str(e)
             raise ArchiveError(cause=msg)
 
+        self._pending += 1
+
+        if self._commit_needed():
+            self.flush()
+
         logger.debug("%s data archived in %s", hashcode, self.archive_path)
 
+    def flush(self):
+        """Commit the items pending to be written in the archive file.
+
+        :raises ArchiveError: when an error occurs committing the items
+        """
+        if not self._db:
+            return
+
+        try:
+            self._db.commit()
+        except sqlite3.DatabaseError as e:
+            msg = "data storage error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+        if self._pending:
+            logger.debug("%s entries committed in %s", self._pending, self.archive_path)
+
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        """Commit the pending items and close the archive file.
+
+        :raises ArchiveError: when an error occurs committing the items
+        """
+        if not self._db:
+            return
+
+        try:
+            self.flush()
+        finally:
+            self._db.close()
+            self._db = None
+
+    def convert(self, compression=None):
+        """Convert the entries stored as pickles to compact records.
+
+        Responses and HTTP errors stored as pickles by older versions
+        are converted to records; the rest of the pickles are stored
+        again with a compact protocol. Once the entries are converted,
+        the archive file is rebuilt to release the space saved.
+
+        :param compression: compression of the bodies of the responses;
+            by default, the compression of this archive
+
+        :returns: number of entries converted
+
+        :raises ArchiveError: when an error occurs converting the entries
+        """
+        compression = compression or self.compression
+        _check_compression(compression)
+
+        select_stmt = "SELECT id, data FROM " + self.ARCHIVE_TABLE + " " \
+                      "WHERE id > ? ORDER BY id LIMIT ?"
+        update_stmt = "UPDATE " + self.ARCHIVE_TABLE + " SET data = ? WHERE id = ?"
+
+        nconverted = 0
+        last_id = -1
+
+        self.flush()
+
+        try:
+            cursor = self._db.cursor()
+
+            while True:
+                cursor.execute(select_stmt, (last_id, self.CONVERT_CHUNK_SIZE))
+                rows = cursor.fetchall()
+
+                if not rows:
+                    break
+
+                for row_id, data_dump in rows:
+                    last_id = row_id
+
+                    if is_record(data_dump):
+                        continue
+
+                    data = pickle.loads(data_dump)
+                    record = encode_record(data, compression=compression,
+                                           blob_store=self.blob_store)
+
+                    # Pickles already using a compact protocol are kept
+                    if not is_record(record) and len(record) >= len(data_dump):
+                        continue
+
+                    cursor.execute(update_stmt, (record, row_id))
+                    nconverted += 1
+
+                self.flush()
+
+            cursor.close()
+
+            if nconverted:
+                self._db.execute("VACUUM")
+        except sqlite3.DatabaseError as e:
+            msg = "data conversion error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+        logger.debug("%s entries converted in %s", nconverted, self.archive_path)
+
+        return nconverted
+
+    def merge(self, archive_path, replace=False):
+        """Copy the entries of another archive into this one.
+
+        Entries already stored in this archive are kept unless
+        `replace` is set. To keep the newest version of each entry,
+        archives must be merged from the newest to the oldest one or,
+        replacing entries, from the oldest to the newest one. Bodies
+        kept in a blob store are not copied; the entries keep
+        referencing them.
+
+        :param archive_path: path of the archive to copy
+        :param replace: replace the entries already stored
+
+        :returns: number of entries copied
+
+        :raises ArchiveError: when an error occurs copying the entries
+        """
+        conflict = "REPLACE" if replace else "IGNORE"
+        insert_stmt = "INSERT OR " + conflict + " INTO " + self.ARCHIVE_TABLE + " " \
+                      "(hashcode, uri, payload, headers, data) " \
+                      "SELECT hashcode, uri, payload, headers, data " \
+                      "FROM source." + self.ARCHIVE_TABLE + " ORDER BY id"
+
+        self.flush()
+
+        try:
+            self._db.execute("ATTACH DATABASE ? AS source", (archive_path,))
+
+            try:
+                ncopied = self._db.execute(insert_stmt).rowcount
+                self._db.commit()
+            finally:
+                self._db.execute("DETACH DATABASE source")
+        except sqlite3.DatabaseError as e:
+            msg = "data merge error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+        logger.debug("%s entries of %s merged in %s", ncopied, archive_path, self.archive_path)
+
+        return ncopied
+
+    def vacuum(self):
+        """Rebuild the archive file to release unused space.
+
+        :raises ArchiveError: when an error occurs rebuilding the file
+        """
+        self.flush()
+
+        try:
+            self._db.execute("VACUUM")
+        except sqlite3.DatabaseError as e:
+            msg = "archive vacuum error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
     def retrieve(self, uri, payload, headers):
         """Retrieve a raw item from the archive.
 
         The method will return the `data` content corresponding to the
-        hascode derived from the given parameters.
+        given parameters. The next entry, in the order they were stored,
+        is returned when it was stored with the same parameters;
+        otherwise, the entry is searched by the hascode derived from
+        them and the following calls will continue from that entry.
 
         :param uri: request URI
         :param payload: request payload
@@ -204,41 +500,85 @@ class Archive:
 
         :raises ArchiveError: when an error occurs retrieving data
         """
-        hashcode = self.make_hashcode(uri, payload, headers)
+        try:
+            row = self._next_replay_row()
 
-        logger.debug("Retrieving entry %s with %s %s %s in %s",
-                     hashcode, uri, payload, headers, self.archive_path)
+            if row and self._replay_row_matches(row, uri, payload, headers):
+                logger.debug("Retrieving entry %s with %s %s %s in %s",
+                             row[0], uri, payload, headers, self.archive_path)
+                self._replay_rows.popleft()
+                return decode_record(row[4], blob_store=self._read_blob_store())
 
-        self._db.row_factory = sqlite3.Row
+            hashcode = self.make_hashcode(uri, payload, headers)
 
-        try:
-            cursor = self._db.cursor()
-            select_stmt = "SELECT data " \
-                          "FROM " + self.ARCHIVE_TABLE + " " \
-                          "WHERE hashcode = ?"
-            cursor.execute(select_stmt, (hashcode,))
-            row = cursor.fetchone()
-            cursor.close()
+            logger.debug("Retrieving entry %s with %s %s %s in %s",
+                         hashcode, uri, payload, headers, self.archive_path)
+
+            row = self._select_entry(hashcode)
         except sqlite3.DatabaseError as e:
             msg = "data retrieval error; cause: %s" % str(e)
             raise ArchiveError(cause=msg)
 
         if row:
-            found = pickle.loads(row['data'])
+            # Continue reading the entries stored after this one
+            self._replay_rows.clear()
+            self._replay_last_id = row[0]
+            found = decode_record(row[1], blob_store=self._read_blob_store())
         else:
             msg = "entry %s not found in archive %s" % (hashcode, self.archive_path)
             raise ArchiveError(cause=msg)
 
         return found
 
+    def blob_refs(self):
+        """Get the bodies of the blob store referenced by this archive.
+
+        :returns: a list with the hash codes of the bodies
+
+        :raises ArchiveError: when an error occurs reading the entries
+        """
+        select_stmt = "SELECT data FROM " + self.ARCHIVE_TABLE
+
+        try:
+            cursor = self._db.cursor()
+            cursor.execute(select_stmt)
+            hashcodes = [record_blob(row[0]) for row in cursor]
+            cursor.close()
+        except sqlite3.DatabaseError as e:
+            msg = "data retrieval error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+        return [hashcode for hashcode in hashcodes if hashcode]
+
+    def lookup(self, hashcode):
+        """Look for an entry by its hash code.
+
+        Unlike `retrieve`, entries are always searched by their hash
+        code, so the order in which they are looked up does not matter.
+
+        :param hashcode: hash code of the entry (see `make_hashcode`)
+
+        :returns: the archived data or `None` when it is not found
+
+        :raises ArchiveError: when an error occurs retrieving data
+        """
+        try:
+            row = self._select_entry(hashcode)
+        except sqlite3.DatabaseError as e:
+            msg = "data retrieval error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+        return decode_record(row[1], blob_store=self._read_blob_store()) if row else None
+
     @classmethod
-    def create(cls, archive_path):
+    def create(cls, archive_path, **kwargs):
         """Create a brand new archive.
 
          Call this method to create a new and empty archive. It will initialize
          the storage file in the path defined by `archive_path`.
 
         :param archive_path: absolute path where the archive file will be created
+        :param kwargs: writing options of the archive (see `Archive`)
 
         :raises ArchiveError: when the archive file already exists
         """
@@ -257,7 +597,7 @@ class Archive:
         conn.close()
 
         logger.debug("Creating archive %s", archive_path)
-        archive = cls(archive_path)
+        archive = cls(archive_path, **kwargs)
         logger.debug("Achive %s was created", archive_path)
 
         return archive
@@ -282,6 +622,93 @@ class Archive:
         hashcode = hashlib.sha1(content.encode('utf-8'))
         return hashcode.hexdigest()
 
+    def _release_blob(self, record):
+        """Release the body referenced by a record that was not stored"""
+
+        hashcode = record_blob(record)
+
+        if hashcode:
+            self.blob_store.release([hashcode])
+
+    def _read_blob_store(self):
+        """Blob store to read the bodies referenced by the records"""
+
+        if self.blob_store:
+            return self.blob_store
+
+        if not self._manager_blob_store:
+            # Archives are kept in subdirectories of the manager path
+            dirpath = os.path.dirname(os.path.dirname(os.path.abspath(self.archive_path)))
+            self._manager_blob_store = BlobStore(dirpath, check_same_thread=self.check_same_thread)
+
+        return self._manager_blob_store
+
+    def _select_entry(self, hashcode):
+        """Select the id and data of the entry with the given hash code"""
+
+        cursor = self._db.cursor()
+        select_stmt = "SELECT id, data " \
+                      "FROM " + self.ARCHIVE_TABLE + " " \
+                      "WHERE hashcode = ?"
+        cursor.execute(select_stmt, (hashcode,))
+        row = cursor.fetchone()
+        cursor.close()
+
+        return row
+
+    def _next_replay_row(self):
+        """Get the next entry to replay, reading ahead when needed"""
+
+        if not self._replay_rows:
+            cursor = self._db.cursor()
+            select_stmt = "SELECT id, uri, payload, headers, data " \
+                          "FROM " + self.ARCHIVE_TABLE + " " \
+                          "WHERE id > ? ORDER BY id LIMIT ?"
+            cursor.execute(select_stmt, (self._replay_last_id, self.REPLAY_READ_AHEAD))
+            self._replay_rows.extend(cursor.fetchall())
+            cursor.close()
+
+            if self._replay_rows:
+                self._replay_last_id = self._replay_rows[-1][0]
+
+        return self._replay_rows[0] if self._replay_rows else None
+
+    @staticmethod
+    def _replay_row_matches(row, uri, payload, headers):
+        """Check whether an entry was stored with these request parameters"""
+
+        if row[1] != uri or row[2] is None or row[3] is None:
+            return False
+
+        return pickle.loads(row[2]) == payload and pickle.loads(row[3]) == headers
+
+    def _commit_needed(self):
+        """Check whether the pending items have to be committed"""
+
+        if self.commit_every is not None and self._pending >= self.commit_every:
+            return True
+        if self.commit_interval is not None and \
+                time.monotonic() - self._last_commit >= self.commit_interval:
+            return True
+
+        return False
+
+    def _set_wal_mode(self):
+        """Set the write-ahead log journal mode.
+
+        Commits in this mode do not wait for the log to be synced;
+        in case of a power failure, the last commits might be lost
+        but the archive will be consistent.
+        """
+        try:
+            cursor = self._db.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+        except sqlite3.DatabaseError as e:
+            msg = "invalid archive file; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
     def _verify_archive(self):
         """Check whether the archive is valid or not.
 
@@ -321,12 +748,30 @@ class Archive:
             self.backend_version = row[2]
             self.category = row[3]
             self.backend_params = pickle.loads(row[4])
+            self.fetches = self._load_fetches() or [self.backend_params]
             self.created_on = str_to_datetime(row[5])
         else:
             logger.debug("Metadata of archive %s was empty", self.archive_path)
 
         logger.debug("Metadata of archive %s loaded", self.archive_path)
 
+    def _load_fetches(self):
+        """Load the parameters of the fetches merged in the archive"""
+
+        cursor = self._db.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (self.FETCHES_TABLE,))
+
+        if not cursor.fetchone():
+            cursor.close()
+            return []
+
+        cursor.execute("SELECT backend_params FROM " + self.FETCHES_TABLE + " ORDER BY id")
+        fetches = [pickle.loads(row[0]) for row in cursor]
+        cursor.close()
+
+        return fetches
+
     def _count_table_rows(self, table_name):
         """Fetch the number of rows in a table"""
 
@@ -354,16 +799,52 @@ class ArchiveManager:
     be the name of the subdirectory; the remaining bytes, the archive
     name.
 
+    The metadata of the archives is kept in a catalog (see
+    `ArchiveCatalog`) stored in `dirpath`, which is updated when
+    archives are created or removed by the manager. Archives copied
+    under `dirpath` by other means, or by older versions of Perceval
+    once the catalog exists, are not found until the catalog is
+    rebuilt with `rebuild_catalog`.
+
+    Archives can be removed following a retention policy with
+    `evict_archives`.
+
+    The writing options of the archives created by this manager are
+    set with `commit_every`, `commit_interval`, `wal` and `compression`.
+    Check the `Archive` class for more information about them.
+
+    When `dedup` is set, the bodies of the responses stored by new
+    archives are kept in a `BlobStore` in `dirpath`, shared by all
+    of them, so identical bodies are stored once. The references of
+    an archive to that store are released when it is removed.
+
     :param: dirpath: path where the archives are stored
+    :param commit_every: maximum number of items pending to be committed
+    :param commit_interval: maximum number of seconds between commits
+    :param wal: use the write-ahead log journal mode
+    :param compression: compression of the bodies of the responses
+    :param dedup: store the bodies of the responses in a blob store
     """
 
     STORAGE_EXT = '.sqlite3'
 
-    def __init__(self, dirpath):
+    # Files SQLite creates next to a database
+    SQLITE_TEMP_EXTS = ('-wal', '-shm', '-journal')
+
+    def __init__(self, dirpath, commit_every=1, commit_interval=None, wal=False,
+                 compression=COMPRESSION_NONE, dedup=False):
         self.dirpath = dirpath
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.wal = wal
+        self.compression = compression
+        self.dedup = dedup
+        self.catalog = ArchiveCatalog(self.dirpath)
+        self.blob_store = BlobStore(self.dirpath)
 
         if not os.path.exists(self.dirpath):
             os.makedirs(self.dirpath)
+            self.catalog.create()
 
     def create_archive(self):
         """Create a new archive.
@@ -387,58 +868,148 @@ class ArchiveManager:
             os.makedirs(archive_dir)
 
         try:
-            archive = Archive.create(archive_path)
+            archive = Archive.create(archive_path,
+                                     commit_every=self.commit_every,
+                                     commit_interval=self.commit_interval,
+                                     wal=self.wal,
+                                     compression=self.compression,
+                                     blob_store=self.blob_store if self.dedup else None)
         except ArchiveError as e:
             raise ArchiveManagerError(cause=str(e))
 
+        self._update_catalog(self.catalog.add, archive_path)
+
         return archive
 
     def remove_archive(self, archive_path):
         """Remove an archive.
 
         This method deletes from the filesystem the archive stored
-        in `archive_path`.
+        in `archive_path`. The bodies it references in the blob store
+        are released.
 
         :param archive_path: path to the archive
 
         :raises ArchiveManangerError: when an error occurs removing the
             archive
         """
+        hashcodes = []
+
         try:
-            Archive(archive_path)
+            archive = Archive(archive_path)
+
+            if self.blob_store.exists():
+                hashcodes = archive.blob_refs()
+
+            archive.close()
         except ArchiveError as e:
             raise ArchiveManagerError(cause=str(e))
 
         os.remove(archive_path)
 
-    def search(self, origin, backend_name, category, archived_after):
-        """Search archives.
+        for ext in self.SQLITE_TEMP_EXTS:
+            if os.path.exists(archive_path + ext):
+                os.remove(archive_path + ext)
 
-        Get the archives which store data based on the given parameters.
-        These parameters define which the origin was (`origin`), how data
-        was fetched (`backend_name`) and data type ('category').
-        Only those archives created on or after `archived_after` will be
-        returned.
+        self._update_catalog(self.catalog.remove, archive_path)
 
-        The method returns a list with the file paths to those archives.
-        The list is sorted by the date of creation of each archive.
+        if hashcodes:
+            try:
+                self.blob_store.release(hashcodes)
+            except ArchiveError as e:
+                raise ArchiveManagerError(cause=str(e))
 
-        :param origin: data origin
-        :param backend_name: backed used to fetch data
-        :param category: type of the items fetched by the backend
-        :param archived_after: get archives created on or after this date
+    def rebuild_catalog(self):
+        """Rebuild the catalog of the archives.
 
-        :returns: a list with archive names which match the search criteria
+        The catalog is built from scratch reading the metadata of
+        every archive stored under the base path. Invalid archives
+        are skipped.
+
+        :returns: the number of archives in the catalog
+
+        :raises ArchiveManagerError: when an error occurs writing
+            the catalog
         """
-        archives = self._search_archives(origin, backend_name,
-                                         category, archived_after)
-        archives = [(fp, date) for fp, date in archives]
-        archives = [fp for fp, _ in sorted(archives, key=lambda x: x[1])]
+        try:
+            narchives = self._build_catalog()
+        except sqlite3.DatabaseError as e:
+            msg = "catalog %s could not be rebuilt; cause: %s" % (self.catalog.catalog_path, str(e))
+            raise ArchiveManagerError(cause=msg)
 
-        return archives
+        logger.info("Catalog %s rebuilt with %s archives", self.catalog.catalog_path, narchives)
 
-    def _search_archives(self, origin, backend_name, category, archived_after):
-        """Search archives using filters."""
+        return narchives
+
+    def convert_archives(self, compression=None):
+        """Convert the entries of the archives to compact records.
+
+        Invalid archives are skipped. See `Archive.convert` for more
+        information.
+
+        :param compression: compression of the bodies of the responses;
+            by default, the compression set in this manager
+
+        :returns: a list of tuples with the path of each archive and
+            the number of entries converted
+
+        :raises ArchiveManagerError: when an error occurs converting
+            an archive
+        """
+        compression = compression or self.compression
+        results = []
+
+        for archive_path in self._search_files():
+            try:
+                archive = Archive(archive_path,
+                                  blob_store=self.blob_store if self.dedup else None)
+            except ArchiveError:
+                continue
+
+            try:
+                nconverted = archive.convert(compression=compression)
+            except ArchiveError as e:
+                raise ArchiveManagerError(cause=str(e))
+            finally:
+                archive.close()
+
+            logger.info("%s entries converted in archive %s", nconverted, archive_path)
+            results.append((archive_path, nconverted))
+
+        return results
+
+    def compact_archives(self, origin=None, backend_name=None, category=None):
+        """Merge the archives of the same fetch into one.
+
+        Archives with the same origin, backend, category and fetch
+        parameters, except those setting the range of the data fetched
+        (`from_date`, `offset` and `to_date`), are merged into a new
+        archive, keeping the newest version of each entry. Thus, the
+        archives of incremental fetches are merged too.
+
+        A backend replays an archive sending the same requests it
+        sent when the archive was created, so the new archive keeps
+        the parameters of every fetch merged (see `Archive.fetches`),
+        sorted by the date of creation of their archives; fetches with
+        the same parameters are replayed once. The rest of metadata is
+        taken from the newest archive merged, including its date of
+        creation, but its range covers the ranges of all the fetches.
+        Once it is rebuilt to release the space not used, the merged
+        archives are removed.
+        Archives can be filtered by `origin`, `backend_name` and
+        `category`; invalid archives are skipped.
+
+        :param origin: only merge archives of this origin
+        :param backend_name: only merge archives of this backend
+        :param category: only merge archives of this category
+
+        :returns: a list of tuples with the path of each new archive
+            and the number of archives merged into it
+
+        :raises ArchiveManagerError: when an error occurs merging
+            the archives
+        """
+        groups = []
 
         for archive_path in self._search_files():
             try:
@@ -446,20 +1017,1101 @@ class ArchiveManager:
             except ArchiveError:
                 continue
 
-            match = archive.origin == origin and \
-                archive.backend_name == backend_name and \
-                archive.category == category and \
-                archive.created_on >= archived_after
+            archive.close()
 
-            if not match:
+            if not archive.created_on:
+                continue
+            if origin is not None and archive.origin != origin:
+                continue
+            if backend_name is not None and archive.backend_name != backend_name:
+                continue
+            if category is not None and archive.category != category:
                 continue
 
-            yield archive_path, archive.created_on
+            for group in groups:
+                if self._same_fetch(group[0], archive):
+                    group.append(archive)
+                    break
+            else:
+                groups.append([archive])
 
-    def _search_files(self):
-        """Retrieve the file paths stored under the base path."""
+        results = []
 
-        for root, _, files in os.walk(self.dirpath):
-            for filename in files:
-                location = os.path.join(root, filename)
-                yield location
+        for group in groups:
+            if len(group) < 2:
+                continue
+
+            group.sort(key=lambda archive: archive.created_on)
+            archive_path = self._merge_archives(group)
+
+            logger.info("%s archives merged in archive %s", len(group), archive_path)
+            results.append((archive_path, len(group)))
+
+        return results
+
+    def evict_archives(self, max_bytes=None, max_age=None, keep_last=None):
+        """Remove archives following a retention policy.
+
+        Archives are evicted from the oldest to the newest one when
+        they were created `max_age` ago, when there are `keep_last`
+        newer archives of the same origin, backend and category, or
+        while the archives take more than `max_bytes`. Bodies kept
+        in the blob store are not taken into account in that size.
+
+        An archive is never evicted when it is the only one with the
+        data of its time range; that is, when the newer archives,
+        fetched with the same parameters, do not cover its range
+        together. Ranges are set by the `from_date`, `offset` and
+        `to_date` parameters; no value means no limit. Invalid
+        archives are skipped.
+
+        Thus, limiting the size is best-effort: the archives of
+        incremental fetches have the only copy of the data updated
+        since the previous fetch, so they are kept until a newer
+        fetch covers their range. To reduce the space they take,
+        merge them with `compact_archives`.
+
+        :param max_bytes: maximum number of bytes taken by the archives
+        :param max_age: maximum age of the archives, as a `timedelta`
+        :param keep_last: number of archives kept for each origin,
+            backend and category
+
+        :returns: a list with the paths of the archives removed
+
+        :raises ArchiveManagerError: when an error occurs removing
+            an archive
+        """
+        archives = []
+
+        for archive_path in self._search_files():
+            try:
+                archive = Archive(archive_path)
+            except ArchiveError:
+                continue
+
+            archive.close()
+
+            if archive.created_on:
+                archives.append(archive)
+
+        archives.sort(key=lambda archive: archive.created_on)
+
+        # Only archives of the same origin, backend and category can cover others
+        groups = collections.defaultdict(list)
+        for archive in archives:
+            groups[(archive.origin, archive.backend_name, archive.category)].append(archive)
+
+        evicted = []
+
+        def evict(archive):
+            group = groups[(archive.origin, archive.backend_name, archive.category)]
+            newer = group[group.index(archive) + 1:]
+
+            if not self._covered(archive, newer):
+                return False
+
+            self.remove_archive(archive.archive_path)
+            group.remove(archive)
+            evicted.append(archive)
+            return True
+
+        if max_age is not None or keep_last is not None:
+            oldest = datetime_utcnow() - max_age if max_age is not None else None
+            expired = set()
+
+            for group in groups.values():
+                for nnewer, archive in enumerate(reversed(group)):
+                    if (oldest is not None and archive.created_on < oldest) or \
+                            (keep_last is not None and nnewer >= keep_last):
+                        expired.add(archive.archive_path)
+
+            for archive in archives:
+                if archive.archive_path in expired:
+                    evict(archive)
+
+        if max_bytes is not None:
+            evicted_paths = {archive.archive_path for archive in evicted}
+            kept = [archive for archive in archives if archive.archive_path not in evicted_paths]
+            nbytes = sum(self._archive_size(archive.archive_path) for archive in kept)
+
+            for archive in kept:
+                if nbytes <= max_bytes:
+                    break
+
+                size = self._archive_size(archive.archive_path)
+
+                if evict(archive):
+                    nbytes -= size
+
+            if nbytes > max_bytes:
+                logger.warning("Archives take %s bytes; no more archives can be evicted "
+                               "without losing data; compact them to save space", nbytes)
+
+        logger.info("%s archives evicted from %s", len(evicted), self.dirpath)
+
+        return [archive.archive_path for archive in evicted]
+
+    def search(self, origin, backend_name, category, archived_after):
+        """Search archives.
+
+        Get the archives which store data based on the given parameters.
+        These parameters define which the origin was (`origin`), how data
+        was fetched (`backend_name`) and data type ('category').
+        Only those archives created on or after `archived_after` will be
+        returned.
+
+        The method returns a list with the file paths to those archives.
+        The list is sorted by the date of creation of each archive.
+
+        Archives are searched in the catalog. When it does not exist
+        yet, it is built reading every archive stored under the base
+        path. If the catalog cannot be read or written, the archives
+        are searched reading their files instead.
+
+        :param origin: data origin
+        :param backend_name: backed used to fetch data
+        :param category: type of the items fetched by the backend
+        :param archived_after: get archives created on or after this date
+
+        :returns: a list with archive names which match the search criteria
+        """
+        try:
+            return self._search_catalog(origin, backend_name,
+                                        category, archived_after)
+        except sqlite3.DatabaseError as e:
+            logger.warning("Catalog %s not available; searching archive files; cause: %s",
+                           self.catalog.catalog_path, str(e))
+
+        archives = self._search_archives(origin, backend_name,
+                                         category, archived_after)
+        archives = [(fp, date) for fp, date in archives]
+        archives = [fp for fp, _ in sorted(archives, key=lambda x: x[1])]
+
+        return archives
+
+    def _merge_archives(self, archives):
+        """Merge archives, sorted by date of creation, into a new archive."""
+
+        newest = archives[-1]
+        merged = self.create_archive()
+
+        # Fetches with the same parameters are replayed once, in the newest position
+        fetches = []
+        for archive in archives:
+            for params in archive.fetches:
+                if params in fetches:
+                    fetches.remove(params)
+                fetches.append(params)
+
+        try:
+            merged.init_metadata(newest.origin, newest.backend_name, newest.backend_version,
+                                 newest.category, self._merge_ranges(archives),
+                                 created_on=newest.created_on,
+                                 fetches=fetches if len(fetches) > 1 else None)
+
+            # Entries are stored in the same order they are replayed
+            for archive in archives:
+                merged.merge(archive.archive_path, replace=True)
+
+            merged.vacuum()
+
+            # References to the blob store are shared with the merged archives
+            if self.blob_store.exists():
+                self.blob_store.acquire(merged.blob_refs())
+
+            merged.close()
+        except ArchiveError as e:
+            merged.close()
+            self.remove_archive(merged.archive_path)
+            raise ArchiveManagerError(cause=str(e))
+
+        self._update_catalog(self._catalog_archive, merged.archive_path)
+
+        for archive in archives:
+            self.remove_archive(archive.archive_path)
+
+        return merged.archive_path
+
+    def _covered(self, archive, newer):
+        """Check whether newer archives have, together, the data of the range of an archive.
+
+        Archives fetched from a later offset cannot cover the archive.
+        The rest of archives cover it when, sorted by the start of their
+        ranges, each one starts before the previous ones end, from the
+        start to the end of the range of the archive.
+        """
+        params = archive.backend_params or {}
+        from_date, offset, to_date = (params.get(name) for name in RANGE_PARAMS)
+
+        ranges = []
+
+        try:
+            for other in newer:
+                other_params = other.backend_params or {}
+                other_from_date, other_offset, other_to_date = (other_params.get(name) for name in RANGE_PARAMS)
+
+                if not self._same_fetch(archive, other) or other.created_on < archive.created_on:
+                    continue
+                if other_offset is not None and (offset is None or other_offset > offset):
+                    continue
+
+                ranges.append((other_from_date, other_to_date))
+
+            # Ranges with no start go first
+            ranges.sort(key=lambda r: (r[0] is not None, r[0]))
+
+            # The range is covered until this date; no value means nothing is covered
+            reach = from_date
+
+            for start, end in ranges:
+                if start is not None and (reach is None or start > reach):
+                    return False
+                if end is None:
+                    return True
+                if reach is None or end > reach:
+                    reach = end
+        except TypeError:
+            return False
+
+        return to_date is not None and reach is not None and reach >= to_date
+
+    def _archive_size(self, archive_path):
+        """Number of bytes taken by an archive, including SQLite temporary files"""
+
+        nbytes = os.path.getsize(archive_path)
+
+        for ext in self.SQLITE_TEMP_EXTS:
+            if os.path.exists(archive_path + ext):
+                nbytes += os.path.getsize(archive_path + ext)
+
+        return nbytes
+
+    @staticmethod
+    def _same_fetch(archive, other):
+        """Check whether two archives were created by the same fetch, whatever its range"""
+
+        def fetch_params(archive):
+            params = dict(archive.backend_params or {})
+            for name in RANGE_PARAMS:
+                params.pop(name, None)
+            return params
+
+        return archive.origin == other.origin and \
+            archive.backend_name == other.backend_name and \
+            archive.category == other.category and \
+            fetch_params(archive) == fetch_params(other)
+
+    @staticmethod
+    def _merge_ranges(archives):
+        """Parameters of the newest archive with a range covering all of them"""
+
+        params = dict(archives[-1].backend_params or {})
+
+        for name, limit in [('from_date', min), ('offset', min), ('to_date', max)]:
+            values = [(archive.backend_params or {}).get(name) for archive in archives]
+
+            # No value means no limit
+            value = None if None in values else limit(values)
+
+            if name in params or value is not None:
+                params[name] = value
+
+        return params
+
+    def _search_catalog(self, origin, backend_name, category, archived_after):
+        """Search archives using the catalog."""
+
+        if not self.catalog.exists():
+            self._build_catalog()
+
+        # Archives created before their metadata was initialized
+        for archive_path in self.catalog.pending():
+            self._catalog_archive(archive_path)
+
+        archives = []
+
+        for archive_path in self.catalog.search(origin, backend_name,
+                                                category, archived_after):
+            if os.path.exists(archive_path):
+                archives.append(archive_path)
+            else:
+                self.catalog.remove(archive_path)
+
+        return archives
+
+    def _build_catalog(self):
+        """Create the catalog from the archives found under the base path."""
+
+        self.catalog.create()
+        self.catalog.clear()
+
+        narchives = 0
+
+        for archive_path in self._search_files():
+            if self._catalog_archive(archive_path):
+                narchives += 1
+
+        return narchives
+
+    def _catalog_archive(self, archive_path):
+        """Add the metadata of an archive to the catalog.
+
+        Archives without metadata are added as pending; invalid
+        archives are removed from the catalog.
+
+        :returns: whether the archive is valid
+        """
+        try:
+            archive = Archive(archive_path)
+        except ArchiveError:
+            self.catalog.remove(archive_path)
+            return False
+
+        archive.close()
+
+        self.catalog.add(archive_path,
+                         origin=archive.origin,
+                         backend_name=archive.backend_name,
+                         category=archive.category,
+                         created_on=archive.created_on)
+        return True
+
+    def _update_catalog(self, func, archive_path):
+        """Run an update on the catalog, when it exists.
+
+        When the catalog cannot be updated, it is removed so it will
+        be built again the next time the archives are searched.
+        """
+        try:
+            if self.catalog.exists():
+                func(archive_path)
+        except sqlite3.DatabaseError as e:
+            logger.warning("Catalog %s could not be updated; cause: %s",
+                           self.catalog.catalog_path, str(e))
+            self.catalog.drop()
+
+    def _search_archives(self, origin, backend_name, category, archived_after):
+        """Search archives using filters."""
+
+        for archive_path in self._search_files():
+            try:
+                archive = Archive(archive_path)
+            except ArchiveError:
+                continue
+
+            match = archive.origin == origin and \
+                archive.backend_name == backend_name and \
+                archive.category == category and \
+                archive.created_on >= archived_after
+
+            if not match:
+                continue
+
+            yield archive_path, archive.created_on
+
+    def _search_files(self):
+        """Retrieve the file paths stored under the base path."""
+
+        for root, _, files in os.walk(self.dirpath):
+            for filename in files:
+                if filename.endswith(self.SQLITE_TEMP_EXTS):
+                    continue
+                location = os.path.join(root, filename)
+                if location in (self.catalog.catalog_path, self.blob_store.blobs_path):
+                    continue
+                yield location
+
+
+class ArchiveCatalog:
+    """Catalog of the archives stored in a directory.
+
+    The catalog is an SQLite database, stored in `dirpath`, with
+    the metadata of every archive stored under that directory;
+    namely, the origin, the name of the backend, the category and
+    the date of creation. It allows to search archives without
+    reading each of their files.
+
+    Archives are identified by their path, relative to `dirpath`.
+    An archive is added to the catalog when it is created, before
+    its metadata is initialized; until then, it is pending (see
+    `pending`).
+
+    Connections to the database are opened on each operation, so
+    several processes can share the same catalog.
+
+    :param dirpath: path of the directory where the archives are stored
+    """
+
+    CATALOG_NAME = 'catalog.db'
+    CATALOG_TABLE = 'catalog'
+
+    # Table structure
+    CATALOG_CREATE_STMT = "CREATE TABLE IF NOT EXISTS " + CATALOG_TABLE + " ( " \
+                          "path TEXT PRIMARY KEY, " \
+                          "origin TEXT, " \
+                          "backend_name TEXT, " \
+                          "category TEXT, " \
+                          "created_on REAL)"
+
+    CATALOG_INDEX_STMT = "CREATE INDEX IF NOT EXISTS " + CATALOG_TABLE + "_search " \
+                         "ON " + CATALOG_TABLE + " (origin, backend_name, category, created_on)"
+
+    def __init__(self, dirpath):
+        self.dirpath = dirpath
+        self.catalog_path = os.path.join(dirpath, self.CATALOG_NAME)
+
+    def exists(self):
+        """Check whether the catalog was created"""
+
+        return os.path.exists(self.catalog_path)
+
+    def create(self):
+        """Create the catalog, when it does not exist"""
+
+        self._execute(self.CATALOG_CREATE_STMT)
+        self._execute(self.CATALOG_INDEX_STMT)
+
+    def drop(self):
+        """Remove the catalog"""
+
+        if self.exists():
+            os.remove(self.catalog_path)
+
+    def clear(self):
+        """Remove every archive from the catalog"""
+
+        self._execute("DELETE FROM " + self.CATALOG_TABLE)
+
+    def add(self, archive_path, origin=None, backend_name=None,
+            category=None, created_on=None):
+        """Add an archive to the catalog or update its metadata.
+
+        :param archive_path: path of the archive
+        :param origin: origin of the data archived
+        :param backend_name: name of the backend
+        :param category: category of the items fetched
+        :param created_on: date when the archive was created
+        """
+        created_on = datetime_to_utc(created_on).timestamp() if created_on else None
+
+        insert_stmt = "INSERT OR REPLACE INTO " + self.CATALOG_TABLE + " " \
+                      "(path, origin, backend_name, category, created_on) " \
+                      "VALUES (?, ?, ?, ?, ?)"
+        self._execute(insert_stmt, (self._relpath(archive_path), origin,
+                                    backend_name, category, created_on))
+
+    def remove(self, archive_path):
+        """Remove an archive from the catalog.
+
+        :param archive_path: path of the archive
+        """
+        delete_stmt = "DELETE FROM " + self.CATALOG_TABLE + " WHERE path = ?"
+        self._execute(delete_stmt, (self._relpath(archive_path),))
+
+    def pending(self):
+        """Get the archives whose metadata is not in the catalog.
+
+        :returns: a list with the paths of the archives
+        """
+        select_stmt = "SELECT path FROM " + self.CATALOG_TABLE + " WHERE created_on IS NULL"
+        return [self._abspath(row[0]) for row in self._execute(select_stmt)]
+
+    def search(self, origin, backend_name, category, archived_after=None):
+        """Search archives in the catalog.
+
+        :param origin: data origin
+        :param backend_name: backed used to fetch data
+        :param category: type of the items fetched by the backend
+        :param archived_after: get archives created on or after this date
+
+        :returns: a list with the paths of the archives, sorted by
+            their date of creation
+        """
+        archived_after = datetime_to_utc(archived_after).timestamp() if archived_after else 0
+
+        select_stmt = "SELECT path FROM " + self.CATALOG_TABLE + " " \
+                      "WHERE origin = ? AND backend_name = ? AND category = ? " \
+                      "AND created_on >= ? " \
+                      "ORDER BY created_on, path"
+        rows = self._execute(select_stmt, (origin, backend_name, category, archived_after))
+
+        return [self._abspath(row[0]) for row in rows]
+
+    def _execute(self, stmt, params=()):
+        """Run a statement in its own transaction and return its rows"""
+
+        with sqlite_connect(self.catalog_path) as conn:
+            return conn.execute(stmt, params).fetchall()
+
+    def _relpath(self, archive_path):
+        return os.path.relpath(archive_path, self.dirpath)
+
+    def _abspath(self, path):
+        return os.path.join(self.dirpath, path)
+
+
+class ArchiveCache:
+    """Cache of requests served from archives.
+
+    The data of a request is searched, by the hash code of the
+    request, in the given archives from the newest to the oldest
+    one. Archives are opened the first time they are needed and
+    those that cannot be read are ignored. Lookups can be done
+    from several threads, like those fetching pages in advance.
+
+    :param archive_paths: paths of the archives, sorted by their
+        date of creation
+    """
+    def __init__(self, archive_paths):
+        self.archive_paths = list(archive_paths)
+        self._archives = None
+        self._lock = threading.Lock()
+
+    def lookup(self, uri, payload, headers):
+        """Look for the data of a request.
+
+        :param uri: request URI
+        :param payload: request payload
+        :param headers: request headers
+
+        :returns: the archived data or `None` when it is not found
+        """
+        hashcode = Archive.make_hashcode(uri, payload, headers)
+
+        with self._lock:
+            for archive in self._open_archives():
+                try:
+                    data = archive.lookup(hashcode)
+                except ArchiveError as e:
+                    logger.warning("Ignoring %s archive in cache due to: %s", archive.archive_path, str(e))
+                    self._archives.remove(archive)
+                    continue
+
+                if data is not None:
+                    return data
+
+        return None
+
+    def close(self):
+        """Close the archives opened"""
+
+        with self._lock:
+            for archive in self._archives or []:
+                archive.close()
+
+            self._archives = None
+
+    def _open_archives(self):
+        if self._archives is not None:
+            return list(self._archives)
+
+        self._archives = []
+
+        for archive_path in reversed(self.archive_paths):
+            try:
+                # Archives are shared by the threads doing lookups,
+                # which are serialized by the lock of the cache
+                self._archives.append(Archive(archive_path, check_same_thread=False))
+            except ArchiveError as e:
+                logger.warning("Ignoring %s archive in cache due to: %s", archive_path, str(e))
+
+        return list(self._archives)
+
+
+class BlobStore:
+    """Content-addressed store of the bodies of archived responses.
+
+    The store is an SQLite database, stored in `dirpath`, where
+    each body is kept once, identified by its SHA256 hash code,
+    with the number of records that reference it. Bodies are
+    removed once they are not referenced anymore.
+
+    Each body added with `put` is committed in its own short
+    transaction, before the archive referencing it commits its
+    record. Thus, the store is never locked while archives batch
+    their writes, and when the process is interrupted, records
+    never reference missing bodies; at most, some bodies will keep
+    references that do not exist.
+
+    :param dirpath: path of the directory where the store is kept
+    :param check_same_thread: only allow the thread that opened the
+        store to use it
+    """
+
+    BLOBS_NAME = 'blobs.db'
+    BLOBS_TABLE = 'blobs'
+
+    TIMEOUT = SQLITE_TIMEOUT
+
+    # Table structure
+    BLOBS_CREATE_STMT = "CREATE TABLE IF NOT EXISTS " + BLOBS_TABLE + " ( " \
+                        "hashcode TEXT PRIMARY KEY, " \
+                        "data BLOB, " \
+                        "refs INTEGER)"
+
+    def __init__(self, dirpath, check_same_thread=True):
+        self.dirpath = dirpath
+        self.blobs_path = os.path.join(dirpath, self.BLOBS_NAME)
+        self.check_same_thread = check_same_thread
+        self._db = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_db'] = None
+        return state
+
+    def exists(self):
+        """Check whether the store was created"""
+
+        return os.path.exists(self.blobs_path)
+
+    def put(self, data):
+        """Add a reference to a body, storing it when it is new.
+
+        :param data: body to store
+
+        :returns: the hash code of the body
+
+        :raises ArchiveError: when an error occurs storing the body
+        """
+        hashcode = self.make_hashcode(data)
+
+        insert_stmt = "INSERT OR IGNORE INTO " + self.BLOBS_TABLE + " " \
+                      "(hashcode, data, refs) VALUES (?, ?, 0)"
+        update_stmt = "UPDATE " + self.BLOBS_TABLE + " SET refs = refs + 1 WHERE hashcode = ?"
+
+        try:
+            db = self._connect(create=True)
+            with sqlite_transaction(db):
+                db.execute(insert_stmt, (hashcode, data))
+                db.execute(update_stmt, (hashcode,))
+        except sqlite3.DatabaseError as e:
+            msg = "blob storage error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+        return hashcode
+
+    def get(self, hashcode):
+        """Get a body from the store.
+
+        :param hashcode: hash code of the body
+
+        :returns: the body
+
+        :raises ArchiveError: when the body is not found
+        """
+        select_stmt = "SELECT data FROM " + self.BLOBS_TABLE + " WHERE hashcode = ?"
+
+        try:
+            row = self._connect().execute(select_stmt, (hashcode,)).fetchone()
+        except sqlite3.DatabaseError as e:
+            msg = "blob retrieval error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+        if not row:
+            msg = "blob %s not found in store %s" % (hashcode, self.blobs_path)
+            raise ArchiveError(cause=msg)
+
+        return row[0]
+
+    def acquire(self, hashcodes):
+        """Add references to bodies already stored.
+
+        :param hashcodes: hash codes of the bodies, once per reference
+
+        :raises ArchiveError: when an error occurs adding the references
+        """
+        update_stmt = "UPDATE " + self.BLOBS_TABLE + " SET refs = refs + 1 WHERE hashcode = ?"
+
+        try:
+            db = self._connect()
+            with sqlite_transaction(db):
+                db.executemany(update_stmt, ((hashcode,) for hashcode in hashcodes))
+        except sqlite3.DatabaseError as e:
+            msg = "blob storage error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+    def release(self, hashcodes):
+        """Remove references to bodies, deleting those not referenced anymore.
+
+        :param hashcodes: hash codes of the bodies, once per reference
+
+        :raises ArchiveError: when an error occurs removing the references
+        """
+        update_stmt = "UPDATE " + self.BLOBS_TABLE + " SET refs = refs - 1 WHERE hashcode = ?"
+        delete_stmt = "DELETE FROM " + self.BLOBS_TABLE + " WHERE refs <= 0"
+
+        try:
+            db = self._connect()
+            with sqlite_transaction(db):
+                db.executemany(update_stmt, ((hashcode,) for hashcode in hashcodes))
+                db.execute(delete_stmt)
+        except sqlite3.DatabaseError as e:
+            msg = "blob release error; cause: %s" % str(e)
+            raise ArchiveError(cause=msg)
+
+    def close(self):
+        """Close the store"""
+
+        if not self._db:
+            return
+
+        self._db.close()
+        self._db = None
+
+    @staticmethod
+    def make_hashcode(data):
+        """Generate the SHA256 hash code of a body"""
+
+        return hashlib.sha256(data).hexdigest()
+
+    def _connect(self, create=False):
+        if self._db:
+            return self._db
+
+        if not create and not self.exists():
+            msg = "blob store %s does not exist" % self.blobs_path
+            raise ArchiveError(cause=msg)
+
+        # Autocommit mode; transactions are started explicitly
+        self._db = sqlite3.connect(self.blobs_path, timeout=self.TIMEOUT,
+                                   isolation_level=None,
+                                   check_same_thread=self.check_same_thread)
+        self._db.execute(self.BLOBS_CREATE_STMT)
+
+        return self._db
+
+
+class ArchiveCommand:
+    """Maintain the archives from the command line.
+
+    The action to run is the first of the arguments. Available
+    actions are:
+
+      - `convert`: convert the responses stored as pickles by older
+        versions of Perceval to compact records
+      - `rebuild-catalog`: rebuild the catalog of the archives
+      - `compact`: merge the archives of the same fetch into one
+      - `prune`: remove archives following a retention policy
+
+    :param args: command line arguments
+    :param debug: boolean flag to check if application is running in debug mode
+    """
+    CONVERT = 'convert'
+    REBUILD_CATALOG = 'rebuild-catalog'
+    COMPACT = 'compact'
+    PRUNE = 'prune'
+
+    def __init__(self, *args, debug=False):
+        parser = self.setup_cmd_parser()
+        self.parsed_args = parser.parse_args(args)
+        self.debug = debug
+
+        archive_path = self.parsed_args.archive_path or os.path.expanduser(ARCHIVES_DEFAULT_PATH)
+        self.manager = ArchiveManager(archive_path)
+
+    def run(self):
+        """Run the action on the archives.
+
+        :returns: the result of the action
+        """
+        if self.parsed_args.action == self.CONVERT:
+            return self._convert()
+        elif self.parsed_args.action == self.REBUILD_CATALOG:
+            return self.manager.rebuild_catalog()
+        elif self.parsed_args.action == self.COMPACT:
+            return self._compact()
+        elif self.parsed_args.action == self.PRUNE:
+            return self._prune()
+
+    def _convert(self):
+        compression = self.parsed_args.compression
+        results = self.manager.convert_archives(compression=compression)
+
+        nentries = sum(nconverted for _, nconverted in results)
+        logger.info("%s entries converted in %s archives", nentries, len(results))
+
+        return results
+
+    def _compact(self):
+        results = self.manager.compact_archives(origin=self.parsed_args.origin,
+                                                backend_name=self.parsed_args.backend_name,
+                                                category=self.parsed_args.category)
+
+        narchives = sum(nmerged for _, nmerged in results)
+        logger.info("%s archives merged in %s archives", narchives, len(results))
+
+        return results
+
+    def _prune(self):
+        max_age = self.parsed_args.max_age
+        max_age = datetime.timedelta(days=max_age) if max_age is not None else None
+
+        return self.manager.evict_archives(max_bytes=self.parsed_args.max_bytes,
+                                           max_age=max_age,
+                                           keep_last=self.parsed_args.keep_last)
+
+    @classmethod
+    def setup_cmd_parser(cls):
+        """Returns the archive argument parser."""
+
+        common = argparse.ArgumentParser(add_help=False)
+        common.add_argument('--archive-path', dest='archive_path', default=None,
+                            help="directory path to the archives (default: %s)" % ARCHIVES_DEFAULT_PATH)
+
+        parser = argparse.ArgumentParser(prog='perceval archive')
+
+        actions = parser.add_subparsers(dest='action', title='actions')
+        actions.required = True
+
+        convert = actions.add_parser(cls.CONVERT, parents=[common],
+                                     help="convert responses stored as pickles to compact records")
+        convert.add_argument('--compression', dest='compression',
+                             choices=COMPRESSIONS, default=COMPRESSION_NONE,
+                             help="compression of the bodies of the responses; "
+                                  "zstd requires 'zstandard' package (default: %(default)s)")
+
+        actions.add_parser(cls.REBUILD_CATALOG, parents=[common],
+                           help="rebuild the catalog used to search the archives")
+
+        compact = actions.add_parser(cls.COMPACT, parents=[common],
+                                     help="merge the archives of the same fetch into one")
+        compact.add_argument('--origin', dest='origin', default=None,
+                             help="only merge archives of this origin")
+        compact.add_argument('--backend', dest='backend_name', default=None,
+                             help="only merge archives of this backend (i.e., its class name)")
+        compact.add_argument('--category', dest='category', default=None,
+                             help="only merge archives of this category")
+
+        prune = actions.add_parser(cls.PRUNE, parents=[common],
+                                   help="remove archives following a retention policy; "
+                                        "archives with the only copy of some data are kept")
+        prune.add_argument('--max-bytes', dest='max_bytes', type=int, default=None,
+                           help="remove the oldest archives while they take more bytes")
+        prune.add_argument('--max-age', dest='max_age', type=float, default=None,
+                           help="remove archives created more than these days ago")
+        prune.add_argument('--keep-last', dest='keep_last', type=int, default=None,
+                           help="keep these newest archives for each origin, backend and category")
+
+        return parser
+
+
+def encode_record(data, compression=COMPRESSION_NONE, blob_store=None):
+    """Encode data to be stored in an archive.
+
+    HTTP responses (`requests.Response`) and the HTTP errors raised
+    for them (`requests.HTTPError`) are encoded as compact records.
+    A record starts with `RECORD_MAGIC`, followed by a byte with the
+    version of the format, the length of the header as a 4-byte
+    big-endian integer, the header and the body of the response.
+    The header is a JSON document with the status, reason, URL,
+    headers, encoding and elapsed time of the response, the method
+    and URL of the request and, for errors, the message of the error.
+    Bodies can be compressed with zstd.
+
+    When a blob store is given, bodies with at least `MIN_BLOB_SIZE`
+    bytes are stored there. These records have no body; their header
+    keeps the hash code of the body under the key `blob`.
+
+    Any other data is pickled.
+
+    :param data: data to encode
+    :param compression: compression of the body of the responses
+    :param blob_store: `BlobStore` where the bodies are stored
+
+    :returns: the encoded data
+    """
+    if isinstance(data, requests.Response):
+        response = data
+        header = {'type': RECORD_RESPONSE}
+    elif isinstance(data, requests.HTTPError) and isinstance(data.response, requests.Response):
+        response = data.response
+        header = {'type': RECORD_HTTP_ERROR, 'message': str(data)}
+    else:
+        return pickle.dumps(data, pickle.DEFAULT_PROTOCOL)
+
+    request = response.request
+
+    header.update({
+        'status_code': response.status_code,
+        'reason': _to_str(response.reason),
+        'url': response.url,
+        'headers': list(response.headers.items()),
+        'encoding': response.encoding,
+        'elapsed': response.elapsed.total_seconds(),
+        'request': {'method': request.method, 'url': request.url} if request else None,
+        'compression': None
+    })
+
+    body = response.content or b''
+
+    if compression == COMPRESSION_ZSTD and len(body) >= MIN_COMPRESSION_SIZE:
+        compressed = zstandard.ZstdCompressor().compress(body)
+
+        if len(compressed) < len(body):
+            body = compressed
+            header['compression'] = COMPRESSION_ZSTD
+
+    version = RECORD_VERSION
+
+    if blob_store and len(body) >= MIN_BLOB_SIZE:
+        header['blob'] = blob_store.put(body)
+        body = b''
+        version = RECORD_VERSION_BLOB
+
+    header_dump = json.dumps(header, separators=(',', ':')).encode('utf-8')
+
+    return b''.join([RECORD_MAGIC,
+                     bytes([version]),
+                     struct.pack('>I', len(header_dump)),
+                     header_dump,
+                     body])
+
+
+def decode_record(record, blob_store=None):
+    """Decode data stored in an archive.
+
+    Records of responses are decoded as `ArchivedResponse` objects;
+    records of errors, as `requests.HTTPError` exceptions with their
+    response. Any other data is unpickled.
+
+    :param record: data to decode
+    :param blob_store: `BlobStore` where the bodies referenced by
+        the records are stored
+
+    :returns: the decoded data
+
+    :raises ArchiveError: when the record is not supported or its
+        body is not available
+    """
+    if not is_record(record):
+        return pickle.loads(record)
+
+    header, offset = _decode_record_header(record)
+
+    if header['compression'] == COMPRESSION_ZSTD and not zstandard:
+        msg = "zstd compressed record requires 'zstandard' package"
+        raise ArchiveError(cause=msg)
+
+    if header.get('blob'):
+        if not blob_store:
+            msg = "record body %s stored in a blob store; store not given" % header['blob']
+            raise ArchiveError(cause=msg)
+        response = ArchivedResponse(header, blob_store.get(header['blob']), 0)
+    else:
+        response = ArchivedResponse(header, record, offset)
+
+    if header['type'] == RECORD_HTTP_ERROR:
+        return requests.HTTPError(header['message'], response=response)
+
+    return response
+
+
+def record_blob(record):
+    """Get the hash code of the body a record keeps in a blob store.
+
+    :param record: encoded data
+
+    :returns: the hash code or `None` when the body is not
+        stored in a blob store
+    """
+    if not is_record(record) or record[len(RECORD_MAGIC)] != RECORD_VERSION_BLOB:
+        return None
+
+    header, _ = _decode_record_header(record)
+
+    return header.get('blob', None)
+
+
+def is_record(data):
+    """Check whether some encoded data is a record"""
+
+    return data[:len(RECORD_MAGIC)] == RECORD_MAGIC
+
+
+class ArchivedResponse(requests.Response):
+    """HTTP response rebuilt from an archive record.
+
+    The body of the response is not copied from the record nor
+    decompressed until the content of the response is accessed.
+
+    :param header: header of the record
+    :param record: encoded record
+    :param offset: position where the body starts in the record
+    """
+    def __init__(self, header, record, offset):
+        super().__init__()
+
+        self.status_code = header['status_code']
+        self.reason = header['reason']
+        self.url = header['url']
+        self.headers = requests.structures.CaseInsensitiveDict(header['headers'])
+        self.encoding = header['encoding']
+        self.elapsed = datetime.timedelta(seconds=header['elapsed'])
+
+        if header['request']:
+            self.request = requests.PreparedRequest()
+            self.request.method = header['request']['method']
+            self.request.url = header['request']['url']
+
+        self._content_consumed = True
+        self._record = record
+        self._offset = offset
+        self._compression = header['compression']
+
+    @property
+    def content(self):
+        """Content of the response, in bytes"""
+
+        if self._content is False:
+            body = self._record[self._offset:]
+
+            if self._compression == COMPRESSION_ZSTD:
+                body = zstandard.ZstdDecompressor().decompress(body)
+
+            self._content = body
+            self._record = None
+
+        return self._content
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        _ = self.content
+        return super().iter_content(chunk_size=chunk_size, decode_unicode=decode_unicode)
+
+    def __getstate__(self):
+        # The record is not pickled, so the body must be read first
+        _ = self.content
+        return super().__getstate__()
+
+
+def _decode_record_header(record):
+    """Decode the header of a record.
+
+    :returns: a tuple with the header and the position where
+        the body starts in the record
+    """
+    offset = len(RECORD_MAGIC)
+    version = record[offset]
+
+    if version > RECORD_VERSION_BLOB:
+        msg = "record version %s not supported" % version
+        raise ArchiveError(cause=msg)
+
+    header_size = struct.unpack_from('>I', record, offset + 1)[0]
+    offset += 5
+    header = json.loads(record[offset:offset + header_size].decode('utf-8'))
+
+    return header, offset + header_size
+
+
+def _check_compression(compression):
+    if compression not in COMPRESSIONS:
+        raise ArchiveError(cause="unknown compression %s" % compression)
+    if compression == COMPRESSION_ZSTD and not zstandard:
+        raise ArchiveError(cause="zstd compression requires 'zstandard' package")
+
+
+def _to_str(value):
+    if isinstance(value, bytes):
+        return value.decode('latin-1')
+    return value
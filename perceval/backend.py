@@ -26,29 +26,68 @@
 
 import argparse
 import collections
+import collections.abc
+import concurrent.futures
 import hashlib
+import heapq
 import importlib
-import json
+import inspect
+import itertools
 import logging
+import multiprocessing
 import os
+import pickle
 import pkgutil
+import queue
 import sys
+import tempfile
+import time
 
 from grimoirelab_toolkit.introspect import find_signature_parameters
 from grimoirelab_toolkit.datetime import (datetime_utcnow,
                                           str_to_datetime,
                                           unixtime_to_datetime)
-from .archive import Archive, ArchiveManager
+from .archive import (ARCHIVES_DEFAULT_PATH,
+                      COMPRESSION_NONE as ARCHIVE_COMPRESSION_NONE,
+                      COMPRESSIONS as ARCHIVE_COMPRESSIONS,
+                      Archive,
+                      ArchiveCache,
+                      ArchiveManager)
+from .client import HttpCache, HttpClient, HttpClientOptions, RateBudget
 from .errors import ArchiveError, BackendError, BackendCommandArgumentParserError
+from .output import (COLUMNAR_FORMATS,
+                     COMPRESSION_NONE,
+                     COMPRESSIONS,
+                     OUTPUT_FORMAT_JSON,
+                     OUTPUT_FORMAT_JSON_LINE,
+                     OUTPUT_FORMATS,
+                     ColumnarItemWriter,
+                     ItemWriter,
+                     JSONSerializer,
+                     ShardedItemWriter)
+from .state import FetchStateStore
+from .utils import DEFAULT_DATETIME
 from ._version import __version__
 
 
 logger = logging.getLogger(__name__)
 
 
-ARCHIVES_DEFAULT_PATH = '~/.perceval/archives/'
 DEFAULT_SEARCH_FIELD = 'item_id'
 
+# Order of the items replayed in parallel from several archives
+REPLAY_ORDER_ARCHIVE = 'archive'
+REPLAY_ORDER_UPDATED_ON = 'updated_on'
+REPLAY_ORDERS = [REPLAY_ORDER_ARCHIVE, REPLAY_ORDER_UPDATED_ON]
+
+# Items sent at once by the processes replaying archives
+REPLAY_CHUNK_SIZE = 100
+# Chunks queued per archive until they are consumed
+REPLAY_QUEUE_SIZE = 10
+# Items sorted in memory before writing them to merge them by date
+REPLAY_RUN_SIZE = 10000
+REPLAY_POLL_TIME = 0.1
+
 OriginUniqueField = collections.namedtuple('OriginUniqueField', 'name type')
 
 
@@ -92,6 +131,15 @@ class Backend:
     the summary also includes some extra fields, which can be used by any
     backend to include fetch-specific information.
 
+    The `HttpClientOptions` set in the `client_options` attribute are
+    given to the client of the backend before fetching the items. They
+    set the `ArchiveCache` serving the requests already stored in
+    previous archives, the `HttpCache` to revalidate unchanged resources
+    with conditional requests, how rate limits are shared and paced and
+    the pages fetched in advance or concurrently. A `BackendError` or
+    an `HttpClientError` is raised when the client does not support
+    any of the options set.
+
     Backends also produce a set of search fields, exposed in the
     `search_fields` attribute of each item returned by a call to :func:`fetch`.
     These contain the `item_id`, as well as any number of backend-specific
@@ -198,6 +246,7 @@ class Backend:
         self.tag = tag if tag else origin
         self.archive = archive or None
         self.blacklist_ids = blacklist_ids or None
+        self.client_options = None
         self._summary = None
         self._ssl_verify = ssl_verify
 
@@ -312,21 +361,33 @@ class Backend:
                                        kwargs)
 
         self.client = self._init_client()
+        self._instrument_client()
 
-        for item in self.fetch_items(category, **kwargs):
-            if filter_classified:
-                item = self.filter_classified_data(item)
+        if self.client_options and any(self.client_options):
+            self._set_client_options()
 
-            metadata_item = self.metadata(item, filter_classified=filter_classified)
-            self.summary.update(metadata_item)
+        items = self.fetch_items(category, **kwargs)
+        if filter_classified:
+            items = map(self.filter_classified_data, items)
 
-            yield metadata_item
+        items = self.metadata_many(items, filter_classified=filter_classified)
+
+        try:
+            for metadata_item in _timed(items, self.summary):
+                self.summary.update(metadata_item)
+
+                yield metadata_item
+        finally:
+            # Archives might batch writes; commit any pending data
+            if self.archive:
+                self.archive.flush()
 
     def fetch_from_archive(self):
         """Fetch the questions from an archive.
 
         It returns the items stored within an archive. If this method is called but
         no archive was provided, the method will raise a `ArchiveError` exception.
+        The items of archives merging several fetches are returned fetch by fetch.
 
         :returns: a generator of items
 
@@ -337,13 +398,22 @@ class Backend:
 
         self._summary = Summary()
         self.client = self._init_client(from_archive=True)
+        self._instrument_client()
+
+        items = self._fetch_archived_items()
+        items = self.metadata_many(items)
 
-        for item in self.fetch_items(self.archive.category, **self.archive.backend_params):
-            metadata_item = self.metadata(item)
+        for metadata_item in _timed(items, self.summary):
             self.summary.update(metadata_item)
 
             yield metadata_item
 
+    def _fetch_archived_items(self):
+        """Replay each of the fetches stored in the archive"""
+
+        for backend_params in self.archive.fetches:
+            yield from self.fetch_items(self.archive.category, **backend_params)
+
     def filter_classified_data(self, item):
         """Remove classified or confidential data from an item.
 
@@ -354,18 +424,12 @@ class Backend:
 
         :returns: the same item but with confidential data filtered
         """
-        item_uuid = uuid(self.origin, self.metadata_id(item))
-
-        logger.debug("Filtering classified data for item %s", item_uuid)
-
         for cf in self.CLASSIFIED_FIELDS:
             try:
                 _remove_key_from_nested_dictlist(item, cf)
             except KeyError:
                 logger.debug("Classified field '%s' not found for item %s; field ignored",
-                             '.'.join(cf), item_uuid)
-
-        logger.debug("Classified data filtered for item %s", item_uuid)
+                             '.'.join(cf), uuid(self.origin, self.metadata_id(item)))
 
         return item
 
@@ -379,31 +443,9 @@ class Backend:
 
         :returns: a dict of search fields
         """
-        item_uuid = uuid(self.origin, self.metadata_id(item))
+        item_id = self.metadata_id(item)
 
-        logger.debug("Adding search fields to item %s", item_uuid)
-
-        logger.debug("Adding default `item_id` search field to item %s", item_uuid)
-        search_fields = {
-            DEFAULT_SEARCH_FIELD: self.metadata_id(item)
-        }
-
-        logger.debug("Adding extra search fields to item %s", item_uuid)
-        for sf in self.EXTRA_SEARCH_FIELDS:
-            try:
-                search_field = self.EXTRA_SEARCH_FIELDS[sf]
-                field_value = _find_value_from_nested_dict(item, search_field)
-                search_fields[sf] = field_value
-            except KeyError:
-                logger.warning("Extra search field '%s' not found for item %s; field ignored",
-                               sf, item_uuid)
-            except IndexError:
-                logger.warning("Extra search field '%s' is empty %s; field ignored",
-                               sf, item_uuid)
-
-        logger.debug("Search fields added for item %s", item_uuid)
-
-        return search_fields
+        return self._default_search_fields(item, item_id, uuid(self.origin, item_id))
 
     def metadata(self, item, filter_classified=False):
         """Add metadata to an item.
@@ -415,23 +457,90 @@ class Backend:
         :param item: an item fetched by a backend
         :param filter_classified: sets if classified fields were filtered
         """
+        classified_fields = self.classified_fields if filter_classified else None
+
+        return self._metadata(item, classified_fields)
+
+    def metadata_many(self, items, filter_classified=False):
+        """Add metadata to a set of items.
+
+        Generator that adds metadata to each item of `items`, like
+        `metadata` does. Those values shared by all the items, such
+        as the list of classified fields, are calculated only once.
+        When a backend overrides `metadata`, that method is called
+        for each item instead.
+
+        :param items: items fetched by a backend
+        :param filter_classified: sets if classified fields were filtered
+
+        :returns: a generator of items with metadata
+        """
+        if type(self).metadata is not Backend.metadata:
+            for item in items:
+                yield self.metadata(item, filter_classified=filter_classified)
+            return
+
+        classified_fields = self.classified_fields if filter_classified else None
+
+        for item in items:
+            yield self._metadata(item, classified_fields)
+
+    def _metadata(self, item, classified_fields):
+        """Build the metadata of an item.
+
+        The id and UUID of the item are calculated once and
+        reused to set the search fields.
+        """
+        item_id = self.metadata_id(item)
+        item_uuid = uuid(self.origin, item_id)
+
         item = {
             'backend_name': self.__class__.__name__,
             'backend_version': self.version,
             'perceval_version': __version__,
             'timestamp': datetime_utcnow().timestamp(),
             'origin': self.origin,
-            'uuid': uuid(self.origin, self.metadata_id(item)),
+            'uuid': item_uuid,
             'updated_on': self.metadata_updated_on(item),
-            'classified_fields_filtered': self.classified_fields if filter_classified else None,
+            'classified_fields_filtered': classified_fields,
             'category': self.metadata_category(item),
-            'search_fields': self.search_fields(item),
+            'search_fields': self._item_search_fields(item, item_id, item_uuid),
             'tag': self.tag,
             'data': item,
         }
 
         return item
 
+    def _item_search_fields(self, item, item_id, item_uuid):
+        """Get the search fields of an item from its id and UUID.
+
+        Backends overriding `search_fields` keep their own
+        behaviour, so that method is called in those cases.
+        """
+        if type(self).search_fields is not Backend.search_fields:
+            return self.search_fields(item)
+
+        return self._default_search_fields(item, item_id, item_uuid)
+
+    def _default_search_fields(self, item, item_id, item_uuid):
+        """Get the search fields defined by `EXTRA_SEARCH_FIELDS`"""
+
+        search_fields = {
+            DEFAULT_SEARCH_FIELD: item_id
+        }
+
+        for sf, search_field in self.EXTRA_SEARCH_FIELDS.items():
+            try:
+                search_fields[sf] = _find_value_from_nested_dict(item, search_field)
+            except KeyError:
+                logger.warning("Extra search field '%s' not found for item %s; field ignored",
+                               sf, item_uuid)
+            except IndexError:
+                logger.warning("Extra search field '%s' is empty %s; field ignored",
+                               sf, item_uuid)
+
+        return search_fields
+
     @classmethod
     def has_archiving(cls):
         """Whether or not this backend supports archiving requests.
@@ -553,6 +662,33 @@ class Backend:
         """
         raise NotImplementedError
 
+    def _instrument_client(self):
+        """Attach the metrics of the client to the summary of the fetch.
+
+        By default, the metrics of the requests sent by the client
+        (see :class:`perceval.metrics.HttpMetrics`) are added to the
+        summary when the client has them. Backends using several
+        clients can override this method to choose which one will
+        be measured.
+        """
+        self._summary.http = getattr(self.client, 'metrics', None)
+
+    def _set_client_options(self):
+        """Give the options in `client_options` to the client.
+
+        By default, the options are set on the client when it is an
+        `HttpClient` (see :func:`perceval.client.HttpClient.set_options`).
+        Backends using other clients can override this method to set
+        the options they support.
+
+        :raises BackendError: when the client does not support options
+        """
+        if not isinstance(self.client, HttpClient):
+            cause = "%s client does not support HTTP client options" % self.__class__.__name__
+            raise BackendError(cause=cause)
+
+        self.client.set_options(self.client_options)
+
     def _skip_item(self, item):
         if not self.origin_unique_field:
             return False
@@ -610,6 +746,10 @@ class BackendCommandArgumentParser:
     :param archive: set archiving arguments
     :param aliases: define aliases for parsed arguments
     :param ssl_verify: set SSL verify argument
+    :param http_cache: set HTTP cache arguments
+    :param rate_limit: set arguments to share and pace rate limits
+    :param prefetch_pages: set argument to prefetch pages
+    :param page_workers: set argument to fetch pages concurrently
 
     :raises AttributeError: when both `from_date` and `offset` are set
         to `True`
@@ -617,10 +757,15 @@ class BackendCommandArgumentParser:
 
     def __init__(self, backend, from_date=False, to_date=False, offset=False,
                  basic_auth=False, token_auth=False, archive=False,
-                 aliases=None, blacklist=False, ssl_verify=False):
+                 aliases=None, blacklist=False, ssl_verify=False,
+                 http_cache=False, rate_limit=False, prefetch_pages=False,
+                 page_workers=False):
         self._from_date = from_date
         self._to_date = to_date
         self._archive = archive
+        self._http_cache = http_cache
+        self._prefetch_pages = prefetch_pages
+        self._page_workers = page_workers
         self._backend = backend
         self._ssl_verify = ssl_verify
 
@@ -652,6 +797,10 @@ class BackendCommandArgumentParser:
             group.add_argument('--offset', dest='offset',
                                type=int, default=0,
                                help="offset to start fetching items")
+        if from_date or offset:
+            group.add_argument('--state-file', dest='state_file', default=None,
+                               help="file storing the state of previous fetches; when set, "
+                                    "fetching resumes from where the previous one finished")
         if blacklist:
             if not backend.ORIGIN_UNIQUE_FIELD:
                 msg = "Origin unique field not defined for {} backend".format(backend.__name__)
@@ -669,6 +818,12 @@ class BackendCommandArgumentParser:
         if archive:
             self._set_archive_arguments()
 
+        if http_cache or rate_limit or prefetch_pages or page_workers:
+            self._set_http_client_arguments(http_cache=http_cache,
+                                            rate_limit=rate_limit,
+                                            prefetch_pages=prefetch_pages,
+                                            page_workers=page_workers)
+
         if ssl_verify:
             group.add_argument('--no-ssl-verify', dest='ssl_verify', action='store_false',
                                help="disable SSL verification")
@@ -701,8 +856,27 @@ class BackendCommandArgumentParser:
 
         if self._archive and parsed_args.fetch_archive and parsed_args.no_archive:
             raise AttributeError("fetch-archive and no-archive arguments are not compatible")
+        if self._http_cache and parsed_args.http_cache_max_bytes < 1:
+            raise AttributeError("http-cache-max-bytes must be greater than 0")
+        if self._prefetch_pages and parsed_args.prefetch_pages < 0:
+            raise AttributeError("prefetch-pages must be greater than or equal to 0")
+        if self._page_workers and parsed_args.page_workers < 1:
+            raise AttributeError("page-workers must be greater than 0")
+        if self._archive and parsed_args.archive_cache_since:
+            parsed_args.archive_cache_since = str_to_datetime(parsed_args.archive_cache_since)
+
+        if self._archive and parsed_args.archive_cache_since and \
+                (parsed_args.fetch_archive or parsed_args.no_archive):
+            raise AttributeError("archive-cache-since is not compatible with fetch-archive or no-archive")
         if self._archive and parsed_args.fetch_archive and not parsed_args.category:
             raise AttributeError("fetch-archive needs a category to work with")
+        if self._archive and parsed_args.replay_workers is not None and parsed_args.replay_workers < 1:
+            raise AttributeError("replay-workers must be greater than 0")
+        if not parsed_args.output_dir and (parsed_args.shard_size or parsed_args.shard_bytes or
+                                           parsed_args.compression != COMPRESSION_NONE):
+            raise AttributeError("shard-size, shard-bytes and compression need output-dir to work with")
+        if parsed_args.output_dir and parsed_args.output_format in COLUMNAR_FORMATS:
+            raise AttributeError("output-dir does not support %s format" % parsed_args.output_format)
 
         # Set aliases
         for alias, arg in self.aliases.items():
@@ -738,6 +912,57 @@ class BackendCommandArgumentParser:
                            help="fetch data from the archives")
         group.add_argument('--archived-since', dest='archived_since', default='1970-01-01',
                            help="retrieve items archived since the given date")
+        group.add_argument('--archive-cache-since', dest='archive_cache_since', default=None,
+                           help="serve the requests found in the archives created since "
+                                "the given date; only the rest are sent to the data source")
+        group.add_argument('--archive-commit-every', dest='archive_commit_every', type=int, default=None,
+                           help="commit archived data every N requests (default: every request)")
+        group.add_argument('--archive-commit-interval', dest='archive_commit_interval', type=float, default=None,
+                           help="commit archived data at least every N seconds")
+        group.add_argument('--archive-wal', dest='archive_wal', action='store_true',
+                           help="use write-ahead logging in archives; not supported on network file systems")
+        group.add_argument('--archive-compression', dest='archive_compression',
+                           choices=ARCHIVE_COMPRESSIONS, default=ARCHIVE_COMPRESSION_NONE,
+                           help="compression of the responses archived; zstd requires "
+                                "'zstandard' package (default: %(default)s)")
+        group.add_argument('--archive-dedup', dest='archive_dedup', action='store_true',
+                           help="store identical responses once, shared by all the archives")
+        group.add_argument('--replay-workers', dest='replay_workers', type=int, default=None,
+                           help="number of processes replaying archives in parallel "
+                                "when fetching data from the archives (default: 1)")
+        group.add_argument('--replay-order', dest='replay_order',
+                           choices=REPLAY_ORDERS, default=REPLAY_ORDER_ARCHIVE,
+                           help="order of the items replayed in parallel: items of each archive "
+                                "in turn or all merged by update date (default: %(default)s)")
+
+    def _set_http_client_arguments(self, http_cache=False, rate_limit=False,
+                                   prefetch_pages=False, page_workers=False):
+        """Activate HTTP client arguments parsing"""
+
+        group = self.parser.add_argument_group('HTTP client arguments')
+        if http_cache:
+            group.add_argument('--http-cache', dest='http_cache', default=None,
+                               help="file caching HTTP responses to revalidate them with "
+                                    "conditional requests (ETag and Last-Modified)")
+            group.add_argument('--http-cache-max-bytes', dest='http_cache_max_bytes', type=int,
+                               default=HttpCache.DEFAULT_MAX_BYTES,
+                               help="maximum size of the responses cached; least recently "
+                                    "used ones are evicted first (default: %(default)s)")
+        if rate_limit:
+            group.add_argument('--rate-budget', dest='rate_budget', default=None,
+                               help="file sharing the rate limits of the tokens with other "
+                                    "processes, which pace their requests to spread them")
+            group.add_argument('--pace-requests', dest='pace_requests', action='store_true',
+                               help="spread the requests evenly until the rate limit is reset "
+                                    "instead of sleeping once it is exhausted")
+        if prefetch_pages:
+            group.add_argument('--prefetch-pages', dest='prefetch_pages', type=int, default=0,
+                               help="number of pages fetched in the background while the "
+                                    "current one is processed (default: %(default)s)")
+        if page_workers:
+            group.add_argument('--page-workers', dest='page_workers', type=int, default=1,
+                               help="number of pages fetched concurrently when the number "
+                                    "of pages is known in advance (default: %(default)s)")
 
     def _set_output_arguments(self):
         """Activate output arguments parsing"""
@@ -748,6 +973,21 @@ class BackendCommandArgumentParser:
                            help="output file")
         group.add_argument('--json-line', dest='json_line', action='store_true',
                            help="produce a JSON line for each output item")
+        group.add_argument('--output-format', dest='output_format',
+                           choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT_JSON,
+                           help="format of the output items; arrow and parquet formats "
+                                "require 'pyarrow' package (default: %(default)s)")
+        group.add_argument('--sort-keys', dest='sort_keys', action='store_true', default=None,
+                           help="sort the keys of JSON lines")
+        group.add_argument('--output-dir', dest='output_dir', default=None,
+                           help="write items as JSON lines split in files under this directory")
+        group.add_argument('--shard-size', dest='shard_size', type=int, default=None,
+                           help="maximum number of items per file in the output directory")
+        group.add_argument('--shard-bytes', dest='shard_bytes', type=int, default=None,
+                           help="maximum number of uncompressed bytes per file in the output directory")
+        group.add_argument('--compression', dest='compression',
+                           choices=COMPRESSIONS, default=COMPRESSION_NONE,
+                           help="compression of the files in the output directory (default: %(default)s)")
 
 
 class BackendCommand:
@@ -780,44 +1020,110 @@ class BackendCommand:
 
         self.outfile = self.parsed_args.outfile
         self.json_line = self.parsed_args.json_line
+        self.output_format = self.parsed_args.output_format
+
+        # Items written to an output directory are always JSON lines
+        if self.json_line or self.parsed_args.output_dir:
+            self.output_format = OUTPUT_FORMAT_JSON_LINE
+
+        self.json_line = self.output_format == OUTPUT_FORMAT_JSON_LINE
+        self.serializer = None
+
+        if self.output_format not in COLUMNAR_FORMATS:
+            self.serializer = JSONSerializer.from_format(self.output_format,
+                                                         sort_keys=self.parsed_args.sort_keys)
 
     def run(self):
         """Fetch and write items.
 
         This method runs the backend to fetch the items from the given
         origin. Items are converted to JSON objects and written to the
-        defined output. A summary with the result is written to the log.
+        defined output. When an output directory is given, items are
+        written as JSON lines split in several, optionally compressed,
+        files. A summary with the result is written to the log.
 
         If `fetch-archive` parameter was given as an argument during
         the initialization of the instance, the items will be retrieved
         using the archive manager.
         """
-        backend_args = vars(self.parsed_args)
-        category = backend_args.pop('category', None)
-        filter_classified = backend_args.pop('filter_classified', False)
-        fetch_archive = self.archive_manager and self.parsed_args.fetch_archive
-        archived_since = backend_args.pop('archived_since', None)
+        backend_args, category, kwargs = self._items_generator_args()
+
+        writer = self._create_writer()
 
-        with BackendItemsGenerator(self.BACKEND, backend_args, category,
-                                   filter_classified=filter_classified,
-                                   manager=self.archive_manager,
-                                   fetch_archive=fetch_archive,
-                                   archived_after=archived_since) as big:
+        with BackendItemsGenerator(self.BACKEND, backend_args, category, **kwargs) as big:
             try:
-                for item in big.items:
-                    if self.json_line:
-                        obj = json.dumps(item, separators=(',', ':'), sort_keys=True)
-                    else:
-                        obj = json.dumps(item, indent=4, sort_keys=True)
-                    self.outfile.write(obj)
-                    self.outfile.write('\n')
+                with writer:
+                    for item in big.items:
+                        writer.write(item)
 
                 self._log_summary(big.summary)
+
+                if self.parsed_args.output_dir:
+                    logger.info("%s files written to %s", len(writer.shards), writer.dirpath)
             except IOError as e:
                 logger.exception(f"Error!: {e}", exc_info=self.debug)
             except Exception as e:
                 logger.exception(f"Error!: {e}", exc_info=self.debug)
 
+    def _create_writer(self):
+        """Create the object that will write the items to the output"""
+
+        if self.output_format in COLUMNAR_FORMATS:
+            return ColumnarItemWriter(self.outfile, self.output_format)
+        if not self.parsed_args.output_dir:
+            return ItemWriter(self.outfile, self.serializer)
+
+        return ShardedItemWriter(self.parsed_args.output_dir,
+                                 serializer=self.serializer,
+                                 compression=self.parsed_args.compression,
+                                 shard_size=self.parsed_args.shard_size,
+                                 shard_bytes=self.parsed_args.shard_bytes)
+
+    def _items_generator_args(self):
+        """Build the arguments to run a `BackendItemsGenerator`.
+
+        The parsed arguments are split into the arguments needed
+        by the backend, the category of the items and the options
+        that set how the items will be fetched.
+
+        :returns: a tuple with the backend arguments, the category
+            and a dict with the fetching options
+        """
+        backend_args = vars(self.parsed_args)
+        category = backend_args.pop('category', None)
+        filter_classified = backend_args.pop('filter_classified', False)
+        fetch_archive = self.archive_manager and self.parsed_args.fetch_archive
+        archived_since = backend_args.pop('archived_since', None)
+        archive_cache_since = backend_args.pop('archive_cache_since', None)
+        state_file = backend_args.pop('state_file', None)
+        replay_workers = backend_args.pop('replay_workers', None)
+        replay_order = backend_args.pop('replay_order', REPLAY_ORDER_ARCHIVE)
+        http_cache = backend_args.pop('http_cache', None)
+        http_cache_max_bytes = backend_args.pop('http_cache_max_bytes', HttpCache.DEFAULT_MAX_BYTES)
+        rate_budget = backend_args.pop('rate_budget', None)
+
+        client_options = HttpClientOptions(
+            http_cache=HttpCache(http_cache, max_bytes=http_cache_max_bytes) if http_cache else None,
+            rate_budget=RateBudget(rate_budget) if rate_budget else None,
+            pace_requests=backend_args.pop('pace_requests', False),
+            prefetch_pages=backend_args.pop('prefetch_pages', None),
+            page_workers=backend_args.pop('page_workers', None)
+        )
+
+        kwargs = {
+            'filter_classified': filter_classified,
+            'manager': self.archive_manager,
+            'fetch_archive': fetch_archive,
+            'archived_after': archived_since,
+            'cached_after': archive_cache_since,
+            'state_store': FetchStateStore(state_file) if state_file else None,
+            'replay_workers': replay_workers,
+            'replay_order': replay_order,
+            'client_options': client_options
+        }
+
+        return backend_args, category, kwargs
+
     def _pre_init(self):
         """Override to execute before backend is initialized."""
         pass
@@ -839,7 +1145,19 @@ class BackendCommand:
             else:
                 archive_path = self.parsed_args.archive_path
 
-            manager = ArchiveManager(archive_path)
+            commit_every = self.parsed_args.archive_commit_every
+            commit_interval = self.parsed_args.archive_commit_interval
+
+            # Commit every request unless writes are batched
+            if not commit_every and not commit_interval:
+                commit_every = 1
+
+            manager = ArchiveManager(archive_path,
+                                     commit_every=commit_every,
+                                     commit_interval=commit_interval,
+                                     wal=self.parsed_args.archive_wal,
+                                     compression=self.parsed_args.archive_compression,
+                                     dedup=self.parsed_args.archive_dedup)
 
         self.archive_manager = manager
 
@@ -881,6 +1199,61 @@ class BackendCommand:
 
         logger.info(message)
 
+        if summary.http:
+            self._log_instrumentation(summary)
+
+    @staticmethod
+    def _log_instrumentation(summary):
+        """Write the time and HTTP metrics of the fetch to the log."""
+
+        http = summary.http
+
+        template = (
+            "Fetch instrumentation\n\n"
+            "\t      Fetch time: \t{fetch_time:.3f} s\n"
+            "\t    Network time: \t{network_time:.3f} s\n"
+            "\tRate limit sleep: \t{rate_limit_sleep_time:.3f} s\n"
+            "\t Processing time: \t{processing_time:.3f} s\n"
+            "\n"
+            "\t   HTTP requests: \t{requests}\n"
+            "\t Failed requests: \t{failed_requests}\n"
+            "\t  Bytes received: \t{bytes_received}\n"
+            "\t         Retries: \t{retries}\n"
+            "\t      4xx errors: \t{client_errors}\n"
+            "\t      5xx errors: \t{server_errors}\n"
+            "\t      Cache hits: \t{cache_hits}\n"
+            "\t    Not modified: \t{not_modified}\n"
+            "\n"
+            "\tLatencies by endpoint (requests, mean, max):\n"
+            "{latencies}"
+        )
+
+        latencies = []
+        for endpoint, histogram in sorted(http.latencies.items()):
+            buckets = histogram.as_dict()['buckets']
+            counts = ' '.join('%s:%s' % (label, count) for label, count in buckets.items() if count)
+            line = "\t\t{}: \t{}, {:.3f} s, {:.3f} s [{}]\n"
+            latencies.append(line.format(endpoint, histogram.count, histogram.mean, histogram.max, counts))
+
+        values = {
+            'fetch_time': summary.fetch_time,
+            'network_time': summary.network_time,
+            'rate_limit_sleep_time': summary.rate_limit_sleep_time,
+            'processing_time': summary.processing_time,
+            'requests': http.requests,
+            'failed_requests': http.failed_requests,
+            'bytes_received': http.bytes_received,
+            'retries': http.retries,
+            'client_errors': http.client_errors,
+            'server_errors': http.server_errors,
+            'cache_hits': http.cache_hits,
+            'not_modified': http.not_modified,
+            'latencies': ''.join(latencies) or "\t\t-\n"
+        }
+        message = template.format(**values)
+
+        logger.info(message)
+
     @classmethod
     def setup_cmd_parser(cls):
         raise NotImplementedError
@@ -910,10 +1283,28 @@ class BackendItemsGenerator:
     :param manager: archive manager where the items will be retrieved
     :param fetch_archive: If enabled, items are fetched from archives
     :param archived_after: return items archived after this date
+    :param state_store: `FetchStateStore` used to resume the fetch
+        from the state of the previous one and to save the new state
+        once the items are fetched; only used by backends that support
+        resuming and ignored when items are fetched from archives
+    :param replay_workers: number of processes replaying the archives
+        in parallel when items are fetched from archives; by default,
+        archives are replayed one after another in this process
+    :param replay_order: order of the items replayed in parallel;
+        see `fetch_from_archive` for more information
+    :param cached_after: serve the requests already stored in the
+        archives created after this date, sending to the data source
+        only those not found; ignored when items are fetched from
+        archives or no manager is given
+    :param client_options: `HttpClientOptions` given to the client
+        of the backend; ignored when items are fetched from archives
     """
     def __init__(self, backend_class, backend_args, category,
                  filter_classified=False, manager=None,
-                 fetch_archive=False, archived_after=None):
+                 fetch_archive=False, archived_after=None,
+                 state_store=None, replay_workers=None,
+                 replay_order=REPLAY_ORDER_ARCHIVE,
+                 cached_after=None, client_options=None):
         init_args = find_signature_parameters(backend_class.__init__,
                                               backend_args)
 
@@ -921,12 +1312,18 @@ class BackendItemsGenerator:
             archive = manager.create_archive() if manager else None
             init_args['archive'] = archive
             self.backend = backend_class(**init_args)
+            self.backend.client_options = client_options
             items = self.__fetch(backend_args, category,
                                  filter_classified=filter_classified,
-                                 manager=manager)
+                                 manager=manager,
+                                 state_store=state_store,
+                                 cached_after=cached_after)
         else:
             self.backend = backend_class(**init_args)
-            items = self.__fetch_from_archive(category, manager, archived_after)
+            items = self.__fetch_from_archive(category, manager, archived_after,
+                                              init_args=init_args,
+                                              replay_workers=replay_workers,
+                                              replay_order=replay_order)
 
         self.items = items
 
@@ -944,7 +1341,7 @@ class BackendItemsGenerator:
         return self.backend.summary
 
     def __fetch(self, backend_args, category, filter_classified=False,
-                manager=None):
+                manager=None, state_store=None, cached_after=None):
         """Fetch items using the given backend.
 
         Generator to get items using the backend. When an archive manager
@@ -952,6 +1349,9 @@ class BackendItemsGenerator:
         If an exception is raised, this archive will be removed to avoid
         corrupted archives.
 
+        When a state store is given, the fetch resumes from the stored
+        state and the state is updated once all the items are fetched.
+
         The parameters needed to get the items are given using the
         `backend_args` dict parameter.
 
@@ -961,6 +1361,9 @@ class BackendItemsGenerator:
         :param filter_classified: remove classified fields from the resulting
             items
         :param manager: archive manager needed to store the items
+        :param state_store: store with the state of the fetches
+        :param cached_after: serve the requests stored in the archives
+            created after this date
 
         :returns: a generator of items
         """
@@ -968,6 +1371,10 @@ class BackendItemsGenerator:
             backend_args['category'] = category
         if filter_classified:
             backend_args['filter_classified'] = filter_classified
+        if state_store:
+            _resume_from_state(self.backend, backend_args, state_store)
+        if manager and cached_after:
+            _set_archive_cache(self.backend, backend_args, manager, cached_after)
 
         fetch_args = find_signature_parameters(self.backend.fetch,
                                                backend_args)
@@ -981,17 +1388,31 @@ class BackendItemsGenerator:
                 archive_path = self.backend.archive.archive_path
                 manager.remove_archive(archive_path)
             raise e
+        finally:
+            _close_archive_cache(self.backend)
+
+        if state_store:
+            _save_state(self.backend, backend_args, state_store)
 
-    def __fetch_from_archive(self, category, manager, archived_after):
+    def __fetch_from_archive(self, category, manager, archived_after,
+                             init_args=None, replay_workers=None,
+                             replay_order=REPLAY_ORDER_ARCHIVE):
         """Fetch items from an archive manager.
 
         Generator to get the items of a category (previously fetched
         by the backend) from an archive manager. Only those items
         archived after the given date will be returned.
 
+        When `replay_workers` is set, archives are replayed in
+        parallel by a pool of processes (see `_replay_archives`).
+
         :param category: category of the items to retrieve
         :param manager: archive manager where the items will be retrieved
         :param archived_after: return items archived after this date
+        :param init_args: arguments to initialize the backend in the
+            replaying processes
+        :param replay_workers: number of processes replaying archives
+        :param replay_order: order of the items replayed in parallel
 
         :returns: a generator of archived items
         """
@@ -1000,6 +1421,11 @@ class BackendItemsGenerator:
                                    category,
                                    archived_after)
 
+        if replay_workers:
+            yield from _replay_archives(self.backend, init_args, filepaths,
+                                        replay_workers, replay_order)
+            return
+
         for filepath in filepaths:
             self.backend.archive = Archive(filepath)
             items = self.backend.fetch_from_archive()
@@ -1023,6 +1449,12 @@ class Summary:
 
     Finally, the summary also includes some extra fields, which can
     be used by any backend to include fetch-specific information.
+
+    The summary also measures where the time of the fetch was spent.
+    `fetch_time` is the time spent producing items; when the backend
+    uses an HTTP client, the metrics of its requests are available in
+    `http` and that time is split into network, rate limit sleeping
+    and processing (i.e, parsing and building items) times.
     """
     def __init__(self):
         self.fetched = 0
@@ -1035,6 +1467,8 @@ class Summary:
         self.max_offset = None
         self.last_offset = None
         self.extras = None
+        self.fetch_time = 0.0
+        self.http = None
 
     @property
     def total(self):
@@ -1042,6 +1476,46 @@ class Summary:
 
         return self.fetched + self.skipped
 
+    @property
+    def network_time(self):
+        """Time spent waiting for HTTP responses"""
+
+        return self.http.network_time if self.http else 0.0
+
+    @property
+    def rate_limit_sleep_time(self):
+        """Time spent sleeping until the rate limit was reset"""
+
+        return self.http.rate_limit_sleep_time if self.http else 0.0
+
+    @property
+    def processing_time(self):
+        """Time spent producing items not waiting on the network or sleeping"""
+
+        return max(self.fetch_time - self.network_time - self.rate_limit_sleep_time, 0.0)
+
+    def as_dict(self):
+        """Return the summary as a dict"""
+
+        return {
+            'total': self.total,
+            'fetched': self.fetched,
+            'skipped': self.skipped,
+            'min_updated_on': self.min_updated_on,
+            'max_updated_on': self.max_updated_on,
+            'last_updated_on': self.last_updated_on,
+            'last_uuid': self.last_uuid,
+            'min_offset': self.min_offset,
+            'max_offset': self.max_offset,
+            'last_offset': self.last_offset,
+            'extras': self.extras,
+            'fetch_time': self.fetch_time,
+            'network_time': self.network_time,
+            'rate_limit_sleep_time': self.rate_limit_sleep_time,
+            'processing_time': self.processing_time,
+            'http': self.http.as_dict() if self.http else None
+        }
+
     def update(self, item):
         """Update the summary attributes by accessing the item data.
 
@@ -1062,6 +1536,24 @@ class Summary:
             self.max_offset = offset if self.max_offset is None else max(self.max_offset, offset)
 
 
+def _timed(items, summary):
+    """Yield the items adding the time spent producing them to the summary."""
+
+    items = iter(items)
+
+    while True:
+        start = time.perf_counter()
+
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        finally:
+            summary.fetch_time += time.perf_counter() - start
+
+        yield item
+
+
 def uuid(*args):
     """Generate a UUID based on the given parameters.
 
@@ -1094,7 +1586,7 @@ def uuid(*args):
 
 
 def fetch(backend_class, backend_args, category, filter_classified=False,
-          manager=None):
+          manager=None, state_store=None, cached_after=None, client_options=None):
     """Fetch items using the given backend.
 
     Generator to get items using the given backend class. When
@@ -1102,6 +1594,16 @@ def fetch(backend_class, backend_args, category, filter_classified=False,
     the fetched items in an `Archive`. If an exception is raised,
     this archive will be removed to avoid corrupted archives.
 
+    When a `FetchStateStore` is given and the backend supports
+    resuming, the fetch starts from the state saved by the previous
+    one (i.e., `from_date` or `offset` are set when they were not
+    given) and the state is updated once all the items are fetched.
+
+    When `cached_after` is set, requests already stored in the
+    archives of the manager created after that date are served
+    from them; only the rest of requests are sent to the data
+    source. All of them are stored in the new archive.
+
     The parameters needed to initialize the `backend` class and
     get the items are given using `backend_args` dict parameter.
 
@@ -1111,6 +1613,11 @@ def fetch(backend_class, backend_args, category, filter_classified=False,
        If None, it will use the default backend category
     :param filter_classified: remove classified fields from the resulting items
     :param manager: archive manager needed to store the items
+    :param state_store: store with the state of the fetches
+    :param cached_after: serve the requests stored in the archives
+        created after this date
+    :param client_options: `HttpClientOptions` given to the client
+        of the backend
 
     :returns: a generator of items
     """
@@ -1120,11 +1627,16 @@ def fetch(backend_class, backend_args, category, filter_classified=False,
     init_args['archive'] = archive
 
     backend = backend_class(**init_args)
+    backend.client_options = client_options
 
     if category:
         backend_args['category'] = category
     if filter_classified:
         backend_args['filter_classified'] = filter_classified
+    if state_store:
+        _resume_from_state(backend, backend_args, state_store)
+    if manager and cached_after:
+        _set_archive_cache(backend, backend_args, manager, cached_after)
 
     fetch_args = find_signature_parameters(backend.fetch,
                                            backend_args)
@@ -1138,10 +1650,16 @@ def fetch(backend_class, backend_args, category, filter_classified=False,
             archive_path = archive.archive_path
             manager.remove_archive(archive_path)
         raise e
+    finally:
+        _close_archive_cache(backend)
+
+    if state_store:
+        _save_state(backend, backend_args, state_store)
 
 
 def fetch_from_archive(backend_class, backend_args, manager,
-                       category, archived_after):
+                       category, archived_after, max_workers=None,
+                       order=REPLAY_ORDER_ARCHIVE):
     """Fetch items from an archive manager.
 
     Generator to get the items of a category (previously fetched
@@ -1151,11 +1669,26 @@ def fetch_from_archive(backend_class, backend_args, manager,
     The parameters needed to initialize `backend` and get the
     items are given using `backend_args` dict parameter.
 
+    By default, archives are replayed one after another. When
+    `max_workers` is set, they are replayed in parallel by a pool
+    of processes, each one replaying a whole archive. Then, `order`
+    sets the order of the items returned:
+
+      - `REPLAY_ORDER_ARCHIVE`: items of each archive, in the same
+        order they were archived; archives are sorted by their date
+        of creation, like when they are replayed one after another
+      - `REPLAY_ORDER_UPDATED_ON`: items of all the archives merged
+        by their `updated_on` date. Items are returned once every
+        archive was replayed; meanwhile, they are kept in temporary
+        files.
+
     :param backend_class: backend class to retrive items
     :param backend_args: dict of arguments needed to retrieve the items
     :param manager: archive manager where the items will be retrieved
     :param category: category of the items to retrieve
     :param archived_after: return items archived after this date
+    :param max_workers: number of processes replaying archives
+    :param order: order of the items replayed in parallel
 
     :returns: a generator of archived items
     """
@@ -1168,6 +1701,11 @@ def fetch_from_archive(backend_class, backend_args, manager,
                                category,
                                archived_after)
 
+    if max_workers:
+        yield from _replay_archives(backend, init_args, filepaths,
+                                    max_workers, order)
+        return
+
     for filepath in filepaths:
         backend.archive = Archive(filepath)
         items = backend.fetch_from_archive()
@@ -1179,14 +1717,361 @@ def fetch_from_archive(backend_class, backend_args, manager,
             logger.warning("Ignoring %s archive due to: %s", filepath, str(e))
 
 
-def find_backends(top_package):
+def _replay_archives(backend, init_args, filepaths, max_workers, order):
+    """Replay archives in parallel using a pool of processes.
+
+    Each archive is replayed by a new instance of the class of
+    `backend`, initialized with `init_args`, in a worker process.
+    Archives that cannot be read are ignored. The summary of
+    `backend` is set with the items of all the archives.
+
+    Memory does not grow with the size of the archives. Items
+    returned in archive order are sent by the workers in chunks
+    of `REPLAY_CHUNK_SIZE`, queuing up to `REPLAY_QUEUE_SIZE` of
+    them per archive. To merge them by date, workers write the
+    items to temporary files in sorted runs of `REPLAY_RUN_SIZE`,
+    which are read back while they are merged.
+
+    :param backend: backend which archived the items
+    :param init_args: arguments to initialize the backend
+    :param filepaths: paths of the archives, sorted by creation date
+    :param max_workers: number of processes replaying archives
+    :param order: order of the items; see `fetch_from_archive`
+
+    :returns: a generator of archived items
+    """
+    if order not in REPLAY_ORDERS:
+        raise ValueError("unknown replay order %s" % order)
+
+    backend._summary = Summary()
+
+    if order == REPLAY_ORDER_ARCHIVE:
+        items = _replay_in_order(backend, init_args, filepaths, max_workers)
+    else:
+        items = _replay_merged(backend, init_args, filepaths, max_workers)
+
+    yield from _summarized(items, backend.summary)
+
+
+def _replay_in_order(backend, init_args, filepaths, max_workers):
+    """Replay archives in parallel, returning their items in archive order."""
+
+    backend_class = backend.__class__
+    filepaths = iter(filepaths)
+    pending = collections.deque()
+
+    with multiprocessing.Manager() as manager:
+        stop = manager.Event()
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+
+        def submit(narchives):
+            for filepath in itertools.islice(filepaths, narchives):
+                chunks = manager.Queue(maxsize=REPLAY_QUEUE_SIZE)
+                future = executor.submit(_replay_archive, backend_class, init_args,
+                                         filepath, chunks, stop)
+                pending.append((filepath, chunks, future))
+
+        try:
+            # Workers replaying the archives after the one consumed
+            # stop once their queues are full
+            submit(max_workers)
+
+            while pending:
+                filepath, chunks, future = pending[0]
+
+                for chunk in _read_chunks(chunks, future):
+                    yield from chunk
+
+                pending.popleft()
+                fetch_time, error = future.result()
+                backend.summary.fetch_time += fetch_time
+
+                if error:
+                    logger.warning("Ignoring %s archive due to: %s", filepath, error)
+
+                submit(1)
+        finally:
+            stop.set()
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+def _replay_merged(backend, init_args, filepaths, max_workers):
+    """Replay archives in parallel, merging their items by date."""
+
+    backend_class = backend.__class__
+    futures = []
+
+    with tempfile.TemporaryDirectory(prefix='perceval_replay_') as dirpath:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+
+        try:
+            for filepath in filepaths:
+                future = executor.submit(_replay_archive_runs, backend_class, init_args,
+                                         filepath, dirpath)
+                futures.append((filepath, future))
+
+            runs = []
+
+            for filepath, future in futures:
+                run_paths, fetch_time, error = future.result()
+                backend.summary.fetch_time += fetch_time
+
+                if error:
+                    logger.warning("Ignoring %s archive due to: %s", filepath, error)
+
+                runs.extend(run_paths)
+        finally:
+            for _, future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        readers = [_read_run(run_path) for run_path in runs]
+        yield from heapq.merge(*readers, key=lambda item: item['updated_on'])
+
+
+def _replay_archive(backend_class, init_args, filepath, chunks, stop):
+    """Replay an archive in a worker process, queuing its items in chunks.
+
+    The end of the items is signaled queuing `None`. The replay
+    finishes, without queuing the rest of items, when `stop` is set.
+
+    :returns: a tuple with the time spent replaying the items and
+        the cause of the error, if any, that stopped the replay
+    """
+    backend = backend_class(**init_args)
+    chunk = []
+    error = None
+
+    try:
+        try:
+            backend.archive = Archive(filepath)
+
+            for item in backend.fetch_from_archive():
+                chunk.append(item)
+
+                if len(chunk) == REPLAY_CHUNK_SIZE:
+                    if not _put_chunk(chunks, chunk, stop):
+                        return 0.0, None
+                    chunk = []
+        except ArchiveError as e:
+            error = str(e)
+
+        if chunk:
+            _put_chunk(chunks, chunk, stop)
+    finally:
+        _put_chunk(chunks, None, stop)
+
+    fetch_time = backend.summary.fetch_time if backend.summary else 0.0
+
+    return fetch_time, error
+
+
+def _replay_archive_runs(backend_class, init_args, filepath, dirpath):
+    """Replay an archive in a worker process, writing its items in sorted runs.
+
+    :returns: a tuple with the paths of the runs written in `dirpath`,
+        the time spent replaying the items and the cause of the error,
+        if any, that stopped the replay
+    """
+    backend = backend_class(**init_args)
+    run_paths = []
+    run = []
+    error = None
+
+    try:
+        backend.archive = Archive(filepath)
+
+        for item in backend.fetch_from_archive():
+            run.append(item)
+
+            if len(run) == REPLAY_RUN_SIZE:
+                run_paths.append(_write_run(run, dirpath))
+                run = []
+    except ArchiveError as e:
+        error = str(e)
+
+    if run:
+        run_paths.append(_write_run(run, dirpath))
+
+    fetch_time = backend.summary.fetch_time if backend.summary else 0.0
+
+    return run_paths, fetch_time, error
+
+
+def _put_chunk(chunks, chunk, stop):
+    """Queue a chunk of items unless the replay was stopped."""
+
+    while not stop.is_set():
+        try:
+            chunks.put(chunk, timeout=REPLAY_POLL_TIME)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+def _read_chunks(chunks, future):
+    """Read the chunks queued by a worker until it finishes."""
+
+    while True:
+        try:
+            chunk = chunks.get(timeout=REPLAY_POLL_TIME)
+        except queue.Empty:
+            # The worker failed before signaling the end of the items
+            if future.done():
+                return
+            continue
+
+        if chunk is None:
+            return
+
+        yield chunk
+
+
+def _write_run(items, dirpath):
+    """Write a run of items, sorted by date, to a temporary file."""
+
+    items.sort(key=lambda item: item['updated_on'])
+
+    fd, run_path = tempfile.mkstemp(suffix='.run', dir=dirpath)
+
+    with os.fdopen(fd, 'wb') as run_file:
+        for item in items:
+            pickle.dump(item, run_file, pickle.HIGHEST_PROTOCOL)
+
+    return run_path
+
+
+def _read_run(run_path):
+    """Read the items of a run written by `_write_run`."""
+
+    with open(run_path, 'rb') as run_file:
+        while True:
+            try:
+                item = pickle.load(run_file)
+            except EOFError:
+                return
+
+            yield item
+
+
+def _summarized(items, summary):
+    """Yield the items updating the summary with them."""
+
+    for item in items:
+        summary.update(item)
+        yield item
+
+
+def _fetch_category(backend, backend_args):
+    """Category of the items a backend will fetch with these arguments"""
+
+    category = backend_args.get('category', None)
+
+    if not category:
+        param = inspect.signature(backend.fetch).parameters.get('category', None)
+        if param and param.default is not inspect.Parameter.empty:
+            category = param.default
+
+    return category
+
+
+def _set_archive_cache(backend, backend_args, manager, cached_after):
+    """Serve the requests of the backend from its previous archives.
+
+    The archives of the same origin, backend and category created
+    after the given date are used as cache. The archive where the
+    items of this fetch are stored has no metadata yet, so it is
+    not part of the cache.
+    """
+    category = _fetch_category(backend, backend_args)
+    filepaths = manager.search(backend.origin, backend.__class__.__name__,
+                               category, cached_after)
+
+    logger.debug("Serving requests of %s from %s archives", backend.origin, len(filepaths))
+
+    options = backend.client_options or HttpClientOptions()
+    backend.client_options = options._replace(archive_cache=ArchiveCache(filepaths))
+
+
+def _close_archive_cache(backend):
+    """Close the archive cache set in the client options of the backend"""
+
+    if backend.client_options and backend.client_options.archive_cache:
+        backend.client_options.archive_cache.close()
+
+
+def _supports_resuming(backend):
+    try:
+        return backend.has_resuming()
+    except NotImplementedError:
+        return False
+
+
+def _resume_from_state(backend, backend_args, state_store):
+    """Set the fetch arguments from the state of the previous fetch.
+
+    `from_date` is set to the date of the most recently updated
+    item and `offset` to the next offset after the highest one
+    fetched. These arguments are set only when the backend accepts
+    them and they were not set or have their default values.
+    """
+    if not _supports_resuming(backend):
+        logger.debug("%s does not support resuming; fetch state ignored",
+                     backend.__class__.__name__)
+        return
+
+    category = _fetch_category(backend, backend_args)
+    state = state_store.get(backend.__class__.__name__, backend.origin, category)
+
+    if not state:
+        return
+
+    params = inspect.signature(backend.fetch).parameters
+
+    def is_unset(name, defaults):
+        default = params[name].default
+        return backend_args.get(name, None) in defaults + [default]
+
+    if state.max_updated_on and 'from_date' in params and is_unset('from_date', [None, DEFAULT_DATETIME]):
+        backend_args['from_date'] = state.max_updated_on
+        logger.info("Resuming fetch of %s from date %s", backend.origin, state.max_updated_on)
+    if state.max_offset is not None and 'offset' in params and is_unset('offset', [None, 0]):
+        backend_args['offset'] = state.max_offset + 1
+        logger.info("Resuming fetch of %s from offset %s", backend.origin, state.max_offset + 1)
+
+
+def _save_state(backend, backend_args, state_store):
+    """Save the state of a completed fetch."""
+
+    summary = backend.summary
+
+    if not _supports_resuming(backend) or not summary or not summary.fetched:
+        return
+
+    category = _fetch_category(backend, backend_args)
+    state_store.update(backend.__class__.__name__, backend.origin, category,
+                       max_updated_on=summary.max_updated_on,
+                       max_offset=summary.max_offset)
+
+
+def find_backends(top_package, lazy=False):
     """Find available backends.
 
     Look for the Perceval backends and commands under `top_package`
     and its sub-packages. When `top_package` defines a namespace,
     backends under that same namespace will be found too.
 
+    By default, every module found is imported to get its classes.
+    When `lazy` is set, modules are only listed and the dicts returned
+    are `BackendRegistry` objects, which import the module of a
+    backend the first time its class is requested.
+
     :param top_package: package storing backends
+    :param lazy: import the backend modules on demand
 
     :returns: a tuple with two dicts: one with `Backend` classes and one
         with `BackendCommand` classes
@@ -1196,9 +2081,55 @@ def find_backends(top_package):
 
     modules = [name for _, name, is_pkg in candidates if not is_pkg]
 
+    if lazy:
+        modules = {module.split('.')[-1]: module for module in modules}
+        return BackendRegistry(modules, Backend), BackendRegistry(modules, BackendCommand)
+
     return _import_backends(modules)
 
 
+class BackendRegistry(collections.abc.Mapping):
+    """Read-only dict of backend classes imported on demand.
+
+    Keys are the names of the backends, which are the names of the
+    modules where they are defined. Listing the names or checking
+    whether a backend is available does not import any module; the
+    module of a backend is imported the first time its class is
+    requested.
+
+    :param modules: dict of module names, indexed by backend name
+    :param parent: base class of the classes to find (i.e, `Backend`
+        or `BackendCommand`)
+    """
+    def __init__(self, modules, parent):
+        self.modules = dict(modules)
+        self.parent = parent
+        self._classes = {}
+
+    def __getitem__(self, name):
+        if name not in self._classes:
+            module = self.modules[name]
+            importlib.import_module(module)
+
+            kls = _find_module_class(self.parent, module)
+
+            if not kls:
+                raise KeyError(name)
+
+            self._classes[name] = kls
+
+        return self._classes[name]
+
+    def __contains__(self, name):
+        return name in self.modules
+
+    def __iter__(self):
+        return iter(self.modules)
+
+    def __len__(self):
+        return len(self.modules)
+
+
 def _import_backends(modules):
     for module in modules:
         importlib.import_module(module)
@@ -1227,3 +2158,24 @@ def _find_classes(parent, modules):
         parents.extend(kls.__subclasses__())
 
         yield name, kls
+
+
+def _find_module_class(parent, module):
+    """Find the most derived subclass of `parent` defined in `module`.
+
+    Unlike `_find_classes`, subclasses defined in other modules are
+    also explored, because the class might extend a backend from
+    another module (e.g, `GitHubQL` extends `GitHub`).
+    """
+    found = None
+    parents = [parent]
+
+    while parents:
+        kls = parents.pop(0)
+
+        for subclass in kls.__subclasses__():
+            if subclass.__module__ == module:
+                found = subclass
+            parents.append(subclass)
+
+    return found
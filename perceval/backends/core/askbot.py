@@ -563,7 +563,8 @@ class AskbotCommand(BackendCommand):
         parser = BackendCommandArgumentParser(cls.BACKEND,
                                               from_date=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True)
 
         # Required arguments
         parser.parser.add_argument('url',
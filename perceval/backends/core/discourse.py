@@ -436,7 +436,8 @@ class DiscourseCommand(BackendCommand):
                                               from_date=True,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True)
 
         # Required arguments
         parser.parser.add_argument('url',
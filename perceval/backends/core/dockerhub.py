@@ -219,7 +219,8 @@ class DockerHubCommand(BackendCommand):
 
         parser = BackendCommandArgumentParser(cls.BACKEND,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True)
 
         # Required arguments
         parser.parser.add_argument('owner',
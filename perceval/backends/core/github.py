@@ -33,6 +33,8 @@
 import datetime
 import json
 import logging
+import re
+import threading
 
 import jwt
 import requests
@@ -601,6 +603,8 @@ class GitHubClient(HttpClient, RateLimitHandler):
     :param from_archive: it tells whether to write/read the archive
     :param ssl_verify: enable/disable SSL verification
     """
+    PAGINATION_OPTIONS = ('prefetch_pages', 'page_workers')
+
     EXTRA_STATUS_FORCELIST = [403, 500, 502, 503]
 
     # API resources
@@ -650,6 +654,7 @@ class GitHubClient(HttpClient, RateLimitHandler):
             self.n_tokens = 0
         self.current_token = None
         self.last_rate_limit_checked = None
+        self._tokens_lock = threading.Lock()
         self.max_items = max_items
         self.github_app_id = github_app_id
         self.github_app_pk_filepath = github_app_pk_filepath
@@ -886,21 +891,22 @@ class GitHubClient(HttpClient, RateLimitHandler):
 
         :returns a response object
         """
+        # Pages can be fetched by several threads, so tokens are
+        # checked and switched by one thread at a time
         if not self.from_archive:
-            self.sleep_for_rate_limit()
-
-        if not self.from_archive:
-            if self._need_check_tokens() and self.sleep_for_rate and self.github_app_id:
-                logger.debug("GitHub APP with {} ID: access token expired, creating new one".format(self.github_app_id))
-                self._choose_best_api_token()
+            with self._tokens_lock:
+                if self._need_check_tokens() and self.sleep_for_rate and self.github_app_id:
+                    logger.debug("GitHub APP with {} ID: access token expired, creating new one".format(self.github_app_id))
+                    self._choose_best_api_token()
 
         response = super().fetch(url, payload, headers, method, stream, auth)
 
         if not self.from_archive:
-            if self._need_check_tokens():
-                self._choose_best_api_token()
-            else:
-                self.update_rate_limit(response)
+            with self._tokens_lock:
+                if self._need_check_tokens():
+                    self._choose_best_api_token()
+                else:
+                    self.update_rate_limit(response)
 
         return response
 
@@ -912,29 +918,51 @@ class GitHubClient(HttpClient, RateLimitHandler):
         url_next = urijoin(self.base_url, self.RREPOS, self.owner, self.repository, path)
         logger.debug("Get GitHub paginated items from " + url_next)
 
-        response = self.fetch(url_next, payload=payload)
+        if self.page_workers > 1:
+            pages = self.__fan_out_pages(url_next, payload)
+        else:
+            pages = self.paginate(url_next, payload=payload)
 
-        items = response.text
-        page += 1
+        for response in pages:
+            items = response.text
+            page += 1
 
-        if 'last' in response.links:
-            last_url = response.links['last']['url']
-            last_page = last_url.split('&page=')[1].split('&')[0]
-            last_page = int(last_page)
-            logger.debug("Page: %i/%i" % (page, last_page))
+            if page > 1:
+                logger.debug("Page: %i/%i" % (page, last_page))
+            elif 'last' in response.links:
+                last_page = self.__last_page(response)
+                logger.debug("Page: %i/%i" % (page, last_page))
+
+            if not items:
+                break
 
-        while items:
             yield items
 
-            items = None
+    def __fan_out_pages(self, url, payload):
+        """Fetch the first page and then the rest of pages concurrently.
 
-            if 'next' in response.links:
-                url_next = response.links['next']['url']
-                response = self.fetch(url_next, payload=payload)
-                page += 1
+        When the link to the last page is given, the rest of pages are
+        fetched by `page_workers` threads; otherwise, they are fetched
+        following the `next` links.
+        """
+        response = self.fetch(url, payload=payload)
+        yield response
 
-                items = response.text
-                logger.debug("Page: %i/%i" % (page, last_page))
+        if 'last' in response.links:
+            last_url = response.links['last']['url']
+            pages = ((re.sub(r'&page=\d+', '&page=%i' % page, last_url, count=1), payload)
+                     for page in range(2, self.__last_page(response) + 1))
+            yield from self.fetch_pages(pages)
+        elif 'next' in response.links:
+            yield from self.paginate(response.links['next']['url'], payload=payload)
+
+    @staticmethod
+    def __last_page(response):
+        """Get the number of the last page from the links of a response"""
+
+        last_url = response.links['last']['url']
+        last_page = last_url.split('&page=')[1].split('&')[0]
+        return int(last_page)
 
     def _get_token_rate_limit(self, token):
         """Return token's remaining API points"""
@@ -956,13 +984,9 @@ class GitHubClient(HttpClient, RateLimitHandler):
         remainings = [0] * self.n_tokens
         # Turn off archiving when checking rates, because that would cause
         # archive key conflict (the same URLs giving different responses)
-        arch = self.archive
-        self.archive = None
-        for idx, token in enumerate(self.tokens):
-            # Pass flag to skip disabling archiving because this function doies it
-            remainings[idx] = self._get_token_rate_limit(token)
-        # Restore archiving to whatever state it was
-        self.archive = arch
+        with self.no_archiving():
+            for idx, token in enumerate(self.tokens):
+                remainings[idx] = self._get_token_rate_limit(token)
         logger.debug("Remaining API points: {}".format(remainings))
         return remainings
 
@@ -1110,10 +1134,8 @@ class GitHubClient(HttpClient, RateLimitHandler):
         try:
             # Turn off archiving when checking rates, because that would cause
             # archive key conflict (the same URLs giving different responses)
-            arch = self.archive
-            self.archive = None
-            response = super().fetch(url)
-            self.archive = arch
+            with self.no_archiving():
+                response = super().fetch(url)
             self.update_rate_limit(response)
             self.last_rate_limit_checked = self.rate_limit
         except requests.exceptions.HTTPError as error:
@@ -1166,7 +1188,11 @@ class GitHubCommand(BackendCommand):
                                               to_date=True,
                                               token_auth=False,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              rate_limit=True,
+                                              prefetch_pages=True,
+                                              page_workers=True)
         # GitHub options
         group = parser.parser.add_argument_group('GitHub arguments')
         group.add_argument('--enterprise-url', dest='base_url',
@@ -454,6 +454,8 @@ class GitLabClient(HttpClient, RateLimitHandler):
     :param from_archive: it tells whether to write/read the archive
     :param ssl_verify: enable/disable SSL verification
     """
+    PAGINATION_OPTIONS = ('prefetch_pages',)
+
     # API resources
     RISSUES = "issues"
     RMERGES = "merge_requests"
@@ -644,9 +646,6 @@ class GitLabClient(HttpClient, RateLimitHandler):
 
         :returns a response object
         """
-        if not self.from_archive:
-            self.sleep_for_rate_limit()
-
         response = super().fetch(url, payload, headers, method, stream)
 
         if not self.from_archive:
@@ -663,34 +662,28 @@ class GitLabClient(HttpClient, RateLimitHandler):
 
         logger.debug("Get GitLab paginated items from " + url_next)
 
-        response = self.fetch(url_next, payload=payload)
-        response.encoding = 'utf-8'
-
-        items = response.text
-        page += 1
-
-        if 'last' in response.links:
-            last_url = response.links['last']['url']
-            last_page = last_url.split('&page=')[1].split('&')[0]
-            last_page = int(last_page)
-            logger.debug("Page: %i/%i" % (page, last_page))
-
-        while items:
-            yield items
-
-            items = None
-
-            if 'next' in response.links:
-                url_next = response.links['next']['url']  # Loving requests :)
-                response = self.fetch(url_next, payload=payload)
-                page += 1
-
-                items = response.text
+        for response in self.paginate(url_next, payload=payload):
+            page += 1
 
+            if page > 1:
                 if not last_page:
                     logger.debug("Page: %i" % page)
                 else:
                     logger.debug("Page: %i/%i" % (page, last_page))
+            else:
+                response.encoding = 'utf-8'
+
+                if 'last' in response.links:
+                    last_url = response.links['last']['url']
+                    last_page = last_url.split('&page=')[1].split('&')[0]
+                    last_page = int(last_page)
+                    logger.debug("Page: %i/%i" % (page, last_page))
+
+            items = response.text
+            if not items:
+                break
+
+            yield items
 
     @staticmethod
     def sanitize_for_archive(url, headers, payload):
@@ -756,7 +749,10 @@ class GitLabCommand(BackendCommand):
                                               token_auth=True,
                                               archive=True,
                                               blacklist=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              rate_limit=True,
+                                              prefetch_pages=True)
 
         # GitLab options
         group = parser.parser.add_argument_group('gitlab arguments')
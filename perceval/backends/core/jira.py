@@ -287,6 +287,8 @@ class JiraClient(HttpClient):
 
     :raises HTTPError: when an error occurs doing the request
     """
+    PAGINATION_OPTIONS = ('page_workers',)
+
     VERSION_API = '2'
     RESOURCE = 'rest/api'
 
@@ -338,17 +340,28 @@ class JiraClient(HttpClient):
         start_at += min(nitems, titems)
         self.__log_status(start_at, titems, url)
 
-        while issues:
-            yield issues
-            issues = None
+        if not issues:
+            return
+
+        yield issues
+
+        if not nitems:
+            return
 
-            if data['startAt'] + nitems < titems:
-                req = self.fetch(url, payload=self.__build_payload(start_at, from_date, expand_fields))
+        # The total number of items is known, so the rest of
+        # pages can be fetched concurrently
+        pages = ((url, self.__build_payload(offset, from_date, expand_fields))
+                 for offset in range(data['startAt'] + nitems, titems, nitems))
 
-                data = req.json()
-                start_at += nitems
-                issues = req.text
-                self.__log_status(start_at, titems, url)
+        for req in self.fetch_pages(pages):
+            start_at += nitems
+            issues = req.text
+            self.__log_status(start_at, titems, url)
+
+            if not issues:
+                break
+
+            yield issues
 
     def get_issues(self, from_date):
         """Retrieve all the issues from a given date.
@@ -458,7 +471,9 @@ class JiraCommand(BackendCommand):
                                               basic_auth=True,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              page_workers=True)
 
         # JIRA options
         group = parser.parser.add_argument_group('JIRA arguments')
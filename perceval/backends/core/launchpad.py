@@ -308,6 +308,8 @@ class LaunchpadClient(HttpClient):
     :param from_archive: it tells whether to write/read the archive
     :param ssl_verify: enable/disable SSL verification
     """
+    PAGINATION_OPTIONS = ('prefetch_pages',)
+
     _users = {}
 
     # API resources
@@ -466,32 +468,38 @@ class LaunchpadClient(HttpClient):
     def __fetch_items(self, path, payload):
         """Return the items from Launchpad API using pagination"""
 
-        page = 0  # current page
-        url_next = path
-        fetch_data = True
-
-        while fetch_data:
-            logger.debug("Fetching page: %i", page)
-
-            try:
-                raw_content = self.__send_request(url_next, payload)
-                content = json.loads(raw_content)
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code in [410]:
-                    logger.warning("Data is not available - %s", url_next)
-                    raw_content = '{"total_size": 0, "start": 0, "entries": []}'
-                    content = json.loads(raw_content)
-                else:
-                    raise e
-
-            if 'next_collection_link' in content:
-                url_next = content['next_collection_link']
-                payload = None
-            else:
-                fetch_data = False
+        pages = self.paginate(path, payload=payload,
+                              next_page=self.__next_page,
+                              fetch_page=self.__fetch_page)
 
+        for page, raw_content in enumerate(pages):
+            logger.debug("Fetched page: %i", page)
             yield raw_content
-            page += 1
+
+    def __fetch_page(self, url, payload):
+        """Fetch a page of items"""
+
+        try:
+            raw_content = self.__send_request(url, payload)
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code in [410]:
+                logger.warning("Data is not available - %s", url)
+                raw_content = '{"total_size": 0, "start": 0, "entries": []}'
+            else:
+                raise e
+
+        return raw_content
+
+    @staticmethod
+    def __next_page(raw_content, payload):
+        """Get the URL of the next page of items"""
+
+        content = json.loads(raw_content)
+
+        if 'next_collection_link' in content:
+            return content['next_collection_link'], None
+
+        return None
 
 
 class LaunchpadCommand(BackendCommand):
@@ -507,7 +515,9 @@ class LaunchpadCommand(BackendCommand):
                                               from_date=True,
                                               archive=True,
                                               token_auth=False,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              prefetch_pages=True)
 
         # Optional arguments
         group = parser.parser.add_argument_group('Launchpad arguments')
@@ -409,9 +409,6 @@ class MattermostClient(HttpClient, RateLimitHandler):
 
         :returns a response object
         """
-        if not self.from_archive:
-            self.sleep_for_rate_limit()
-
         response = super().fetch(url, payload, headers, method, stream)
 
         if not self.from_archive:
@@ -493,7 +490,9 @@ class MattermostCommand(BackendCommand):
                                               from_date=True,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              rate_limit=True)
 
         # Mattermost options
         group = parser.parser.add_argument_group('Mattermost arguments', description=cls.DESCRIPTION)
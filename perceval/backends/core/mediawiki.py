@@ -582,7 +582,8 @@ class MediaWikiCommand(BackendCommand):
         parser = BackendCommandArgumentParser(cls.BACKEND,
                                               from_date=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True)
 
         # MediaWiki options
         group = parser.parser.add_argument_group('MediaWiki arguments')
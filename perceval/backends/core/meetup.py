@@ -287,7 +287,9 @@ class MeetupCommand(BackendCommand):
                                               to_date=True,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              rate_limit=True)
 
         # Meetup options
         group = parser.parser.add_argument_group('Meetup arguments')
@@ -467,9 +469,6 @@ class MeetupClient(HttpClient, RateLimitHandler):
             logger.debug("Meetup client calls resource: %s params: %s",
                          resource, str(params))
 
-            if not self.from_archive:
-                self.sleep_for_rate_limit()
-
             r = self.fetch(url, payload=params, headers=headers)
 
             if not self.from_archive:
@@ -246,6 +246,8 @@ class PagureClient(HttpClient):
     :param from_archive: it tells whether to write/read the archive
     :param ssl_verify: enable/disable SSL verification
     """
+    PAGINATION_OPTIONS = ('prefetch_pages',)
+
     # API resources
     RISSUES = 'issues'
 
@@ -332,31 +334,25 @@ class PagureClient(HttpClient):
         url_next = self.__get_url_item(path)
         logger.debug("Get Pagure paginated items from " + url_next)
 
-        response = self.fetch(url_next, payload=payload)
-        if not response:
-            return []
-
-        items = response.text
-        page += 1
+        for response in self.paginate(url_next, payload=payload):
+            if not response:
+                return
 
-        if 'last' in response.links:
-            last_url = response.links['last']['url']
-            last_page = last_url.split('&page=')[1].split('&')[0]
-            last_page = int(last_page)
-            logger.debug("Page: %i/%i" % (page, last_page))
-
-        while items:
-            yield items
+            items = response.text
+            page += 1
 
-            items = None
+            if page > 1:
+                logger.debug("Page: %i/%i" % (page, last_page))
+            elif 'last' in response.links:
+                last_url = response.links['last']['url']
+                last_page = last_url.split('&page=')[1].split('&')[0]
+                last_page = int(last_page)
+                logger.debug("Page: %i/%i" % (page, last_page))
 
-            if 'next' in response.links:
-                url_next = response.links['next']['url']
-                response = self.fetch(url_next, payload=payload)
-                page += 1
+            if not items:
+                break
 
-                items = response.text
-                logger.debug("Page: %i/%i" % (page, last_page))
+            yield items
 
     def _set_extra_headers(self):
         """Set extra headers for session"""
@@ -421,7 +417,9 @@ class PagureCommand(BackendCommand):
                                               to_date=True,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              prefetch_pages=True)
 
         group = parser.parser.add_argument_group('Pagure arguments')
 
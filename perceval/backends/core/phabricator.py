@@ -636,7 +636,8 @@ class PhabricatorCommand(BackendCommand):
                                               token_auth=True,
                                               archive=True,
                                               ssl_verify=True,
-                                              blacklist=True)
+                                              blacklist=True,
+                                              http_cache=True)
 
         # Phabricator options
         group = parser.parser.add_argument_group('Phabricator arguments')
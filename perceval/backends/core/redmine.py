@@ -303,7 +303,8 @@ class RedmineCommand(BackendCommand):
                                               from_date=True,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True)
 
         # Redmine options
         group = parser.parser.add_argument_group('Redmine arguments')
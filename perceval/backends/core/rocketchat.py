@@ -329,9 +329,6 @@ class RocketChatClient(HttpClient, RateLimitHandler):
 
         logger.debug("Rocket.Chat client message request with params: %s", str(payload))
 
-        if not self.from_archive:
-            self.sleep_for_rate_limit()
-
         response = super().fetch(url, payload, headers=headers)
 
         if not self.from_archive:
@@ -372,7 +369,9 @@ class RocketChatCommand(BackendCommand):
                                               from_date=True,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              rate_limit=True)
 
         # Backend token is required
         action = parser.parser._option_string_actions['--api-token']
@@ -481,7 +481,8 @@ class SlackCommand(BackendCommand):
                                               from_date=True,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True)
 
         # Backend token is required
         action = parser.parser._option_string_actions['--api-token']
@@ -288,7 +288,8 @@ class TelegramCommand(BackendCommand):
                                               token_auth=True,
                                               archive=True,
                                               aliases=aliases,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True)
 
         # Backend token is required
         action = parser.parser._option_string_actions['--api-token']
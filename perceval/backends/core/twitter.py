@@ -362,9 +362,6 @@ class TwitterClient(HttpClient, RateLimitHandler):
 
         :returns: the text of the response
         """
-        if not self.from_archive:
-            self.sleep_for_rate_limit()
-
         headers = {self.HAUTHORIZATION: 'Bearer ' + self.api_key}
         r = self.fetch(url, payload=params, headers=headers)
 
@@ -386,7 +383,9 @@ class TwitterCommand(BackendCommand):
         parser = BackendCommandArgumentParser(cls.BACKEND,
                                               token_auth=True,
                                               archive=True,
-                                              ssl_verify=True)
+                                              ssl_verify=True,
+                                              http_cache=True,
+                                              rate_limit=True)
 
         # Backend token is required
         action = parser.parser._option_string_actions['--api-token']
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import argparse
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import queue
+import shlex
+import sys
+
+from .backend import REPLAY_ORDER_ARCHIVE, BackendItemsGenerator
+from .errors import BackendError
+from .output import (COLUMNAR_FORMATS,
+                     COMPRESSION_NONE,
+                     COMPRESSIONS,
+                     OUTPUT_FORMAT_JSON,
+                     OUTPUT_FORMAT_JSON_LINE,
+                     OUTPUT_FORMATS,
+                     ColumnarItemWriter,
+                     ItemWriter,
+                     JSONSerializer,
+                     ShardedItemWriter)
+
+
+logger = logging.getLogger(__name__)
+
+
+BatchJob = collections.namedtuple('BatchJob',
+                                  'backend_class backend_args category '
+                                  'filter_classified manager fetch_archive archived_after '
+                                  'state_store replay_workers replay_order cached_after '
+                                  'client_options',
+                                  defaults=(False, None, False, None, None, None,
+                                            REPLAY_ORDER_ARCHIVE, None, None))
+"""A fetch job to run in a batch.
+
+The fields are the same parameters `BackendItemsGenerator` needs
+to fetch the items of an origin.
+"""
+
+BatchResult = collections.namedtuple('BatchResult', 'job summary error')
+"""Result of a batch job: the summary of the fetch and the cause
+of the error, if any, that made the job fail."""
+
+
+# Output arguments of the backend commands, ignored in batch jobs
+OUTPUT_ARGS = ['outfile', 'json_line', 'output_format', 'sort_keys',
+               'output_dir', 'shard_size', 'shard_bytes', 'compression']
+
+# Messages sent by the workers to the parent process
+_MSG_ITEMS = 'items'
+_MSG_DONE = 'done'
+_MSG_ERROR = 'error'
+
+# Queue shared by the workers of a pool; set by `_init_batch_worker`
+_batch_queue = None
+_batch_stop = None
+
+
+class BatchItemsGenerator:
+    """Fetch items from several origins in parallel.
+
+    This class runs a list of `BatchJob` on a pool of processes,
+    where each job fetches the items of one origin using a
+    `BackendItemsGenerator`. The items produced by the jobs are
+    merged into a single generator, available via the `items`
+    attribute. Items of the same job keep their order, but items
+    of different jobs are interleaved.
+
+    Jobs run isolated: when one of them fails, the error is logged
+    and the rest of the jobs keep running. Once the items have been
+    consumed, the `results` attribute will store a `BatchResult` for
+    each job, in the same order the jobs were given, with the summary
+    of the fetch and the cause of the error, if any.
+
+    This object can also be used as a context manager.
+
+    :param jobs: list of `BatchJob` to run
+    :param max_workers: maximum number of jobs running at the same
+        time; by default, the number of CPUs of the machine
+    :param chunk_size: number of items sent at once by a worker
+    :param queue_size: maximum number of chunks waiting to be consumed
+    """
+    CHUNK_SIZE = 100
+    QUEUE_SIZE = 64
+    POLL_TIMEOUT = 0.5
+
+    def __init__(self, jobs, max_workers=None, chunk_size=CHUNK_SIZE,
+                 queue_size=QUEUE_SIZE):
+        self.jobs = list(jobs)
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.results = [None] * len(self.jobs)
+        self.items = self.__run()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.items:
+            self.items.close()
+        self.items = None
+
+    @property
+    def failed(self):
+        """List of results of the jobs that failed"""
+
+        return [result for result in self.results if result and result.error]
+
+    def __run(self):
+        """Run the jobs and yield the items they produce."""
+
+        if not self.jobs:
+            return
+
+        items_queue = multiprocessing.Queue(maxsize=self.queue_size)
+        stop_event = multiprocessing.Event()
+        pending = set(range(len(self.jobs)))
+        futures = {}
+
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers,
+                                                          initializer=_init_batch_worker,
+                                                          initargs=(items_queue, stop_event))
+        try:
+            for index, job in enumerate(self.jobs):
+                future = executor.submit(_run_batch_job, index, job, self.chunk_size)
+                futures[future] = index
+
+            while pending:
+                try:
+                    msg, index, payload = items_queue.get(timeout=self.POLL_TIMEOUT)
+                except queue.Empty:
+                    self.__check_crashed_jobs(futures, pending)
+                    continue
+
+                if msg == _MSG_ITEMS:
+                    for item in payload:
+                        yield item
+                else:
+                    self.__set_result(index, msg, payload)
+                    pending.discard(index)
+        finally:
+            if pending:
+                self.__stop(futures, items_queue, stop_event)
+            executor.shutdown(wait=True)
+
+    def __set_result(self, index, msg, payload):
+        job = self.jobs[index]
+
+        if msg == _MSG_DONE:
+            self.results[index] = BatchResult(job, payload, None)
+        else:
+            summary, cause = payload
+            self.results[index] = BatchResult(job, summary, cause)
+            logger.error("Batch job %s failed; cause: %s", _job_name(job), cause)
+
+    def __check_crashed_jobs(self, futures, pending):
+        """Set as failed those jobs whose process died unexpectedly."""
+
+        for future, index in futures.items():
+            if index not in pending or not future.done():
+                continue
+
+            error = future.exception() if not future.cancelled() else None
+
+            if error:
+                self.__set_result(index, _MSG_ERROR, (None, str(error)))
+                pending.discard(index)
+
+    @staticmethod
+    def __stop(futures, items_queue, stop_event):
+        """Stop the running jobs when the items are not consumed anymore."""
+
+        stop_event.set()
+
+        for future in futures:
+            future.cancel()
+
+        # Drain the queue so blocked workers can finish
+        while not all(future.done() for future in futures):
+            try:
+                items_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def _init_batch_worker(items_queue, stop_event):
+    """Set the queue where a worker process will send the items."""
+
+    global _batch_queue
+    global _batch_stop
+
+    _batch_queue = items_queue
+    _batch_stop = stop_event
+
+
+def _run_batch_job(index, job, chunk_size):
+    """Run a batch job in a worker process.
+
+    Items are sent to the parent process in chunks. When the job
+    finishes, its summary is sent too; if it fails, the cause
+    of the error is sent with the summary.
+    """
+    big = None
+
+    try:
+        big = BackendItemsGenerator(job.backend_class, job.backend_args, job.category,
+                                    filter_classified=job.filter_classified,
+                                    manager=job.manager,
+                                    fetch_archive=job.fetch_archive,
+                                    archived_after=job.archived_after,
+                                    state_store=job.state_store,
+                                    replay_workers=job.replay_workers,
+                                    replay_order=job.replay_order,
+                                    cached_after=job.cached_after,
+                                    client_options=job.client_options)
+        chunk = []
+
+        for item in big.items:
+            chunk.append(item)
+
+            if len(chunk) >= chunk_size:
+                if _batch_stop.is_set():
+                    return
+                _batch_queue.put((_MSG_ITEMS, index, chunk))
+                chunk = []
+
+        if chunk:
+            _batch_queue.put((_MSG_ITEMS, index, chunk))
+    except Exception as e:
+        logger.debug("Batch job %s failed", _job_name(job), exc_info=True)
+        summary = big.summary if big else None
+        _batch_queue.put((_MSG_ERROR, index, (summary, str(e))))
+        return
+
+    _batch_queue.put((_MSG_DONE, index, big.summary))
+
+
+def _job_name(job):
+    origin = job.backend_args.get('origin', None) or job.backend_args.get('uri', '-')
+    return "%s:%s" % (job.backend_class.__name__, origin)
+
+
+class BatchCommand:
+    """Run several backend commands in parallel from the command line.
+
+    The commands to run are read from a jobs file. Each line of
+    that file defines a job, using the same arguments given to
+    `perceval` to fetch data from one origin (i.e, the name of the
+    backend followed by its arguments). Empty lines and lines
+    starting with `#` are ignored.
+
+    The items fetched by the jobs are written to the same output
+    and the summary of each job is written to the log.
+
+    :param args: command line arguments
+    :param commands: dict of `BackendCommand` classes, indexed by
+        backend name
+    :param debug: boolean flag to check if application is running in debug mode
+    """
+    def __init__(self, *args, commands=None, debug=False):
+        parser = self.setup_cmd_parser()
+        self.parsed_args = parser.parse_args(args)
+        self.debug = debug
+        self.commands = commands or {}
+
+        if not self.parsed_args.output_dir and (self.parsed_args.shard_size or self.parsed_args.shard_bytes or
+                                                self.parsed_args.compression != COMPRESSION_NONE):
+            raise AttributeError("shard-size, shard-bytes and compression need output-dir to work with")
+        if self.parsed_args.output_dir and self.parsed_args.output_format in COLUMNAR_FORMATS:
+            raise AttributeError("output-dir does not support %s format" % self.parsed_args.output_format)
+
+        self.outfile = self.parsed_args.outfile
+        self.json_line = self.parsed_args.json_line
+        self.output_format = self.parsed_args.output_format
+
+        # Items written to an output directory are always JSON lines
+        if self.json_line or self.parsed_args.output_dir:
+            self.output_format = OUTPUT_FORMAT_JSON_LINE
+
+        self.serializer = None
+
+        if self.output_format not in COLUMNAR_FORMATS:
+            self.serializer = JSONSerializer.from_format(self.output_format,
+                                                         sort_keys=self.parsed_args.sort_keys)
+        self.jobs = self._read_jobs(self.parsed_args.jobs_file)
+
+    def run(self):
+        """Run the jobs and write the fetched items.
+
+        :returns: the list of `BatchResult` of the jobs
+        """
+        with BatchItemsGenerator(self.jobs, max_workers=self.parsed_args.max_workers) as bbig:
+            with self._create_writer() as writer:
+                for item in bbig.items:
+                    writer.write(item)
+
+            results = bbig.results
+
+        self._log_results(results)
+
+        if self.parsed_args.output_dir:
+            logger.info("%s files written to %s", len(writer.shards), writer.dirpath)
+
+        return results
+
+    def _create_writer(self):
+        """Create the object that will write the items to the output"""
+
+        if self.output_format in COLUMNAR_FORMATS:
+            return ColumnarItemWriter(self.outfile, self.output_format)
+        if not self.parsed_args.output_dir:
+            return ItemWriter(self.outfile, self.serializer)
+
+        return ShardedItemWriter(self.parsed_args.output_dir,
+                                 serializer=self.serializer,
+                                 compression=self.parsed_args.compression,
+                                 shard_size=self.parsed_args.shard_size,
+                                 shard_bytes=self.parsed_args.shard_bytes)
+
+    def _read_jobs(self, jobs_file):
+        """Read the jobs defined in a file"""
+
+        jobs = []
+
+        with jobs_file:
+            for nline, line in enumerate(jobs_file, start=1):
+                line = line.strip()
+
+                if not line or line.startswith('#'):
+                    continue
+
+                backend, *backend_args = shlex.split(line)
+
+                if backend not in self.commands:
+                    cause = "unknown backend %s in line %s" % (backend, nline)
+                    raise BackendError(cause=cause)
+
+                cmd = self.commands[backend](*backend_args, debug=self.debug)
+                jobs.append(self._make_job(cmd))
+
+        return jobs
+
+    @staticmethod
+    def _make_job(cmd):
+        """Create a batch job from a backend command"""
+
+        backend_args, category, kwargs = cmd._items_generator_args()
+
+        # Output is set by the batch command
+        for arg in OUTPUT_ARGS:
+            backend_args.pop(arg, None)
+
+        return BatchJob(cmd.BACKEND, backend_args, category, **kwargs)
+
+    @staticmethod
+    def _log_results(results):
+        """Write the summary of each job to the log"""
+
+        template = "Summary of %s: %s items produced, %s skipped, last item date %s%s"
+
+        for result in results:
+            summary = result.summary
+            fetched = summary.fetched if summary else 0
+            skipped = summary.skipped if summary else 0
+            last_updated_on = (summary.last_updated_on if summary else None) or '-'
+            status = "; failed: %s" % result.error if result.error else ''
+
+            logger.info(template, _job_name(result.job), fetched,
+                        skipped, last_updated_on, status)
+
+    @staticmethod
+    def setup_cmd_parser():
+        """Returns the batch argument parser."""
+
+        parser = argparse.ArgumentParser(prog='perceval batch')
+        parser.add_argument('jobs_file', type=argparse.FileType('r'),
+                            help="file with a backend command line per job")
+        parser.add_argument('-j', '--jobs', dest='max_workers', type=int, default=None,
+                            help="number of jobs to run in parallel (default: number of CPUs)")
+
+        group = parser.add_argument_group('output arguments')
+        group.add_argument('-o', '--output', type=argparse.FileType('w'),
+                           dest='outfile', default=sys.stdout,
+                           help="output file")
+        group.add_argument('--json-line', dest='json_line', action='store_true',
+                           help="produce a JSON line for each output item")
+        group.add_argument('--output-format', dest='output_format',
+                           choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT_JSON,
+                           help="format of the output items; arrow and parquet formats "
+                                "require 'pyarrow' package (default: %(default)s)")
+        group.add_argument('--sort-keys', dest='sort_keys', action='store_true', default=None,
+                           help="sort the keys of JSON lines")
+        group.add_argument('--output-dir', dest='output_dir', default=None,
+                           help="write items as JSON lines split in files under this directory")
+        group.add_argument('--shard-size', dest='shard_size', type=int, default=None,
+                           help="maximum number of items per file in the output directory")
+        group.add_argument('--shard-bytes', dest='shard_bytes', type=int, default=None,
+                           help="maximum number of uncompressed bytes per file in the output directory")
+        group.add_argument('--compression', dest='compression',
+                           choices=COMPRESSIONS, default=COMPRESSION_NONE,
+                           help="compression of the files in the output directory (default: %(default)s)")
+
+        return parser
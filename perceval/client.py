@@ -20,18 +20,62 @@
 #     Santiago Dueñas <sduenas@bitergia.com>
 #
 
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import http
+import itertools
+import json
 import logging
+import queue
+import sqlite3
+import threading
 import time
+import urllib.parse
 
 import requests
 import urllib3.util
 
-from .errors import RateLimitError
+from .errors import HttpClientError, RateLimitError
+from .metrics import HttpMetrics
+from .utils import sqlite_connect, sqlite_transaction
 from ._version import __version__
 
 logger = logging.getLogger(__name__)
 
 
+def follow_next_link(response, payload):
+    """Return the request of the next page following the `next` link.
+
+    :param response: response of the current page
+    :param payload: payload of the current page, sent with the next one
+
+    :returns: a tuple with the URL and the payload of the next page
+        or `None` when this is the last one
+    """
+    if response is None or 'next' not in response.links:
+        return None
+
+    return response.links['next']['url'], payload
+
+
+HttpClientOptions = collections.namedtuple('HttpClientOptions',
+                                           'archive_cache http_cache rate_budget pace_requests '
+                                           'prefetch_pages page_workers',
+                                           defaults=(None, None, None, False, None, None))
+"""Options given by a backend to its HTTP client.
+
+They set the `ArchiveCache` and `HttpCache` of the client, the
+`RateBudget` and request pacing of clients handling rate limits,
+and the pages fetched in advance or concurrently by the clients
+that paginate. Options left unset keep the defaults of the client
+(see `HttpClient.set_options`).
+"""
+
+
 class HttpClient:
     """Abstract class for HTTP clients.
 
@@ -62,10 +106,42 @@ class HttpClient:
     :param from_archive: if `True` the data is fetched
         from an archive
     :param ssl_verify: enable/disable SSL verification
+
+    The requests sent by the client are measured by the `HttpMetrics`
+    object available in the `metrics` attribute.
+
+    Requests can also be served from previous archives setting an
+    `ArchiveCache` in the `cache` attribute. When the response of a
+    request is found in the cache, it is stored in `archive` and
+    returned without sending the request; otherwise, the request
+    is sent to the data source. Errors are never served from the
+    cache, so failed requests are always retried.
+
+    Setting an `HttpCache` in the `http_cache` attribute, GET requests
+    are sent as conditional requests when a previous response with an
+    `ETag` or `Last-Modified` validator is stored there. When the data
+    source answers `304 Not Modified`, the stored response is returned
+    with the headers of the new one (e.g, rate limit headers).
+
+    Paginated resources can be fetched with `paginate`, which can get
+    up to `prefetch_pages` pages in a background thread while the
+    current one is processed. When the pages to fetch are known in advance, like
+    when the data source returns the number of the last one, they
+    can be fetched concurrently with `fetch_pages`, using up to
+    `page_workers` threads.
+
+    All these attributes can be set at once with `set_options`.
     """
     version = '0.3.0'
 
     DEFAULT_SLEEP_TIME = 1
+    DEFAULT_PREFETCH_PAGES = 0
+    DEFAULT_PAGE_WORKERS = 1
+    PREFETCH_POLL_TIME = 0.1
+
+    # Pagination options of `HttpClientOptions` supported by
+    # the client; set by the clients paginating the data
+    PAGINATION_OPTIONS = ()
 
     MAX_RETRIES = 5
     MAX_RETRIES_ON_CONNECT = 5
@@ -119,6 +195,12 @@ class HttpClient:
 
         self.archive = archive
         self.from_archive = from_archive
+        self.cache = None
+        self.http_cache = None
+        self.prefetch_pages = self.DEFAULT_PREFETCH_PAGES
+        self.page_workers = self.DEFAULT_PAGE_WORKERS
+        self.metrics = HttpMetrics()
+        self._local = threading.local()
 
         self._create_http_session()
 
@@ -144,6 +226,132 @@ class HttpClient:
 
         return response
 
+    @classmethod
+    def supported_options(cls):
+        """Return the names of the options supported by the client.
+
+        Every client supports the caches; rate limit options are
+        supported by the clients handling rate limits and pagination
+        options by the ones listed in `PAGINATION_OPTIONS`.
+        """
+        options = ['archive_cache', 'http_cache']
+        if issubclass(cls, RateLimitHandler):
+            options.extend(['rate_budget', 'pace_requests'])
+        options.extend(cls.PAGINATION_OPTIONS)
+
+        return options
+
+    def set_options(self, options):
+        """Set the options given by a backend.
+
+        :param options: `HttpClientOptions` to set on the client
+
+        :raises HttpClientError: when any of the options set is not
+            supported by the client
+        """
+        supported = self.supported_options()
+        unsupported = [name for name, value in options._asdict().items()
+                       if value and name not in supported]
+        if unsupported:
+            cause = "%s does not support %s options" % (self.__class__.__name__,
+                                                        ', '.join(unsupported))
+            raise HttpClientError(cause=cause)
+
+        if options.archive_cache:
+            self.cache = options.archive_cache
+        if options.http_cache:
+            self.http_cache = options.http_cache
+        if options.rate_budget:
+            self.rate_budget = options.rate_budget
+        if options.pace_requests:
+            self.pace_requests = True
+        if options.prefetch_pages:
+            self.prefetch_pages = options.prefetch_pages
+        if options.page_workers:
+            self.page_workers = options.page_workers
+
+    def paginate(self, url, payload=None, next_page=follow_next_link, fetch_page=None,
+                 prefetch=None):
+        """Iterate over the pages of a resource.
+
+        While a page is processed, the next ones are fetched in a
+        background thread, up to `prefetch` pages ahead. Pages fetched
+        in advance are archived when they are returned, so the archive
+        keeps the same order as when the pages are fetched one after
+        another, no matter the requests sent while processing them.
+        Pages are never prefetched when they are read from an archive.
+
+        :param url: URL of the first page
+        :param payload: payload of the first page
+        :param next_page: function returning the URL and the payload
+            of the next page, given the current page and its payload,
+            or `None` when it is the last one; by default, it follows
+            the `next` link of the response headers
+        :param fetch_page: function fetching a page given its URL and
+            payload; by default, `fetch` is called
+        :param prefetch: number of pages fetched in advance; when it
+            is 0, pages are fetched one after another; by default,
+            `prefetch_pages`
+
+        :returns: a generator of pages
+        """
+        if not fetch_page:
+            def fetch_page(page_url, page_payload):
+                return self.fetch(page_url, payload=page_payload)
+
+        if prefetch is None:
+            prefetch = self.prefetch_pages
+
+        if self.from_archive or not prefetch:
+            request = (url, payload)
+            while request:
+                page = fetch_page(*request)
+                request = next_page(page, request[1])
+                yield page
+        else:
+            yield from self._prefetch_pages(url, payload, next_page, fetch_page, prefetch)
+
+    def fetch_pages(self, pages, fetch_page=None, workers=None):
+        """Fetch a set of pages concurrently, returning them in order.
+
+        Up to `workers` pages are fetched at the same time by a pool
+        of threads, but they are returned, and archived, in the same
+        order they are given, so archives keep the same order as when
+        the pages are fetched one after another. Pages are fetched
+        one after another when they are read from an archive.
+
+        :param pages: iterable of tuples with the URL and the payload
+            of each page
+        :param fetch_page: function fetching a page given its URL and
+            payload; by default, `fetch` is called
+        :param workers: maximum number of pages fetched at the same
+            time; by default, `page_workers`
+
+        :returns: a generator of pages
+        """
+        if not fetch_page:
+            def fetch_page(page_url, page_payload):
+                return self.fetch(page_url, payload=page_payload)
+
+        workers = workers or self.page_workers
+
+        if self.from_archive or workers <= 1:
+            for request in pages:
+                yield fetch_page(*request)
+        else:
+            yield from self._fan_out_pages(pages, fetch_page, workers)
+
+    @contextlib.contextmanager
+    def no_archiving(self):
+        """Do not archive the requests sent by this thread within the context"""
+
+        previous = getattr(self._local, 'no_archiving', False)
+        self._local.no_archiving = True
+        try:
+            yield
+        finally:
+            self._local.no_archiving = previous
+
     @staticmethod
     def sanitize_for_archive(url, headers, payload):
         """Sanitize the URL, headers and payload of a HTTP request before storing/retrieving items.
@@ -168,28 +376,254 @@ class HttpClient:
 
         return response
 
+    def _fetch_from_cache(self, url, payload, headers):
+        """Look for the response of a request in the cache.
+
+        The response found is stored in the archive, if any. Rate
+        limit headers of the cached response are outdated, so they
+        are replaced by the current values known by the client.
+
+        :returns: the response or `None` when it is not cached
+        """
+        if not self.cache:
+            return None
+
+        cached_url, cached_headers, cached_payload = self._sanitize_request(url, headers, payload)
+        response = self.cache.lookup(cached_url, cached_payload, cached_headers)
+
+        if not isinstance(response, requests.Response):
+            return None
+
+        rate_limit_header = getattr(self, 'rate_limit_header', None)
+        if rate_limit_header:
+            current_values = ((rate_limit_header, self.rate_limit),
+                              (self.rate_limit_reset_header, self.rate_limit_reset_ts))
+            for header, value in current_values:
+                response.headers.pop(header, None)
+                if value is not None:
+                    response.headers[header] = str(value)
+
+        self.metrics.record_cache_hit()
+        self._archive_response(url, payload, headers, response)
+
+        return response
+
+    def _sanitize_request(self, url, headers, payload):
+        """Sanitize a copy of a request that has not been sent yet.
+
+        Some clients remove credentials from the headers or the payload
+        in place, so they are copied to keep them in the request.
+        """
+        headers = dict(headers) if headers else headers
+        payload = dict(payload) if isinstance(payload, dict) else payload
+
+        return self.sanitize_for_archive(url, headers, payload)
+
     def _fetch_from_remote(self, url, payload, headers, method, stream, auth):
 
-        if method == self.GET:
-            response = self.session.get(url, params=payload, headers=headers, stream=stream,
-                                        verify=self.ssl_verify, auth=auth)
-        else:
-            response = self.session.post(url, data=payload, headers=headers, stream=stream,
-                                         verify=self.ssl_verify, auth=auth)
+        response = self._fetch_from_cache(url, payload, headers)
+        if response is not None:
+            return response
+
+        key, entry = self._find_validators(url, payload, headers, method, stream)
+        request_headers = self._conditional_headers(headers, entry)
+
+        # Only requests sent to the data source wait for the rate
+        # limit; those served from the archive cache are not charged
+        rate_limited = isinstance(self, RateLimitHandler)
+        if rate_limited:
+            self.sleep_for_rate_limit()
+
+        response = self._send_request(url, payload, request_headers, method, stream, auth)
+
+        if rate_limited and entry and response.status_code == HttpCache.NOT_MODIFIED:
+            self.refund_rate_limit()
+
+        response = self._validate_response(key, entry, response)
+
+        return self._handle_response(url, payload, headers, response)
+
+    def _find_validators(self, url, payload, headers, method, stream):
+        """Find the response of a request stored in the HTTP cache.
+
+        Only GET requests whose body is not streamed are cached.
+
+        :returns: a tuple with the key of the request in the cache, or
+            `None` when the request is not cacheable, and the stored entry
+        """
+        if not self.http_cache or method != self.GET or stream:
+            return None, None
+
+        url, headers, payload = self._sanitize_request(url, headers, payload)
+        key = HttpCache.make_key(url, payload, headers)
+
+        return key, self.http_cache.get(key)
+
+    @staticmethod
+    def _conditional_headers(headers, entry):
+        """Add the validators of a cached response to the request headers"""
+
+        if not entry:
+            return headers
+
+        headers = dict(headers) if headers else {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+        return headers
+
+    def _validate_response(self, key, entry, response):
+        """Serve the cached response when it was not modified or cache the new one."""
+
+        if key is None:
+            return response
+
+        if entry and response.status_code == HttpCache.NOT_MODIFIED:
+            logger.debug("Response of %s not modified; serving it from the HTTP cache", response.url)
+            return entry.to_response(response)
+
+        if response.status_code == HttpCache.OK:
+            self.http_cache.put(key, HttpCacheEntry.from_response(response))
+
+        return response
+
+    def _send_request(self, url, payload, headers, method, stream, auth):
+        """Send a request to the remote server and return its response."""
+
+        response = None
+        start = time.perf_counter()
+
+        try:
+            if method == self.GET:
+                response = self.session.get(url, params=payload, headers=headers, stream=stream,
+                                            verify=self.ssl_verify, auth=auth)
+            else:
+                response = self.session.post(url, data=payload, headers=headers, stream=stream,
+                                             verify=self.ssl_verify, auth=auth)
+        finally:
+            self.metrics.record_request(url, time.perf_counter() - start,
+                                        response=response, stream=stream)
+
+        return response
+
+    def _handle_response(self, url, payload, headers, response):
+        """Check the status of a response and archive it."""
 
         try:
             response.raise_for_status()
         except Exception as e:
-            if self.archive:
-                url, headers, payload = self.sanitize_for_archive(url, headers, payload)
-                self.archive.store(url, payload, headers, e)
+            self._archive_response(url, payload, headers, e)
             raise e
 
-        if self.archive:
-            url, headers, payload = self.sanitize_for_archive(url, headers, payload)
-            self.archive.store(url, payload, headers, response)
+        self._archive_response(url, payload, headers, response)
         return response
 
+    def _archive_response(self, url, payload, headers, data):
+        """Store the response, or the error, of a request in the archive.
+
+        Nothing is stored when archiving is disabled in this thread.
+        Threads fetching pages in advance keep the data to be archived
+        by the thread that consumes the pages.
+        """
+        if not self.archive or getattr(self._local, 'no_archiving', False):
+            return
+
+        url, headers, payload = self.sanitize_for_archive(url, headers, payload)
+
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.append((url, payload, headers, data))
+        else:
+            self.archive.store(url, payload, headers, data)
+
+    def _prefetch_pages(self, url, payload, next_page, fetch_page, prefetch):
+        """Fetch the pages in a background thread, yielding them in order."""
+
+        pages = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=self.PREFETCH_POLL_TIME)
+                    return
+                except queue.Full:
+                    continue
+
+        def fetch_pages():
+            self._local.pending = []
+            request = (url, payload)
+
+            while request and not stop.is_set():
+                page, error = None, None
+                try:
+                    page = fetch_page(*request)
+                    request = next_page(page, request[1])
+                except Exception as e:
+                    error, request = e, None
+
+                pending, self._local.pending = self._local.pending, []
+                put((page, pending, error, request is None))
+
+        thread = threading.Thread(target=fetch_pages, name='perceval-prefetch', daemon=True)
+        thread.start()
+
+        try:
+            last = False
+            while not last:
+                page, pending, error, last = pages.get()
+
+                for entry in pending:
+                    self.archive.store(*entry)
+                if error:
+                    raise error
+
+                yield page
+        finally:
+            stop.set()
+
+    def _fan_out_pages(self, pages, fetch_page, workers):
+        """Fetch the pages in a pool of threads, yielding them in order."""
+
+        def fetch(request):
+            self._local.pending = []
+            try:
+                return fetch_page(*request), self._local.pending, None
+            except Exception as e:
+                return None, self._local.pending, e
+            finally:
+                self._local.pending = None
+
+        pages = iter(pages)
+        futures = collections.deque()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                         thread_name_prefix='perceval-page')
+        try:
+            for request in itertools.islice(pages, workers):
+                futures.append(executor.submit(fetch, request))
+
+            while futures:
+                page, pending, error = futures.popleft().result()
+
+                request = next(pages, None)
+                if request:
+                    futures.append(executor.submit(fetch, request))
+
+                for entry in pending:
+                    self.archive.store(*entry)
+                if error:
+                    raise error
+
+                yield page
+        finally:
+            # Pages not requested yet are discarded but those being
+            # fetched are waited, so no request outlives the generator
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
     def _create_http_session(self):
         """Create a http session and initialize the retry object."""
 
@@ -210,8 +644,15 @@ class HttpClient:
                                      raise_on_status=self.raise_on_status,
                                      respect_retry_after_header=self.respect_retry_after_header)
 
-        self.session.mount('http://', requests.adapters.HTTPAdapter(max_retries=retries))
-        self.session.mount('https://', requests.adapters.HTTPAdapter(max_retries=retries))
+        self._mount_http_adapters(retries)
+
+    def _mount_http_adapters(self, retries, pool_maxsize=requests.adapters.DEFAULT_POOLSIZE):
+        """Mount the adapters of the session for http and https."""
+
+        self.session.mount('http://', requests.adapters.HTTPAdapter(max_retries=retries,
+                                                                    pool_maxsize=pool_maxsize))
+        self.session.mount('https://', requests.adapters.HTTPAdapter(max_retries=retries,
+                                                                     pool_maxsize=pool_maxsize))
 
     def _close_http_session(self):
         """Close the http session."""
@@ -220,13 +661,520 @@ class HttpClient:
             self.session.keep_alive = False
 
 
+class AsyncHttpClient(HttpClient):
+    """HTTP client able to keep several requests in flight.
+
+    This client extends `HttpClient` with an asyncio interface
+    to send requests concurrently. Requests are dispatched on a
+    pool of threads that share the HTTP session, so the retry
+    policy and headers are the same of `HttpClient`. Responses
+    are checked and archived in the thread running the event loop,
+    which must be the same that created the archive.
+
+    The coroutine `async_fetch` fetches a single resource while
+    `fetch_many` fetches a list of resources at once, returning the
+    responses in the same order the requests were given.
+
+    :param max_concurrent_requests: maximum number of requests
+        in flight at the same time
+
+    The rest of parameters are the same of `HttpClient`.
+    """
+    DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+
+    def __init__(self, base_url, max_retries=HttpClient.MAX_RETRIES,
+                 sleep_time=HttpClient.DEFAULT_SLEEP_TIME, extra_headers=None,
+                 extra_status_forcelist=None, extra_retry_after_status=None,
+                 archive=None, from_archive=False, ssl_verify=True,
+                 max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS):
+
+        if max_concurrent_requests < 1:
+            raise ValueError("max_concurrent_requests must be greater than 0")
+
+        self.max_concurrent_requests = max_concurrent_requests
+        self._executor = None
+
+        super().__init__(base_url, max_retries=max_retries, sleep_time=sleep_time,
+                         extra_headers=extra_headers, extra_status_forcelist=extra_status_forcelist,
+                         extra_retry_after_status=extra_retry_after_status,
+                         archive=archive, from_archive=from_archive, ssl_verify=ssl_verify)
+
+    async def async_fetch(self, url, payload=None, headers=None, method=HttpClient.GET,
+                          stream=False, auth=None):
+        """Fetch the data from a given URL without blocking the event loop.
+
+        :param url: link to the resource
+        :param payload: payload of the request
+        :param headers: headers of the request
+        :param method: type of request call (GET or POST)
+        :param stream: defer downloading the response body until the response content is available
+        :param auth: auth of the request
+
+        :returns a response object
+        """
+        if self.from_archive:
+            return self._fetch_from_archive(url, payload, headers)
+
+        response = self._fetch_from_cache(url, payload, headers)
+        if response is not None:
+            return response
+
+        if not self._executor:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrent_requests)
+
+        loop = asyncio.get_running_loop()
+        key, entry = self._find_validators(url, payload, headers, method, stream)
+        request_headers = self._conditional_headers(headers, entry)
+
+        send_request = functools.partial(self._send_request, url, payload,
+                                         request_headers, method, stream, auth)
+        response = await loop.run_in_executor(self._executor, send_request)
+        response = self._validate_response(key, entry, response)
+
+        return self._handle_response(url, payload, headers, response)
+
+    def fetch_many(self, requests_args):
+        """Fetch the data from a list of requests concurrently.
+
+        Each request is defined by a dict with the arguments
+        of `fetch` (i.e, `url`, `payload`, `headers`, etc.).
+        When any of the requests fails, the exception is raised
+        once the rest of requests in flight have finished.
+
+        :param requests_args: list of dicts defining the requests
+
+        :returns: a list of response objects in the same order
+            the requests were given
+        """
+        async def fetch_all():
+            tasks = [self.async_fetch(**args) for args in requests_args]
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        responses = asyncio.run(fetch_all())
+
+        for response in responses:
+            if isinstance(response, BaseException):
+                raise response
+
+        return responses
+
+    def _mount_http_adapters(self, retries, pool_maxsize=None):
+        """Mount the adapters with a pool as big as the concurrent requests."""
+
+        pool_maxsize = pool_maxsize or max(self.max_concurrent_requests, requests.adapters.DEFAULT_POOLSIZE)
+        super()._mount_http_adapters(retries, pool_maxsize=pool_maxsize)
+
+    def _close_http_session(self):
+        """Close the http session and stop the dispatching threads."""
+
+        executor = getattr(self, '_executor', None)
+        if executor:
+            executor.shutdown(wait=False)
+            self._executor = None
+
+        if getattr(self, 'session', None):
+            super()._close_http_session()
+
+
+class HttpCacheEntry(collections.namedtuple('HttpCacheEntry',
+                                            'etag last_modified status headers body')):
+    """Response stored in an `HttpCache` with its validators"""
+
+    # Headers describing the body of the 304 response, not the cached one
+    BODY_HEADERS = ('Content-Length', 'Content-Encoding', 'Transfer-Encoding')
+
+    @classmethod
+    def from_response(cls, response):
+        """Create an entry from a response with validators.
+
+        :returns: an entry or `None` when the response does not
+            include `ETag` nor `Last-Modified` headers
+        """
+        etag = response.headers.get('ETag', None)
+        last_modified = response.headers.get('Last-Modified', None)
+
+        if not etag and not last_modified:
+            return None
+
+        return cls(etag, last_modified, response.status_code,
+                   dict(response.headers), response.content)
+
+    def to_response(self, not_modified):
+        """Build the cached response updated with a `304 Not Modified` one.
+
+        :param not_modified: `304 Not Modified` response
+        """
+        response = requests.Response()
+        response.status_code = self.status
+        response.reason = http.HTTPStatus(self.status).phrase
+        response.headers = requests.structures.CaseInsensitiveDict(self.headers)
+        response.headers.update((name, value) for name, value in not_modified.headers.items()
+                                if name not in self.BODY_HEADERS)
+        response._content = self.body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+
+        return response
+
+
+class HttpCache:
+    """Cache of HTTP responses revalidated with conditional requests.
+
+    The cache stores, in a SQLite database, the last successful
+    response of those requests whose response included an `ETag`
+    or `Last-Modified` validator. Requests are identified by their
+    URL, payload and headers.
+
+    When the size of the bodies stored exceeds `max_bytes`, the
+    least recently used responses are evicted. A new connection
+    is opened for each operation, so the same file can be shared
+    by several processes. Errors reading or writing the cache are
+    logged and ignored, so they never stop fetching data.
+
+    :param path: path to the SQLite database
+    :param max_bytes: maximum size of the bodies stored
+
+    :raises HttpClientError: when the database cannot be initialized
+    """
+    CACHE_TABLE = "responses"
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+    OK = 200
+    NOT_MODIFIED = 304
+
+    # Table structure
+    CACHE_CREATE_STMT = "CREATE TABLE IF NOT EXISTS " + CACHE_TABLE + " ( " \
+                        "key TEXT PRIMARY KEY, " \
+                        "etag TEXT, " \
+                        "last_modified TEXT, " \
+                        "status INTEGER, " \
+                        "headers TEXT, " \
+                        "body BLOB, " \
+                        "size INTEGER, " \
+                        "used_on REAL)"
+    CACHE_INDEX_STMT = "CREATE INDEX IF NOT EXISTS responses_used_on " \
+                       "ON " + CACHE_TABLE + " (used_on)"
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be greater than 0")
+
+        self.path = path
+        self.max_bytes = max_bytes
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                conn.execute(self.CACHE_CREATE_STMT)
+                conn.execute(self.CACHE_INDEX_STMT)
+        except sqlite3.DatabaseError as e:
+            msg = "HTTP cache %s initialization error; cause: %s" % (self.path, str(e))
+            raise HttpClientError(cause=msg)
+
+    def get(self, key):
+        """Get a cached response, marking it as recently used.
+
+        :param key: key of the request (see `make_key`)
+
+        :returns: an `HttpCacheEntry` or `None` when it is not found
+        """
+        select_stmt = "SELECT etag, last_modified, status, headers, body " \
+                      "FROM " + self.CACHE_TABLE + " " \
+                      "WHERE key = ?"
+        update_stmt = "UPDATE " + self.CACHE_TABLE + " " \
+                      "SET used_on = ? WHERE key = ?"
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                row = conn.execute(select_stmt, (key,)).fetchone()
+                if row:
+                    conn.execute(update_stmt, (time.time(), key))
+        except sqlite3.DatabaseError as e:
+            logger.warning("Ignoring HTTP cache %s due to: %s", self.path, str(e))
+            return None
+
+        if not row:
+            return None
+
+        return HttpCacheEntry(row[0], row[1], row[2], json.loads(row[3]), row[4])
+
+    def put(self, key, entry):
+        """Store a response, evicting the least recently used ones when needed.
+
+        Responses bigger than the cache are not stored.
+
+        :param key: key of the request (see `make_key`)
+        :param entry: `HttpCacheEntry` to store; ignored when it is `None`
+        """
+        if not entry or len(entry.body) > self.max_bytes:
+            return
+
+        insert_stmt = "INSERT OR REPLACE INTO " + self.CACHE_TABLE + " " \
+                      "(key, etag, last_modified, status, headers, body, size, used_on) " \
+                      "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        row = (key, entry.etag, entry.last_modified, entry.status,
+               json.dumps(entry.headers), entry.body, len(entry.body), time.time())
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                with sqlite_transaction(conn):
+                    conn.execute(insert_stmt, row)
+                    self._evict(conn)
+        except sqlite3.DatabaseError as e:
+            logger.warning("Response not stored in HTTP cache %s due to: %s", self.path, str(e))
+
+    def size(self):
+        """Size of the bodies stored in the cache"""
+
+        with sqlite_connect(self.path) as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM " + self.CACHE_TABLE).fetchone()[0]
+
+    @staticmethod
+    def make_key(url, payload, headers):
+        """Generate the key of a request in the cache"""
+
+        content = ':'.join([url,
+                            json.dumps(payload, sort_keys=True),
+                            json.dumps(headers, sort_keys=True)])
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def _evict(self, conn):
+        """Remove the least recently used responses exceeding the size of the cache"""
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM " + self.CACHE_TABLE).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        select_stmt = "SELECT key, size FROM " + self.CACHE_TABLE + " " \
+                      "ORDER BY used_on, rowid"
+        evicted = []
+
+        for key, size in conn.execute(select_stmt):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+
+        conn.executemany("DELETE FROM " + self.CACHE_TABLE + " WHERE key = ?", evicted)
+
+        logger.debug("%s responses evicted from HTTP cache %s", len(evicted), self.path)
+
+
+def pacing_interval(remaining, min_remaining, seconds_to_reset):
+    """Seconds between requests to spread them until the rate limit is reset.
+
+    :param remaining: remaining requests
+    :param min_remaining: requests kept in reserve
+    :param seconds_to_reset: seconds until the rate limit is reset
+
+    :returns: the interval or 0 when the requests do not need to be paced
+    """
+    available = remaining - min_remaining
+
+    if available <= 0 or seconds_to_reset <= 0:
+        return 0
+
+    return seconds_to_reset / available
+
+
+RatePermit = collections.namedtuple('RatePermit', 'wait exhausted')
+"""Permit to send a request given by a `RateBudget`.
+
+It includes the seconds to wait before sending the request and
+whether the budget was exhausted, in which case the wait lasts
+until the rate limit is reset.
+"""
+
+
+class RateBudget:
+    """Rate limit budget shared by several clients and processes.
+
+    The budget stores, in a SQLite database, the remaining requests
+    and the time of the next reset of each rate limit, identified by
+    a key (e.g, host and token). Clients update it with the values
+    returned by the data source and reserve a permit before sending
+    each request.
+
+    Permits are spread evenly over the time left until the reset,
+    keeping `min_remaining` requests in reserve, so clients sharing
+    the same key pace their requests instead of draining the budget
+    and then waiting until it is reset. Budgets are read and written
+    in exclusive transactions, so the same file can be shared by
+    several processes. Errors accessing the budget are logged and
+    ignored, so they never stop fetching data.
+
+    :param path: path to the SQLite database
+
+    :raises HttpClientError: when the database cannot be initialized
+    """
+    BUDGET_TABLE = "rate_budget"
+
+    # Seconds between two reset times of the same rate limit window
+    RESET_TOLERANCE = 5
+
+    # Table structure
+    BUDGET_CREATE_STMT = "CREATE TABLE IF NOT EXISTS " + BUDGET_TABLE + " ( " \
+                         "key TEXT PRIMARY KEY, " \
+                         "remaining INTEGER, " \
+                         "reset_on REAL, " \
+                         "next_on REAL)"
+
+    def __init__(self, path):
+        self.path = path
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                conn.execute(self.BUDGET_CREATE_STMT)
+        except sqlite3.DatabaseError as e:
+            msg = "rate budget %s initialization error; cause: %s" % (self.path, str(e))
+            raise HttpClientError(cause=msg)
+
+    def get(self, key):
+        """Get the remaining requests and the reset time of a budget.
+
+        :param key: key of the budget
+
+        :returns: a tuple with the remaining requests and the reset
+            time, or `None` when the budget is not found
+        """
+        select_stmt = "SELECT remaining, reset_on " \
+                      "FROM " + self.BUDGET_TABLE + " " \
+                      "WHERE key = ?"
+
+        with sqlite_connect(self.path) as conn:
+            row = conn.execute(select_stmt, (key,)).fetchone()
+
+        return tuple(row) if row else None
+
+    def update(self, key, remaining, reset_on):
+        """Update a budget with the values returned by the data source.
+
+        Requests reserved by other clients might be still in flight,
+        so within the same rate limit window the lowest number of
+        remaining requests is kept.
+
+        :param key: key of the budget
+        :param remaining: remaining requests; `None` when unknown
+        :param reset_on: time (epoch) when the rate limit is reset;
+            `None` when unknown
+        """
+        select_stmt = "SELECT remaining, reset_on, next_on " \
+                      "FROM " + self.BUDGET_TABLE + " " \
+                      "WHERE key = ?"
+        insert_stmt = "INSERT OR REPLACE INTO " + self.BUDGET_TABLE + " " \
+                      "(key, remaining, reset_on, next_on) " \
+                      "VALUES (?, ?, ?, ?)"
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                with sqlite_transaction(conn):
+                    row = conn.execute(select_stmt, (key,)).fetchone()
+                    next_on = None
+
+                    if row and self._same_window(row[1], reset_on):
+                        next_on = row[2]
+                        if row[0] is not None and remaining is not None:
+                            remaining = min(row[0], remaining)
+
+                    conn.execute(insert_stmt, (key, remaining, reset_on, next_on))
+        except sqlite3.DatabaseError as e:
+            logger.warning("Rate budget %s not updated due to: %s", self.path, str(e))
+            return
+
+        logger.debug("Rate budget %s: %s requests remaining", key, remaining)
+
+    def reserve(self, key, min_remaining=0):
+        """Reserve a permit to send a request.
+
+        When the budget is unknown or its window has passed, the
+        request can be sent right away.
+
+        :param key: key of the budget
+        :param min_remaining: requests kept in reserve; when the
+            remaining requests reach this value, the budget is exhausted
+
+        :returns: a `RatePermit`
+        """
+        select_stmt = "SELECT remaining, reset_on, next_on " \
+                      "FROM " + self.BUDGET_TABLE + " " \
+                      "WHERE key = ?"
+        update_stmt = "UPDATE " + self.BUDGET_TABLE + " " \
+                      "SET remaining = ?, next_on = ? " \
+                      "WHERE key = ?"
+
+        now = time.time()
+        permit = RatePermit(0, False)
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                with sqlite_transaction(conn):
+                    row = conn.execute(select_stmt, (key,)).fetchone()
+
+                    if row and row[0] is not None and row[1] is not None and row[1] > now:
+                        remaining, reset_on, next_on = row
+
+                        if remaining <= min_remaining:
+                            permit = RatePermit(reset_on - now, True)
+                        else:
+                            slot = max(now, next_on or now)
+                            interval = pacing_interval(remaining, min_remaining, reset_on - now)
+                            conn.execute(update_stmt, (remaining - 1, slot + interval, key))
+                            permit = RatePermit(slot - now, False)
+        except sqlite3.DatabaseError as e:
+            logger.warning("Ignoring rate budget %s due to: %s", self.path, str(e))
+            return RatePermit(0, False)
+
+        return permit
+
+    def release(self, key):
+        """Give back a permit reserved for a request not charged.
+
+        :param key: key of the budget
+        """
+        update_stmt = "UPDATE " + self.BUDGET_TABLE + " " \
+                      "SET remaining = remaining + 1 " \
+                      "WHERE key = ? AND remaining IS NOT NULL"
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                with sqlite_transaction(conn):
+                    conn.execute(update_stmt, (key,))
+        except sqlite3.DatabaseError as e:
+            logger.warning("Rate budget %s not released due to: %s", self.path, str(e))
+
+    def _same_window(self, stored_reset_on, reset_on):
+        if stored_reset_on is None or reset_on is None:
+            return False
+        return abs(stored_reset_on - reset_on) <= self.RESET_TOLERANCE
+
+
 class RateLimitHandler:
     """Class to handle rate limit for HTTP clients.
 
+    By default, the rate limit is tracked by each client and requests
+    are sent as soon as possible until the rate limit is exhausted.
+    When `pace_requests` is set, requests are spaced to spread the
+    remaining rate limit evenly until it is reset, so the fetching
+    process keeps a steady pace instead of waiting a whole reset
+    window.
+
+    Setting a `RateBudget` in the `rate_budget` attribute, the rate
+    limit is shared with other clients, in this or other processes,
+    that use the same token on the same host (see `rate_budget_key`),
+    and requests are always paced.
+
+    `HttpClient` subclasses call `sleep_for_rate_limit` before each
+    request sent to the data source, once the request was not found
+    in the archive cache, so cached requests never wait nor consume
+    the budget. Requests answered with `304 Not Modified` give back
+    their permit (see `refund_rate_limit`).
+
     :param sleep_for_rate: sleep until rate limit is reset
     :param min_rate_to_sleep: minimun rate needed to sleep until it will be rese
     :param rate_limit_header: header to know the current rate limit
     :param rate_limit_reset_header: header to know the next rate limit reset
+    :param pace_requests: spread the requests until the rate limit is reset
     """
     version = '0.2'
 
@@ -237,19 +1185,25 @@ class RateLimitHandler:
 
     def setup_rate_limit_handler(self, sleep_for_rate=False, min_rate_to_sleep=MIN_RATE_LIMIT,
                                  rate_limit_header=RATE_LIMIT_HEADER,
-                                 rate_limit_reset_header=RATE_LIMIT_RESET_HEADER):
+                                 rate_limit_reset_header=RATE_LIMIT_RESET_HEADER,
+                                 pace_requests=False):
         """Setup the rate limit handler.
 
         :param sleep_for_rate: sleep until rate limit is reset
         :param min_rate_to_sleep: minimun rate needed to make the fecthing process sleep
         :param rate_limit_header: header from where extract the rate limit data
         :param rate_limit_reset_header: header from where extract the rate limit reset data
+        :param pace_requests: spread the requests until the rate limit is reset
         """
         self.rate_limit = None
         self.rate_limit_reset_ts = None
         self.sleep_for_rate = sleep_for_rate
         self.rate_limit_header = rate_limit_header
         self.rate_limit_reset_header = rate_limit_reset_header
+        self.rate_budget = None
+        self.pace_requests = pace_requests
+        self._next_request_on = None
+        self._pace_lock = threading.Lock()
 
         if min_rate_to_sleep > self.MAX_RATE_LIMIT:
             msg = "Minimum rate to sleep value exceeded (%d)."
@@ -263,20 +1217,100 @@ class RateLimitHandler:
     def sleep_for_rate_limit(self):
         """The fetching process sleeps until the rate limit is restored or
            raises a RateLimitError exception if sleep_for_rate flag is disabled.
+
+           When requests are paced or a rate budget is set, the process
+           also sleeps the time needed to keep the pace of the requests.
         """
-        if self.rate_limit is not None and self.rate_limit <= self.min_rate_to_sleep:
+        if self.rate_budget:
+            permit = self.rate_budget.reserve(self.rate_budget_key(), self.min_rate_to_sleep)
+
+            if not permit.exhausted:
+                if permit.wait > 0:
+                    logger.debug("Pacing requests; waiting %.3f secs", permit.wait)
+                    self._sleep_for_rate_limit(permit.wait)
+                return
+
+            seconds_to_reset = permit.wait
+        elif self.rate_limit is not None and self.rate_limit <= self.min_rate_to_sleep:
             seconds_to_reset = self.calculate_time_to_reset()
+        else:
+            if self.pace_requests:
+                self._pace_request()
+            return
 
-            if seconds_to_reset < 0:
-                logger.warning("Value of sleep for rate limit is negative, reset it to 0")
-                seconds_to_reset = 0
+        if seconds_to_reset < 0:
+            logger.warning("Value of sleep for rate limit is negative, reset it to 0")
+            seconds_to_reset = 0
 
-            cause = "Rate limit exhausted."
-            if self.sleep_for_rate:
-                logger.info("%s Waiting %i secs for rate limit reset.", cause, seconds_to_reset)
-                time.sleep(seconds_to_reset)
-            else:
-                raise RateLimitError(cause=cause, seconds_to_reset=seconds_to_reset)
+        cause = "Rate limit exhausted."
+        if self.sleep_for_rate:
+            logger.info("%s Waiting %i secs for rate limit reset.", cause, seconds_to_reset)
+            self._sleep_for_rate_limit(seconds_to_reset)
+        else:
+            raise RateLimitError(cause=cause, seconds_to_reset=seconds_to_reset)
+
+    def refund_rate_limit(self):
+        """Give back the permit reserved for a request not charged.
+
+        Data sources like GitHub do not count the requests answered
+        with `304 Not Modified` against the rate limit, so the permit
+        reserved in the rate budget is given back. When the data source
+        charges them, the remaining requests it returns will correct
+        the budget.
+        """
+        if self.rate_budget:
+            self.rate_budget.release(self.rate_budget_key())
+
+    def _pace_request(self):
+        """Sleep until the time of the next request to keep the pace.
+
+        Requests are spaced by the interval needed to spread the
+        remaining rate limit until the reset. The time spent since
+        the previous request is discounted, so slow requests or
+        processing do not make the client wait longer.
+        """
+        if self.rate_limit is None or self.rate_limit_reset_ts is None:
+            self._next_request_on = None
+            return
+
+        interval = pacing_interval(self.rate_limit, self.min_rate_to_sleep,
+                                   self.calculate_time_to_reset())
+
+        # Slots are reserved under a lock because pages can be
+        # fetched by several threads (see `HttpClient.fetch_pages`)
+        with self._pace_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_on or now)
+            self._next_request_on = slot + interval
+
+        if slot > now:
+            logger.debug("Pacing requests; waiting %.3f secs", slot - now)
+            self._sleep_for_rate_limit(slot - now)
+
+    def rate_budget_key(self):
+        """Key of the rate budget consumed by the client.
+
+        The key is made of the host of `base_url` and a hash of the
+        session headers, which include the token in most clients, so
+        tokens are not stored in the budget. Clients sending tokens
+        in other ways can override this method.
+        """
+        host = urllib.parse.urlsplit(getattr(self, 'base_url', None) or '').netloc
+        session = getattr(self, 'session', None)
+        headers = sorted(session.headers.items()) if session else []
+
+        token = hashlib.sha1(json.dumps(headers).encode('utf-8')).hexdigest()
+
+        return host + ':' + token
+
+    def _sleep_for_rate_limit(self, seconds):
+        """Sleep and record the time in the metrics of the client"""
+
+        time.sleep(seconds)
+
+        metrics = getattr(self, 'metrics', None)
+        if metrics:
+            metrics.record_rate_limit_sleep(seconds)
 
     def calculate_time_to_reset(self):
         """Calculate the seconds to reset the token requests."""
@@ -300,3 +1334,9 @@ class RateLimitHandler:
             logger.debug("Rate limit reset: %s", self.calculate_time_to_reset())
         else:
             self.rate_limit_reset_ts = None
+
+        if self.rate_budget:
+            reset_on = None
+            if self.rate_limit_reset_ts is not None:
+                reset_on = time.time() + self.calculate_time_to_reset()
+            self.rate_budget.update(self.rate_budget_key(), self.rate_limit, reset_on)
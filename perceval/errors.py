@@ -88,6 +88,12 @@ class ParseError(BaseError):
     message = "%(cause)s"
 
 
+class StateStoreError(BaseError):
+    """Generic error for fetch state stores"""
+
+    message = "%(cause)s"
+
+
 class BackendCommandArgumentParserError(BaseError):
     """Generic error for BackendCommandArgumentParser"""
 
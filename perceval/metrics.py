@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import bisect
+import re
+import threading
+import urllib.parse
+
+
+class LatencyHistogram:
+    """Histogram of latencies.
+
+    Latencies are counted in buckets defined by their upper bounds,
+    in seconds. Latencies greater than the last bound are counted
+    in an extra bucket.
+
+    :param buckets: sorted list of upper bounds of the buckets
+    """
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self):
+        """Mean of the latencies observed"""
+
+        return self.total / self.count if self.count else 0.0
+
+    def observe(self, seconds):
+        """Add a latency to the histogram.
+
+        :param seconds: latency in seconds
+        """
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        """Return the histogram as a dict"""
+
+        labels = ['<=%s' % bound for bound in self.buckets]
+        labels.append('>%s' % self.buckets[-1])
+
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean,
+            'max': self.max,
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+
+class HttpMetrics:
+    """Measure the requests sent by an HTTP client.
+
+    This class counts the requests sent, the bytes received, the
+    retries and the responses with client (4xx) or server (5xx)
+    errors. Requests that did not get any response (e.g, because
+    retries were exhausted) are counted as failed.
+
+    Responses served from a cache of archives are not sent to the
+    data source, so they are only counted as cache hits. Conditional
+    requests answered with `304 Not Modified` are counted apart.
+
+    It also measures the time spent waiting on the network and
+    sleeping until the rate limit is reset. Latencies are grouped
+    by endpoint, which is the host and the path of the URL where
+    numeric ids and hashes are replaced by `{id}`. The number of
+    endpoints is limited by `MAX_ENDPOINTS`; once reached, the
+    latencies of new endpoints are grouped under `other`.
+
+    Requests can be recorded from several threads. When they run
+    concurrently, the network time is the sum of the time of every
+    request, so it can be longer than the elapsed time.
+    """
+    MAX_ENDPOINTS = 100
+    OTHER_ENDPOINT = 'other'
+
+    ID_REGEX = re.compile(r'^(\d+|[0-9a-fA-F]{32,})$')
+
+    def __init__(self):
+        self.requests = 0
+        self.failed_requests = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.client_errors = 0
+        self.server_errors = 0
+        self.cache_hits = 0
+        self.not_modified = 0
+        self.network_time = 0.0
+        self.rate_limit_sleep_time = 0.0
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def record_request(self, url, seconds, response=None, stream=False):
+        """Record a request and its response.
+
+        :param url: URL of the request
+        :param seconds: time spent waiting for the response
+        :param response: response received; `None` when the request failed
+        :param stream: whether the body of the response was deferred;
+            in that case, the size of the body is taken from its headers
+        """
+        endpoint = self.endpoint(url)
+
+        with self._lock:
+            self.requests += 1
+            self.network_time += seconds
+
+            if endpoint not in self.latencies and len(self.latencies) >= self.MAX_ENDPOINTS:
+                endpoint = self.OTHER_ENDPOINT
+            if endpoint not in self.latencies:
+                self.latencies[endpoint] = LatencyHistogram()
+            self.latencies[endpoint].observe(seconds)
+
+            if response is None:
+                self.failed_requests += 1
+                return
+
+            self.bytes_received += self._body_size(response, stream)
+            self.retries += self._retries(response)
+
+            if response.status_code == 304:
+                self.not_modified += 1
+            elif 400 <= response.status_code < 500:
+                self.client_errors += 1
+            elif response.status_code >= 500:
+                self.server_errors += 1
+
+    def record_cache_hit(self):
+        """Record a response served from the cache instead of the network"""
+
+        with self._lock:
+            self.cache_hits += 1
+
+    def record_rate_limit_sleep(self, seconds):
+        """Record the time spent sleeping until the rate limit is reset.
+
+        :param seconds: time slept
+        """
+        with self._lock:
+            self.rate_limit_sleep_time += seconds
+
+    def as_dict(self):
+        """Return the metrics as a dict"""
+
+        return {
+            'requests': self.requests,
+            'failed_requests': self.failed_requests,
+            'bytes_received': self.bytes_received,
+            'retries': self.retries,
+            'client_errors': self.client_errors,
+            'server_errors': self.server_errors,
+            'cache_hits': self.cache_hits,
+            'not_modified': self.not_modified,
+            'network_time': self.network_time,
+            'rate_limit_sleep_time': self.rate_limit_sleep_time,
+            'latencies': {endpoint: histogram.as_dict()
+                          for endpoint, histogram in self.latencies.items()}
+        }
+
+    @classmethod
+    def endpoint(cls, url):
+        """Return the endpoint of a URL"""
+
+        parts = urllib.parse.urlsplit(url)
+        segments = ['{id}' if cls.ID_REGEX.match(segment) else segment
+                    for segment in parts.path.split('/')]
+
+        return parts.netloc + '/'.join(segments)
+
+    @staticmethod
+    def _body_size(response, stream):
+        if not stream:
+            return len(response.content or b'')
+
+        length = response.headers.get('Content-Length', None)
+        return int(length) if length and length.isdigit() else 0
+
+    @staticmethod
+    def _retries(response):
+        retries = getattr(response.raw, 'retries', None)
+        history = getattr(retries, 'history', None)
+        return len(history) if history else 0
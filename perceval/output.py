@@ -0,0 +1,597 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import gzip
+import json
+import logging
+import math
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+
+OUTPUT_FORMAT_JSON = 'json'
+OUTPUT_FORMAT_JSON_LINE = 'json-line'
+OUTPUT_FORMAT_ARROW = 'arrow'
+OUTPUT_FORMAT_PARQUET = 'parquet'
+JSON_FORMATS = [OUTPUT_FORMAT_JSON, OUTPUT_FORMAT_JSON_LINE]
+COLUMNAR_FORMATS = [OUTPUT_FORMAT_ARROW, OUTPUT_FORMAT_PARQUET]
+OUTPUT_FORMATS = JSON_FORMATS + COLUMNAR_FORMATS
+
+ENGINE_AUTO = 'auto'
+ENGINE_JSON = 'json'
+ENGINE_ORJSON = 'orjson'
+ENGINE_UJSON = 'ujson'
+ENGINES = [ENGINE_AUTO, ENGINE_JSON, ENGINE_ORJSON, ENGINE_UJSON]
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSIONS = [COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD]
+
+
+class JSONSerializer:
+    """Serialize items to JSON documents.
+
+    Items can be serialized as indented JSON documents or as JSON
+    lines, one compact document per line. By default, keys are
+    sorted only in indented documents.
+
+    JSON lines are encoded using the fastest library available
+    (`orjson` or `ujson`), when any of them is installed. Set
+    `engine` to choose a specific one. When a fast library is not
+    able to encode an item (e.g., strings with surrogate escapes),
+    the standard library is used for that item. Every engine
+    produces the same JSON lines, following `orjson`: non-ASCII
+    characters are not escaped and non-finite floats (NaN and
+    Infinity) are encoded as `null`. Only items with surrogate
+    escapes, which are not valid UTF-8, are escaped as ASCII.
+
+    Indented documents are always encoded with the standard library,
+    escaping non-ASCII characters and writing non-finite floats as
+    `NaN` and `Infinity`, as in previous versions.
+
+    :param json_line: produce a compact JSON document per line
+    :param sort_keys: sort the keys of the documents; when `None`,
+        keys are sorted only in indented documents
+    :param engine: library used to encode JSON lines (`auto`,
+        `json`, `orjson` or `ujson`)
+
+    :raises ValueError: when the engine is unknown or it is not installed
+    """
+    def __init__(self, json_line=False, sort_keys=None, engine=ENGINE_AUTO):
+        self.json_line = json_line
+        self.sort_keys = (not json_line) if sort_keys is None else sort_keys
+        self.engine = self._select_engine(engine) if json_line else ENGINE_JSON
+
+        if self.engine == ENGINE_ORJSON:
+            self._fast_dumps = self._orjson_dumps
+        elif self.engine == ENGINE_UJSON:
+            self._fast_dumps = self._ujson_dumps
+        else:
+            self._fast_dumps = None
+
+    @classmethod
+    def from_format(cls, output_format, sort_keys=None, engine=ENGINE_AUTO):
+        """Create a serializer for one of the output formats.
+
+        :param output_format: one of `JSON_FORMATS`
+        :param sort_keys: sort the keys of the documents
+        :param engine: library used to encode JSON lines
+
+        :raises ValueError: when the output format is not supported
+        """
+        if output_format not in JSON_FORMATS:
+            raise ValueError("unknown output format %s" % output_format)
+
+        json_line = output_format == OUTPUT_FORMAT_JSON_LINE
+        return cls(json_line=json_line, sort_keys=sort_keys, engine=engine)
+
+    def dumps(self, item):
+        """Serialize an item to a JSON string, ending with a new line."""
+
+        return self.encode(item) + '\n'
+
+    def encode(self, item):
+        """Serialize an item to a JSON string."""
+
+        if self._fast_dumps:
+            try:
+                return self._fast_dumps(item)
+            except (TypeError, ValueError, OverflowError):
+                pass
+
+        if self.json_line:
+            return self._json_dumps(item)
+        else:
+            return json.dumps(item, indent=4, sort_keys=self.sort_keys)
+
+    def _json_dumps(self, item):
+        try:
+            doc = json.dumps(item, separators=(',', ':'), sort_keys=self.sort_keys,
+                             ensure_ascii=False, allow_nan=False)
+        except ValueError:
+            item = _replace_non_finite(item)
+            doc = json.dumps(item, separators=(',', ':'), sort_keys=self.sort_keys,
+                             ensure_ascii=False)
+
+        try:
+            doc.encode('utf-8')
+        except UnicodeEncodeError:
+            doc = json.dumps(item, separators=(',', ':'), sort_keys=self.sort_keys)
+
+        return doc
+
+    def _orjson_dumps(self, item):
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        return orjson.dumps(item, option=option).decode('utf-8')
+
+    def _ujson_dumps(self, item):
+        doc = ujson.dumps(item, sort_keys=self.sort_keys, ensure_ascii=False,
+                          escape_forward_slashes=False, allow_nan=False)
+
+        # Surrogate escapes are written as they are; raising the
+        # error, the item is encoded with the standard library
+        doc.encode('utf-8')
+
+        return doc
+
+    @staticmethod
+    def _select_engine(engine):
+        if engine not in ENGINES:
+            raise ValueError("unknown JSON engine %s" % engine)
+
+        available = {
+            ENGINE_JSON: True,
+            ENGINE_ORJSON: orjson is not None,
+            ENGINE_UJSON: ujson is not None
+        }
+
+        if engine == ENGINE_AUTO:
+            for candidate in [ENGINE_ORJSON, ENGINE_UJSON, ENGINE_JSON]:
+                if available[candidate]:
+                    return candidate
+        elif not available[engine]:
+            raise ValueError("JSON engine %s is not installed" % engine)
+
+        return engine
+
+
+class ItemWriter:
+    """Write serialized items to a file using large writes.
+
+    Serialized items are kept in a buffer until it reaches
+    `buffer_size` characters. Then, the whole buffer is written
+    at once. Call `flush` to write the pending items or use the
+    object as a context manager.
+
+    :param outfile: file object where items will be written
+    :param serializer: object to serialize the items; by default
+        a `JSONSerializer` producing indented documents
+    :param buffer_size: number of characters to buffer before writing
+    """
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, outfile, serializer=None, buffer_size=BUFFER_SIZE):
+        self.outfile = outfile
+        self.serializer = serializer or JSONSerializer()
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def write(self, item):
+        """Serialize and buffer an item."""
+
+        obj = self.serializer.dumps(item)
+
+        self._buffer.append(obj)
+        self._buffered += len(obj)
+
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered items to the file."""
+
+        if self._buffer:
+            self.outfile.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+        self.outfile.flush()
+
+
+class ShardedItemWriter:
+    """Write serialized items to a set of compressed files.
+
+    Items are written to files, or shards, stored under `dirpath`.
+    A new shard is started when the current one has `shard_size`
+    items or when writing the next item would make it larger than
+    `shard_bytes` bytes of uncompressed data. When none of these
+    limits is set, all the items are written to the same shard.
+
+    Shards can be compressed with `gzip` or `zstd`; the latter
+    requires the `zstandard` package. They are named after `prefix`,
+    followed by the number of shard and the extension of the format
+    (e.g, `items-00003.jsonl.gz`). While a shard is being written,
+    the suffix `.part` is added to its name, so readers only find
+    complete shards in the directory. Shards written before with the
+    same prefix are removed when the writer is created, so they are
+    not mixed with the new ones.
+
+    The paths of the completed shards are available in `shards`.
+    Call `close` to finish the last shard, or `abort` to discard it
+    when the items could not be written. When the object is used as
+    a context manager, the last shard is discarded if an exception
+    is raised.
+
+    :param dirpath: directory where shards will be written
+    :param serializer: object to serialize the items; by default
+        a `JSONSerializer` producing JSON lines
+    :param compression: compression of the shards (`none`, `gzip`
+        or `zstd`)
+    :param shard_size: maximum number of items per shard
+    :param shard_bytes: maximum number of uncompressed bytes per shard
+    :param prefix: prefix of the names of the shards
+    :param buffer_size: number of bytes to buffer before writing
+
+    :raises ValueError: when the compression is unknown or it is
+        not available, or the shard limits are not positive
+    """
+    BUFFER_SIZE = ItemWriter.BUFFER_SIZE
+    PART_SUFFIX = '.part'
+
+    def __init__(self, dirpath, serializer=None, compression=COMPRESSION_NONE,
+                 shard_size=None, shard_bytes=None, prefix='items',
+                 buffer_size=BUFFER_SIZE):
+        if compression not in COMPRESSIONS:
+            raise ValueError("unknown compression %s" % compression)
+        if compression == COMPRESSION_ZSTD and not zstandard:
+            raise ValueError("zstd compression requires 'zstandard' package")
+        if shard_size is not None and shard_size < 1:
+            raise ValueError("shard size must be greater than 0; %s given" % shard_size)
+        if shard_bytes is not None and shard_bytes < 1:
+            raise ValueError("shard bytes must be greater than 0; %s given" % shard_bytes)
+
+        self.dirpath = dirpath
+        self.serializer = serializer or JSONSerializer(json_line=True)
+        self.compression = compression
+        self.shard_size = shard_size
+        self.shard_bytes = shard_bytes
+        self.prefix = prefix
+        self.buffer_size = buffer_size
+        self.shards = []
+
+        self._fd = None
+        self._index = 0
+        self._items = 0
+        self._bytes = 0
+        self._buffer = []
+        self._buffered = 0
+
+        os.makedirs(self.dirpath, exist_ok=True)
+        self._remove_shards()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+    def write(self, item):
+        """Serialize and write an item, starting a new shard when needed."""
+
+        obj = self.serializer.dumps(item).encode('utf-8')
+
+        if self._fd and self._is_full(len(obj)):
+            self._close_shard()
+        if not self._fd:
+            self._open_shard()
+
+        self._buffer.append(obj)
+        self._buffered += len(obj)
+        self._items += 1
+        self._bytes += len(obj)
+
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered items to the current shard."""
+
+        if self._buffer:
+            self._fd.write(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def close(self):
+        """Finish the current shard."""
+
+        if self._fd:
+            self._close_shard()
+
+    def abort(self):
+        """Discard the current shard, which is left incomplete."""
+
+        if not self._fd:
+            return
+
+        self._buffer = []
+        self._buffered = 0
+        self._fd.close()
+        self._fd = None
+
+        os.remove(self._shard_path(self._index) + self.PART_SUFFIX)
+
+    @property
+    def extension(self):
+        """Extension of the names of the shards"""
+
+        ext = '.jsonl' if self.serializer.json_line else '.json'
+
+        if self.compression == COMPRESSION_GZIP:
+            ext += '.gz'
+        elif self.compression == COMPRESSION_ZSTD:
+            ext += '.zst'
+
+        return ext
+
+    def _is_full(self, nbytes):
+        if self.shard_size and self._items >= self.shard_size:
+            return True
+        if self.shard_bytes and self._bytes + nbytes > self.shard_bytes:
+            return True
+        return False
+
+    def _remove_shards(self):
+        """Remove the shards, complete or not, written before with the same prefix"""
+
+        regex = re.compile(r'^' + re.escape(self.prefix) + r'-\d{5,}\.jsonl?(\.gz|\.zst)?(' +
+                           re.escape(self.PART_SUFFIX) + r')?$')
+
+        for filename in os.listdir(self.dirpath):
+            if regex.match(filename):
+                os.remove(os.path.join(self.dirpath, filename))
+
+    def _shard_path(self, index):
+        filename = "%s-%05d%s" % (self.prefix, index, self.extension)
+        return os.path.join(self.dirpath, filename)
+
+    def _open_shard(self):
+        path = self._shard_path(self._index) + self.PART_SUFFIX
+
+        if self.compression == COMPRESSION_GZIP:
+            self._fd = gzip.open(path, 'wb')
+        elif self.compression == COMPRESSION_ZSTD:
+            self._fd = zstandard.open(path, 'wb')
+        else:
+            self._fd = open(path, 'wb')
+
+        self._items = 0
+        self._bytes = 0
+
+    def _close_shard(self):
+        self.flush()
+        self._fd.close()
+        self._fd = None
+
+        path = self._shard_path(self._index)
+        os.replace(path + self.PART_SUFFIX, path)
+
+        self.shards.append(path)
+        self._index += 1
+
+        logger.debug("Shard %s completed with %s items", path, self._items)
+
+
+class ColumnarItemWriter:
+    """Write items to a file using a columnar format.
+
+    Items are written to Arrow IPC files or Parquet files, in record
+    batches of `batch_size` items. Each batch is stored as a row
+    group in Parquet files, so readers can skip those batches whose
+    statistics do not match a filter (e.g, a range of `updated_on`).
+
+    Metadata fields are stored in typed columns; `timestamp` and
+    `updated_on` are stored as UTC timestamps. The fields that
+    depend on the backend, `search_fields` and `data`, are stored
+    as JSON strings. The schema of the columns is available in
+    the attribute `schema`.
+
+    When `outfile` is a text file, items are written to its binary
+    buffer. The file is not closed by this object. Call `close` to
+    write the pending items and finish the file, or use the object
+    as a context manager. This writer requires the `pyarrow` package.
+
+    :param outfile: file object where items will be written
+    :param output_format: one of `COLUMNAR_FORMATS`
+    :param batch_size: number of items per record batch
+
+    :raises ValueError: when the output format is not supported
+        or `pyarrow` is not installed
+    """
+    BATCH_SIZE = 10000
+
+    def __init__(self, outfile, output_format=OUTPUT_FORMAT_PARQUET,
+                 batch_size=BATCH_SIZE):
+        if output_format not in COLUMNAR_FORMATS:
+            raise ValueError("unknown columnar format %s" % output_format)
+
+        pyarrow = _import_pyarrow()
+
+        if not pyarrow:
+            raise ValueError("%s format requires 'pyarrow' package" % output_format)
+
+        if hasattr(outfile, 'buffer'):
+            outfile.flush()
+            outfile = outfile.buffer
+
+        self.outfile = outfile
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.serializer = JSONSerializer(json_line=True, sort_keys=False)
+        self._pyarrow = pyarrow
+        self.schema = self._items_schema()
+
+        self._writer = None
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _items_schema(self):
+        """Schema of the columns written by this class"""
+
+        pyarrow = self._pyarrow
+        timestamp = pyarrow.timestamp('us', tz='UTC')
+
+        return pyarrow.schema([
+            ('backend_name', pyarrow.string()),
+            ('backend_version', pyarrow.string()),
+            ('perceval_version', pyarrow.string()),
+            ('timestamp', timestamp),
+            ('origin', pyarrow.string()),
+            ('uuid', pyarrow.string()),
+            ('updated_on', timestamp),
+            ('classified_fields_filtered', pyarrow.list_(pyarrow.string())),
+            ('category', pyarrow.string()),
+            ('search_fields', pyarrow.string()),
+            ('tag', pyarrow.string()),
+            ('data', pyarrow.string())
+        ])
+
+    def write(self, item):
+        """Buffer an item, writing a record batch when it is full."""
+
+        self._rows.append(item)
+
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered items as a record batch."""
+
+        if not self._rows:
+            return
+
+        if not self._writer:
+            self._writer = self._open_writer()
+
+        self._writer.write_batch(self._record_batch(self._rows))
+        self._rows = []
+
+    def close(self):
+        """Write the pending items and finish the file."""
+
+        self.flush()
+
+        # Files without items still have a schema
+        if not self._writer:
+            self._writer = self._open_writer()
+
+        self._writer.close()
+
+    def _open_writer(self):
+        if self.output_format == OUTPUT_FORMAT_PARQUET:
+            return self._pyarrow.parquet.ParquetWriter(self.outfile, self.schema)
+        else:
+            return self._pyarrow.ipc.new_file(self.outfile, self.schema)
+
+    def _record_batch(self, items):
+        encode = self.serializer.encode
+
+        columns = {
+            'backend_name': [item['backend_name'] for item in items],
+            'backend_version': [item['backend_version'] for item in items],
+            'perceval_version': [item['perceval_version'] for item in items],
+            'timestamp': [_to_microseconds(item['timestamp']) for item in items],
+            'origin': [item['origin'] for item in items],
+            'uuid': [item['uuid'] for item in items],
+            'updated_on': [_to_microseconds(item['updated_on']) for item in items],
+            'classified_fields_filtered': [item['classified_fields_filtered'] for item in items],
+            'category': [item['category'] for item in items],
+            'search_fields': [encode(item['search_fields']) for item in items],
+            'tag': [item['tag'] for item in items],
+            'data': [encode(item['data']) for item in items]
+        }
+
+        return self._pyarrow.RecordBatch.from_pydict(columns, schema=self.schema)
+
+
+def _import_pyarrow():
+    """Import `pyarrow` modules; `None` when it is not installed.
+
+    `pyarrow` takes long to import, so it is only imported when
+    a columnar format is used.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+
+    return pyarrow
+
+
+def _replace_non_finite(obj):
+    """Replace NaN and infinite floats by `None`, as `orjson` does"""
+
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    elif isinstance(obj, dict):
+        return {key: _replace_non_finite(value) for key, value in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [_replace_non_finite(value) for value in obj]
+    else:
+        return obj
+
+
+def _to_microseconds(ts):
+    """Convert a POSIX timestamp to microseconds"""
+
+    return None if ts is None else int(round(ts * 1000000))
@@ -35,11 +35,16 @@ import logging
 import sys
 
 import perceval
+import perceval.archive
 import perceval.backend
 import perceval.backends.core
+import perceval.batch
+import perceval.profiling
 
 PERCEVAL_USAGE_MSG = \
-    """%(prog)s [-g] <backend> [<args>] | --help | --version | --list"""
+    """%(prog)s [-g] [--profile] [--trace-malloc] <backend> [<args>] |
+                batch <jobs-file> [<args>] | archive <action> [<args>] |
+                --help | --version | --list"""
 
 PERCEVAL_DESC_MSG = \
     """Send Sir Perceval on a quest to retrieve and gather data from software
@@ -82,11 +87,23 @@ are:
     telegram         Fetch messages from the Telegram server
     twitter          Fetch tweets from the Twitter Search API
 
+Several origins can be fetched in parallel running the 'batch' command
+with a file that has one backend command line per line.
+
+Archives are maintained with the 'archive' command. Run 'archive --help'
+to get the list of available actions.
+
 optional arguments:
   -h, --help            show this help message and exit
   -v, --version         show version
   -g, --debug           set debug mode on
   -l, --list            show available backends
+  --profile             profile the command with cProfile
+  --trace-malloc        trace the memory allocated by the command
+
+Profiling stats are written next to the output: named after the output
+file, inside the output directory or, when items are written to the
+standard output, in the current directory.
 """
 
 PERCEVAL_EPILOG_MSG = \
@@ -96,6 +113,12 @@ PERCEVAL_VERSION_MSG = \
     """%(prog)s """ + perceval.backends.core.__version__
 
 
+# Command to run several backends in parallel
+BATCH_CMD = 'batch'
+
+# Command to maintain the archives
+ARCHIVE_CMD = 'archive'
+
 # Logging formats
 PERCEVAL_LOG_FORMAT = "[%(asctime)s] - %(message)s"
 PERCEVAL_DEBUG_LOG_FORMAT = "[%(asctime)s - %(name)s - %(levelname)s] - %(message)s"
@@ -116,18 +139,33 @@ class ListBackends(argparse.Action):
 
 
 def main():
-    _, PERCEVAL_CMDS = perceval.backend.find_backends(perceval.backends)
+    _, PERCEVAL_CMDS = perceval.backend.find_backends(perceval.backends, lazy=True)
 
     args = parse_args(PERCEVAL_CMDS)
 
-    if args.backend not in PERCEVAL_CMDS:
+    if args.backend not in (BATCH_CMD, ARCHIVE_CMD) and args.backend not in PERCEVAL_CMDS:
         raise RuntimeError("Unknown backend %s" % args.backend)
     configure_logging(args.debug)
 
     logging.info("Sir Perceval is on his quest.")
-    klass = PERCEVAL_CMDS[args.backend]
-    cmd = klass(*args.backend_args, debug=args.debug)
-    cmd.run()
+
+    if args.backend == BATCH_CMD:
+        cmd = perceval.batch.BatchCommand(*args.backend_args,
+                                          commands=PERCEVAL_CMDS,
+                                          debug=args.debug)
+    elif args.backend == ARCHIVE_CMD:
+        cmd = perceval.archive.ArchiveCommand(*args.backend_args,
+                                              debug=args.debug)
+    else:
+        klass = PERCEVAL_CMDS[args.backend]
+        cmd = klass(*args.backend_args, debug=args.debug)
+
+    if args.profile or args.trace_malloc:
+        run_profiled(cmd, args.backend,
+                     profile=args.profile,
+                     trace_malloc=args.trace_malloc)
+    else:
+        cmd.run()
 
     logging.info("Sir Perceval completed his quest.")
 
@@ -151,6 +189,12 @@ def parse_args(perceval_cmds):
                         help=argparse.SUPPRESS)
     parser.add_argument('-l', '--list', backends=perceval_cmds, action=ListBackends,
                         help=argparse.SUPPRESS)
+    parser.add_argument('--profile', dest='profile',
+                        action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--trace-malloc', dest='trace_malloc',
+                        action='store_true',
+                        help=argparse.SUPPRESS)
 
     parser.add_argument('backend', help=argparse.SUPPRESS)
     parser.add_argument('backend_args', nargs=argparse.REMAINDER,
@@ -163,6 +207,29 @@ def parse_args(perceval_cmds):
     return parser.parse_args()
 
 
+def run_profiled(cmd, name, profile=True, trace_malloc=False):
+    """Run a command measuring its time and memory usage.
+
+    The stats are written next to the output of the command,
+    even when the command fails.
+
+    :param cmd: command to run
+    :param name: name of the stats files when the command writes
+        to the standard output
+    :param profile: profile the command with `cProfile`
+    :param trace_malloc: trace the memory allocated by the command
+    """
+    output_dir = getattr(cmd.parsed_args, 'output_dir', None)
+    basepath = perceval.profiling.stats_basepath(getattr(cmd, 'outfile', None),
+                                                 output_dir=output_dir,
+                                                 name='perceval-' + name)
+
+    with perceval.profiling.Profiler(basepath,
+                                     profile=profile,
+                                     trace_malloc=trace_malloc):
+        cmd.run()
+
+
 def configure_logging(debug=False):
     """Configure Perceval logging
 
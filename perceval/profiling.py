@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import tracemalloc
+
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_EXTENSION = '.prof'
+TRACE_MALLOC_EXTENSION = '.malloc.txt'
+
+
+class Profiler:
+    """Profile the code run within a context.
+
+    This context manager measures the time spent by every function
+    using `cProfile` and the memory allocated using `tracemalloc`.
+    When the context exits, even when it was due to an error, the
+    stats are written to files named after `basepath`:
+
+      - `<basepath>.prof`, with the stats of `cProfile`; they can be
+        read with `pstats` or any tool supporting that format
+      - `<basepath>.malloc.txt`, with the peak of memory traced and
+        the lines of code which allocated most of the memory still
+        in use
+
+    :param basepath: path, without extension, of the stats files
+    :param profile: measure the time spent by the functions
+    :param trace_malloc: trace the memory allocations
+    :param top: number of lines of code listed in the memory stats
+    :param nframes: number of frames stored for each memory allocation
+    """
+    TOP = 25
+
+    def __init__(self, basepath, profile=True, trace_malloc=False,
+                 top=TOP, nframes=1):
+        self.basepath = basepath
+        self.profile = profile
+        self.trace_malloc = trace_malloc
+        self.top = top
+        self.nframes = nframes
+        self.files = []
+        self._profiler = None
+
+    @property
+    def profile_path(self):
+        """Path of the `cProfile` stats file"""
+
+        return self.basepath + PROFILE_EXTENSION
+
+    @property
+    def trace_malloc_path(self):
+        """Path of the memory stats file"""
+
+        return self.basepath + TRACE_MALLOC_EXTENSION
+
+    def __enter__(self):
+        if self.trace_malloc:
+            tracemalloc.start(self.nframes)
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        dirpath = os.path.dirname(self.basepath)
+
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+
+        if self._profiler:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+            self._add_file(self.profile_path)
+
+        if self.trace_malloc and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self._write_malloc_stats(snapshot, current, peak)
+            self._add_file(self.trace_malloc_path)
+
+    def _add_file(self, path):
+        self.files.append(path)
+        logger.info("Profiling stats written to %s", path)
+
+    def _write_malloc_stats(self, snapshot, current, peak):
+        """Write the memory allocated by the top lines of code"""
+
+        # Ignore the memory allocated by the profilers themselves
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, pstats.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        stats = snapshot.statistics('lineno')
+
+        with open(self.trace_malloc_path, 'w') as fd:
+            fd.write("Current memory traced: %s bytes\n" % current)
+            fd.write("Peak memory traced: %s bytes\n" % peak)
+            fd.write("Top %s lines allocating memory still in use:\n" % self.top)
+
+            for stat in stats[:self.top]:
+                fd.write("%s\n" % stat)
+
+
+def stats_basepath(outfile=None, output_dir=None, name='perceval'):
+    """Return the base path of the stats files of a command.
+
+    Stats files are written next to the output of the command. When
+    the items are written to a directory, they are written inside that
+    directory using `name`. When they are written to a file, they are
+    named after that file. Otherwise, when the output is the standard
+    output, they are written to the current working directory.
+
+    :param outfile: file object where the items are written
+    :param output_dir: directory where the items are written
+    :param name: name of the files when they cannot be named after
+        the output file
+
+    :returns: path, without extension, of the stats files
+    """
+    if output_dir:
+        return os.path.join(output_dir, name)
+
+    filename = getattr(outfile, 'name', None)
+
+    if outfile in (None, sys.stdout, sys.stderr) or not isinstance(filename, str) \
+            or filename.startswith('<'):
+        return os.path.join(os.getcwd(), name)
+
+    return filename
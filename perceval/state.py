@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import collections
+import logging
+import sqlite3
+
+from grimoirelab_toolkit.datetime import (datetime_utcnow,
+                                          datetime_to_utc,
+                                          str_to_datetime)
+
+from .errors import StateStoreError
+from .utils import sqlite_connect, sqlite_transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+FetchState = collections.namedtuple('FetchState',
+                                    'backend_name origin category '
+                                    'max_updated_on max_offset updated_on')
+"""State of the fetches of a category of items from an origin.
+
+It stores the date of the most recently updated item and the
+highest offset fetched so far, together with the date when the
+state was updated for the last time.
+"""
+
+
+class FetchStateStore:
+    """Store the state of incremental fetches in a SQLite database.
+
+    For each backend, origin and category of items, the store keeps
+    the date of the most recently updated item and the highest
+    offset fetched. Backends that support resuming can use these
+    values to fetch only the items updated since the last time.
+
+    The database is created when it does not exist. A new
+    connection is opened for each operation, so the same file
+    can be shared by several processes.
+
+    :param path: path to the SQLite database
+
+    :raises StateStoreError: when the database cannot be initialized
+    """
+    STATE_TABLE = "fetch_state"
+
+    # Table structure
+    STATE_CREATE_STMT = "CREATE TABLE IF NOT EXISTS " + STATE_TABLE + " ( " \
+                        "backend_name TEXT NOT NULL, " \
+                        "origin TEXT NOT NULL, " \
+                        "category TEXT NOT NULL, " \
+                        "max_updated_on TEXT, " \
+                        "max_offset INTEGER, " \
+                        "updated_on TEXT, " \
+                        "PRIMARY KEY (backend_name, origin, category))"
+
+    def __init__(self, path):
+        self.path = path
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                conn.execute(self.STATE_CREATE_STMT)
+        except sqlite3.DatabaseError as e:
+            msg = "state store %s initialization error; cause: %s" % (self.path, str(e))
+            raise StateStoreError(cause=msg)
+
+    def get(self, backend_name, origin, category):
+        """Get the state of a category of items from an origin.
+
+        :param backend_name: name of the backend
+        :param origin: origin of the items
+        :param category: category of the items
+
+        :returns: a `FetchState` object or `None` when there is
+            no state stored
+
+        :raises StateStoreError: when an error occurs reading the state
+        """
+        select_stmt = "SELECT backend_name, origin, category, " \
+                      "max_updated_on, max_offset, updated_on " \
+                      "FROM " + self.STATE_TABLE + " " \
+                      "WHERE backend_name = ? AND origin = ? AND category = ?"
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                row = conn.execute(select_stmt, (backend_name, origin, category)).fetchone()
+        except sqlite3.DatabaseError as e:
+            msg = "state retrieval error; cause: %s" % str(e)
+            raise StateStoreError(cause=msg)
+
+        return self._to_state(row) if row else None
+
+    def update(self, backend_name, origin, category,
+               max_updated_on=None, max_offset=None):
+        """Update the state of a category of items from an origin.
+
+        New values are merged with the stored ones, so the state
+        never goes backwards. The state is read and written in the
+        same transaction.
+
+        :param backend_name: name of the backend
+        :param origin: origin of the items
+        :param category: category of the items
+        :param max_updated_on: date of the most recently updated item
+        :param max_offset: highest offset of the items
+
+        :returns: the updated `FetchState`
+
+        :raises StateStoreError: when an error occurs updating the state
+        """
+        select_stmt = "SELECT max_updated_on, max_offset " \
+                      "FROM " + self.STATE_TABLE + " " \
+                      "WHERE backend_name = ? AND origin = ? AND category = ?"
+        insert_stmt = "INSERT OR REPLACE INTO " + self.STATE_TABLE + " " \
+                      "(backend_name, origin, category, " \
+                      "max_updated_on, max_offset, updated_on) " \
+                      "VALUES (?, ?, ?, ?, ?, ?)"
+
+        key = (backend_name, origin, category)
+
+        if max_updated_on:
+            max_updated_on = datetime_to_utc(max_updated_on)
+
+        try:
+            with sqlite_connect(self.path) as conn, sqlite_transaction(conn):
+                row = conn.execute(select_stmt, key).fetchone()
+
+                if row:
+                    stored_updated_on = str_to_datetime(row[0]) if row[0] else None
+                    max_updated_on = _max(stored_updated_on, max_updated_on)
+                    max_offset = _max(row[1], max_offset)
+
+                updated_on = datetime_to_utc(datetime_utcnow())
+                state = FetchState(backend_name, origin, category,
+                                   max_updated_on, max_offset, updated_on)
+
+                conn.execute(insert_stmt, self._to_row(state))
+        except sqlite3.DatabaseError as e:
+            msg = "state update error; cause: %s" % str(e)
+            raise StateStoreError(cause=msg)
+
+        logger.debug("Fetch state of %s updated to %s", key, state)
+
+        return state
+
+    def remove(self, backend_name, origin, category):
+        """Remove the state of a category of items from an origin.
+
+        :param backend_name: name of the backend
+        :param origin: origin of the items
+        :param category: category of the items
+
+        :raises StateStoreError: when an error occurs removing the state
+        """
+        delete_stmt = "DELETE FROM " + self.STATE_TABLE + " " \
+                      "WHERE backend_name = ? AND origin = ? AND category = ?"
+
+        try:
+            with sqlite_connect(self.path) as conn:
+                conn.execute(delete_stmt, (backend_name, origin, category))
+        except sqlite3.DatabaseError as e:
+            msg = "state removal error; cause: %s" % str(e)
+            raise StateStoreError(cause=msg)
+
+    @staticmethod
+    def _to_row(state):
+        max_updated_on = state.max_updated_on.isoformat() if state.max_updated_on else None
+
+        return (state.backend_name, state.origin, state.category,
+                max_updated_on, state.max_offset, state.updated_on.isoformat())
+
+    @staticmethod
+    def _to_state(row):
+        backend_name, origin, category, max_updated_on, max_offset, updated_on = row
+
+        max_updated_on = str_to_datetime(max_updated_on) if max_updated_on else None
+        updated_on = str_to_datetime(updated_on) if updated_on else None
+
+        return FetchState(backend_name, origin, category,
+                          max_updated_on, max_offset, updated_on)
+
+
+def _max(a, b):
+    """Maximum of two values, ignoring `None` values"""
+
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
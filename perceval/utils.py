@@ -24,11 +24,13 @@
 #     Harshal Mittal <harshalmittal4@gmail.com>
 #
 
+import contextlib
 import datetime
 import email
 import logging
 import mailbox
 import re
+import sqlite3
 import sys
 
 import xml.etree.ElementTree
@@ -49,6 +51,9 @@ DEFAULT_DATETIME = datetime.datetime(1970, 1, 1, 0, 0, 0,
 DEFAULT_LAST_DATETIME = datetime.datetime(2100, 1, 1, 0, 0, 0,
                                           tzinfo=dateutil.tz.tzutc())
 
+# Seconds to wait for a SQLite database locked by another connection
+SQLITE_TIMEOUT = 30
+
 
 def check_compressed_file_type(filepath):
     """Check if filename is a compressed file supported by the tool.
@@ -271,3 +276,43 @@ def xml_to_dict(raw_xml):
     d = node_to_dict(tree)
 
     return d
+
+
+@contextlib.contextmanager
+def sqlite_connect(path, timeout=SQLITE_TIMEOUT):
+    """Open a connection to a SQLite database, closing it on exit.
+
+    The connection is in autocommit mode, so each statement runs in
+    its own transaction unless `sqlite_transaction` is used. When
+    the database is locked by another connection, statements wait
+    up to `timeout` seconds before failing.
+
+    :param path: path to the SQLite database
+    :param timeout: seconds to wait for a locked database
+    """
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextlib.contextmanager
+def sqlite_transaction(conn):
+    """Run a block of statements in an exclusive write transaction.
+
+    The transaction takes the write lock of the database when it
+    starts, so values read in the block cannot be changed by other
+    connections before they are written. It is committed when the
+    block ends, or rolled back when an exception is raised.
+
+    :param conn: connection opened by `sqlite_connect`
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -23,6 +23,7 @@
 #     Jesus M. Gonzalez-Barahona <jgb@gsyc.es>
 #
 
+import datetime
 import os
 import pickle
 import shutil
@@ -31,12 +32,26 @@ import tempfile
 import unittest
 import unittest.mock
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 import httpretty
 import requests
 
 from grimoirelab_toolkit.datetime import datetime_utcnow, datetime_to_utc
 
-from perceval.archive import Archive, ArchiveManager
+from perceval.archive import (Archive,
+                              ArchiveCatalog,
+                              ArchiveCommand,
+                              ArchiveManager,
+                              ArchivedResponse,
+                              BlobStore,
+                              decode_record,
+                              encode_record,
+                              is_record,
+                              record_blob)
 from perceval.errors import ArchiveError, ArchiveManagerError
 
 
@@ -190,7 +205,8 @@ class TestArchive(unittest.TestCase):
         ds = data_stored[0]
         dr = data_requests[0]
         self.assertEqual(ds[0], '0fa4ce047340780f08efca92f22027514263521d')
-        self.assertEqual(pickle.loads(ds[1]).url, responses[0].url)
+        self.assertTrue(is_record(ds[1]))
+        self.assertEqual(decode_record(ds[1]).url, responses[0].url)
         self.assertEqual(ds[2], dr[0])
         self.assertEqual(pickle.loads(ds[3]), dr[1])
         self.assertEqual(pickle.loads(ds[4]), dr[2])
@@ -198,7 +214,8 @@ class TestArchive(unittest.TestCase):
         ds = data_stored[1]
         dr = data_requests[1]
         self.assertEqual(ds[0], '3879a6f12828b7ac3a88b7167333e86168f2f5d2')
-        self.assertEqual(pickle.loads(ds[1]).url, responses[1].url)
+        self.assertTrue(is_record(ds[1]))
+        self.assertEqual(decode_record(ds[1]).url, responses[1].url)
         self.assertEqual(ds[2], dr[0])
         self.assertEqual(pickle.loads(ds[3]), dr[1])
         self.assertEqual(pickle.loads(ds[4]), dr[2])
@@ -206,7 +223,8 @@ class TestArchive(unittest.TestCase):
         ds = data_stored[2]
         dr = data_requests[2]
         self.assertEqual(ds[0], 'ef38f574a0745b63a056e7befdb7a06e7cf1549b')
-        self.assertEqual(pickle.loads(ds[1]).url, responses[2].url)
+        self.assertTrue(is_record(ds[1]))
+        self.assertEqual(decode_record(ds[1]).url, responses[2].url)
         self.assertEqual(ds[2], dr[0])
         self.assertEqual(pickle.loads(ds[3]), dr[1])
         self.assertEqual(pickle.loads(ds[4]), dr[2])
@@ -256,6 +274,58 @@ class TestArchive(unittest.TestCase):
 
         self.assertEqual(data.url, response.url)
 
+    def test_retrieve_in_order(self):
+        """Test whether entries stored in order are retrieved without hash lookups"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+        archive.init_metadata('http://example.com/', 'MockBackend', '0.1', 'mock', {})
+
+        for i in range(5):
+            archive.store('http://example.com/%s' % i, {'page': i}, None, {'item': i})
+
+        archive = Archive(archive_path)
+        archive.REPLAY_READ_AHEAD = 2
+
+        with unittest.mock.patch.object(Archive, 'make_hashcode') as mock_hashcode:
+            for i in range(5):
+                data = archive.retrieve('http://example.com/%s' % i, {'page': i}, None)
+                self.assertDictEqual(data, {'item': i})
+
+        mock_hashcode.assert_not_called()
+
+    def test_retrieve_out_of_order(self):
+        """Test whether entries are retrieved when they are not requested in order"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+        archive.init_metadata('http://example.com/', 'MockBackend', '0.1', 'mock', {})
+
+        for i in range(5):
+            archive.store('http://example.com/%s' % i, {'page': i}, None, {'item': i})
+
+        archive = Archive(archive_path)
+        archive.REPLAY_READ_AHEAD = 2
+
+        # Entries are searched by their hash code on a mismatch
+        data = archive.retrieve('http://example.com/2', {'page': 2}, None)
+        self.assertDictEqual(data, {'item': 2})
+
+        data = archive.retrieve('http://example.com/0', {'page': 0}, None)
+        self.assertDictEqual(data, {'item': 0})
+
+        # Same URI but different payload
+        with self.assertRaisesRegex(ArchiveError, "not found in archive"):
+            _ = archive.retrieve('http://example.com/1', {'page': 2}, None)
+
+        # Replay continues after the last entry found
+        with unittest.mock.patch.object(Archive, 'make_hashcode') as mock_hashcode:
+            for i in range(1, 5):
+                data = archive.retrieve('http://example.com/%s' % i, {'page': i}, None)
+                self.assertDictEqual(data, {'item': i})
+
+        mock_hashcode.assert_not_called()
+
     def test_retrieve_missing(self):
         """Test whether the retrieval of non archived data throws an error
 
@@ -269,6 +339,231 @@ class TestArchive(unittest.TestCase):
         with self.assertRaisesRegex(ArchiveError, "not found in archive"):
             _ = archive.retrieve("http://wrong", payload={}, headers={})
 
+    def test_writing_options(self):
+        """Test whether writing options are initialized"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+
+        self.assertEqual(archive.commit_every, 1)
+        self.assertIsNone(archive.commit_interval)
+        self.assertFalse(archive.wal)
+
+        archive = Archive(archive_path, commit_every=10, commit_interval=5.0, wal=True)
+
+        self.assertEqual(archive.commit_every, 10)
+        self.assertEqual(archive.commit_interval, 5.0)
+        self.assertTrue(archive.wal)
+
+    def test_store_commit_every(self):
+        """Test whether stored data is committed in batches"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path, commit_every=2)
+
+        archive.store("https://example.com/", {'page': 1}, {}, 'page 1')
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 0)
+
+        # Pending data is visible for the archive itself
+        data = archive.retrieve("https://example.com/", {'page': 1}, {})
+        self.assertEqual(data, 'page 1')
+
+        archive.store("https://example.com/", {'page': 2}, {}, 'page 2')
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 2)
+
+        archive.store("https://example.com/", {'page': 3}, {}, 'page 3')
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 2)
+
+        archive.flush()
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 3)
+
+    @unittest.mock.patch('perceval.archive.time.monotonic')
+    def test_store_commit_interval(self, mock_monotonic):
+        """Test whether stored data is committed after some time"""
+
+        mock_monotonic.return_value = 100.0
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path, commit_every=None, commit_interval=10)
+
+        mock_monotonic.return_value = 105.0
+        archive.store("https://example.com/", {'page': 1}, {}, 'page 1')
+        archive.store("https://example.com/", {'page': 2}, {}, 'page 2')
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 0)
+
+        mock_monotonic.return_value = 110.0
+        archive.store("https://example.com/", {'page': 3}, {}, 'page 3')
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 3)
+
+        # Time is counted from the last commit
+        mock_monotonic.return_value = 115.0
+        archive.store("https://example.com/", {'page': 4}, {}, 'page 4')
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 3)
+
+    def test_store_duplicate_pending(self):
+        """Test whether a duplicated entry does not discard pending data"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path, commit_every=10)
+
+        archive.store("https://example.com/", {'page': 1}, {}, 'page 1')
+        archive.store("https://example.com/", {'page': 2}, {}, 'page 2')
+
+        with self.assertRaisesRegex(ArchiveError, "duplicated entry"):
+            archive.store("https://example.com/", {'page': 1}, {}, 'page 1')
+
+        archive.flush()
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 2)
+
+    def test_close(self):
+        """Test whether pending data is committed when the archive is closed"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path, commit_every=None)
+
+        archive.store("https://example.com/", {'page': 1}, {}, 'page 1')
+        archive.close()
+
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 1)
+
+        # Closing or flushing a closed archive does nothing
+        archive.close()
+        archive.flush()
+
+    def test_wal(self):
+        """Test whether the write-ahead log journal is set"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path, wal=True)
+        archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+
+        cursor = archive._db.cursor()
+        cursor.execute("PRAGMA journal_mode")
+        self.assertEqual(cursor.fetchone()[0], 'wal')
+        cursor.close()
+
+        archive.store("https://example.com/", {'page': 1}, {}, 'page 1')
+        nrows = count_number_rows(archive_path, Archive.ARCHIVE_TABLE)
+        self.assertEqual(nrows, 1)
+
+        archive.close()
+
+        archive = Archive(archive_path)
+        data = archive.retrieve("https://example.com/", {'page': 1}, {})
+        self.assertEqual(data, 'page 1')
+
+    @httpretty.activate
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_store_compression(self):
+        """Test whether the bodies of the responses are compressed"""
+
+        body = '{"hey": "there"}' * 100
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/",
+                               body=body,
+                               status=200)
+        response = requests.get("https://example.com/")
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path, compression='zstd')
+        archive.store("https://example.com/", None, None, response)
+
+        db = sqlite3.connect(archive_path)
+        record = db.execute("SELECT data FROM archive").fetchone()[0]
+        db.close()
+
+        self.assertLess(len(record), len(body))
+
+        data = archive.retrieve("https://example.com/", None, None)
+        self.assertEqual(data.text, body)
+
+    def test_unknown_compression(self):
+        """Test whether an exception is raised when the compression is not supported"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+
+        with self.assertRaisesRegex(ArchiveError, "unknown compression gzip"):
+            _ = Archive.create(archive_path, compression='gzip')
+
+        with unittest.mock.patch('perceval.archive.zstandard', None):
+            with self.assertRaisesRegex(ArchiveError, "zstd compression requires 'zstandard' package"):
+                _ = Archive(archive_path, compression='zstd')
+
+    @httpretty.activate
+    def test_convert(self):
+        """Test whether entries stored as pickles are converted to records"""
+
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/",
+                               body='{"hey": "there"}',
+                               status=200)
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/missing",
+                               body='Not found',
+                               status=404)
+
+        response = requests.get("https://example.com/")
+        error = requests.HTTPError("404 Client Error", response=requests.get("https://example.com/missing"))
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+        archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+
+        # Entries stored by older versions
+        entries = [
+            ("https://example.com/", response),
+            ("https://example.com/missing", error),
+            ("https://example.com/other", {'item': 1})
+        ]
+        for uri, data in entries:
+            hashcode = Archive.make_hashcode(uri, None, None)
+            archive._db.execute("INSERT INTO archive (hashcode, uri, payload, headers, data) "
+                                "VALUES (?, ?, ?, ?, ?)",
+                                (hashcode, uri, pickle.dumps(None, 0), pickle.dumps(None, 0),
+                                 pickle.dumps(data, 0)))
+        archive._db.commit()
+
+        # Old entries can be read
+        data = archive.retrieve("https://example.com/", None, None)
+        self.assertNotIsInstance(data, ArchivedResponse)
+        self.assertEqual(data.json(), {"hey": "there"})
+
+        # Small pickles are smaller using the old protocol; they are kept
+        nconverted = archive.convert()
+        self.assertEqual(nconverted, 2)
+
+        db = sqlite3.connect(archive_path)
+        records = [row[0] for row in db.execute("SELECT data FROM archive ORDER BY id")]
+        db.close()
+
+        self.assertTrue(is_record(records[0]))
+        self.assertTrue(is_record(records[1]))
+        self.assertFalse(is_record(records[2]))
+
+        data = archive.retrieve("https://example.com/", None, None)
+        self.assertIsInstance(data, ArchivedResponse)
+        self.assertEqual(data.json(), {"hey": "there"})
+
+        data = archive.retrieve("https://example.com/missing", None, None)
+        self.assertIsInstance(data, requests.HTTPError)
+        self.assertEqual(data.response.status_code, 404)
+
+        data = archive.retrieve("https://example.com/other", None, None)
+        self.assertDictEqual(data, {'item': 1})
+
+        # Converted entries are skipped
+        nconverted = archive.convert()
+        self.assertEqual(nconverted, 0)
+
 
 ARCHIVE_TEST_DIR = 'archivedir'
 
@@ -363,6 +658,99 @@ class TestArchiveManager(unittest.TestCase):
         with self.assertRaisesRegex(ArchiveManagerError, 'archive mockarchive does not exist'):
             manager.remove_archive('mockarchive')
 
+    def test_create_archive_writing_options(self):
+        """Test if the writing options are set in the archives created"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path, commit_every=100,
+                                 commit_interval=30, wal=True)
+
+        self.assertEqual(manager.commit_every, 100)
+        self.assertEqual(manager.commit_interval, 30)
+        self.assertTrue(manager.wal)
+
+        archive = manager.create_archive()
+        self.assertEqual(archive.commit_every, 100)
+        self.assertEqual(archive.commit_interval, 30)
+        self.assertTrue(archive.wal)
+
+    def test_remove_archive_wal(self):
+        """Test if the files of the write-ahead log are removed with the archive"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path, wal=True)
+
+        dt = datetime_utcnow()
+
+        archive = manager.create_archive()
+        archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+        archive.store("https://example.com/", {'page': 1}, {}, 'page 1')
+        self.assertEqual(os.path.exists(archive.archive_path + '-wal'), True)
+
+        # Files created by SQLite are not archives
+        archives = manager.search('https://example.com', 'MockBackend', 'mock', dt)
+        self.assertListEqual(archives, [archive.archive_path])
+
+        manager.remove_archive(archive.archive_path)
+        self.assertEqual(os.path.exists(archive.archive_path), False)
+        self.assertEqual(os.path.exists(archive.archive_path + '-wal'), False)
+        self.assertEqual(os.path.exists(archive.archive_path + '-shm'), False)
+
+    def test_convert_archives(self):
+        """Test if the entries of every archive are converted"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"hey": "there"}'
+
+        paths = []
+        for _ in range(2):
+            archive = manager.create_archive()
+            archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+            archive._db.execute("INSERT INTO archive (hashcode, uri, payload, headers, data) "
+                                "VALUES (?, 'https://example.com', NULL, NULL, ?)",
+                                (Archive.make_hashcode('https://example.com', None, None),
+                                 pickle.dumps(response, 0)))
+            archive.close()
+            paths.append(archive.archive_path)
+
+        # Invalid archives are ignored
+        with open(os.path.join(archive_mng_path, 'invalid'), 'w') as fd:
+            fd.write("Invalid archive file")
+
+        results = manager.convert_archives()
+        self.assertListEqual(sorted(results), sorted([(path, 1) for path in paths]))
+
+        for path in paths:
+            data = Archive(path).retrieve('https://example.com', None, None)
+            self.assertIsInstance(data, ArchivedResponse)
+
+    def test_archive_command(self):
+        """Test whether the archive command converts the archives"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+        archive = manager.create_archive()
+        archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+        archive.close()
+
+        cmd = ArchiveCommand('convert', '--archive-path', archive_mng_path)
+        self.assertEqual(cmd.manager.dirpath, archive_mng_path)
+        self.assertEqual(cmd.parsed_args.compression, 'none')
+
+        results = cmd.run()
+        self.assertListEqual(results, [(archive.archive_path, 0)])
+
+    def test_archive_command_no_action(self):
+        """Test whether the archive command requires an action"""
+
+        with self.assertRaises(SystemExit):
+            with unittest.mock.patch('sys.stderr'):
+                ArchiveCommand('--archive-path', self.test_path)
+
     def test_search(self):
         """Test if a set of archives is found based on the given criteria"""
 
@@ -515,6 +903,944 @@ class TestArchiveManager(unittest.TestCase):
         archives = manager.search('https://example.com', 'bugzilla', 'commit', dt)
         self.assertListEqual(archives, [])
 
+    def test_catalog(self):
+        """Test if the catalog is updated when archives are created and removed"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        self.assertEqual(manager.catalog.catalog_path,
+                         os.path.join(archive_mng_path, 'catalog.db'))
+        self.assertEqual(manager.catalog.exists(), True)
+
+        dt = datetime_utcnow()
+
+        archive = manager.create_archive()
+        self.assertListEqual(manager.catalog.pending(), [archive.archive_path])
+
+        # Metadata is added to the catalog when archives are searched
+        archive.init_metadata('https://example.com', 'git', '0.8', 'commit', {})
+
+        archives = manager.search('https://example.com', 'git', 'commit', dt)
+        self.assertListEqual(archives, [archive.archive_path])
+        self.assertListEqual(manager.catalog.pending(), [])
+
+        archives = manager.catalog.search('https://example.com', 'git', 'commit', dt)
+        self.assertListEqual(archives, [archive.archive_path])
+
+        manager.remove_archive(archive.archive_path)
+
+        archives = manager.catalog.search('https://example.com', 'git', 'commit', dt)
+        self.assertListEqual(archives, [])
+
+    def test_search_build_catalog(self):
+        """Test if the catalog is built when it does not exist"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        dt = datetime_utcnow()
+
+        archive = manager.create_archive()
+        archive.init_metadata('https://example.com', 'git', '0.8', 'commit', {})
+
+        # Remove the catalog, like in trees created by older versions
+        manager.catalog.drop()
+        self.assertEqual(manager.catalog.exists(), False)
+
+        # Invalid archives are not added to the catalog
+        with open(os.path.join(archive_mng_path, 'invalid'), 'w') as fd:
+            fd.write("Invalid archive file")
+
+        archives = manager.search('https://example.com', 'git', 'commit', dt)
+        self.assertListEqual(archives, [archive.archive_path])
+        self.assertEqual(manager.catalog.exists(), True)
+        self.assertEqual(count_number_rows(manager.catalog.catalog_path,
+                                           ArchiveCatalog.CATALOG_TABLE), 1)
+
+    def test_search_catalog_missing_archive(self):
+        """Test if archives removed from the filesystem are removed from the catalog"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        dt = datetime_utcnow()
+
+        archive = manager.create_archive()
+        archive.init_metadata('https://example.com', 'git', '0.8', 'commit', {})
+        archive.close()
+
+        archives = manager.search('https://example.com', 'git', 'commit', dt)
+        self.assertListEqual(archives, [archive.archive_path])
+
+        os.remove(archive.archive_path)
+
+        archives = manager.search('https://example.com', 'git', 'commit', dt)
+        self.assertListEqual(archives, [])
+        self.assertEqual(count_number_rows(manager.catalog.catalog_path,
+                                           ArchiveCatalog.CATALOG_TABLE), 0)
+
+    def test_search_invalid_catalog(self):
+        """Test if archive files are searched when the catalog is invalid"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        dt = datetime_utcnow()
+
+        archive = manager.create_archive()
+        archive.init_metadata('https://example.com', 'git', '0.8', 'commit', {})
+
+        with open(manager.catalog.catalog_path, 'w') as fd:
+            fd.write("Invalid catalog file")
+
+        with self.assertLogs('perceval.archive', level='WARNING') as cm:
+            archives = manager.search('https://example.com', 'git', 'commit', dt)
+        self.assertRegex(cm.output[0], 'Catalog .+ not available')
+        self.assertListEqual(archives, [archive.archive_path])
+
+        # The invalid catalog is removed when it cannot be updated
+        manager.remove_archive(archive.archive_path)
+        self.assertEqual(manager.catalog.exists(), False)
+
+    def test_rebuild_catalog(self):
+        """Test if the catalog is rebuilt from the archives found"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        dt = datetime_utcnow()
+
+        archive = manager.create_archive()
+        archive.init_metadata('https://example.com', 'git', '0.8', 'commit', {})
+
+        # Archives not created by the manager are not in the catalog
+        os.makedirs(os.path.join(archive_mng_path, 'AB'))
+        alt_archive = Archive.create(os.path.join(archive_mng_path, 'AB', 'alt.sqlite3'))
+        alt_archive.init_metadata('https://example.com', 'git', '0.8', 'commit', {})
+
+        archives = manager.search('https://example.com', 'git', 'commit', dt)
+        self.assertListEqual(archives, [archive.archive_path])
+
+        narchives = manager.rebuild_catalog()
+        self.assertEqual(narchives, 2)
+
+        archives = manager.search('https://example.com', 'git', 'commit', dt)
+        self.assertListEqual(archives, [archive.archive_path, alt_archive.archive_path])
+
+    def test_archive_command_rebuild_catalog(self):
+        """Test whether the archive command rebuilds the catalog"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+        archive = manager.create_archive()
+        archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+        archive.close()
+
+        manager.catalog.drop()
+
+        cmd = ArchiveCommand('rebuild-catalog', '--archive-path', archive_mng_path)
+        narchives = cmd.run()
+        self.assertEqual(narchives, 1)
+        self.assertEqual(manager.catalog.exists(), True)
+
+    @httpretty.activate
+    def test_dedup(self):
+        """Test whether identical bodies are stored once by archives with deduplication"""
+
+        body = '{"login": "jsmith"}' * 100
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/users/jsmith",
+                               body=body,
+                               status=200)
+        response = requests.get("https://example.com/users/jsmith")
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path, dedup=True)
+
+        archives = []
+        for _ in range(2):
+            archive = manager.create_archive()
+            archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+            archive.store("https://example.com/users/jsmith", None, None, response)
+            archive.close()
+            archives.append(archive.archive_path)
+
+        blobs_path = manager.blob_store.blobs_path
+        self.assertEqual(blobs_path, os.path.join(archive_mng_path, 'blobs.db'))
+        self.assertEqual(count_number_rows(blobs_path, BlobStore.BLOBS_TABLE), 1)
+
+        # Records only keep a reference to the body
+        db = sqlite3.connect(archives[0])
+        record = db.execute("SELECT data FROM archive").fetchone()[0]
+        db.close()
+
+        self.assertLess(len(record), len(body))
+        self.assertEqual(record_blob(record), BlobStore.make_hashcode(response.content))
+
+        # Archives opened by other means find the blob store
+        archive = Archive(archives[1])
+        data = archive.retrieve("https://example.com/users/jsmith", None, None)
+        self.assertEqual(data.text, body)
+        archive.close()
+
+        # The store is not considered an archive
+        archives_found = manager.search('https://example.com', 'MockBackend', 'mock', None)
+        self.assertListEqual(archives_found, archives)
+
+        # Bodies are removed when they are not referenced
+        manager.remove_archive(archives[0])
+        self.assertEqual(count_number_rows(blobs_path, BlobStore.BLOBS_TABLE), 1)
+
+        archive = Archive(archives[1])
+        data = archive.retrieve("https://example.com/users/jsmith", None, None)
+        self.assertEqual(data.text, body)
+        archive.close()
+
+        manager.remove_archive(archives[1])
+        self.assertEqual(count_number_rows(blobs_path, BlobStore.BLOBS_TABLE), 0)
+
+    @httpretty.activate
+    def test_dedup_duplicated_entry(self):
+        """Test whether bodies of entries not stored are released"""
+
+        body = '{"login": "jsmith"}' * 100
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/users/jsmith",
+                               body=body,
+                               status=200)
+        response = requests.get("https://example.com/users/jsmith")
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path, dedup=True)
+
+        archive = manager.create_archive()
+        archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+        archive.store("https://example.com/users/jsmith", None, None, response)
+
+        with self.assertRaisesRegex(ArchiveError, 'duplicated entry'):
+            archive.store("https://example.com/users/jsmith", None, None, response)
+        archive.close()
+
+        blobs_path = manager.blob_store.blobs_path
+        db = sqlite3.connect(blobs_path)
+        refs = db.execute("SELECT refs FROM blobs").fetchall()
+        db.close()
+
+        self.assertListEqual(refs, [(1,)])
+
+        manager.remove_archive(archive.archive_path)
+        self.assertEqual(count_number_rows(blobs_path, BlobStore.BLOBS_TABLE), 0)
+
+    @httpretty.activate
+    @unittest.mock.patch('perceval.archive.BlobStore.TIMEOUT', 0.1)
+    def test_dedup_concurrent_writers(self):
+        """Test whether archives batching their writes do not lock the shared store"""
+
+        body = '{"login": "jsmith"}' * 100
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/users/jsmith",
+                               body=body,
+                               status=200)
+        response = requests.get("https://example.com/users/jsmith")
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager_a = ArchiveManager(archive_mng_path, dedup=True, commit_every=10)
+        manager_b = ArchiveManager(archive_mng_path, dedup=True, commit_every=10)
+
+        archive_a = manager_a.create_archive()
+        archive_a.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+        archive_b = manager_b.create_archive()
+        archive_b.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', {})
+
+        # Entries are pending in both archives while they write to the store
+        for x in range(3):
+            uri = "https://example.com/users/jsmith?page=%s" % x
+            archive_a.store(uri, None, None, response)
+            archive_b.store(uri, None, None, response)
+
+        archive_a.close()
+        archive_b.close()
+
+        blobs_path = manager_a.blob_store.blobs_path
+        db = sqlite3.connect(blobs_path)
+        refs = db.execute("SELECT refs FROM blobs").fetchall()
+        db.close()
+
+        self.assertListEqual(refs, [(6,)])
+
+        archive = Archive(archive_b.archive_path, blob_store=manager_b.blob_store)
+        data = archive.retrieve("https://example.com/users/jsmith?page=2", None, None)
+        self.assertEqual(data.text, body)
+
+    def test_compact_archives(self):
+        """Test whether the archives of the same fetch are merged"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        params = {'from_date': '2016-01-01'}
+
+        def create_archive(origin, backend_params, entries):
+            archive = manager.create_archive()
+            archive.init_metadata(origin, 'MockBackend', '0.1', 'mock', backend_params)
+            for uri, data in entries:
+                archive.store(uri, None, None, data)
+            archive.close()
+            return archive
+
+        first = create_archive('https://example.com', params,
+                               [('https://example.com/1', 'page 1 v1'),
+                                ('https://example.com/2', 'page 2 v1')])
+        second = create_archive('https://example.com', params,
+                                [('https://example.com/1', 'page 1 v2'),
+                                 ('https://example.com/3', 'page 3 v2')])
+        third = create_archive('https://example.com', params,
+                               [('https://example.com/1', 'page 1 v3')])
+        other_params = create_archive('https://example.com', {'from_date': '2016-01-01', 'branches': ['dev']},
+                                      [('https://example.com/1', 'page 1')])
+        other_origin = create_archive('https://example.org', params,
+                                      [('https://example.org/1', 'page 1')])
+
+        results = manager.compact_archives()
+        self.assertEqual(len(results), 1)
+
+        merged_path, nmerged = results[0]
+        self.assertEqual(nmerged, 3)
+
+        for archive in [first, second, third]:
+            self.assertEqual(os.path.exists(archive.archive_path), False)
+
+        # Metadata of the newest archive is kept
+        merged = Archive(merged_path)
+        self.assertEqual(merged.origin, 'https://example.com')
+        self.assertEqual(merged.backend_params, params)
+        self.assertEqual(merged.created_on, third.created_on)
+
+        # Newest version of each entry is kept
+        self.assertEqual(count_number_rows(merged_path, Archive.ARCHIVE_TABLE), 3)
+        self.assertEqual(merged.retrieve('https://example.com/1', None, None), 'page 1 v3')
+        self.assertEqual(merged.retrieve('https://example.com/2', None, None), 'page 2 v1')
+        self.assertEqual(merged.retrieve('https://example.com/3', None, None), 'page 3 v2')
+        merged.close()
+
+        archives = manager.search('https://example.com', 'MockBackend', 'mock', None)
+        self.assertListEqual(archives, [merged_path, other_params.archive_path])
+
+        archives = manager.search('https://example.org', 'MockBackend', 'mock', None)
+        self.assertListEqual(archives, [other_origin.archive_path])
+
+        # Nothing else to merge
+        results = manager.compact_archives()
+        self.assertListEqual(results, [])
+
+    def test_compact_archives_incremental(self):
+        """Test whether the archives of incremental fetches are merged"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        def create_archive(backend_params, entries):
+            archive = manager.create_archive()
+            archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', backend_params)
+            for uri, data in entries:
+                archive.store(uri, None, None, data)
+            archive.close()
+            return archive
+
+        first = create_archive({'from_date': None, 'to_date': None},
+                               [('https://example.com/?since=none', 'page 1'),
+                                ('https://example.com/users/1', 'user 1 v1')])
+        second = create_archive({'from_date': '2016-02-01', 'to_date': None},
+                                [('https://example.com/?since=2016-02-01', 'page 2'),
+                                 ('https://example.com/users/1', 'user 1 v2')])
+        third = create_archive({'from_date': '2016-03-01', 'to_date': None},
+                               [('https://example.com/?since=2016-03-01', 'page 3')])
+
+        results = manager.compact_archives()
+        self.assertEqual(len(results), 1)
+
+        merged_path, nmerged = results[0]
+        self.assertEqual(nmerged, 3)
+
+        for archive in [first, second, third]:
+            self.assertEqual(os.path.exists(archive.archive_path), False)
+
+        # The parameters of each fetch are kept, in replay order
+        merged = Archive(merged_path)
+        self.assertEqual(merged.created_on, third.created_on)
+        self.assertDictEqual(merged.backend_params, {'from_date': None, 'to_date': None})
+        self.assertListEqual(merged.fetches, [first.backend_params,
+                                              second.backend_params,
+                                              third.backend_params])
+
+        # Entries are stored in replay order, keeping the newest version
+        self.assertEqual(count_number_rows(merged_path, Archive.ARCHIVE_TABLE), 4)
+        self.assertEqual(merged.retrieve('https://example.com/?since=none', None, None), 'page 1')
+        self.assertEqual(merged.retrieve('https://example.com/?since=2016-02-01', None, None), 'page 2')
+        self.assertEqual(merged.retrieve('https://example.com/users/1', None, None), 'user 1 v2')
+        self.assertEqual(merged.retrieve('https://example.com/?since=2016-03-01', None, None), 'page 3')
+        merged.close()
+
+        # A new incremental fetch is merged with the merged archive
+        fourth = create_archive({'from_date': '2016-04-01', 'to_date': None},
+                                [('https://example.com/?since=2016-04-01', 'page 4')])
+
+        results = manager.compact_archives()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1], 2)
+
+        merged = Archive(results[0][0])
+        self.assertListEqual(merged.fetches, [first.backend_params,
+                                              second.backend_params,
+                                              third.backend_params,
+                                              fourth.backend_params])
+        self.assertEqual(count_number_rows(results[0][0], Archive.ARCHIVE_TABLE), 5)
+        merged.close()
+
+    def test_compact_archives_ranges(self):
+        """Test whether the range of a merged archive covers the ranges of its fetches"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        for backend_params in [{'from_date': '2016-02-01', 'offset': 10, 'to_date': '2016-03-01'},
+                               {'from_date': '2016-01-01', 'offset': 20, 'to_date': '2016-04-01'},
+                               {'from_date': '2016-01-01', 'to_date': '2016-02-01'},
+                               {'from_date': '2016-01-01', 'offset': 20, 'to_date': '2016-04-01'}]:
+            archive = manager.create_archive()
+            archive.init_metadata('https://example.com', 'MockBackend', '0.1', 'mock', backend_params)
+            archive.close()
+
+        results = manager.compact_archives()
+        self.assertEqual(len(results), 1)
+
+        merged = Archive(results[0][0])
+        self.assertDictEqual(merged.backend_params,
+                             {'from_date': '2016-01-01', 'offset': None, 'to_date': '2016-04-01'})
+
+        # Fetches with the same parameters are kept once, in the newest position
+        self.assertListEqual(merged.fetches,
+                             [{'from_date': '2016-02-01', 'offset': 10, 'to_date': '2016-03-01'},
+                              {'from_date': '2016-01-01', 'to_date': '2016-02-01'},
+                              {'from_date': '2016-01-01', 'offset': 20, 'to_date': '2016-04-01'}])
+        merged.close()
+
+    @httpretty.activate
+    def test_compact_archives_dedup(self):
+        """Test whether bodies in the blob store are kept after merging archives"""
+
+        body = '{"login": "jsmith"}' * 100
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/users/jsmith",
+                               body=body,
+                               status=200)
+        response = requests.get("https://example.com/users/jsmith")
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path, dedup=True)
+
+        for origin in ['https://example.com', 'https://example.com', 'https://example.org']:
+            archive = manager.create_archive()
+            archive.init_metadata(origin, 'MockBackend', '0.1', 'mock', {})
+            archive.store("https://example.com/users/jsmith", None, None, response)
+            archive.close()
+
+        results = manager.compact_archives(origin='https://example.com')
+        self.assertEqual(len(results), 1)
+
+        merged = Archive(results[0][0])
+        data = merged.retrieve("https://example.com/users/jsmith", None, None)
+        self.assertEqual(data.text, body)
+        merged.close()
+
+        # The body is released once every archive is removed
+        manager.remove_archive(results[0][0])
+        self.assertEqual(count_number_rows(manager.blob_store.blobs_path, BlobStore.BLOBS_TABLE), 1)
+
+        archives = manager.search('https://example.org', 'MockBackend', 'mock', None)
+        manager.remove_archive(archives[0])
+        self.assertEqual(count_number_rows(manager.blob_store.blobs_path, BlobStore.BLOBS_TABLE), 0)
+
+    def test_archive_command_compact(self):
+        """Test whether the archive command merges archives"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        for backend_name in ['MockBackend', 'MockBackend', 'OtherBackend', 'OtherBackend']:
+            archive = manager.create_archive()
+            archive.init_metadata('https://example.com', backend_name, '0.1', 'mock', {})
+            archive.close()
+
+        cmd = ArchiveCommand('compact', '--archive-path', archive_mng_path,
+                             '--backend', 'MockBackend')
+        results = cmd.run()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1], 2)
+
+        archives = manager.search('https://example.com', 'OtherBackend', 'mock', None)
+        self.assertEqual(len(archives), 2)
+
+    def _create_archives(self, manager, archives):
+        """Create archives from a list of (from_date, days ago, backend name) tuples"""
+
+        paths = []
+        now = datetime_utcnow()
+
+        for from_date, days, backend_name in archives:
+            archive = manager.create_archive()
+            archive.init_metadata('https://example.com', backend_name, '0.1', 'mock',
+                                  {'from_date': from_date, 'latest': False},
+                                  created_on=now - datetime.timedelta(days=days))
+            archive.store('https://example.com/%s' % days, None, None, 'x' * 1000)
+            archive.close()
+            paths.append(archive.archive_path)
+
+        return paths
+
+    def test_evict_archives_max_age(self):
+        """Test whether old archives are evicted when newer archives cover their data"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        dt2016 = datetime.datetime(2016, 1, 1, tzinfo=datetime.timezone.utc)
+        dt2017 = datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc)
+
+        archives = self._create_archives(manager, [(dt2016, 100, 'MockBackend'),
+                                                   (dt2016, 50, 'MockBackend'),
+                                                   (dt2017, 10, 'MockBackend'),
+                                                   (dt2016, 90, 'OtherBackend')])
+
+        # The second archive is the only one with data from 2016
+        evicted = manager.evict_archives(max_age=datetime.timedelta(days=30))
+        self.assertListEqual(evicted, [archives[0]])
+
+        found = manager.search('https://example.com', 'MockBackend', 'mock', None)
+        self.assertListEqual(found, [archives[1], archives[2]])
+
+        found = manager.search('https://example.com', 'OtherBackend', 'mock', None)
+        self.assertListEqual(found, [archives[3]])
+
+    def test_evict_archives_keep_last(self):
+        """Test whether only the newest archives are kept"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        archives = self._create_archives(manager, [(None, 30, 'MockBackend'),
+                                                   (None, 20, 'MockBackend'),
+                                                   (None, 10, 'MockBackend'),
+                                                   (None, 5, 'OtherBackend')])
+
+        evicted = manager.evict_archives(keep_last=1)
+        self.assertListEqual(evicted, [archives[0], archives[1]])
+
+        found = manager.search('https://example.com', 'MockBackend', 'mock', None)
+        self.assertListEqual(found, [archives[2]])
+
+        evicted = manager.evict_archives(keep_last=1)
+        self.assertListEqual(evicted, [])
+
+    def test_evict_archives_max_bytes(self):
+        """Test whether the oldest archives are evicted until they take the given bytes"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        archives = self._create_archives(manager, [(None, 30, 'MockBackend'),
+                                                   (None, 20, 'MockBackend'),
+                                                   (None, 10, 'MockBackend')])
+        size = os.path.getsize(archives[0])
+
+        evicted = manager.evict_archives(max_bytes=size * 2)
+        self.assertListEqual(evicted, [archives[0]])
+
+        # The newest archive is never evicted
+        with self.assertLogs('perceval.archive', level='WARNING') as cm:
+            evicted = manager.evict_archives(max_bytes=0)
+        self.assertListEqual(evicted, [archives[1]])
+        self.assertRegex(cm.output[0], 'no more archives can be evicted')
+
+        found = manager.search('https://example.com', 'MockBackend', 'mock', None)
+        self.assertListEqual(found, [archives[2]])
+
+    def test_evict_archives_incremental(self):
+        """Test whether archives of incremental fetches are kept when no newer archive covers them"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        dt2016 = datetime.datetime(2016, 1, 1, tzinfo=datetime.timezone.utc)
+        dt2017 = datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc)
+
+        # Each incremental fetch has the only copy of the data updated since the previous one
+        archives = self._create_archives(manager, [(None, 30, 'MockBackend'),
+                                                   (dt2016, 20, 'MockBackend'),
+                                                   (dt2017, 10, 'MockBackend')])
+
+        with self.assertLogs('perceval.archive', level='WARNING') as cm:
+            evicted = manager.evict_archives(max_bytes=0)
+        self.assertListEqual(evicted, [])
+        self.assertRegex(cm.output[0], 'compact them to save space')
+
+        # A full fetch covers all of them
+        archives += self._create_archives(manager, [(None, 5, 'MockBackend')])
+
+        evicted = manager.evict_archives(max_bytes=0)
+        self.assertListEqual(evicted, archives[:3])
+
+    def test_evict_archives_union(self):
+        """Test whether archives covered by several newer archives together are evicted"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+        now = datetime_utcnow()
+
+        def create_archive(backend_name, days, from_date, to_date, offset=None):
+            archive = manager.create_archive()
+            archive.init_metadata('https://example.com', backend_name, '0.1', 'mock',
+                                  {'from_date': from_date, 'to_date': to_date, 'offset': offset},
+                                  created_on=now - datetime.timedelta(days=days))
+            archive.close()
+            return archive.archive_path
+
+        # Newer windows cover the whole range of the oldest archive
+        covered = create_archive('MockBackend', 30, '2016-01-01', '2016-03-01')
+        create_archive('MockBackend', 20, '2016-02-01', '2016-04-01')
+        create_archive('MockBackend', 10, None, '2016-02-01')
+
+        # There is a gap between the newer windows
+        gap = create_archive('OtherBackend', 30, '2016-01-01', '2016-03-01')
+        create_archive('OtherBackend', 20, '2016-01-01', '2016-02-01')
+        create_archive('OtherBackend', 10, '2016-02-15', None)
+
+        # Newer windows fetched from a later offset
+        offset = create_archive('ThirdBackend', 30, '2016-01-01', '2016-03-01', offset=10)
+        create_archive('ThirdBackend', 20, '2016-01-01', '2016-02-01', offset=10)
+        create_archive('ThirdBackend', 10, '2016-02-01', None, offset=20)
+
+        with self.assertLogs('perceval.archive', level='WARNING'):
+            evicted = manager.evict_archives(max_bytes=0)
+
+        self.assertIn(covered, evicted)
+        self.assertNotIn(gap, evicted)
+        self.assertNotIn(offset, evicted)
+
+    def test_archive_command_prune(self):
+        """Test whether the archive command evicts archives"""
+
+        archive_mng_path = os.path.join(self.test_path, ARCHIVE_TEST_DIR)
+        manager = ArchiveManager(archive_mng_path)
+
+        archives = self._create_archives(manager, [(None, 30, 'MockBackend'),
+                                                   (None, 20, 'MockBackend'),
+                                                   (None, 10, 'MockBackend')])
+
+        cmd = ArchiveCommand('prune', '--archive-path', archive_mng_path,
+                             '--max-age', '15')
+        evicted = cmd.run()
+        self.assertListEqual(evicted, archives[:2])
+
+
+class TestBlobStore(unittest.TestCase):
+    """Unit tests for BlobStore"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def test_put_get(self):
+        """Test whether bodies are stored once and retrieved"""
+
+        store = BlobStore(self.test_path)
+        self.assertEqual(store.exists(), False)
+
+        hashcode = store.put(b'body')
+        self.assertEqual(hashcode, BlobStore.make_hashcode(b'body'))
+        self.assertEqual(store.put(b'body'), hashcode)
+        store.put(b'other body')
+        store.close()
+
+        self.assertEqual(store.exists(), True)
+        self.assertEqual(count_number_rows(store.blobs_path, BlobStore.BLOBS_TABLE), 2)
+
+        store = BlobStore(self.test_path)
+        self.assertEqual(store.get(hashcode), b'body')
+
+        with self.assertRaisesRegex(ArchiveError, "blob 1234 not found"):
+            _ = store.get('1234')
+
+    @unittest.mock.patch('perceval.archive.BlobStore.TIMEOUT', 0.1)
+    def test_concurrent_stores(self):
+        """Test whether several stores write to the same database at the same time"""
+
+        store_a = BlobStore(self.test_path)
+        store_b = BlobStore(self.test_path)
+
+        hashcode = store_a.put(b'body')
+        self.assertEqual(store_b.put(b'body'), hashcode)
+        other = store_b.put(b'other body')
+        store_a.release([other])
+
+        # Bodies are visible to other stores before they are closed
+        self.assertEqual(store_b.get(hashcode), b'body')
+
+        with self.assertRaisesRegex(ArchiveError, "not found"):
+            _ = store_a.get(other)
+
+        store_a.close()
+        store_b.close()
+
+        db = sqlite3.connect(store_a.blobs_path)
+        refs = db.execute("SELECT hashcode, refs FROM blobs").fetchall()
+        db.close()
+
+        self.assertListEqual(refs, [(hashcode, 2)])
+
+    def test_release(self):
+        """Test whether bodies are removed when they are not referenced"""
+
+        store = BlobStore(self.test_path)
+        hashcode = store.put(b'body')
+        store.put(b'body')
+        other = store.put(b'other body')
+
+        store.release([hashcode, other])
+        self.assertEqual(store.get(hashcode), b'body')
+
+        with self.assertRaisesRegex(ArchiveError, "not found"):
+            _ = store.get(other)
+
+        store.release([hashcode])
+
+        with self.assertRaisesRegex(ArchiveError, "not found"):
+            _ = store.get(hashcode)
+
+    def test_not_exists(self):
+        """Test whether bodies cannot be read when the store does not exist"""
+
+        store = BlobStore(self.test_path)
+
+        with self.assertRaisesRegex(ArchiveError, "blob store .+ does not exist"):
+            _ = store.get('1234')
+
+        self.assertEqual(store.exists(), False)
+
+    def test_pickle(self):
+        """Test whether a store can be pickled"""
+
+        store = BlobStore(self.test_path)
+        hashcode = store.put(b'body')
+
+        store = pickle.loads(pickle.dumps(store))
+        self.assertEqual(store.get(hashcode), b'body')
+
+
+class TestRecords(unittest.TestCase):
+    """Unit tests for archive records"""
+
+    @httpretty.activate
+    def test_response(self):
+        """Test whether a response is encoded and decoded"""
+
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/tasks",
+                               body='{"task": "ñandú"}',
+                               adding_headers={'Link': '<https://example.com/tasks?page=2>; rel="next"'},
+                               content_type='application/json; charset=utf-8',
+                               status=200)
+        response = requests.get("https://example.com/tasks", params={'page': 1})
+
+        record = encode_record(response)
+        self.assertTrue(is_record(record))
+
+        data = decode_record(record)
+        self.assertIsInstance(data, ArchivedResponse)
+        self.assertIsInstance(data, requests.Response)
+
+        # Body is not decoded until it is accessed
+        self.assertIs(data._content, False)
+
+        self.assertEqual(data.status_code, 200)
+        self.assertEqual(data.reason, 'OK')
+        self.assertEqual(data.url, response.url)
+        self.assertEqual(data.headers['content-type'], 'application/json; charset=utf-8')
+        self.assertEqual(data.links['next']['url'], 'https://example.com/tasks?page=2')
+        self.assertEqual(data.encoding, response.encoding)
+        self.assertEqual(data.elapsed, response.elapsed)
+        self.assertEqual(data.request.method, 'GET')
+        self.assertEqual(data.request.url, response.url)
+        self.assertEqual(data.content, response.content)
+        self.assertEqual(data.text, '{"task": "ñandú"}')
+        self.assertDictEqual(data.json(), {'task': 'ñandú'})
+        self.assertEqual(b''.join(data.iter_content(4)), response.content)
+        self.assertTrue(data.ok)
+
+        # It can be pickled too
+        data = pickle.loads(pickle.dumps(data))
+        self.assertEqual(data.content, response.content)
+
+    @httpretty.activate
+    def test_response_pickle(self):
+        """Test whether a response is pickled before its content is accessed"""
+
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/tasks",
+                               body='{"task": "ñandú"}',
+                               status=200)
+        response = requests.get("https://example.com/tasks")
+
+        data = decode_record(encode_record(response))
+        self.assertIs(data._content, False)
+
+        data = pickle.loads(pickle.dumps(data))
+        self.assertIsInstance(data, ArchivedResponse)
+        self.assertEqual(data.status_code, 200)
+        self.assertEqual(data.url, response.url)
+        self.assertEqual(data.content, response.content)
+        self.assertDictEqual(data.json(), {'task': 'ñandú'})
+
+    @httpretty.activate
+    def test_response_blob(self):
+        """Test whether large bodies are stored in a blob store"""
+
+        body = '{"task": "ñandú"}' * 100
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/tasks",
+                               body=body,
+                               status=200)
+        response = requests.get("https://example.com/tasks")
+
+        test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.addCleanup(shutil.rmtree, test_path)
+        store = BlobStore(test_path)
+
+        record = encode_record(response, blob_store=store)
+        self.assertEqual(record[5], 2)
+        self.assertEqual(record_blob(record), BlobStore.make_hashcode(response.content))
+
+        data = decode_record(record, blob_store=store)
+        self.assertIsInstance(data, ArchivedResponse)
+        self.assertEqual(data.status_code, 200)
+        self.assertEqual(data.text, body)
+
+        with self.assertRaisesRegex(ArchiveError, "store not given"):
+            _ = decode_record(record)
+
+        # Small bodies are kept in the record
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/small",
+                               body='{"task": 1}',
+                               status=200)
+        response = requests.get("https://example.com/small")
+
+        record = encode_record(response, blob_store=store)
+        self.assertEqual(record[5], 1)
+        self.assertIsNone(record_blob(record))
+        self.assertIsNone(record_blob(pickle.dumps({'item': 1})))
+        self.assertEqual(decode_record(record).text, '{"task": 1}')
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_response_compressed(self):
+        """Test whether the body of a response is compressed"""
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"hey": "there"}' * 100
+
+        record = encode_record(response, compression='zstd')
+        self.assertLess(len(record), len(response.content))
+
+        data = decode_record(record)
+        self.assertEqual(data.content, response.content)
+
+        # Small bodies are not compressed
+        response._content = b'{"hey": "there"}'
+        record = encode_record(response, compression='zstd')
+        self.assertTrue(record.endswith(response.content))
+
+        with unittest.mock.patch('perceval.archive.zstandard', None):
+            record = encode_record(response)
+            self.assertEqual(decode_record(record).content, response.content)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_response_compressed_no_zstandard(self):
+        """Test whether an error is raised decoding a compressed record without zstandard"""
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"hey": "there"}' * 100
+
+        record = encode_record(response, compression='zstd')
+
+        with unittest.mock.patch('perceval.archive.zstandard', None):
+            with self.assertRaisesRegex(ArchiveError, "requires 'zstandard' package"):
+                decode_record(record)
+
+    @httpretty.activate
+    def test_http_error(self):
+        """Test whether an HTTP error is encoded and decoded"""
+
+        httpretty.register_uri(httpretty.GET,
+                               "https://example.com/missing",
+                               body='Not found',
+                               status=404)
+        response = requests.get("https://example.com/missing")
+
+        with self.assertRaises(requests.HTTPError) as ctx:
+            response.raise_for_status()
+
+        record = encode_record(ctx.exception)
+        self.assertTrue(is_record(record))
+
+        error = decode_record(record)
+        self.assertIsInstance(error, requests.HTTPError)
+        self.assertEqual(str(error), str(ctx.exception))
+        self.assertEqual(error.response.status_code, 404)
+        self.assertEqual(error.response.text, 'Not found')
+        self.assertEqual(error.request.url, "https://example.com/missing")
+
+        with self.assertRaises(requests.HTTPError):
+            error.response.raise_for_status()
+
+    def test_other_data(self):
+        """Test whether other data is pickled"""
+
+        for data in [{'item': 1}, 'text', requests.HTTPError("no response"), None]:
+            record = encode_record(data)
+            self.assertFalse(is_record(record))
+
+            decoded = decode_record(record)
+            self.assertEqual(type(decoded), type(data))
+            self.assertEqual(str(decoded), str(data))
+
+    def test_legacy_pickle(self):
+        """Test whether data pickled by older versions is decoded"""
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"hey": "there"}'
+
+        data = decode_record(pickle.dumps(response, 0))
+        self.assertEqual(data.json(), {'hey': 'there'})
+
+    def test_unsupported_version(self):
+        """Test whether an error is raised when the version of the record is not supported"""
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b''
+
+        record = bytearray(encode_record(response))
+        record[5] = 99
+
+        with self.assertRaisesRegex(ArchiveError, "record version 99 not supported"):
+            decode_record(bytes(record))
+
 
 if __name__ == "__main__":
     unittest.main()
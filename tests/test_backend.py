@@ -27,6 +27,8 @@
 
 import argparse
 import datetime
+import gzip
+import importlib
 import io
 import json
 import os
@@ -38,15 +40,25 @@ import unittest.mock
 
 import dateutil.tz
 
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 from grimoirelab_toolkit.datetime import (InvalidDateError,
                                           datetime_utcnow,
                                           str_to_datetime)
 from perceval.backends.core import __version__
 from perceval.archive import Archive, ArchiveManager
-from perceval.backend import (Backend,
+from perceval.backend import (REPLAY_ORDER_ARCHIVE,
+                              REPLAY_ORDER_UPDATED_ON,
+                              Backend,
                               BackendCommandArgumentParser,
                               BackendCommand,
                               BackendItemsGenerator,
+                              BackendRegistry,
                               OriginUniqueField,
                               Summary,
                               uuid,
@@ -54,7 +66,17 @@ from perceval.backend import (Backend,
                               fetch_from_archive,
                               find_backends,
                               logger as backend_logger)
-from perceval.errors import ArchiveError, BackendError, BackendCommandArgumentParserError
+from perceval.client import (HttpCache,
+                             HttpClient,
+                             HttpClientOptions,
+                             RateBudget,
+                             RateLimitHandler)
+from perceval.errors import (ArchiveError,
+                             BackendError,
+                             BackendCommandArgumentParserError,
+                             HttpClientError)
+from perceval.metrics import HttpMetrics
+from perceval.state import FetchStateStore
 from perceval.utils import DEFAULT_DATETIME
 from base import TestCaseBackendArchive
 import mocked_package
@@ -239,6 +261,97 @@ class ErrorCommandBackend(CommandBackend):
             raise BackendError(cause="Unhandled exception")
 
 
+class ResumingBackend(MockedBackend):
+    """Mocked backend which supports resuming from a date or an offset"""
+
+    ITEMS = 5
+
+    def fetch(self, category=MockedBackend.DEFAULT_CATEGORY, from_date=DEFAULT_DATETIME, offset=0):
+        return Backend.fetch(self, category, from_date=from_date, offset=offset)
+
+    def fetch_items(self, category, **kwargs):
+        from_date = kwargs['from_date'].timestamp()
+        offset = kwargs['offset']
+
+        for x in range(self.ITEMS):
+            item = {'item': x, 'offset': x, 'category': category}
+
+            if x >= offset and self.metadata_updated_on(item) >= from_date:
+                yield item
+
+    def metadata(self, item, filter_classified=False):
+        item = super().metadata(item, filter_classified=filter_classified)
+        item['offset'] = item['data']['offset']
+        return item
+
+    @classmethod
+    def has_resuming(cls):
+        return True
+
+
+class ErrorResumingBackend(ResumingBackend):
+    """Resuming backend which raises an exception while fetching items"""
+
+    def fetch_items(self, category, **kwargs):
+        for item in super().fetch_items(category, **kwargs):
+            yield item
+            raise BackendError(cause="Unhandled exception")
+
+
+class InstrumentedBackend(CommandBackend):
+    """Backend which uses a client with metrics"""
+
+    def fetch_items(self, category, **kwargs):
+        for item in super().fetch_items(category, **kwargs):
+            self.client.metrics.record_request('http://example.com/items/%s' % item['item'], 0.5)
+            yield item
+
+    def _init_client(self, from_archive=False):
+        super()._init_client(from_archive=from_archive)
+
+        client = unittest.mock.Mock()
+        client.metrics = HttpMetrics()
+        return client
+
+
+class CachingClient(HttpClient, RateLimitHandler):
+    """Client supporting every HTTP client option"""
+
+    PAGINATION_OPTIONS = ('prefetch_pages', 'page_workers')
+
+    def __init__(self):
+        super().__init__('http://example.com/')
+        self.setup_rate_limit_handler()
+
+
+class CachingBackend(CommandBackend):
+    """Backend which uses a client able to serve items from a cache"""
+
+    def fetch_items(self, category, **kwargs):
+        for x in range(MockedBackend.ITEMS):
+            item = self.client.cache.lookup(str(x), None, None) if self.client.cache else None
+
+            if item:
+                item = dict(item, cached=True)
+            else:
+                item = {'item': x, 'category': category, 'cached': False}
+
+            self.archive.store(str(x), None, None, item)
+            yield item
+
+    def _init_client(self, from_archive=False):
+        super()._init_client(from_archive=from_archive)
+
+        return CachingClient()
+
+
+class HttpBackend(CachingBackend):
+    """Backend which uses a client without rate limits nor pagination options"""
+
+    def _init_client(self, from_archive=False):
+        return HttpClient('http://example.com/')
+
+
 class MockedBackendCommand(BackendCommand):
     """Mocked backend command class used for testing"""
 
@@ -267,6 +380,25 @@ class MockedBackendCommand(BackendCommand):
         return parser
 
 
+class CachingBackendCommand(BackendCommand):
+    """Mocked backend command class supporting HTTP client arguments"""
+
+    BACKEND = CachingBackend
+
+    @classmethod
+    def setup_cmd_parser(cls):
+        parser = BackendCommandArgumentParser(cls.BACKEND,
+                                              from_date=True,
+                                              archive=True,
+                                              http_cache=True,
+                                              rate_limit=True,
+                                              prefetch_pages=True,
+                                              page_workers=True)
+        parser.parser.add_argument('origin')
+
+        return parser
+
+
 class MockedBackendBlacklistCommand(BackendCommand):
     """Mocked backend command class used for testing"""
 
@@ -627,6 +759,34 @@ class TestBackend(unittest.TestCase):
         self.assertEqual(b.archive.origin, b.origin)
         self.assertEqual(b.archive.category, MockedBackend.DEFAULT_CATEGORY)
 
+    def test_fetch_flush_archive(self):
+        """Test whether the data pending in the archive is committed when the fetch ends"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path, commit_every=100)
+        b = MockedBackend('test', archive=archive)
+
+        items = b.fetch()
+        _ = next(items)
+        self.assertEqual(archive._pending, 1)
+
+        _ = [item for item in items]
+        self.assertEqual(archive._pending, 0)
+        self.assertEqual(len(Archive(archive_path).retrieve('4', None, None)), 2)
+
+    def test_fetch_flush_archive_on_error(self):
+        """Test whether the data pending in the archive is committed when the fetch fails"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path, commit_every=100)
+        b = ErrorCommandBackend('test', archive=archive)
+
+        with self.assertRaises(BackendError):
+            _ = [item for item in b.fetch()]
+
+        self.assertEqual(archive._pending, 0)
+        self.assertEqual(Archive(archive_path).retrieve('0', None, None)['item'], 0)
+
     def test_fetch_wrong_category(self):
         """Check that an error is thrown if the category is not valid"""
 
@@ -798,12 +958,9 @@ class TestClassifiedFieldsFiltering(unittest.TestCase):
                 self.assertDictEqual(item['data'], expected)
 
                 # Check logger output
-                # Each classified-field-related message appears after 7 debug messages
-                # because there are other debug messages
-                _num_debug_msgs = 7
                 expected_uuid = uuid('http://example.com/', str(x))
                 exp = "Classified field 'classified_field' not found for item " + expected_uuid
-                self.assertRegex(cm.output[x * _num_debug_msgs + 1], exp)
+                self.assertRegex(cm.output[x], exp)
 
 
 class TestBackendBlacklist(unittest.TestCase):
@@ -913,6 +1070,45 @@ class TestBackendCommandArgumentParser(unittest.TestCase):
 
         self.assertEqual(parsed_args.filter_classified, False)
 
+    def test_parse_output_args(self):
+        """Test if the output arguments are parsed"""
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND)
+
+        parsed_args = parser.parse()
+        self.assertEqual(parsed_args.output_format, 'json')
+        self.assertIsNone(parsed_args.sort_keys)
+        self.assertFalse(parsed_args.json_line)
+
+        args = ['--output-format', 'json-line', '--sort-keys']
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.output_format, 'json-line')
+        self.assertTrue(parsed_args.sort_keys)
+
+        with self.assertRaises(SystemExit):
+            with unittest.mock.patch('sys.stderr', new_callable=io.StringIO):
+                parser.parse('--output-format', 'xml')
+
+        args = ['--output-dir', '/tmp/items', '--shard-size', '100',
+                '--shard-bytes', '1024', '--compression', 'gzip']
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.output_dir, '/tmp/items')
+        self.assertEqual(parsed_args.shard_size, 100)
+        self.assertEqual(parsed_args.shard_bytes, 1024)
+        self.assertEqual(parsed_args.compression, 'gzip')
+
+    def test_incompatible_output_args(self):
+        """Test if an exception is raised when output-dir is not set with sharding args"""
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND)
+
+        for args in [['--shard-size', '100'], ['--shard-bytes', '1024'], ['--compression', 'gzip']]:
+            with self.assertRaisesRegex(AttributeError, "need output-dir to work with"):
+                parser.parse(*args)
+
+        with self.assertRaisesRegex(AttributeError, "output-dir does not support parquet format"):
+            parser.parse('--output-dir', '/tmp/items', '--output-format', 'parquet')
+
     def test_parse_with_aliases(self):
         """Test if a set of aliases is created after parsing"""
 
@@ -1082,6 +1278,150 @@ class TestBackendCommandArgumentParser(unittest.TestCase):
         self.assertEqual(parsed_args.fetch_archive, True)
         self.assertEqual(parsed_args.no_archive, False)
         self.assertEqual(parsed_args.archived_since, expected_dt)
+        self.assertIsNone(parsed_args.archive_commit_every)
+        self.assertIsNone(parsed_args.archive_commit_interval)
+        self.assertFalse(parsed_args.archive_wal)
+        self.assertFalse(parsed_args.archive_dedup)
+        self.assertIsNone(parsed_args.replay_workers)
+        self.assertEqual(parsed_args.replay_order, REPLAY_ORDER_ARCHIVE)
+        self.assertIsNone(parsed_args.archive_cache_since)
+
+    def test_parse_http_cache_args(self):
+        """Test if HTTP cache arguments are parsed"""
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND,
+                                              http_cache=True)
+
+        parsed_args = parser.parse()
+        self.assertIsNone(parsed_args.http_cache)
+        self.assertEqual(parsed_args.http_cache_max_bytes, HttpCache.DEFAULT_MAX_BYTES)
+
+        parsed_args = parser.parse('--http-cache', '/tmp/http_cache',
+                                   '--http-cache-max-bytes', '1024')
+        self.assertEqual(parsed_args.http_cache, '/tmp/http_cache')
+        self.assertEqual(parsed_args.http_cache_max_bytes, 1024)
+
+        with self.assertRaises(AttributeError):
+            _ = parser.parse('--http-cache', '/tmp/http_cache',
+                             '--http-cache-max-bytes', '0')
+
+    def test_parse_rate_budget_args(self):
+        """Test if the rate budget argument is parsed"""
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND,
+                                              rate_limit=True)
+
+        parsed_args = parser.parse()
+        self.assertIsNone(parsed_args.rate_budget)
+        self.assertFalse(parsed_args.pace_requests)
+
+        parsed_args = parser.parse('--rate-budget', '/tmp/budget', '--pace-requests')
+        self.assertEqual(parsed_args.rate_budget, '/tmp/budget')
+        self.assertTrue(parsed_args.pace_requests)
+
+    def test_parse_page_workers_args(self):
+        """Test if the prefetch pages and page workers arguments are parsed"""
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND,
+                                              prefetch_pages=True,
+                                              page_workers=True)
+
+        parsed_args = parser.parse()
+        self.assertEqual(parsed_args.prefetch_pages, 0)
+        self.assertEqual(parsed_args.page_workers, 1)
+
+        parsed_args = parser.parse('--prefetch-pages', '2', '--page-workers', '4')
+        self.assertEqual(parsed_args.prefetch_pages, 2)
+        self.assertEqual(parsed_args.page_workers, 4)
+
+        with self.assertRaises(AttributeError):
+            _ = parser.parse('--prefetch-pages', '-1')
+
+        with self.assertRaises(AttributeError):
+            _ = parser.parse('--page-workers', '0')
+
+    def test_http_client_args_not_set(self):
+        """Test if HTTP client arguments are only set when they are enabled"""
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND)
+
+        parsed_args = parser.parse()
+        for arg in ['http_cache', 'http_cache_max_bytes', 'rate_budget',
+                    'pace_requests', 'prefetch_pages', 'page_workers']:
+            self.assertNotIn(arg, parsed_args)
+
+        with self.assertRaises(SystemExit):
+            with unittest.mock.patch('sys.stderr'):
+                _ = parser.parse('--http-cache', '/tmp/http_cache')
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND,
+                                              prefetch_pages=True)
+
+        parsed_args = parser.parse()
+        self.assertEqual(parsed_args.prefetch_pages, 0)
+        for arg in ['http_cache', 'rate_budget', 'page_workers']:
+            self.assertNotIn(arg, parsed_args)
+
+    def test_parse_archive_cache_args(self):
+        """Test if the archive cache argument is parsed"""
+
+        args = ['--archive-path', '/tmp/archive',
+                '--archive-cache-since', '2016-01-01']
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND,
+                                              archive=True)
+        parsed_args = parser.parse(*args)
+
+        expected_dt = datetime.datetime(2016, 1, 1, 0, 0,
+                                        tzinfo=dateutil.tz.tzutc())
+        self.assertEqual(parsed_args.archive_cache_since, expected_dt)
+
+        args = ['--archive-cache-since', '2016-01-01', '--no-archive']
+        with self.assertRaises(AttributeError):
+            _ = parser.parse(*args)
+
+        args = ['--archive-cache-since', '2016-01-01',
+                '--fetch-archive', '--category', 'mocked']
+        with self.assertRaises(AttributeError):
+            _ = parser.parse(*args)
+
+    def test_parse_archive_replay_args(self):
+        """Test if archive replay arguments are parsed"""
+
+        args = ['--archive-path', '/tmp/archive',
+                '--fetch-archive', '--category', 'mocked',
+                '--replay-workers', '4',
+                '--replay-order', 'updated_on']
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND,
+                                              archive=True)
+        parsed_args = parser.parse(*args)
+
+        self.assertEqual(parsed_args.replay_workers, 4)
+        self.assertEqual(parsed_args.replay_order, REPLAY_ORDER_UPDATED_ON)
+
+        args = ['--fetch-archive', '--category', 'mocked',
+                '--replay-workers', '0']
+
+        with self.assertRaisesRegex(AttributeError, 'replay-workers'):
+            _ = parser.parse(*args)
+
+    def test_parse_archive_writing_args(self):
+        """Test if archive writing arguments are parsed"""
+
+        args = ['--archive-path', '/tmp/archive',
+                '--archive-commit-every', '100',
+                '--archive-commit-interval', '2.5',
+                '--archive-wal', '--archive-dedup']
+
+        parser = BackendCommandArgumentParser(MockedBackendCommand.BACKEND,
+                                              archive=True)
+        parsed_args = parser.parse(*args)
+
+        self.assertEqual(parsed_args.archive_commit_every, 100)
+        self.assertEqual(parsed_args.archive_commit_interval, 2.5)
+        self.assertTrue(parsed_args.archive_wal)
+        self.assertTrue(parsed_args.archive_dedup)
 
     def test_incompatible_fetch_archive_and_no_archive(self):
         """Test if fetch-archive and no-archive arguments are incompatible"""
@@ -1228,6 +1568,20 @@ class TestBackendCommand(unittest.TestCase):
         self.assertIsInstance(manager, ArchiveManager)
         self.assertEqual(os.path.exists(manager.dirpath), True)
         self.assertEqual(manager.dirpath, self.test_path)
+        self.assertEqual(manager.commit_every, 1)
+        self.assertIsNone(manager.commit_interval)
+        self.assertFalse(manager.wal)
+
+        # Writes are only batched by time when no number of requests is given
+        args = ['--archive-commit-interval', '10', '--archive-wal',
+                '--output', self.fout_path, 'http://example.com/']
+
+        cmd = MockedBackendCommand(*args)
+
+        manager = cmd.archive_manager
+        self.assertIsNone(manager.commit_every)
+        self.assertEqual(manager.commit_interval, 10)
+        self.assertTrue(manager.wal)
 
         # Due to '--no-archive' is given, Archive Manager isn't set
         args = ['-u', 'jsmith', '-p', '1234', '-t', 'abcd',
@@ -1462,6 +1816,136 @@ class TestBackendCommand(unittest.TestCase):
             self.assertEqual(item['category'], MockedBackend.DEFAULT_CATEGORY)
             self.assertEqual(item['classified_fields_filtered'], None)
 
+    def test_state_file(self):
+        """Test whether a state store is created when a state file is given"""
+
+        state_path = os.path.join(self.test_path, 'state.sqlite3')
+        args = ['--no-archive', '--state-file', state_path, 'http://example.com/']
+
+        cmd = MockedBackendCommand(*args)
+        backend_args, _, kwargs = cmd._items_generator_args()
+
+        self.assertNotIn('state_file', backend_args)
+        self.assertIsInstance(kwargs['state_store'], FetchStateStore)
+        self.assertEqual(kwargs['state_store'].path, state_path)
+
+        cmd = MockedBackendCommand('--no-archive', 'http://example.com/')
+        _, _, kwargs = cmd._items_generator_args()
+        self.assertIsNone(kwargs['state_store'])
+
+    def test_client_options(self):
+        """Test whether the HTTP client arguments are bundled in the client options"""
+
+        args = ['--no-archive',
+                '--http-cache', os.path.join(self.test_path, 'http_cache'),
+                '--http-cache-max-bytes', '1024',
+                '--rate-budget', os.path.join(self.test_path, 'budget'),
+                '--pace-requests', '--prefetch-pages', '2', '--page-workers', '4',
+                'http://example.com/']
+
+        cmd = CachingBackendCommand(*args)
+        backend_args, _, kwargs = cmd._items_generator_args()
+
+        for arg in ['http_cache', 'http_cache_max_bytes', 'rate_budget',
+                    'pace_requests', 'prefetch_pages', 'page_workers']:
+            self.assertNotIn(arg, backend_args)
+
+        options = kwargs['client_options']
+        self.assertIsInstance(options, HttpClientOptions)
+        self.assertIsNone(options.archive_cache)
+        self.assertIsInstance(options.http_cache, HttpCache)
+        self.assertEqual(options.http_cache.max_bytes, 1024)
+        self.assertIsInstance(options.rate_budget, RateBudget)
+        self.assertTrue(options.pace_requests)
+        self.assertEqual(options.prefetch_pages, 2)
+        self.assertEqual(options.page_workers, 4)
+
+        # Commands without HTTP client arguments set no options
+        cmd = MockedBackendCommand('--no-archive', 'http://example.com/')
+        _, _, kwargs = cmd._items_generator_args()
+        self.assertFalse(any(kwargs['client_options']))
+
+    def test_run_output_format(self):
+        """Test run method with --output-format and --sort-keys"""
+
+        args = ['--no-archive', '--from-date', '2015-01-01', '--tag', 'test',
+                '--output', self.fout_path, 'http://example.com/',
+                '--output-format', 'json-line', '--sort-keys']
+
+        cmd = MockedBackendCommand(*args)
+
+        self.assertTrue(cmd.json_line)
+        self.assertTrue(cmd.serializer.json_line)
+        self.assertTrue(cmd.serializer.sort_keys)
+
+        cmd.run()
+        cmd.outfile.close()
+
+        with open(self.fout_path) as fout:
+            items = fout.readlines()
+
+        self.assertEqual(len(items), 5)
+
+        for x in range(5):
+            item = json.loads(items[x])
+
+            self.assertEqual(item['data']['item'], x)
+            self.assertEqual(item['uuid'], uuid('http://example.com/', str(x)))
+            self.assertListEqual(list(item.keys()), sorted(item.keys()))
+
+    def test_run_output_dir(self):
+        """Test run method with --output-dir"""
+
+        output_dir = os.path.join(self.test_path, 'items')
+        args = ['--no-archive', '--from-date', '2015-01-01', '--tag', 'test',
+                '--output-dir', output_dir, '--shard-size', '2',
+                '--compression', 'gzip', 'http://example.com/']
+
+        cmd = MockedBackendCommand(*args)
+        self.assertTrue(cmd.json_line)
+
+        with self.assertLogs(backend_logger, level='INFO') as cm:
+            cmd.run()
+
+        self.assertEqual(cm.output[-1], 'INFO:perceval.backend:3 files written to %s' % output_dir)
+
+        shards = sorted(os.listdir(output_dir))
+        self.assertListEqual(shards, ['items-00000.jsonl.gz', 'items-00001.jsonl.gz', 'items-00002.jsonl.gz'])
+
+        items = []
+        for shard in shards:
+            with gzip.open(os.path.join(output_dir, shard), 'rt') as fd:
+                items.extend([json.loads(line) for line in fd])
+
+        self.assertEqual(len(items), 5)
+
+        for x in range(5):
+            self.assertEqual(items[x]['data']['item'], x)
+            self.assertEqual(items[x]['uuid'], uuid('http://example.com/', str(x)))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_run_parquet(self):
+        """Test run method with --output-format parquet"""
+
+        args = ['--no-archive', '--from-date', '2015-01-01', '--tag', 'test',
+                '--output', self.fout_path, 'http://example.com/',
+                '--output-format', 'parquet']
+
+        cmd = MockedBackendCommand(*args)
+        self.assertFalse(cmd.json_line)
+        self.assertIsNone(cmd.serializer)
+
+        cmd.run()
+        cmd.outfile.close()
+
+        table = pyarrow.parquet.read_table(self.fout_path)
+        self.assertEqual(table.num_rows, 5)
+
+        for x, row in enumerate(table.to_pylist()):
+            self.assertEqual(json.loads(row['data'])['item'], x)
+            self.assertEqual(row['uuid'], uuid('http://example.com/', str(x)))
+            self.assertEqual(row['tag'], 'test')
+
     def test_filter_classified_fields(self):
         """Test if fields are filtered with filter-classified option is active"""
 
@@ -1525,6 +2009,48 @@ class TestBackendCommand(unittest.TestCase):
             # The last message should be the summary output
             self.assertEqual(cm.output[-1], SUMMARY_LOG_REPORT)
 
+    def test_instrumentation_logging(self):
+        """Test if the metrics of the HTTP client are written to the log"""
+
+        cmd = MockedBackendCommand('--no-archive', '--output', self.fout_path, 'http://example.com/')
+        cmd.outfile.close()
+
+        summary = Summary()
+        summary.fetch_time = 10.0
+        summary.http = HttpMetrics()
+        summary.http.record_request('http://example.com/items/1', 0.5)
+        summary.http.record_request('http://example.com/items/2', 2.0)
+        summary.http.record_request('http://example.com/users', 0.01)
+        summary.http.record_rate_limit_sleep(5.0)
+
+        with self.assertLogs('perceval.backend', level='INFO') as cm:
+            cmd._log_summary(summary)
+
+        self.assertEqual(len(cm.output), 2)
+        self.assertEqual(cm.output[0].split('\n')[0], "INFO:perceval.backend:Summary of results")
+
+        expected = (
+            "INFO:perceval.backend:Fetch instrumentation\n\n"
+            "\t      Fetch time: \t10.000 s\n"
+            "\t    Network time: \t2.510 s\n"
+            "\tRate limit sleep: \t5.000 s\n"
+            "\t Processing time: \t2.490 s\n"
+            "\n"
+            "\t   HTTP requests: \t3\n"
+            "\t Failed requests: \t3\n"
+            "\t  Bytes received: \t0\n"
+            "\t         Retries: \t0\n"
+            "\t      4xx errors: \t0\n"
+            "\t      5xx errors: \t0\n"
+            "\t      Cache hits: \t0\n"
+            "\t    Not modified: \t0\n"
+            "\n"
+            "\tLatencies by endpoint (requests, mean, max):\n"
+            "\t\texample.com/items/{id}: \t2, 1.250 s, 2.000 s [<=0.5:1 <=2.5:1]\n"
+            "\t\texample.com/users: \t1, 0.010 s, 0.010 s [<=0.05:1]\n"
+        )
+        self.assertEqual(cm.output[1], expected)
+
     def test_blacklist_ids(self):
         """Test whether items are blacklisted when their IDs are passed via the command line"""
 
@@ -1600,6 +2126,240 @@ class TestBackendItemsGenerator(unittest.TestCase):
             self.assertEqual(item['tag'], 'test')
             self.assertEqual(item['classified_fields_filtered'], None)
 
+    def test_summary_instrumentation(self):
+        """Test whether the summary measures the fetch"""
+
+        args = {'origin': 'http://example.com/'}
+
+        with BackendItemsGenerator(InstrumentedBackend, args, 'mock_item') as big:
+            items = [item for item in big.items]
+            summary = big.summary
+
+        self.assertEqual(len(items), 5)
+        self.assertGreater(summary.fetch_time, 0)
+        self.assertIsInstance(summary.http, HttpMetrics)
+        self.assertEqual(summary.http.requests, 5)
+        self.assertEqual(summary.network_time, 2.5)
+
+        with BackendItemsGenerator(CommandBackend, args, 'mock_item') as big:
+            _ = [item for item in big.items]
+            summary = big.summary
+
+        self.assertGreater(summary.fetch_time, 0)
+        self.assertIsNone(summary.http)
+
+    def test_archive_cache(self):
+        """Test whether requests are served from previous archives"""
+
+        manager = ArchiveManager(self.test_path)
+        args = {'origin': 'http://example.com/'}
+
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item',
+                                   manager=manager, cached_after=DEFAULT_DATETIME) as big:
+            items = [item for item in big.items]
+            first_archive = big.backend.archive.archive_path
+
+        self.assertEqual(len(items), 5)
+        self.assertListEqual([item['data']['cached'] for item in items], [False] * 5)
+
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item',
+                                   manager=manager, cached_after=DEFAULT_DATETIME) as big:
+            items = [item for item in big.items]
+            self.assertListEqual(big.backend.client.cache.archive_paths, [first_archive])
+
+        self.assertEqual(len(items), 5)
+        self.assertListEqual([item['data']['cached'] for item in items], [True] * 5)
+
+        # Archives created before the date are not used
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item',
+                                   manager=manager, cached_after=datetime_utcnow()) as big:
+            items = [item for item in big.items]
+
+        self.assertListEqual([item['data']['cached'] for item in items], [False] * 5)
+
+        # Without cache, every request is sent
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item', manager=manager) as big:
+            items = [item for item in big.items]
+            self.assertIsNone(big.backend.client.cache)
+
+        self.assertListEqual([item['data']['cached'] for item in items], [False] * 5)
+
+    def test_http_cache(self):
+        """Test whether the HTTP cache is given to the client"""
+
+        http_cache = HttpCache(os.path.join(self.test_path, 'http_cache'))
+        args = {'origin': 'http://example.com/'}
+
+        options = HttpClientOptions(http_cache=http_cache)
+
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item',
+                                   manager=ArchiveManager(self.test_path),
+                                   client_options=options) as big:
+            items = [item for item in big.items]
+            self.assertEqual(big.backend.client.http_cache, http_cache)
+            self.assertIsNone(big.backend.client.rate_budget)
+
+        self.assertEqual(len(items), 5)
+
+        # Backends without HTTP clients do not support options
+        with BackendItemsGenerator(CommandBackend, dict(args), 'mock_item',
+                                   client_options=options) as big:
+            with self.assertRaisesRegex(BackendError, "CommandBackend client does not support"):
+                _ = [item for item in big.items]
+
+    def test_rate_budget(self):
+        """Test whether the rate budget is given to the client"""
+
+        rate_budget = RateBudget(os.path.join(self.test_path, 'budget'))
+        args = {'origin': 'http://example.com/'}
+
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item',
+                                   manager=ArchiveManager(self.test_path),
+                                   client_options=HttpClientOptions(rate_budget=rate_budget)) as big:
+            items = [item for item in big.items]
+            self.assertEqual(big.backend.client.rate_budget, rate_budget)
+            self.assertFalse(big.backend.client.pace_requests)
+
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item',
+                                   manager=ArchiveManager(self.test_path),
+                                   client_options=HttpClientOptions(pace_requests=True)) as big:
+            _ = [item for item in big.items]
+            self.assertTrue(big.backend.client.pace_requests)
+
+        self.assertEqual(len(items), 5)
+
+    def test_page_workers(self):
+        """Test whether the pages to prefetch and the page workers are given to the client"""
+
+        args = {'origin': 'http://example.com/'}
+
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item',
+                                   manager=ArchiveManager(self.test_path)) as big:
+            items = [item for item in big.items]
+            self.assertEqual(big.backend.client.prefetch_pages, 0)
+            self.assertEqual(big.backend.client.page_workers, 1)
+
+        with BackendItemsGenerator(CachingBackend, dict(args), 'mock_item',
+                                   manager=ArchiveManager(self.test_path),
+                                   client_options=HttpClientOptions(prefetch_pages=2,
+                                                                    page_workers=4)) as big:
+            _ = [item for item in big.items]
+            self.assertEqual(big.backend.client.prefetch_pages, 2)
+            self.assertEqual(big.backend.client.page_workers, 4)
+
+        self.assertEqual(len(items), 5)
+
+    def test_unsupported_client_options(self):
+        """Test whether an error is raised when the client does not support an option"""
+
+        args = {'origin': 'http://example.com/'}
+        http_cache = HttpCache(os.path.join(self.test_path, 'http_cache'))
+        rate_budget = RateBudget(os.path.join(self.test_path, 'budget'))
+
+        with BackendItemsGenerator(HttpBackend, dict(args), 'mock_item',
+                                   manager=ArchiveManager(self.test_path),
+                                   client_options=HttpClientOptions(http_cache=http_cache)) as big:
+            items = [item for item in big.items]
+            self.assertEqual(big.backend.client.http_cache, http_cache)
+
+        self.assertEqual(len(items), 5)
+
+        options = [
+            (HttpClientOptions(rate_budget=rate_budget), 'rate_budget'),
+            (HttpClientOptions(pace_requests=True, page_workers=2), 'pace_requests, page_workers'),
+            (HttpClientOptions(prefetch_pages=1), 'prefetch_pages')
+        ]
+
+        for client_options, names in options:
+            with BackendItemsGenerator(HttpBackend, dict(args), 'mock_item',
+                                       client_options=client_options) as big:
+                expected = "HttpClient does not support %s options" % names
+                with self.assertRaisesRegex(HttpClientError, expected):
+                    _ = [item for item in big.items]
+                self.assertEqual(big.backend.client.prefetch_pages, 0)
+
+    def test_state_store(self):
+        """Test whether fetching resumes from the stored state"""
+
+        store = FetchStateStore(os.path.join(self.test_path, 'state.sqlite3'))
+        args = {'origin': 'http://example.com/'}
+
+        with BackendItemsGenerator(ResumingBackend, dict(args), None, state_store=store) as big:
+            items = [item for item in big.items]
+
+        self.assertEqual(len(items), 5)
+
+        state = store.get('ResumingBackend', 'http://example.com/', 'mock_item')
+        self.assertEqual(state.max_updated_on, str_to_datetime('2016-01-01 00:00:04'))
+        self.assertEqual(state.max_offset, 4)
+
+        # New items are fetched from the last date and offset
+        with unittest.mock.patch.object(ResumingBackend, 'ITEMS', 8):
+            with self.assertLogs(backend_logger, level='INFO') as cm:
+                with BackendItemsGenerator(ResumingBackend, dict(args), 'mock_item',
+                                           state_store=store) as big:
+                    items = [item for item in big.items]
+
+        self.assertListEqual([item['offset'] for item in items], [5, 6, 7])
+        self.assertEqual(cm.output[0],
+                         "INFO:perceval.backend:Resuming fetch of http://example.com/ "
+                         "from date 2016-01-01 00:00:04+00:00")
+        self.assertEqual(cm.output[1],
+                         "INFO:perceval.backend:Resuming fetch of http://example.com/ from offset 5")
+
+        state = store.get('ResumingBackend', 'http://example.com/', 'mock_item')
+        self.assertEqual(state.max_updated_on, str_to_datetime('2016-01-01 00:00:07'))
+        self.assertEqual(state.max_offset, 7)
+
+        # No new items keep the state
+        with BackendItemsGenerator(ResumingBackend, dict(args), 'mock_item', state_store=store) as big:
+            items = [item for item in big.items]
+
+        self.assertListEqual(items, [])
+        self.assertEqual(store.get('ResumingBackend', 'http://example.com/', 'mock_item').max_offset, 7)
+
+    def test_state_store_explicit_args(self):
+        """Test whether the stored state does not replace the given arguments"""
+
+        store = FetchStateStore(os.path.join(self.test_path, 'state.sqlite3'))
+        store.update('ResumingBackend', 'http://example.com/', 'mock_item',
+                     max_updated_on=str_to_datetime('2016-01-01 00:00:04'), max_offset=4)
+
+        args = {
+            'origin': 'http://example.com/',
+            'from_date': str_to_datetime('2016-01-01 00:00:01'),
+            'offset': 2
+        }
+
+        with BackendItemsGenerator(ResumingBackend, args, None, state_store=store) as big:
+            items = [item for item in big.items]
+
+        self.assertListEqual([item['offset'] for item in items], [2, 3, 4])
+
+    def test_state_store_error(self):
+        """Test whether the state is not updated when the fetch fails"""
+
+        store = FetchStateStore(os.path.join(self.test_path, 'state.sqlite3'))
+        args = {'origin': 'http://example.com/'}
+
+        with self.assertRaises(BackendError):
+            with BackendItemsGenerator(ErrorResumingBackend, args, None, state_store=store) as big:
+                _ = [item for item in big.items]
+
+        self.assertIsNone(store.get('ErrorResumingBackend', 'http://example.com/', 'mock_item'))
+
+    def test_state_store_no_resuming(self):
+        """Test whether the state is ignored by backends that do not support resuming"""
+
+        store = FetchStateStore(os.path.join(self.test_path, 'state.sqlite3'))
+        args = {'origin': 'http://example.com/'}
+
+        with BackendItemsGenerator(CommandBackend, args, None, state_store=store) as big:
+            items = [item for item in big.items]
+
+        self.assertEqual(len(items), 5)
+        self.assertIsNone(store.get('CommandBackend', 'http://example.com/', 'mock_item'))
+
     def test_init_items_from_archive(self):
         """Test whether a set of items is fetched from the archive"""
 
@@ -1694,6 +2454,103 @@ class TestBackendItemsGenerator(unittest.TestCase):
             items = [item for item in big.items]
             self.assertEqual(len(items), 5)
 
+    def test_init_items_from_archive_parallel(self):
+        """Test whether archives are replayed in parallel"""
+
+        manager = ArchiveManager(self.test_path)
+
+        category = 'mock_item'
+        args = {
+            'origin': 'http://example.com/',
+            'tag': 'test',
+            'subtype': 'mocksubtype',
+            'from-date': str_to_datetime('2015-01-01')
+        }
+
+        for _ in range(3):
+            with BackendItemsGenerator(CommandBackend, args, category, manager=manager) as big:
+                _ = [item for item in big.items]
+
+        # Items of each archive, one archive after another
+        with BackendItemsGenerator(CommandBackend, args, category,
+                                   manager=manager, fetch_archive=True,
+                                   archived_after=str_to_datetime('1970-01-01'),
+                                   replay_workers=2) as big:
+            items = [item for item in big.items]
+
+            self.assertEqual(big.summary.fetched, 15)
+            self.assertEqual(big.summary.last_updated_on.timestamp(), 1451606404.0)
+
+        self.assertEqual(len(items), 15)
+        self.assertListEqual([item['data']['item'] for item in items],
+                             [0, 1, 2, 3, 4] * 3)
+
+        for item in items:
+            self.assertEqual(item['data']['archive'], True)
+            self.assertEqual(item['uuid'], uuid('http://example.com/', str(item['data']['item'])))
+            self.assertEqual(item['tag'], 'test')
+
+        # Items of every archive merged by date
+        with BackendItemsGenerator(CommandBackend, args, category,
+                                   manager=manager, fetch_archive=True,
+                                   archived_after=str_to_datetime('1970-01-01'),
+                                   replay_workers=2,
+                                   replay_order=REPLAY_ORDER_UPDATED_ON) as big:
+            items = [item for item in big.items]
+
+        self.assertEqual(len(items), 15)
+        self.assertListEqual([item['data']['item'] for item in items],
+                             [0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4])
+
+    @unittest.mock.patch('perceval.backend.REPLAY_RUN_SIZE', 2)
+    @unittest.mock.patch('perceval.backend.REPLAY_QUEUE_SIZE', 1)
+    @unittest.mock.patch('perceval.backend.REPLAY_CHUNK_SIZE', 2)
+    def test_init_items_from_archive_parallel_chunks(self):
+        """Test whether archives replayed in parallel are streamed in chunks"""
+
+        manager = ArchiveManager(self.test_path)
+
+        category = 'mock_item'
+        args = {
+            'origin': 'http://example.com/',
+            'tag': 'test',
+            'subtype': 'mocksubtype',
+            'from-date': str_to_datetime('2015-01-01')
+        }
+
+        for _ in range(3):
+            with BackendItemsGenerator(CommandBackend, args, category, manager=manager) as big:
+                _ = [item for item in big.items]
+
+        with BackendItemsGenerator(CommandBackend, args, category,
+                                   manager=manager, fetch_archive=True,
+                                   archived_after=str_to_datetime('1970-01-01'),
+                                   replay_workers=2) as big:
+            items = [item for item in big.items]
+
+        self.assertListEqual([item['data']['item'] for item in items],
+                             [0, 1, 2, 3, 4] * 3)
+
+        # Items of each archive are written in several sorted runs
+        with BackendItemsGenerator(CommandBackend, args, category,
+                                   manager=manager, fetch_archive=True,
+                                   archived_after=str_to_datetime('1970-01-01'),
+                                   replay_workers=2,
+                                   replay_order=REPLAY_ORDER_UPDATED_ON) as big:
+            items = [item for item in big.items]
+
+        self.assertListEqual([item['data']['item'] for item in items],
+                             [0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4])
+
+        # Workers blocked on full queues stop when the replay is closed
+        items = fetch_from_archive(CommandBackend, args, manager,
+                                   category, str_to_datetime('1970-01-01'),
+                                   max_workers=2)
+        item = next(items)
+        items.close()
+
+        self.assertEqual(item['data']['item'], 0)
+
     def test_init_items_filter_classified_fields(self):
         """Test whether classified fields are removed from the items"""
 
@@ -1884,6 +2741,56 @@ class TestSummary(unittest.TestCase):
         self.assertIsNone(summary.max_offset)
         self.assertIsNone(summary.last_offset)
         self.assertIsNone(summary.extras)
+        self.assertEqual(summary.fetch_time, 0.0)
+        self.assertIsNone(summary.http)
+        self.assertEqual(summary.network_time, 0.0)
+        self.assertEqual(summary.rate_limit_sleep_time, 0.0)
+        self.assertEqual(summary.processing_time, 0.0)
+
+    def test_times(self):
+        """Test whether the fetch time is split in network, sleep and processing times"""
+
+        summary = Summary()
+        summary.fetch_time = 10.0
+        self.assertEqual(summary.processing_time, 10.0)
+
+        summary.http = HttpMetrics()
+        summary.http.record_request('http://example.com/', 6.0)
+        summary.http.record_rate_limit_sleep(3.0)
+
+        self.assertEqual(summary.network_time, 6.0)
+        self.assertEqual(summary.rate_limit_sleep_time, 3.0)
+        self.assertEqual(summary.processing_time, 1.0)
+
+        # Concurrent requests might take longer than the fetch
+        summary.http.record_request('http://example.com/', 6.0)
+        self.assertEqual(summary.processing_time, 0.0)
+
+    def test_as_dict(self):
+        """Test whether the summary is returned as a dict"""
+
+        summary = Summary()
+        summary.update({"updated_on": 1483228800.0, "uuid": "0fa16dc4edab9130a14914a8d797f634d13b4ff4"})
+        summary.fetch_time = 2.0
+
+        result = summary.as_dict()
+
+        self.assertEqual(result['total'], 1)
+        self.assertEqual(result['fetched'], 1)
+        self.assertEqual(result['skipped'], 0)
+        self.assertEqual(result['last_uuid'], "0fa16dc4edab9130a14914a8d797f634d13b4ff4")
+        self.assertEqual(result['max_updated_on'].timestamp(), 1483228800.0)
+        self.assertIsNone(result['last_offset'])
+        self.assertEqual(result['fetch_time'], 2.0)
+        self.assertEqual(result['processing_time'], 2.0)
+        self.assertIsNone(result['http'])
+
+        summary.http = HttpMetrics()
+        summary.http.record_request('http://example.com/', 0.5)
+
+        result = summary.as_dict()
+        self.assertEqual(result['network_time'], 0.5)
+        self.assertEqual(result['http']['requests'], 1)
 
     def test_update(self):
         """Test whether the method update properly works"""
@@ -2064,6 +2971,82 @@ class TestMetadata(unittest.TestCase):
 
             before = item['timestamp']
 
+    def test_metadata_many(self):
+        """Test whether metadata is added to a set of items"""
+
+        backend = ClassifiedFieldsBackend('test', 'mytag')
+        raw_items = [{'item': x, 'category': 'mock_item'} for x in range(3)]
+
+        items = [item for item in backend.metadata_many(raw_items, filter_classified=True)]
+        self.assertEqual(len(items), 3)
+
+        for x in range(3):
+            item = items[x]
+
+            self.assertDictEqual(item['data'], raw_items[x])
+            self.assertEqual(item['backend_name'], 'ClassifiedFieldsBackend')
+            self.assertEqual(item['uuid'], uuid('test', str(x)))
+            self.assertEqual(item['updated_on'], 1451606400.0 + x)
+            self.assertEqual(item['category'], 'mock_item')
+            self.assertDictEqual(item['search_fields'], {'item_id': str(x)})
+            self.assertEqual(item['classified_fields_filtered'],
+                             ['my.list_classified.dict_classified.field',
+                              'my.classified.field', 'classified'])
+            self.assertEqual(item['tag'], 'mytag')
+
+            # Same result as adding the metadata item by item
+            expected = backend.metadata(raw_items[x], filter_classified=True)
+            del expected['timestamp']
+            del item['timestamp']
+            self.assertDictEqual(item, expected)
+
+    def test_metadata_many_overridden_methods(self):
+        """Test whether overridden metadata methods are called for each item"""
+
+        class OverriddenMetadataBackend(MockedBackend):
+
+            def metadata(self, item, filter_classified=False):
+                item = super().metadata(item, filter_classified=filter_classified)
+                item['offset'] = item['data']['item']
+                return item
+
+            def search_fields(self, item):
+                return {'item_id': self.metadata_id(item), 'owner': 'me'}
+
+        backend = OverriddenMetadataBackend('test')
+        raw_items = [{'item': x, 'category': 'mock_item'} for x in range(3)]
+
+        items = [item for item in backend.metadata_many(raw_items)]
+        self.assertEqual(len(items), 3)
+
+        for x in range(3):
+            item = items[x]
+            self.assertEqual(item['offset'], x)
+            self.assertEqual(item['uuid'], uuid('test', str(x)))
+            self.assertDictEqual(item['search_fields'], {'item_id': str(x), 'owner': 'me'})
+
+    def test_metadata_extended_search_fields(self):
+        """Test whether search fields extending the default ones are added"""
+
+        class ExtendedSearchFieldsBackend(MockedBackend):
+
+            def search_fields(self, item):
+                search_fields = super().search_fields(item)
+                search_fields['owner'] = 'me'
+                return search_fields
+
+        backend = ExtendedSearchFieldsBackend('test')
+        raw_items = [{'item': x, 'category': 'mock_item'} for x in range(3)]
+
+        item = backend.metadata(raw_items[0])
+        self.assertDictEqual(item['search_fields'], {'item_id': '0', 'owner': 'me'})
+
+        items = [item for item in backend.metadata_many(raw_items)]
+        self.assertEqual(len(items), 3)
+
+        for x in range(3):
+            self.assertDictEqual(items[x]['search_fields'], {'item_id': str(x), 'owner': 'me'})
+
 
 class TestUUID(unittest.TestCase):
     """Unit tests for uuid function"""
@@ -2134,6 +3117,18 @@ class TestFetch(unittest.TestCase):
             self.assertEqual(item['tag'], 'test')
             self.assertEqual(item['classified_fields_filtered'], None)
 
+    def test_items_state_store(self):
+        """Test whether the fetch resumes from the stored state"""
+
+        store = FetchStateStore(os.path.join(self.test_path, 'state.sqlite3'))
+        store.update('ResumingBackend', 'http://example.com/', 'mock_item', max_offset=2)
+
+        items = fetch(ResumingBackend, {'origin': 'http://example.com/'}, None, state_store=store)
+        items = [item for item in items]
+
+        self.assertListEqual([item['offset'] for item in items], [3, 4])
+        self.assertEqual(store.get('ResumingBackend', 'http://example.com/', 'mock_item').max_offset, 4)
+
     def test_items_storing_archive(self):
         """Test whether items are stored in an archive"""
 
@@ -2320,6 +3315,47 @@ class TestFetchFromArchive(unittest.TestCase):
         items = [item for item in items]
         self.assertEqual(len(items), 5)
 
+    def test_compacted_archives(self):
+        """Test whether the items of every fetch merged in an archive are returned"""
+
+        class IncrementalBackend(MockedBackend):
+
+            def fetch(self, category=MockedBackend.DEFAULT_CATEGORY, from_date=None,
+                      filter_classified=False):
+                return Backend.fetch(self, category, from_date=from_date,
+                                     filter_classified=filter_classified)
+
+            def fetch_items(self, category, from_date=None):
+                for x in range(2):
+                    uri = '%s?since=%s' % (x, from_date)
+                    if self._fetch_from_archive:
+                        yield self.archive.retrieve(uri, None, None)
+                    else:
+                        item = {'item': x, 'since': from_date, 'category': category}
+                        self.archive.store(uri, None, None, item)
+                        yield item
+
+        manager = ArchiveManager(self.test_path)
+        args = {'origin': 'http://example.com/'}
+
+        for from_date in [None, '2016-01-01', '2016-02-01']:
+            args['from_date'] = from_date
+            items = [item for item in fetch(IncrementalBackend, args, 'mock_item', manager=manager)]
+            self.assertEqual(len(items), 2)
+
+        results = manager.compact_archives()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1], 3)
+
+        items = fetch_from_archive(IncrementalBackend, args, manager,
+                                   'mock_item', str_to_datetime('1970-01-01'))
+        items = [(item['data']['item'], item['data']['since']) for item in items]
+
+        expected = [(0, None), (1, None),
+                    (0, '2016-01-01'), (1, '2016-01-01'),
+                    (0, '2016-02-01'), (1, '2016-02-01')]
+        self.assertListEqual(items, expected)
+
     def test_no_archived_items(self):
         """Test when no archived items are available"""
 
@@ -2400,6 +3436,35 @@ class TestFetchFromArchive(unittest.TestCase):
             self.assertEqual(item['tag'], 'test')
             self.assertEqual(item['classified_fields_filtered'], None)
 
+        # Fetch items replaying the archives in parallel
+        with self.assertLogs(backend_logger, level='WARNING') as cm:
+            items = fetch_from_archive(CommandBackend, args, manager,
+                                       category, str_to_datetime('1970-01-01'),
+                                       max_workers=2)
+            items = [item for item in items]
+
+        self.assertEqual(len(items), 5)
+        self.assertRegex(cm.output[0], 'Ignoring .+ archive')
+
+    def test_parallel_unknown_order(self):
+        """Test if an error is raised when the replay order is not valid"""
+
+        manager = ArchiveManager(self.test_path)
+
+        args = {
+            'origin': 'http://example.com/',
+            'tag': 'test',
+            'subtype': 'mocksubtype',
+            'from-date': str_to_datetime('2015-01-01')
+        }
+
+        items = fetch_from_archive(CommandBackend, args, manager,
+                                   'mock_item', str_to_datetime('1970-01-01'),
+                                   max_workers=2, order='unknown')
+
+        with self.assertRaisesRegex(ValueError, 'unknown replay order'):
+            _ = [item for item in items]
+
 
 class TestFindBackends(unittest.TestCase):
     """Unit tests for find_backends function"""
@@ -2440,6 +3505,65 @@ class TestFindBackends(unittest.TestCase):
         }
         self.assertDictEqual(backend_commands, expected_backend_commands)
 
+    def test_find_backends_lazy(self):
+        """Check that backend modules are only imported when their classes are requested"""
+
+        with unittest.mock.patch('perceval.backend.importlib.import_module',
+                                 wraps=importlib.import_module) as mock_import:
+            backends, backend_commands = find_backends(mocked_package, lazy=True)
+
+            self.assertIsInstance(backends, BackendRegistry)
+            self.assertIsInstance(backend_commands, BackendRegistry)
+            self.assertListEqual(sorted(backend_commands.keys()),
+                                 ['backend', 'nested_backend_b', 'nested_backend_c'])
+            self.assertEqual(len(backends), 3)
+            self.assertIn('nested_backend_b', backend_commands)
+            self.assertNotIn('unknown', backend_commands)
+            mock_import.assert_not_called()
+
+            self.assertEqual(backend_commands['nested_backend_b'], BackendCommandB)
+            self.assertEqual(backends['nested_backend_b'], BackendB)
+            mock_import.assert_called_with('mocked_package.nested_package.nested_backend_b')
+
+        expected_backends = {
+            'backend': BackendA,
+            'nested_backend_b': BackendB,
+            'nested_backend_c': BackendC
+        }
+        self.assertDictEqual(dict(backends), expected_backends)
+
+        expected_backend_commands = {
+            'backend': BackendCommandA,
+            'nested_backend_b': BackendCommandB,
+            'nested_backend_c': BackendCommandC
+        }
+        self.assertDictEqual(dict(backend_commands), expected_backend_commands)
+
+    def test_backend_registry_not_found(self):
+        """Check that a KeyError is raised when a backend is not available"""
+
+        registry = BackendRegistry({'backend': 'mocked_package.backend'}, BackendCommand)
+
+        with self.assertRaises(KeyError):
+            _ = registry['unknown']
+
+        # Modules without backend classes are not valid
+        registry = BackendRegistry({'nested_package': 'mocked_package.nested_package'}, BackendCommand)
+
+        with self.assertRaises(KeyError):
+            _ = registry['nested_package']
+
+    def test_backend_registry_subclass(self):
+        """Check that backends extending a backend from another module are found"""
+
+        from perceval.backends.core.github import GitHubCommand
+        from perceval.backends.core.githubql import GitHubQLCommand
+
+        registry = BackendRegistry({'githubql': 'perceval.backends.core.githubql'}, BackendCommand)
+
+        self.assertEqual(registry['githubql'], GitHubQLCommand)
+        self.assertTrue(issubclass(GitHubQLCommand, GitHubCommand))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from grimoirelab_toolkit.datetime import str_to_datetime
+
+from perceval.archive import ArchiveManager
+from perceval.backend import (Backend,
+                              BackendCommand,
+                              BackendCommandArgumentParser,
+                              Summary,
+                              uuid)
+from perceval.batch import (BatchCommand,
+                            BatchItemsGenerator,
+                            BatchJob,
+                            BatchResult)
+from perceval.errors import BackendError
+
+
+class BatchBackend(Backend):
+    """Mocked backend for testing batch jobs"""
+
+    version = '0.1.0'
+    CATEGORIES = ['mock_item']
+    ITEMS = 250
+
+    def fetch(self, category='mock_item'):
+        return super().fetch(category)
+
+    def fetch_items(self, category, **kwargs):
+        for x in range(self.ITEMS):
+            if self._from_archive:
+                item = self.archive.retrieve(str(x), None, None)
+            else:
+                item = {'item': x, 'category': category}
+                if self.archive:
+                    self.archive.store(str(x), None, None, item)
+            yield item
+
+    def _init_client(self, from_archive=False):
+        self._from_archive = from_archive
+        return None
+
+    @staticmethod
+    def metadata_id(item):
+        return str(item['item'])
+
+    @staticmethod
+    def metadata_updated_on(item):
+        return str_to_datetime('2016-01-01').timestamp() + item['item']
+
+    @staticmethod
+    def metadata_category(item):
+        return item['category']
+
+
+class ErrorBatchBackend(BatchBackend):
+    """Mocked backend which fails after producing some items"""
+
+    def fetch_items(self, category, **kwargs):
+        for item in super().fetch_items(category, **kwargs):
+            if item['item'] == 3:
+                raise BackendError(cause="Unhandled exception")
+            yield item
+
+
+class BatchBackendCommand(BackendCommand):
+    """Mocked backend command for testing batch jobs"""
+
+    BACKEND = BatchBackend
+
+    @classmethod
+    def setup_cmd_parser(cls):
+        parser = BackendCommandArgumentParser(cls.BACKEND,
+                                              archive=True)
+        parser.parser.add_argument('origin')
+
+        return parser
+
+
+class ErrorBatchBackendCommand(BatchBackendCommand):
+    """Mocked backend command which fails while fetching"""
+
+    BACKEND = ErrorBatchBackend
+
+
+class TestBatchItemsGenerator(unittest.TestCase):
+    """Unit tests for BatchItemsGenerator"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def test_items(self):
+        """Test whether the items of every job are returned"""
+
+        origins = ['http://example.com/%s' % i for i in range(4)]
+        jobs = [BatchJob(BatchBackend, {'origin': origin}, 'mock_item') for origin in origins]
+
+        with BatchItemsGenerator(jobs, max_workers=2, chunk_size=7) as bbig:
+            items = [item for item in bbig.items]
+            results = bbig.results
+
+        self.assertEqual(len(items), len(origins) * BatchBackend.ITEMS)
+
+        for origin in origins:
+            origin_items = [item for item in items if item['origin'] == origin]
+            self.assertEqual(len(origin_items), BatchBackend.ITEMS)
+
+            # Items from the same origin keep their order
+            for x, item in enumerate(origin_items):
+                self.assertEqual(item['data']['item'], x)
+                self.assertEqual(item['uuid'], uuid(origin, str(x)))
+
+        self.assertEqual(len(results), len(origins))
+
+        for job, result in zip(jobs, results):
+            self.assertIsInstance(result, BatchResult)
+            self.assertEqual(result.job, job)
+            self.assertIsNone(result.error)
+            self.assertIsInstance(result.summary, Summary)
+            self.assertEqual(result.summary.fetched, BatchBackend.ITEMS)
+            self.assertEqual(result.summary.last_uuid,
+                             uuid(job.backend_args['origin'], str(BatchBackend.ITEMS - 1)))
+
+    def test_no_jobs(self):
+        """Test whether no items are returned when there are no jobs"""
+
+        with BatchItemsGenerator([]) as bbig:
+            items = [item for item in bbig.items]
+
+        self.assertListEqual(items, [])
+        self.assertListEqual(bbig.results, [])
+
+    def test_job_error(self):
+        """Test whether a failed job does not stop the rest of jobs"""
+
+        jobs = [
+            BatchJob(BatchBackend, {'origin': 'http://example.com/a'}, 'mock_item'),
+            BatchJob(ErrorBatchBackend, {'origin': 'http://example.com/b'}, 'mock_item'),
+            BatchJob(BatchBackend, {'origin': 'http://example.com/c'}, 'mock_item')
+        ]
+
+        with self.assertLogs('perceval.batch', level='ERROR') as cm:
+            with BatchItemsGenerator(jobs, max_workers=2) as bbig:
+                items = [item for item in bbig.items]
+                results = bbig.results
+                failed = bbig.failed
+
+        self.assertRegex(cm.output[0], "ErrorBatchBackend:http://example.com/b failed; cause: Unhandled exception")
+
+        origins = {item['origin'] for item in items}
+        self.assertSetEqual(origins, {'http://example.com/a', 'http://example.com/c'})
+        self.assertEqual(len(items), 2 * BatchBackend.ITEMS)
+
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[1].error, "Unhandled exception")
+        self.assertEqual(results[1].summary.fetched, 3)
+        self.assertIsNone(results[2].error)
+        self.assertListEqual(failed, [results[1]])
+
+    def test_invalid_category(self):
+        """Test whether a job with an invalid category fails"""
+
+        jobs = [BatchJob(BatchBackend, {'origin': 'http://example.com/'}, 'unknown')]
+
+        with self.assertLogs('perceval.batch', level='ERROR'):
+            with BatchItemsGenerator(jobs, max_workers=1) as bbig:
+                items = [item for item in bbig.items]
+
+        self.assertListEqual(items, [])
+        self.assertEqual(bbig.results[0].error, "unknown category not valid for BatchBackend")
+
+    def test_archive(self):
+        """Test whether the items of each job are archived"""
+
+        manager = ArchiveManager(self.test_path)
+
+        jobs = [
+            BatchJob(BatchBackend, {'origin': 'http://example.com/a'}, 'mock_item', manager=manager),
+            BatchJob(BatchBackend, {'origin': 'http://example.com/b'}, 'mock_item', manager=manager)
+        ]
+
+        with BatchItemsGenerator(jobs, max_workers=2) as bbig:
+            items = [item for item in bbig.items]
+
+        self.assertEqual(len(items), 2 * BatchBackend.ITEMS)
+
+        dt = str_to_datetime('1970-01-01')
+        jobs = [
+            BatchJob(BatchBackend, {'origin': 'http://example.com/a'}, 'mock_item',
+                     manager=manager, fetch_archive=True, archived_after=dt)
+        ]
+
+        with BatchItemsGenerator(jobs, max_workers=1) as bbig:
+            items = [item for item in bbig.items]
+
+        self.assertEqual(len(items), BatchBackend.ITEMS)
+        for item in items:
+            self.assertEqual(item['origin'], 'http://example.com/a')
+
+    def test_stop_consuming(self):
+        """Test whether the jobs are stopped when the items are not consumed"""
+
+        jobs = [BatchJob(BatchBackend, {'origin': 'http://example.com/%s' % i}, 'mock_item')
+                for i in range(8)]
+
+        with BatchItemsGenerator(jobs, max_workers=2, chunk_size=1, queue_size=1) as bbig:
+            item = next(bbig.items)
+
+        self.assertEqual(item['data']['item'], 0)
+        self.assertIsNone(bbig.items)
+
+
+class TestBatchCommand(unittest.TestCase):
+    """Unit tests for BatchCommand"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.fout_path = os.path.join(self.test_path, 'items.json')
+        self.jobs_path = os.path.join(self.test_path, 'jobs.txt')
+        self.commands = {
+            'mock': BatchBackendCommand,
+            'error': ErrorBatchBackendCommand
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def _write_jobs(self, lines):
+        with open(self.jobs_path, 'w') as fd:
+            fd.write('\n'.join(lines))
+
+    def test_read_jobs(self):
+        """Test whether the jobs are read from the jobs file"""
+
+        self._write_jobs([
+            "# jobs to run",
+            "mock http://example.com/a --no-archive --tag 'my tag'",
+            "",
+            "error http://example.com/b --archive-path %s" % self.test_path
+        ])
+
+        cmd = BatchCommand(self.jobs_path, '-j', '3', '-o', self.fout_path,
+                           commands=self.commands)
+        cmd.outfile.close()
+
+        self.assertEqual(cmd.parsed_args.max_workers, 3)
+        self.assertEqual(len(cmd.jobs), 2)
+
+        job = cmd.jobs[0]
+        self.assertEqual(job.backend_class, BatchBackend)
+        self.assertEqual(job.backend_args['origin'], 'http://example.com/a')
+        self.assertEqual(job.backend_args['tag'], 'my tag')
+        self.assertNotIn('outfile', job.backend_args)
+        self.assertIsNone(job.category)
+        self.assertIsNone(job.manager)
+
+        job = cmd.jobs[1]
+        self.assertEqual(job.backend_class, ErrorBatchBackend)
+        self.assertEqual(job.backend_args['origin'], 'http://example.com/b')
+        self.assertIsInstance(job.manager, ArchiveManager)
+        self.assertEqual(job.manager.dirpath, self.test_path)
+
+    def test_unknown_backend(self):
+        """Test whether an exception is raised when a backend is unknown"""
+
+        self._write_jobs(["mock http://example.com/a", "unknown http://example.com/b"])
+
+        with self.assertRaisesRegex(BackendError, "unknown backend unknown in line 2"):
+            BatchCommand(self.jobs_path, '-o', self.fout_path, commands=self.commands)
+
+    def test_run(self):
+        """Test whether items are written and results are logged"""
+
+        self._write_jobs([
+            "mock http://example.com/a --no-archive",
+            "error http://example.com/b --no-archive"
+        ])
+
+        cmd = BatchCommand(self.jobs_path, '-j', '2', '--json-line', '-o', self.fout_path,
+                           commands=self.commands)
+
+        with self.assertLogs('perceval.batch', level='INFO') as cm:
+            results = cmd.run()
+        cmd.outfile.close()
+
+        with open(self.fout_path) as fd:
+            items = [json.loads(line) for line in fd]
+
+        self.assertEqual(len(items), BatchBackend.ITEMS)
+        self.assertEqual(len(results), 2)
+
+        self.assertEqual(cm.output[-2],
+                         "INFO:perceval.batch:Summary of BatchBackend:http://example.com/a: "
+                         "250 items produced, 0 skipped, last item date 2016-01-01 00:04:09+00:00")
+        self.assertEqual(cm.output[-1],
+                         "INFO:perceval.batch:Summary of ErrorBatchBackend:http://example.com/b: "
+                         "3 items produced, 0 skipped, last item date 2016-01-01 00:00:02+00:00; "
+                         "failed: Unhandled exception")
+
+    def test_run_output_dir(self):
+        """Test whether items are written to an output directory"""
+
+        self._write_jobs([
+            "mock http://example.com/a --no-archive",
+            "mock http://example.com/b --no-archive"
+        ])
+
+        output_dir = os.path.join(self.test_path, 'items')
+        cmd = BatchCommand(self.jobs_path, '-j', '2', '--output-dir', output_dir,
+                           '--shard-size', '200', '--compression', 'gzip',
+                           commands=self.commands)
+
+        self.assertTrue(cmd.serializer.json_line)
+        for job in cmd.jobs:
+            self.assertNotIn('output_dir', job.backend_args)
+            self.assertNotIn('compression', job.backend_args)
+
+        with self.assertLogs('perceval.batch', level='INFO') as cm:
+            cmd.run()
+
+        self.assertEqual(cm.output[-1], "INFO:perceval.batch:3 files written to %s" % output_dir)
+
+        items = []
+        for shard in sorted(os.listdir(output_dir)):
+            with gzip.open(os.path.join(output_dir, shard), 'rt') as fd:
+                items.extend([json.loads(line) for line in fd])
+
+        self.assertEqual(len(items), 2 * BatchBackend.ITEMS)
+
+    def test_output_dir_needed(self):
+        """Test whether an exception is raised when sharding args are set without output-dir"""
+
+        self._write_jobs(["mock http://example.com/a --no-archive"])
+
+        with self.assertRaisesRegex(AttributeError, "need output-dir to work with"):
+            BatchCommand(self.jobs_path, '--compression', 'gzip', commands=self.commands)
+
+
+if __name__ == "__main__":
+    unittest.main()
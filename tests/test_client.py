@@ -23,19 +23,30 @@
 #     Jesus M. Gonzalez-Barahona <jgb@gsyc.es>
 #
 
+import asyncio
 import os
 import shutil
 import time
 import tempfile
 import unittest
+import unittest.mock
 
 import httpretty
 import requests
 
 from grimoirelab_toolkit.datetime import datetime_utcnow
 
-from perceval.archive import Archive
-from perceval.client import HttpClient, RateLimitHandler
+from perceval.archive import Archive, ArchiveCache
+from perceval.client import (AsyncHttpClient,
+                             HttpCache,
+                             HttpCacheEntry,
+                             HttpClient,
+                             HttpClientOptions,
+                             RateBudget,
+                             RateLimitHandler,
+                             RatePermit,
+                             pacing_interval)
+from perceval.errors import HttpClientError, RateLimitError
 
 
 CLIENT_API_URL = "https://gateway.marvel.com/v1/"
@@ -43,6 +54,7 @@ CLIENT_SPIDERMAN_URL = "https://gateway.marvel.com/v1/public/characters/1"
 CLIENT_SUPERMAN_URL = "https://gateway.marvel.com/v1/public/characters/2"
 CLIENT_BATMAN_URL = "https://gateway.marvel.com/v1/public/characters/3"
 CLIENT_IRONMAN_URL = "https://gateway.marvel.com/v1/public/characters/4"
+CLIENT_PAGES_URL = "https://gateway.marvel.com/v1/public/comics"
 
 
 class MockedClient(HttpClient, RateLimitHandler):
@@ -78,6 +90,19 @@ class MockedClient(HttpClient, RateLimitHandler):
             return super().calculate_time_to_reset()
 
 
+class SanitizingClient(MockedClient):
+    """Mocked client removing the credentials of the requests in place"""
+
+    @staticmethod
+    def sanitize_for_archive(url, headers, payload):
+        if headers:
+            headers.pop('Authorization', None)
+        if payload:
+            payload.pop('key', None)
+
+        return url, headers, payload
+
+
 class TestHttpClient(unittest.TestCase):
     """Http client tests"""
 
@@ -150,6 +175,60 @@ class TestHttpClient(unittest.TestCase):
         response = client.fetch(CLIENT_SPIDERMAN_URL)
         self.assertEqual(response.headers['connection'], 'close')
 
+    def test_supported_options(self):
+        """Test whether the options supported by the client are returned"""
+
+        self.assertListEqual(HttpClient.supported_options(),
+                             ['archive_cache', 'http_cache'])
+        self.assertListEqual(MockedClient.supported_options(),
+                             ['archive_cache', 'http_cache', 'rate_budget', 'pace_requests'])
+
+        class PaginatingClient(HttpClient):
+            PAGINATION_OPTIONS = ('prefetch_pages', 'page_workers')
+
+        self.assertListEqual(PaginatingClient.supported_options(),
+                             ['archive_cache', 'http_cache', 'prefetch_pages', 'page_workers'])
+
+    def test_set_options(self):
+        """Test whether the options are set on the client"""
+
+        http_cache = HttpCache(os.path.join(self.test_path, 'http_cache'))
+        rate_budget = RateBudget(os.path.join(self.test_path, 'budget'))
+
+        client = MockedClient(CLIENT_API_URL)
+        client.set_options(HttpClientOptions(http_cache=http_cache,
+                                             rate_budget=rate_budget,
+                                             pace_requests=True))
+
+        self.assertIsNone(client.cache)
+        self.assertEqual(client.http_cache, http_cache)
+        self.assertEqual(client.rate_budget, rate_budget)
+        self.assertTrue(client.pace_requests)
+        self.assertEqual(client.prefetch_pages, HttpClient.DEFAULT_PREFETCH_PAGES)
+        self.assertEqual(client.page_workers, HttpClient.DEFAULT_PAGE_WORKERS)
+
+        # Unset options do not change the client
+        client.set_options(HttpClientOptions())
+        self.assertEqual(client.http_cache, http_cache)
+        self.assertTrue(client.pace_requests)
+
+    def test_set_options_unsupported(self):
+        """Test whether an error is raised setting options not supported by the client"""
+
+        client = MockedClient(CLIENT_API_URL)
+
+        with self.assertRaisesRegex(HttpClientError,
+                                    "MockedClient does not support prefetch_pages, page_workers options"):
+            client.set_options(HttpClientOptions(pace_requests=True, prefetch_pages=1, page_workers=2))
+
+        # No option is set when any of them is not supported
+        self.assertFalse(client.pace_requests)
+
+        client = HttpClient(CLIENT_API_URL)
+
+        with self.assertRaisesRegex(HttpClientError, "HttpClient does not support rate_budget options"):
+            client.set_options(HttpClientOptions(rate_budget=RateBudget(os.path.join(self.test_path, 'budget'))))
+
     @httpretty.activate
     def test_fetch_get(self):
         """Test fetch method"""
@@ -204,6 +283,53 @@ class TestHttpClient(unittest.TestCase):
         with self.assertRaises(requests.exceptions.HTTPError):
             _ = client.fetch(CLIENT_SUPERMAN_URL)
 
+    @httpretty.activate
+    def test_fetch_metrics(self):
+        """Test whether the requests sent are measured"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               responses=[
+                                   httpretty.Response(body="", status=504),
+                                   httpretty.Response(body="success", status=200)
+                               ])
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="not found",
+                               status=404)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_BATMAN_URL,
+                               body="",
+                               status=500)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_IRONMAN_URL,
+                               body="",
+                               status=408)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+
+        _ = client.fetch(CLIENT_SPIDERMAN_URL)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.fetch(CLIENT_SUPERMAN_URL)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.fetch(CLIENT_BATMAN_URL)
+        with self.assertRaises(requests.exceptions.RetryError):
+            _ = client.fetch(CLIENT_IRONMAN_URL)
+
+        metrics = client.metrics
+        self.assertEqual(metrics.requests, 4)
+        self.assertEqual(metrics.failed_requests, 1)
+        self.assertEqual(metrics.bytes_received, len("success") + len("not found"))
+        self.assertEqual(metrics.retries, 1)
+        self.assertEqual(metrics.client_errors, 1)
+        self.assertEqual(metrics.server_errors, 1)
+        self.assertGreater(metrics.network_time, 0)
+
+        endpoint = 'gateway.marvel.com/v1/public/characters/{id}'
+        self.assertListEqual(list(metrics.latencies.keys()), [endpoint])
+        self.assertEqual(metrics.latencies[endpoint].count, 4)
+
     @httpretty.activate
     def test_fetch_post(self):
         """Test fetch method"""
@@ -340,6 +466,522 @@ class TestHttpClient(unittest.TestCase):
         with self.assertRaises(requests.exceptions.HTTPError):
             _ = client.fetch(CLIENT_SPIDERMAN_URL)
 
+    @httpretty.activate
+    def test_fetch_from_cache(self):
+        """Test whether cached responses are not requested to the data source"""
+
+        cached_path = os.path.join(self.test_path, 'cached')
+        cached = Archive.create(cached_path)
+        cached.init_metadata('marvel', 'MockedBackend', '0.1', 'character', {})
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="bad",
+                               status=404)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=cached)
+        _ = client.fetch(CLIENT_SUPERMAN_URL)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.fetch(CLIENT_SPIDERMAN_URL)
+        cached.close()
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="new",
+                               status=200)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="new",
+                               status=200)
+
+        archive = Archive.create(os.path.join(self.test_path, 'myarchive'))
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=archive)
+        client.cache = ArchiveCache([cached_path])
+
+        # Cached responses are stored in the new archive
+        response = client.fetch(CLIENT_SUPERMAN_URL)
+        self.assertEqual(response.text, "good")
+        self.assertEqual(client.metrics.requests, 0)
+        self.assertEqual(client.metrics.cache_hits, 1)
+        self.assertEqual(archive.retrieve(CLIENT_SUPERMAN_URL, None, None).text, "good")
+
+        # Errors are requested again
+        response = client.fetch(CLIENT_SPIDERMAN_URL)
+        self.assertEqual(response.text, "new")
+        self.assertEqual(client.metrics.requests, 1)
+        self.assertEqual(client.metrics.cache_hits, 1)
+        client.cache.close()
+
+    @httpretty.activate
+    def test_fetch_from_cache_rate_limit(self):
+        """Test whether cached responses keep the current rate limit"""
+
+        cached_path = os.path.join(self.test_path, 'cached')
+        cached = Archive.create(cached_path)
+        cached.init_metadata('marvel', 'MockedBackend', '0.1', 'character', {})
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '5',
+                                   'X-RateLimit-Reset': '15'
+                               })
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=cached)
+        _ = client.fetch(CLIENT_SUPERMAN_URL)
+        cached.close()
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        client.cache = ArchiveCache([cached_path])
+        client.rate_limit = 20
+
+        response = client.fetch(CLIENT_SUPERMAN_URL)
+        client.update_rate_limit(response)
+
+        self.assertEqual(response.text, "good")
+        self.assertEqual(client.rate_limit, 20)
+        self.assertIsNone(client.rate_limit_reset_ts)
+        client.cache.close()
+
+    @httpretty.activate
+    def test_fetch_from_cache_rate_budget(self):
+        """Test whether cached responses neither wait nor consume the rate budget"""
+
+        cached_path = os.path.join(self.test_path, 'cached')
+        cached = Archive.create(cached_path)
+        cached.init_metadata('marvel', 'MockedBackend', '0.1', 'character', {})
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=cached)
+        _ = client.fetch(CLIENT_SUPERMAN_URL)
+        cached.close()
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="new",
+                               status=200)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        client.cache = ArchiveCache([cached_path])
+        client.rate_budget = RateBudget(os.path.join(self.test_path, 'budget'))
+        client.pace_requests = True
+
+        key = client.rate_budget_key()
+        reset_on = time.time() + 3600
+        client.rate_budget.update(key, 100, reset_on)
+
+        with unittest.mock.patch.object(client, 'sleep_for_rate_limit',
+                                        wraps=client.sleep_for_rate_limit) as mock_sleep:
+            response = client.fetch(CLIENT_SUPERMAN_URL)
+            self.assertEqual(response.text, "good")
+            self.assertEqual(client.metrics.cache_hits, 1)
+            self.assertEqual(client.rate_budget.get(key), (100, reset_on))
+            mock_sleep.assert_not_called()
+
+            response = client.fetch(CLIENT_SPIDERMAN_URL)
+            self.assertEqual(response.text, "new")
+            self.assertEqual(client.rate_budget.get(key), (99, reset_on))
+            mock_sleep.assert_called_once_with()
+
+        client.cache.close()
+
+    @httpretty.activate
+    def test_fetch_from_cache_sanitize(self):
+        """Test whether credentials are sent when the request is not cached"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200)
+
+        client = SanitizingClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        client.cache = ArchiveCache([])
+
+        payload = {'q': '1', 'key': 'secret'}
+        headers = {'Authorization': 'token secret'}
+        response = client.fetch(CLIENT_SUPERMAN_URL, payload=payload, headers=headers)
+
+        self.assertEqual(response.text, "good")
+        self.assertDictEqual(httpretty.last_request().querystring, {'q': ['1'], 'key': ['secret']})
+        self.assertEqual(httpretty.last_request().headers['Authorization'], 'token secret')
+        client.cache.close()
+
+    @httpretty.activate
+    def test_fetch_conditional(self):
+        """Test whether not modified responses are served from the HTTP cache"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               responses=[
+                                   httpretty.Response(body="good", status=200,
+                                                      forcing_headers={
+                                                          'ETag': '"abcd"',
+                                                          'Link': '<next>; rel="next"',
+                                                          'X-RateLimit-Remaining': '20'
+                                                      }),
+                                   httpretty.Response(body="", status=304,
+                                                      forcing_headers={
+                                                          'ETag': '"abcd"',
+                                                          'X-RateLimit-Remaining': '19'
+                                                      })
+                               ])
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        client.http_cache = HttpCache(os.path.join(self.test_path, 'http_cache'))
+
+        response = client.fetch(CLIENT_SUPERMAN_URL)
+        self.assertEqual(response.text, "good")
+        self.assertNotIn('If-None-Match', httpretty.last_request().headers)
+
+        archive = Archive.create(os.path.join(self.test_path, 'myarchive'))
+        client.archive = archive
+
+        response = client.fetch(CLIENT_SUPERMAN_URL)
+        self.assertEqual(httpretty.last_request().headers['If-None-Match'], '"abcd"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "good")
+        self.assertEqual(response.headers['X-RateLimit-Remaining'], '19')
+        self.assertEqual(response.links['next']['url'], 'next')
+        self.assertEqual(client.metrics.requests, 2)
+        self.assertEqual(client.metrics.not_modified, 1)
+
+        # Revalidated responses are archived as the request was sent
+        client = MockedClient(CLIENT_API_URL, archive=archive, from_archive=True)
+        self.assertEqual(client.fetch(CLIENT_SUPERMAN_URL).text, "good")
+
+    @httpretty.activate
+    def test_fetch_conditional_rate_budget(self):
+        """Test whether not modified responses give back their rate budget permit"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               responses=[
+                                   httpretty.Response(body="good", status=200,
+                                                      forcing_headers={'ETag': '"abcd"'}),
+                                   httpretty.Response(body="", status=304,
+                                                      forcing_headers={'ETag': '"abcd"'}),
+                                   httpretty.Response(body="new", status=200,
+                                                      forcing_headers={'ETag': '"efgh"'})
+                               ])
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        client.http_cache = HttpCache(os.path.join(self.test_path, 'http_cache'))
+        client.rate_budget = RateBudget(os.path.join(self.test_path, 'budget'))
+
+        key = client.rate_budget_key()
+        reset_on = time.time() + 10
+        client.rate_budget.update(key, 1000, reset_on)
+
+        _ = client.fetch(CLIENT_SUPERMAN_URL)
+        self.assertEqual(client.rate_budget.get(key), (999, reset_on))
+
+        response = client.fetch(CLIENT_SUPERMAN_URL)
+        self.assertEqual(response.text, "good")
+        self.assertEqual(client.metrics.not_modified, 1)
+        self.assertEqual(client.rate_budget.get(key), (999, reset_on))
+
+        response = client.fetch(CLIENT_SUPERMAN_URL)
+        self.assertEqual(response.text, "new")
+        self.assertEqual(client.rate_budget.get(key), (998, reset_on))
+
+    @httpretty.activate
+    def test_fetch_conditional_not_cacheable(self):
+        """Test whether responses without validators are not cached"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200,
+                               forcing_headers={'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="good",
+                               status=200)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        client.http_cache = HttpCache(os.path.join(self.test_path, 'http_cache'))
+
+        _ = client.fetch(CLIENT_SPIDERMAN_URL)
+        _ = client.fetch(CLIENT_SPIDERMAN_URL)
+        self.assertNotIn('If-None-Match', httpretty.last_request().headers)
+        self.assertNotIn('If-Modified-Since', httpretty.last_request().headers)
+
+        # Streamed responses are not cached either
+        _ = client.fetch(CLIENT_SUPERMAN_URL, stream=True)
+        _ = client.fetch(CLIENT_SUPERMAN_URL)
+        self.assertNotIn('If-Modified-Since', httpretty.last_request().headers)
+
+        _ = client.fetch(CLIENT_SUPERMAN_URL)
+        self.assertEqual(httpretty.last_request().headers['If-Modified-Since'],
+                         'Wed, 21 Oct 2015 07:28:00 GMT')
+
+    @staticmethod
+    def __register_pages(npages):
+        for npage in range(1, npages + 1):
+            headers = {}
+            if npage < npages:
+                headers['Link'] = '<' + CLIENT_PAGES_URL + '?page=' + str(npage + 1) + '>; rel="next"'
+
+            httpretty.register_uri(httpretty.GET,
+                                   CLIENT_PAGES_URL + '?page=' + str(npage),
+                                   body="page " + str(npage),
+                                   status=200,
+                                   forcing_headers=headers,
+                                   match_querystring=True)
+
+    @httpretty.activate
+    def test_paginate(self):
+        """Test whether pages are fetched in advance and archived in order"""
+
+        self.__register_pages(3)
+
+        resources = [CLIENT_SPIDERMAN_URL, CLIENT_SUPERMAN_URL, CLIENT_BATMAN_URL]
+        for resource in resources:
+            httpretty.register_uri(httpretty.GET,
+                                   resource,
+                                   body="good",
+                                   status=200)
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=archive)
+
+        pages = []
+        for npage, page in enumerate(client.paginate(CLIENT_PAGES_URL + '?page=1', prefetch=2)):
+            pages.append(page.text)
+            # Sub-resources requested while processing a page are
+            # archived after the page, no matter when the next page is fetched
+            _ = client.fetch(resources[npage])
+
+        self.assertListEqual(pages, ['page 1', 'page 2', 'page 3'])
+
+        cursor = archive._db.execute("SELECT uri FROM archive ORDER BY id")
+        uris = [row[0] for row in cursor]
+        cursor.close()
+
+        expected = [
+            CLIENT_PAGES_URL + '?page=1', CLIENT_SPIDERMAN_URL,
+            CLIENT_PAGES_URL + '?page=2', CLIENT_SUPERMAN_URL,
+            CLIENT_PAGES_URL + '?page=3', CLIENT_BATMAN_URL
+        ]
+        self.assertListEqual(uris, expected)
+
+        # Pages are read one after another from the archive
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=archive, from_archive=True)
+        httpretty.reset()
+
+        pages = [page.text for page in client.paginate(CLIENT_PAGES_URL + '?page=1')]
+        self.assertListEqual(pages, ['page 1', 'page 2', 'page 3'])
+        self.assertEqual(len(httpretty.latest_requests()), 0)
+
+    @httpretty.activate
+    def test_paginate_sequential(self):
+        """Test whether pages are fetched one after another when prefetching is disabled"""
+
+        self.__register_pages(3)
+
+        def next_page(response, payload):
+            return (response.links['next']['url'], payload) if 'next' in response.links else None
+
+        def fetch_page(url, payload):
+            requested.append(url)
+            return client.fetch(url, payload=payload)
+
+        requested = []
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        self.assertEqual(client.prefetch_pages, 0)
+
+        # Pages are not prefetched by default
+        pages = client.paginate(CLIENT_PAGES_URL + '?page=1', next_page=next_page,
+                                fetch_page=fetch_page)
+
+        page = next(pages)
+        self.assertEqual(page.text, 'page 1')
+        self.assertListEqual(requested, [CLIENT_PAGES_URL + '?page=1'])
+
+        pages = [page.text for page in pages]
+        self.assertListEqual(pages, ['page 2', 'page 3'])
+        self.assertEqual(len(requested), 3)
+
+    @httpretty.activate
+    def test_paginate_http_error(self):
+        """Test whether errors fetching pages in advance are raised in order"""
+
+        self.__register_pages(2)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_PAGES_URL + '?page=2',
+                               body="bad",
+                               status=404,
+                               match_querystring=True)
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=archive)
+        pages = client.paginate(CLIENT_PAGES_URL + '?page=1', prefetch=1)
+
+        self.assertEqual(next(pages).text, 'page 1')
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = next(pages)
+
+        # The error was archived, so it is raised when replaying
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=archive, from_archive=True)
+        pages = client.paginate(CLIENT_PAGES_URL + '?page=1')
+
+        self.assertEqual(next(pages).text, 'page 1')
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = next(pages)
+
+    @httpretty.activate
+    def test_paginate_from_cache(self):
+        """Test whether the cache is shared with the thread fetching pages in advance"""
+
+        self.__register_pages(2)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="good",
+                               status=200)
+
+        cached_path = os.path.join(self.test_path, 'cached')
+        cached = Archive.create(cached_path)
+        cached.init_metadata('marvel', 'MockedBackend', '0.1', 'character', {})
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=cached)
+        _ = [page for page in client.paginate(CLIENT_PAGES_URL + '?page=1', prefetch=0)]
+        _ = client.fetch(CLIENT_SPIDERMAN_URL)
+        cached.close()
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        client.cache = ArchiveCache([cached_path])
+        client.prefetch_pages = 1
+
+        # Archives of the cache are opened by the thread fetching
+        # the pages and used by this one to fetch the sub-resources
+        for page in client.paginate(CLIENT_PAGES_URL + '?page=1'):
+            response = client.fetch(CLIENT_SPIDERMAN_URL)
+            self.assertEqual(response.text, "good")
+
+        self.assertEqual(client.metrics.requests, 0)
+        self.assertEqual(client.metrics.cache_hits, 4)
+        client.cache.close()
+
+    @httpretty.activate
+    def test_fetch_pages(self):
+        """Test whether pages are fetched concurrently and archived in order"""
+
+        self.__register_pages(4)
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=archive)
+        client.page_workers = 3
+
+        requests_ = [(CLIENT_PAGES_URL + '?page=' + str(npage), None) for npage in range(1, 5)]
+        pages = [page.text for page in client.fetch_pages(requests_)]
+
+        self.assertListEqual(pages, ['page 1', 'page 2', 'page 3', 'page 4'])
+
+        cursor = archive._db.execute("SELECT uri FROM archive ORDER BY id")
+        uris = [row[0] for row in cursor]
+        cursor.close()
+
+        self.assertListEqual(uris, [request[0] for request in requests_])
+
+        # Pages are read one after another from the archive
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=archive, from_archive=True)
+        client.page_workers = 3
+        httpretty.reset()
+
+        pages = [page.text for page in client.fetch_pages(requests_)]
+        self.assertListEqual(pages, ['page 1', 'page 2', 'page 3', 'page 4'])
+        self.assertEqual(len(httpretty.latest_requests()), 0)
+
+    @httpretty.activate
+    def test_fetch_pages_http_error(self):
+        """Test whether errors fetching pages concurrently are raised in order"""
+
+        self.__register_pages(3)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_PAGES_URL + '?page=2',
+                               body="bad",
+                               status=404,
+                               match_querystring=True)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+
+        requests_ = [(CLIENT_PAGES_URL + '?page=' + str(npage), None) for npage in range(1, 4)]
+        pages = client.fetch_pages(requests_, workers=3)
+
+        self.assertEqual(next(pages).text, 'page 1')
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = next(pages)
+
+    @httpretty.activate
+    def test_no_archiving(self):
+        """Test whether requests are not archived within the context"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="good",
+                               status=200)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200)
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1, archive=archive)
+
+        with client.no_archiving():
+            _ = client.fetch(CLIENT_SPIDERMAN_URL)
+        _ = client.fetch(CLIENT_SUPERMAN_URL)
+
+        self.assertIs(client.archive, archive)
+
+        cursor = archive._db.execute("SELECT uri FROM archive ORDER BY id")
+        uris = [row[0] for row in cursor]
+        cursor.close()
+
+        self.assertListEqual(uris, [CLIENT_SUPERMAN_URL])
+
+    @httpretty.activate
+    def test_fetch_conditional_sanitize(self):
+        """Test whether credentials are sent when requests are cacheable"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200,
+                               forcing_headers={'ETag': '"abc"'})
+
+        client = SanitizingClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+        client.http_cache = HttpCache(os.path.join(self.test_path, 'http_cache'))
+
+        for _ in range(2):
+            payload = {'q': '1', 'key': 'secret'}
+            headers = {'Authorization': 'token secret'}
+            _ = client.fetch(CLIENT_SUPERMAN_URL, payload=payload, headers=headers)
+
+            self.assertDictEqual(httpretty.last_request().querystring, {'q': ['1'], 'key': ['secret']})
+            self.assertEqual(httpretty.last_request().headers['Authorization'], 'token secret')
+
+        # The key of the request does not include the credentials
+        self.assertEqual(httpretty.last_request().headers['If-None-Match'], '"abc"')
+
     def test_sanitize_for_archive(self):
         """Test whether the default sanitize method works properly"""
 
@@ -350,6 +992,299 @@ class TestHttpClient(unittest.TestCase):
         self.assertEqual(payload, "payload")
 
 
+class TestHttpCache(unittest.TestCase):
+    """HTTP cache tests"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.cache_path = os.path.join(self.test_path, 'http_cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        cache = HttpCache(self.cache_path, max_bytes=10)
+
+        self.assertEqual(cache.path, self.cache_path)
+        self.assertEqual(cache.max_bytes, 10)
+        self.assertEqual(cache.size(), 0)
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        with self.assertRaises(ValueError):
+            _ = HttpCache(self.cache_path, max_bytes=0)
+
+        with self.assertRaises(HttpClientError):
+            _ = HttpCache(self.test_path)
+
+    def test_put_get(self):
+        """Test whether responses are stored and retrieved"""
+
+        cache = HttpCache(self.cache_path)
+        entry = HttpCacheEntry('"abcd"', None, 200, {'ETag': '"abcd"'}, b'good')
+
+        key = HttpCache.make_key(CLIENT_SUPERMAN_URL, {'page': 1}, None)
+        self.assertEqual(key, HttpCache.make_key(CLIENT_SUPERMAN_URL, {'page': 1}, None))
+        self.assertNotEqual(key, HttpCache.make_key(CLIENT_SUPERMAN_URL, {'page': 2}, None))
+
+        self.assertIsNone(cache.get(key))
+
+        cache.put(key, entry)
+        self.assertEqual(cache.get(key), entry)
+        self.assertEqual(cache.size(), 4)
+
+        # Nothing is stored for responses without validators
+        cache.put('other', None)
+        self.assertIsNone(cache.get('other'))
+
+    def test_eviction(self):
+        """Test whether least recently used responses are evicted"""
+
+        cache = HttpCache(self.cache_path, max_bytes=10)
+
+        for key in ['a', 'b', 'c']:
+            cache.put(key, HttpCacheEntry(key, None, 200, {}, b'1234'))
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size(), 8)
+
+        # Using 'b' makes 'c' the least recently used
+        _ = cache.get('b')
+        cache.put('d', HttpCacheEntry('d', None, 200, {}, b'1234'))
+
+        self.assertIsNone(cache.get('c'))
+        self.assertIsNotNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('d'))
+
+        # Responses bigger than the cache are not stored
+        cache.put('e', HttpCacheEntry('e', None, 200, {}, b'12345678901'))
+        self.assertIsNone(cache.get('e'))
+        self.assertEqual(cache.size(), 8)
+
+
+class TestRateBudget(unittest.TestCase):
+    """Rate budget tests"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.budget_path = os.path.join(self.test_path, 'budget')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        budget = RateBudget(self.budget_path)
+
+        self.assertEqual(budget.path, self.budget_path)
+        self.assertIsNone(budget.get('host:token'))
+
+        with self.assertRaises(HttpClientError):
+            _ = RateBudget(self.test_path)
+
+    @unittest.mock.patch('perceval.client.time.time')
+    def test_reserve(self, mock_time):
+        """Test whether permits are spread until the reset"""
+
+        mock_time.return_value = 1000
+        budget = RateBudget(self.budget_path)
+
+        self.assertEqual(budget.reserve('host:token', 2), RatePermit(0, False))
+
+        budget.update('host:token', 12, 1100)
+
+        self.assertEqual(budget.reserve('host:token', 2), RatePermit(0, False))
+        self.assertEqual(budget.reserve('host:token', 2), RatePermit(10, False))
+        permit = budget.reserve('host:token', 2)
+        self.assertAlmostEqual(permit.wait, 10 + 100 / 9)
+        self.assertEqual(budget.get('host:token'), (9, 1100))
+
+        # Permits are given as the time passes
+        mock_time.return_value = 1050
+        self.assertEqual(budget.reserve('host:token', 2), RatePermit(0, False))
+
+        # Keep the reserve
+        budget.update('host:token', 2, 1100)
+        self.assertEqual(budget.reserve('host:token', 2), RatePermit(50, True))
+        self.assertEqual(budget.get('host:token'), (2, 1100))
+
+        # Once the window passes, requests are not paced
+        mock_time.return_value = 1101
+        self.assertEqual(budget.reserve('host:token', 2), RatePermit(0, False))
+
+    def test_update(self):
+        """Test whether the lowest remaining requests are kept within a window"""
+
+        budget = RateBudget(self.budget_path)
+
+        budget.update('host:token', 100, 1000)
+        budget.update('host:token', 120, 1001)
+        self.assertEqual(budget.get('host:token'), (100, 1001))
+
+        budget.update('host:token', 90, 1000)
+        self.assertEqual(budget.get('host:token'), (90, 1000))
+
+        # New window
+        budget.update('host:token', 5000, 4600)
+        self.assertEqual(budget.get('host:token'), (5000, 4600))
+
+        budget.update('host:token', None, None)
+        self.assertEqual(budget.get('host:token'), (None, None))
+
+    def test_release(self):
+        """Test whether released permits are given back to the budget"""
+
+        budget = RateBudget(self.budget_path)
+
+        # Unknown budgets are not modified
+        budget.release('host:token')
+        self.assertIsNone(budget.get('host:token'))
+
+        reset_on = time.time() + 3600
+        budget.update('host:token', 100, reset_on)
+        _ = budget.reserve('host:token', 2)
+        self.assertEqual(budget.get('host:token'), (99, reset_on))
+
+        budget.release('host:token')
+        self.assertEqual(budget.get('host:token'), (100, reset_on))
+
+        budget.update('host:token', None, None)
+        budget.release('host:token')
+        self.assertEqual(budget.get('host:token'), (None, None))
+
+
+class TestAsyncHttpClient(unittest.TestCase):
+    """Async Http client tests"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        client = AsyncHttpClient(CLIENT_API_URL)
+        self.assertEqual(client.base_url, CLIENT_API_URL)
+        self.assertEqual(client.max_concurrent_requests, AsyncHttpClient.DEFAULT_MAX_CONCURRENT_REQUESTS)
+        self.assertIsNotNone(client.session)
+
+        client = AsyncHttpClient(CLIENT_API_URL, max_concurrent_requests=20)
+        self.assertEqual(client.max_concurrent_requests, 20)
+
+        adapter = client.session.get_adapter(CLIENT_API_URL)
+        self.assertEqual(adapter._pool_maxsize, 20)
+
+    def test_initialization_invalid_concurrency(self):
+        """Test whether an exception is raised when the number of requests is not valid"""
+
+        with self.assertRaisesRegex(ValueError, "must be greater than 0"):
+            _ = AsyncHttpClient(CLIENT_API_URL, max_concurrent_requests=0)
+
+    @httpretty.activate
+    def test_async_fetch(self):
+        """Test whether a resource is fetched using a coroutine"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="spiderman",
+                               status=200)
+
+        client = AsyncHttpClient(CLIENT_API_URL)
+        response = asyncio.run(client.async_fetch(CLIENT_SPIDERMAN_URL, payload={'q': 1}))
+
+        self.assertEqual(response.text, "spiderman")
+        self.assertDictEqual(httpretty.last_request().querystring, {'q': ['1']})
+
+    @httpretty.activate
+    def test_fetch_many(self):
+        """Test whether requests are sent concurrently and returned in order"""
+
+        def request_callback(request, uri, headers):
+            time.sleep(0.3)
+            return 200, headers, uri
+
+        urls = [CLIENT_SPIDERMAN_URL, CLIENT_SUPERMAN_URL, CLIENT_BATMAN_URL, CLIENT_IRONMAN_URL]
+
+        for url in urls:
+            httpretty.register_uri(httpretty.GET,
+                                   url,
+                                   body=request_callback)
+
+        client = AsyncHttpClient(CLIENT_API_URL, max_concurrent_requests=4)
+
+        before = time.time()
+        responses = client.fetch_many([{'url': url} for url in urls])
+        elapsed = time.time() - before
+
+        self.assertEqual(len(responses), 4)
+        self.assertListEqual([r.text for r in responses], urls)
+        self.assertLess(elapsed, 1.2)
+
+    @httpretty.activate
+    def test_fetch_many_http_error(self):
+        """Test whether an exception is raised when a request fails"""
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="bad",
+                               status=404)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200)
+
+        client = AsyncHttpClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.fetch_many([{'url': CLIENT_SUPERMAN_URL}, {'url': CLIENT_SPIDERMAN_URL}])
+
+    @httpretty.activate
+    def test_fetch_many_from_archive(self):
+        """Test whether concurrent responses are archived and retrieved"""
+
+        archive_path = os.path.join(self.test_path, 'myarchive')
+        archive = Archive.create(archive_path)
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="bad",
+                               status=404)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SUPERMAN_URL,
+                               body="good",
+                               status=200)
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_BATMAN_URL,
+                               body="better",
+                               status=200)
+
+        requests_args = [
+            {'url': CLIENT_SUPERMAN_URL},
+            {'url': CLIENT_BATMAN_URL, 'payload': {'page': 2}}
+        ]
+
+        client = AsyncHttpClient(CLIENT_API_URL, archive=archive)
+        answers_api = client.fetch_many(requests_args)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.fetch_many([{'url': CLIENT_SPIDERMAN_URL}])
+
+        httpretty.disable()
+
+        client = AsyncHttpClient(CLIENT_API_URL, archive=archive, from_archive=True)
+        answers_archive = client.fetch_many(requests_args)
+
+        self.assertListEqual([a.text for a in answers_archive],
+                             [a.text for a in answers_api])
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.fetch_many([{'url': CLIENT_SPIDERMAN_URL}])
+
+
 class TestRateLimitHandler(unittest.TestCase):
     """RateLimit handler tests"""
 
@@ -457,6 +1392,127 @@ class TestRateLimitHandler(unittest.TestCase):
 
         self.assertEqual(before, after)
 
+    @unittest.mock.patch('perceval.client.time.sleep')
+    def test_sleep_for_rate_limit_metrics(self, mock_sleep):
+        """Test whether the time sleeping for the rate limit is measured"""
+
+        client = MockedClient(CLIENT_API_URL, sleep_time=0.1, max_retries=1,
+                              min_rate_to_sleep=100,
+                              sleep_for_rate=True)
+        client.rate_limit = 50
+        client.calculate_time_to_reset = lambda: 30
+
+        client.sleep_for_rate_limit()
+        client.sleep_for_rate_limit()
+
+        mock_sleep.assert_called_with(30)
+        self.assertEqual(client.metrics.rate_limit_sleep_time, 60)
+
+    @unittest.mock.patch('perceval.client.time.monotonic')
+    @unittest.mock.patch('perceval.client.time.sleep')
+    def test_pace_requests(self, mock_sleep, mock_monotonic):
+        """Test whether requests are spread until the rate limit is reset"""
+
+        mock_monotonic.return_value = 1000
+
+        client = MockedClient(CLIENT_API_URL, min_rate_to_sleep=10)
+        client.pace_requests = True
+        client.calculate_time_to_reset = lambda: 100
+
+        # Requests are not paced until the rate limit is known
+        client.sleep_for_rate_limit()
+        mock_sleep.assert_not_called()
+
+        client.rate_limit = 30
+        client.rate_limit_reset_ts = 1100
+
+        client.sleep_for_rate_limit()
+        mock_sleep.assert_not_called()
+
+        client.sleep_for_rate_limit()
+        mock_sleep.assert_called_with(5)
+        self.assertEqual(client.metrics.rate_limit_sleep_time, 5)
+
+        # The time spent since the last request is discounted
+        mock_monotonic.return_value = 1008
+        client.sleep_for_rate_limit()
+        mock_sleep.assert_called_with(2)
+
+        # Slow requests are not delayed
+        mock_monotonic.return_value = 1050
+        client.sleep_for_rate_limit()
+        self.assertEqual(mock_sleep.call_count, 2)
+
+        # Exhausted rate limits still wait until the reset
+        client.rate_limit = 10
+        client.sleep_for_rate = True
+        client.sleep_for_rate_limit()
+        mock_sleep.assert_called_with(100)
+
+    def test_pacing_interval(self):
+        """Test the interval between paced requests"""
+
+        self.assertEqual(pacing_interval(30, 10, 100), 5)
+        self.assertEqual(pacing_interval(10, 10, 100), 0)
+        self.assertEqual(pacing_interval(30, 10, 0), 0)
+
+    @httpretty.activate
+    @unittest.mock.patch('perceval.client.time.sleep')
+    def test_rate_budget(self, mock_sleep):
+        """Test whether clients share the rate limit using a budget"""
+
+        test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.addCleanup(shutil.rmtree, test_path)
+        budget = RateBudget(os.path.join(test_path, 'budget'))
+
+        httpretty.register_uri(httpretty.GET,
+                               CLIENT_SPIDERMAN_URL,
+                               body="",
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+
+        clients = []
+        for _ in range(2):
+            client = MockedClient(CLIENT_API_URL, sleep_for_rate=True, min_rate_to_sleep=10)
+            client.calculate_time_to_reset = lambda: 100
+            client.rate_budget = budget
+            clients.append(client)
+
+        key = clients[0].rate_budget_key()
+        self.assertEqual(key, clients[1].rate_budget_key())
+
+        # Unknown budgets do not make clients wait
+        clients[0].sleep_for_rate_limit()
+        mock_sleep.assert_not_called()
+
+        response = clients[0].fetch(CLIENT_SPIDERMAN_URL)
+        clients[0].update_rate_limit(response)
+        self.assertEqual(budget.get(key)[0], 20)
+
+        # The second request waits for its turn
+        clients[1].sleep_for_rate_limit()
+        mock_sleep.assert_not_called()
+        clients[0].sleep_for_rate_limit()
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 10, delta=1)
+        self.assertEqual(budget.get(key)[0], 18)
+
+        # Exhausted budgets wait until the reset or fail
+        budget.update(key, 10, budget.get(key)[1])
+        clients[1].sleep_for_rate_limit()
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 100, delta=1)
+
+        clients[0].sleep_for_rate = False
+        with self.assertRaises(RateLimitError):
+            clients[0].sleep_for_rate_limit()
+
+        # Other tokens have their own budget
+        client = MockedClient(CLIENT_API_URL, extra_headers={'Authorization': 'token abcd'})
+        self.assertNotEqual(client.rate_budget_key(), key)
+
 
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
@@ -3616,6 +3616,104 @@ class TestGitHubClient(unittest.TestCase):
         self.assertDictEqual(httpretty.last_request().querystring, expected)
         self.assertEqual(httpretty.last_request().headers["Authorization"], "token aaa")
 
+    @httpretty.activate
+    def test_get_page_issues_prefetch(self):
+        """Test whether pages are fetched in advance following the next links"""
+
+        issue_1 = read_file('data/github/github_issue_1')
+        issue_2 = read_file('data/github/github_issue_2')
+        rate_limit = read_file('data/github/rate_limit')
+
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_RATE_LIMIT,
+                               body=rate_limit,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUES_URL,
+                               body=issue_1,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15',
+                                   'Link': '<' + GITHUB_ISSUES_URL + '/?&page=2>; rel="next", <' +
+                                           GITHUB_ISSUES_URL + '/?&page=2>; rel="last"'
+                               })
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUES_URL + '/?&page=2',
+                               body=issue_2,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+
+        client = GitHubClient("zhquan_example", "repo", ["aaa"])
+        client.prefetch_pages = 1
+
+        issues = [issues for issues in client.issues()]
+
+        self.assertListEqual(issues, [issue_1, issue_2])
+        self.assertEqual(httpretty.last_request().querystring['page'], ['2'])
+        self.assertEqual(httpretty.last_request().headers["Authorization"], "token aaa")
+
+    @httpretty.activate
+    def test_get_page_issues_fan_out(self):
+        """Test whether pages are fetched concurrently when the last page is known"""
+
+        issue_1 = read_file('data/github/github_issue_1')
+        issue_2 = read_file('data/github/github_issue_2')
+        rate_limit = read_file('data/github/rate_limit')
+
+        bodies = {
+            '2': issue_2,
+            '3': issue_1,
+            '4': issue_2
+        }
+
+        def request_callback(request, uri, headers):
+            headers.update({
+                'X-RateLimit-Remaining': '20',
+                'X-RateLimit-Reset': '15'
+            })
+            return 200, headers, bodies[request.querystring['page'][0]]
+
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_RATE_LIMIT,
+                               body=rate_limit,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUES_URL,
+                               body=issue_1,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15',
+                                   'Link': '<' + GITHUB_ISSUES_URL + '/?&page=2>; rel="next", <' +
+                                           GITHUB_ISSUES_URL + '/?&page=4>; rel="last"'
+                               })
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_ISSUES_URL + '/',
+                               body=request_callback)
+
+        client = GitHubClient("zhquan_example", "repo", ["aaa"])
+        client.page_workers = 2
+
+        issues = [issues for issues in client.issues()]
+
+        self.assertListEqual(issues, [issue_1, issue_2, issue_1, issue_2])
+
+        pages = sorted(request.querystring['page'][0] for request in httpretty.latest_requests()
+                       if 'page' in request.querystring)
+        self.assertListEqual(pages, ['2', '3', '4'])
+
     @httpretty.activate
     def test_pull_requested_reviewers(self):
         """Test pull requested reviewers API call"""
@@ -750,6 +750,34 @@ class TestJiraClient(unittest.TestCase):
         self.assertEqual(pages[0], bodies_json[0])
         self.assertEqual(pages[1], bodies_json[1])
 
+    @httpretty.activate
+    def test_get_issues_fan_out(self):
+        """Test whether pages are fetched concurrently when the total is known"""
+
+        from_date = str_to_datetime('2015-01-01')
+
+        def request_callback(request, uri, headers):
+            start_at = int(request.querystring['startAt'][0])
+            body = '{"total": 4, "maxResults": 1, "startAt": %s, "issues": [{"id": "%s"}]}' % (start_at, start_at)
+            return 200, headers, body
+
+        httpretty.register_uri(httpretty.GET,
+                               JIRA_SEARCH_URL,
+                               body=request_callback)
+
+        client = JiraClient(url='http://example.com', project='perceval',
+                            user='user', password='password',
+                            ssl_verify=False, cert=None, max_results=1)
+        client.page_workers = 3
+
+        pages = [json.loads(page) for page in client.get_issues(from_date)]
+
+        self.assertEqual(len(pages), 4)
+        self.assertListEqual([page['startAt'] for page in pages], [0, 1, 2, 3])
+
+        starts = sorted(request.querystring['startAt'][0] for request in httpretty.latest_requests())
+        self.assertListEqual(starts, ['0', '1', '2', '3'])
+
     @httpretty.activate
     def test_get_comments(self):
         """Test get comments API call"""
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import pickle
+import unittest
+import unittest.mock
+
+import requests
+
+from perceval.metrics import HttpMetrics, LatencyHistogram
+
+
+def make_response(status_code, content=b'', headers=None, retries=0):
+    """Create a response object"""
+
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    response.raw = unittest.mock.Mock()
+    response.raw.retries.history = tuple(range(retries))
+
+    return response
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Unit tests for LatencyHistogram"""
+
+    def test_init(self):
+        """Test whether the attributes are initialized"""
+
+        histogram = LatencyHistogram(buckets=[0.1, 1])
+
+        self.assertEqual(histogram.buckets, (0.1, 1))
+        self.assertListEqual(histogram.counts, [0, 0, 0])
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(histogram.total, 0.0)
+        self.assertEqual(histogram.max, 0.0)
+        self.assertEqual(histogram.mean, 0.0)
+
+    def test_observe(self):
+        """Test whether latencies are counted in their buckets"""
+
+        histogram = LatencyHistogram(buckets=[0.1, 1])
+
+        for seconds in [0.05, 0.1, 0.5, 2, 4]:
+            histogram.observe(seconds)
+
+        self.assertListEqual(histogram.counts, [2, 1, 2])
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.total, 6.65)
+        self.assertAlmostEqual(histogram.mean, 1.33)
+        self.assertEqual(histogram.max, 4)
+
+        expected = {
+            'count': 5,
+            'total': histogram.total,
+            'mean': histogram.mean,
+            'max': 4,
+            'buckets': {'<=0.1': 2, '<=1': 1, '>1': 2}
+        }
+        self.assertDictEqual(histogram.as_dict(), expected)
+
+
+class TestHttpMetrics(unittest.TestCase):
+    """Unit tests for HttpMetrics"""
+
+    def test_init(self):
+        """Test whether the attributes are initialized"""
+
+        metrics = HttpMetrics()
+
+        self.assertEqual(metrics.requests, 0)
+        self.assertEqual(metrics.failed_requests, 0)
+        self.assertEqual(metrics.bytes_received, 0)
+        self.assertEqual(metrics.retries, 0)
+        self.assertEqual(metrics.client_errors, 0)
+        self.assertEqual(metrics.server_errors, 0)
+        self.assertEqual(metrics.network_time, 0.0)
+        self.assertEqual(metrics.rate_limit_sleep_time, 0.0)
+        self.assertDictEqual(metrics.latencies, {})
+
+    def test_record_request(self):
+        """Test whether requests and their responses are recorded"""
+
+        metrics = HttpMetrics()
+
+        url = 'https://api.github.com/repos/chaoss/perceval/issues/%s'
+        metrics.record_request(url % 1, 0.5, response=make_response(200, b'12345', retries=2))
+        metrics.record_request(url % 2, 0.25, response=make_response(404, b'123'))
+        metrics.record_request(url % 3, 1.5, response=make_response(502))
+        metrics.record_request('https://api.github.com/users/jsmith', 0.1)
+
+        self.assertEqual(metrics.requests, 4)
+        self.assertEqual(metrics.failed_requests, 1)
+        self.assertEqual(metrics.bytes_received, 8)
+        self.assertEqual(metrics.retries, 2)
+        self.assertEqual(metrics.client_errors, 1)
+        self.assertEqual(metrics.server_errors, 1)
+        self.assertAlmostEqual(metrics.network_time, 2.35)
+
+        self.assertListEqual(sorted(metrics.latencies.keys()),
+                             ['api.github.com/repos/chaoss/perceval/issues/{id}',
+                              'api.github.com/users/jsmith'])
+        self.assertEqual(metrics.latencies['api.github.com/repos/chaoss/perceval/issues/{id}'].count, 3)
+
+    def test_record_stream_request(self):
+        """Test whether the size of streamed responses is taken from their headers"""
+
+        metrics = HttpMetrics()
+
+        response = make_response(200, headers={'Content-Length': '1024'})
+        response._content = False
+        metrics.record_request('http://example.com/', 0.1, response=response, stream=True)
+
+        response = make_response(200)
+        response._content = False
+        metrics.record_request('http://example.com/', 0.1, response=response, stream=True)
+
+        self.assertEqual(metrics.bytes_received, 1024)
+
+    def test_record_rate_limit_sleep(self):
+        """Test whether the time sleeping for the rate limit is added"""
+
+        metrics = HttpMetrics()
+        metrics.record_rate_limit_sleep(10)
+        metrics.record_rate_limit_sleep(5.5)
+
+        self.assertEqual(metrics.rate_limit_sleep_time, 15.5)
+
+    def test_endpoint(self):
+        """Test whether ids and hashes are removed from URLs"""
+
+        self.assertEqual(HttpMetrics.endpoint('https://api.github.com/repos/chaoss/perceval/issues/12?page=2'),
+                         'api.github.com/repos/chaoss/perceval/issues/{id}')
+        self.assertEqual(HttpMetrics.endpoint('https://example.com/commits/' + 'a1b2c3d4' * 5 + '/diff'),
+                         'example.com/commits/{id}/diff')
+        self.assertEqual(HttpMetrics.endpoint('https://example.com/v1/api'),
+                         'example.com/v1/api')
+
+    def test_max_endpoints(self):
+        """Test whether new endpoints are grouped when the limit is reached"""
+
+        metrics = HttpMetrics()
+
+        with unittest.mock.patch.object(HttpMetrics, 'MAX_ENDPOINTS', 2):
+            for name in ['a', 'b', 'c', 'd', 'a']:
+                metrics.record_request('http://example.com/' + name, 0.1)
+
+        self.assertListEqual(sorted(metrics.latencies.keys()),
+                             ['example.com/a', 'example.com/b', 'other'])
+        self.assertEqual(metrics.latencies['example.com/a'].count, 2)
+        self.assertEqual(metrics.latencies['other'].count, 2)
+
+    def test_as_dict(self):
+        """Test whether the metrics are returned as a dict"""
+
+        metrics = HttpMetrics()
+        metrics.record_request('http://example.com/a', 0.5, response=make_response(200, b'12'))
+        metrics.record_rate_limit_sleep(2)
+        metrics.record_cache_hit()
+        metrics.record_request('http://example.com/a', 0.1, response=make_response(304, b''))
+
+        result = metrics.as_dict()
+
+        self.assertEqual(result['requests'], 2)
+        self.assertEqual(result['failed_requests'], 0)
+        self.assertEqual(result['bytes_received'], 2)
+        self.assertEqual(result['retries'], 0)
+        self.assertEqual(result['client_errors'], 0)
+        self.assertEqual(result['server_errors'], 0)
+        self.assertEqual(result['cache_hits'], 1)
+        self.assertEqual(result['not_modified'], 1)
+        self.assertEqual(result['network_time'], 0.6)
+        self.assertEqual(result['rate_limit_sleep_time'], 2)
+        self.assertEqual(result['latencies']['example.com/a']['count'], 2)
+
+    def test_pickle(self):
+        """Test whether metrics can be pickled"""
+
+        metrics = HttpMetrics()
+        metrics.record_request('http://example.com/a', 0.5, response=make_response(200, b'12'))
+
+        result = pickle.loads(pickle.dumps(metrics))
+
+        self.assertDictEqual(result.as_dict(), metrics.as_dict())
+        result.record_rate_limit_sleep(1)
+        self.assertEqual(result.rate_limit_sleep_time, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+import perceval.output
+from perceval.output import (ENGINE_JSON,
+                             ENGINE_ORJSON,
+                             ENGINE_UJSON,
+                             ColumnarItemWriter,
+                             ItemWriter,
+                             JSONSerializer,
+                             ShardedItemWriter)
+
+
+ITEM = {
+    'uuid': '1234',
+    'data': {
+        'title': 'ñandú',
+        'number': 1,
+        'url': 'http://example.com/'
+    },
+    'classified_fields_filtered': None,
+    'backend_name': 'MockedBackend'
+}
+
+
+class TestJSONSerializer(unittest.TestCase):
+    """Unit tests for JSONSerializer"""
+
+    def test_initialization(self):
+        """Test whether attributes are initialized"""
+
+        serializer = JSONSerializer()
+        self.assertFalse(serializer.json_line)
+        self.assertTrue(serializer.sort_keys)
+        self.assertEqual(serializer.engine, ENGINE_JSON)
+
+        serializer = JSONSerializer(json_line=True, engine=ENGINE_JSON)
+        self.assertTrue(serializer.json_line)
+        self.assertFalse(serializer.sort_keys)
+        self.assertEqual(serializer.engine, ENGINE_JSON)
+
+        serializer = JSONSerializer(json_line=True, sort_keys=True, engine=ENGINE_JSON)
+        self.assertTrue(serializer.sort_keys)
+
+    def test_from_format(self):
+        """Test whether serializers are created from output formats"""
+
+        serializer = JSONSerializer.from_format('json')
+        self.assertFalse(serializer.json_line)
+
+        serializer = JSONSerializer.from_format('json-line', sort_keys=True)
+        self.assertTrue(serializer.json_line)
+        self.assertTrue(serializer.sort_keys)
+
+        with self.assertRaisesRegex(ValueError, "unknown output format xml"):
+            JSONSerializer.from_format('xml')
+
+    def test_dumps(self):
+        """Test whether items are serialized as indented documents"""
+
+        serializer = JSONSerializer()
+        obj = serializer.dumps(ITEM)
+
+        self.assertEqual(obj, json.dumps(ITEM, indent=4, sort_keys=True) + '\n')
+
+    def test_dumps_json_line(self):
+        """Test whether items are serialized as compact lines"""
+
+        serializer = JSONSerializer(json_line=True, sort_keys=True, engine=ENGINE_JSON)
+        obj = serializer.dumps(ITEM)
+
+        self.assertEqual(obj, json.dumps(ITEM, separators=(',', ':'), sort_keys=True,
+                                         ensure_ascii=False) + '\n')
+        self.assertIn('ñandú', obj)
+
+    def test_dumps_json_line_non_finite(self):
+        """Test whether non-finite floats are serialized as null in compact lines"""
+
+        serializer = JSONSerializer(json_line=True, sort_keys=True, engine=ENGINE_JSON)
+
+        item = {'a': float('nan'), 'b': [1.5, float('inf'), {'c': float('-inf')}], 'd': (1, 2)}
+        obj = serializer.dumps(item)
+        self.assertEqual(obj, '{"a":null,"b":[1.5,null,{"c":null}],"d":[1,2]}\n')
+
+        # Indented documents keep the standard library behaviour
+        serializer = JSONSerializer()
+        obj = serializer.dumps({'a': float('nan')})
+        self.assertEqual(obj, '{\n    "a": NaN\n}\n')
+
+    def test_dumps_engines_same_output(self):
+        """Test whether every engine produces the same JSON lines"""
+
+        engines = [ENGINE_JSON]
+        if perceval.output.orjson:
+            engines.append(ENGINE_ORJSON)
+        if perceval.output.ujson:
+            engines.append(ENGINE_UJSON)
+
+        items = [
+            ITEM,
+            {'text': 'ñandú € \U0001F600', 'url': 'http://example.com/a/b'},
+            {'nan': float('nan'), 'inf': float('inf'), 'values': [float('-inf'), 0.5]},
+            {'text': 'invalid \udc80 surrogate', 'title': 'ñandú'},
+            {'nested': {'list': [1, None, True, 'x'], 'empty': {}}}
+        ]
+
+        for item in items:
+            docs = {engine: JSONSerializer(json_line=True, sort_keys=True, engine=engine).dumps(item)
+                    for engine in engines}
+            expected = docs[ENGINE_JSON]
+
+            for engine, obj in docs.items():
+                self.assertEqual(obj, expected, msg="engine %s" % engine)
+
+            expected.encode('utf-8')
+
+    def test_dumps_fast_engines(self):
+        """Test whether fast engines produce the same documents"""
+
+        for engine, module in [(ENGINE_ORJSON, perceval.output.orjson),
+                               (ENGINE_UJSON, perceval.output.ujson)]:
+            if not module:
+                continue
+
+            serializer = JSONSerializer(json_line=True, sort_keys=True, engine=engine)
+            obj = serializer.dumps(ITEM)
+
+            self.assertTrue(obj.endswith('\n'))
+            self.assertEqual(obj.count('\n'), 1)
+            self.assertEqual(json.loads(obj), ITEM)
+            self.assertEqual(list(json.loads(obj).keys()), sorted(ITEM.keys()))
+
+            # Items not supported by the engine are encoded with 'json'
+            item = {'text': 'invalid \udc80 surrogate'}
+            obj = serializer.dumps(item)
+            self.assertEqual(obj, json.dumps(item, separators=(',', ':'), sort_keys=True) + '\n')
+
+    def test_unknown_engine(self):
+        """Test whether an exception is raised with an unknown engine"""
+
+        with self.assertRaisesRegex(ValueError, "unknown JSON engine simplejson"):
+            JSONSerializer(json_line=True, engine='simplejson')
+
+    @unittest.mock.patch('perceval.output.orjson', None)
+    @unittest.mock.patch('perceval.output.ujson', None)
+    def test_engine_not_installed(self):
+        """Test whether the standard library is used when no fast engine is installed"""
+
+        serializer = JSONSerializer(json_line=True)
+        self.assertEqual(serializer.engine, ENGINE_JSON)
+
+        with self.assertRaisesRegex(ValueError, "JSON engine orjson is not installed"):
+            JSONSerializer(json_line=True, engine=ENGINE_ORJSON)
+
+
+class TestItemWriter(unittest.TestCase):
+    """Unit tests for ItemWriter"""
+
+    def test_write(self):
+        """Test whether items are buffered and written"""
+
+        outfile = io.StringIO()
+        serializer = JSONSerializer(json_line=True, engine=ENGINE_JSON)
+        writer = ItemWriter(outfile, serializer, buffer_size=60)
+
+        writer.write({'item': 1})
+        self.assertEqual(outfile.getvalue(), '')
+
+        for x in range(2, 11):
+            writer.write({'item': x})
+        self.assertNotEqual(outfile.getvalue(), '')
+
+        writer.flush()
+
+        lines = outfile.getvalue().splitlines()
+        self.assertListEqual([json.loads(line) for line in lines],
+                             [{'item': x} for x in range(1, 11)])
+
+    def test_context_manager(self):
+        """Test whether pending items are written when the context exits"""
+
+        outfile = io.StringIO()
+
+        with ItemWriter(outfile) as writer:
+            writer.write(ITEM)
+            self.assertEqual(outfile.getvalue(), '')
+
+        self.assertEqual(outfile.getvalue(), json.dumps(ITEM, indent=4, sort_keys=True) + '\n')
+
+
+def make_item(x):
+    """Create an item with metadata"""
+
+    return {
+        'backend_name': 'MockedBackend',
+        'backend_version': '0.1.0',
+        'perceval_version': '1.0.0',
+        'timestamp': 1451606400.5,
+        'origin': 'http://example.com/',
+        'uuid': str(x),
+        'updated_on': 1451606400.0 + x,
+        'classified_fields_filtered': None,
+        'category': 'mock_item',
+        'search_fields': {'item_id': str(x)},
+        'tag': 'test',
+        'data': {'item': x, 'title': 'ñandú'}
+    }
+
+
+def read_shard(path):
+    """Read the items stored in a shard"""
+
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rt') as fd:
+            return [json.loads(line) for line in fd]
+    elif path.endswith('.zst'):
+        with perceval.output.zstandard.open(path, 'rt') as fd:
+            return [json.loads(line) for line in fd]
+    else:
+        with open(path) as fd:
+            return [json.loads(line) for line in fd]
+
+
+class TestShardedItemWriter(unittest.TestCase):
+    """Unit tests for ShardedItemWriter"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.dirpath = os.path.join(self.test_path, 'items')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initialized"""
+
+        writer = ShardedItemWriter(self.dirpath)
+
+        self.assertTrue(os.path.isdir(self.dirpath))
+        self.assertEqual(writer.dirpath, self.dirpath)
+        self.assertTrue(writer.serializer.json_line)
+        self.assertEqual(writer.compression, 'none')
+        self.assertIsNone(writer.shard_size)
+        self.assertIsNone(writer.shard_bytes)
+        self.assertEqual(writer.extension, '.jsonl')
+        self.assertListEqual(writer.shards, [])
+
+    def test_invalid_arguments(self):
+        """Test whether an exception is raised with invalid arguments"""
+
+        with self.assertRaisesRegex(ValueError, "unknown compression bzip2"):
+            ShardedItemWriter(self.dirpath, compression='bzip2')
+
+        with self.assertRaisesRegex(ValueError, "shard size must be greater than 0"):
+            ShardedItemWriter(self.dirpath, shard_size=0)
+
+        with self.assertRaisesRegex(ValueError, "shard bytes must be greater than 0"):
+            ShardedItemWriter(self.dirpath, shard_bytes=-1)
+
+        with unittest.mock.patch('perceval.output.zstandard', None):
+            with self.assertRaisesRegex(ValueError, "zstd compression requires 'zstandard' package"):
+                ShardedItemWriter(self.dirpath, compression='zstd')
+
+    def test_shard_size(self):
+        """Test whether shards are rotated after a number of items"""
+
+        with ShardedItemWriter(self.dirpath, compression='gzip', shard_size=4) as writer:
+            for x in range(10):
+                writer.write({'item': x})
+
+                # Only completed shards have their final name
+                completed = [os.path.join(self.dirpath, name) for name in os.listdir(self.dirpath)
+                             if not name.endswith('.part')]
+                self.assertListEqual(sorted(completed), writer.shards)
+
+        expected = [os.path.join(self.dirpath, 'items-%05d.jsonl.gz' % x) for x in range(3)]
+        self.assertListEqual(writer.shards, expected)
+        self.assertListEqual(sorted(os.listdir(self.dirpath)),
+                             [os.path.basename(path) for path in expected])
+
+        items = [item for path in writer.shards for item in read_shard(path)]
+        self.assertListEqual(items, [{'item': x} for x in range(10)])
+        self.assertEqual(len(read_shard(writer.shards[2])), 2)
+
+    def test_shard_bytes(self):
+        """Test whether shards are rotated before they get too large"""
+
+        # Each item takes 11 bytes
+        with ShardedItemWriter(self.dirpath, shard_bytes=25, buffer_size=1) as writer:
+            for x in range(5):
+                writer.write({'item': x})
+
+        self.assertEqual(len(writer.shards), 3)
+
+        for path in writer.shards:
+            self.assertLessEqual(os.path.getsize(path), 25)
+
+        items = [item for path in writer.shards for item in read_shard(path)]
+        self.assertListEqual(items, [{'item': x} for x in range(5)])
+
+    def test_single_shard(self):
+        """Test whether items are written to one shard when there are no limits"""
+
+        with ShardedItemWriter(self.dirpath, prefix='github') as writer:
+            for x in range(100):
+                writer.write({'item': x})
+
+        self.assertListEqual(writer.shards, [os.path.join(self.dirpath, 'github-00000.jsonl')])
+        self.assertEqual(len(read_shard(writer.shards[0])), 100)
+
+    def test_no_items(self):
+        """Test whether no shards are created when there are no items"""
+
+        with ShardedItemWriter(self.dirpath) as writer:
+            pass
+
+        self.assertListEqual(writer.shards, [])
+        self.assertListEqual(os.listdir(self.dirpath), [])
+
+    def test_error(self):
+        """Test whether the last shard is discarded when an exception is raised"""
+
+        with self.assertRaisesRegex(RuntimeError, 'fetch failed'):
+            with ShardedItemWriter(self.dirpath, shard_size=3) as writer:
+                for x in range(5):
+                    writer.write({'item': x})
+                raise RuntimeError('fetch failed')
+
+        # The shard being written was incomplete
+        expected = [os.path.join(self.dirpath, 'items-00000.jsonl')]
+        self.assertListEqual(writer.shards, expected)
+        self.assertListEqual(os.listdir(self.dirpath), ['items-00000.jsonl'])
+
+    def test_previous_shards(self):
+        """Test whether shards of previous runs with the same prefix are removed"""
+
+        with ShardedItemWriter(self.dirpath, compression='gzip', shard_size=1) as writer:
+            for x in range(3):
+                writer.write({'item': x})
+
+        other_path = os.path.join(self.dirpath, 'github-00004.jsonl')
+        with open(other_path, 'w') as fd:
+            fd.write('{"item": 0}\n')
+        with open(os.path.join(self.dirpath, 'items-00007.jsonl.part'), 'w') as fd:
+            fd.write('{"item": 0}\n')
+
+        with ShardedItemWriter(self.dirpath, shard_size=2) as writer:
+            writer.write({'item': 0})
+
+        self.assertListEqual(sorted(os.listdir(self.dirpath)),
+                             ['github-00004.jsonl', 'items-00000.jsonl'])
+
+    @unittest.skipIf(perceval.output.zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        """Test whether shards are compressed with zstd"""
+
+        with ShardedItemWriter(self.dirpath, compression='zstd', shard_size=3) as writer:
+            for x in range(5):
+                writer.write({'item': x})
+
+        self.assertEqual(len(writer.shards), 2)
+        self.assertTrue(writer.shards[0].endswith('items-00000.jsonl.zst'))
+
+        items = [item for path in writer.shards for item in read_shard(path)]
+        self.assertListEqual(items, [{'item': x} for x in range(5)])
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class TestColumnarItemWriter(unittest.TestCase):
+    """Unit tests for ColumnarItemWriter"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.fout_path = os.path.join(self.test_path, 'items')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def _check_table(self, table, nitems):
+
+        self.assertEqual(table.num_rows, nitems)
+        self.assertEqual(table.schema.field('updated_on').type, pyarrow.timestamp('us', tz='UTC'))
+        self.assertEqual(table.schema.field('data').type, pyarrow.string())
+
+        rows = table.to_pylist()
+        for x, row in enumerate(rows):
+            self.assertEqual(row['uuid'], str(x))
+            self.assertEqual(row['origin'], 'http://example.com/')
+            self.assertEqual(row['updated_on'].timestamp(), 1451606400.0 + x)
+            self.assertEqual(row['timestamp'].timestamp(), 1451606400.5)
+            self.assertIsNone(row['classified_fields_filtered'])
+            self.assertEqual(row['category'], 'mock_item')
+            self.assertEqual(row['tag'], 'test')
+            self.assertDictEqual(json.loads(row['search_fields']), {'item_id': str(x)})
+            self.assertDictEqual(json.loads(row['data']), {'item': x, 'title': 'ñandú'})
+
+    def test_parquet(self):
+        """Test whether items are written to Parquet files in record batches"""
+
+        with open(self.fout_path, 'w') as outfile:
+            with ColumnarItemWriter(outfile, 'parquet', batch_size=4) as writer:
+                for x in range(10):
+                    writer.write(make_item(x))
+
+        parquet_file = pyarrow.parquet.ParquetFile(self.fout_path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+
+        # Statistics of 'updated_on' are available for filtering
+        stats = parquet_file.metadata.row_group(0).column(6).statistics
+        self.assertEqual(stats.min.timestamp(), 1451606400.0)
+        self.assertEqual(stats.max.timestamp(), 1451606403.0)
+
+        self._check_table(parquet_file.read(), 10)
+
+    def test_arrow(self):
+        """Test whether items are written to Arrow IPC files"""
+
+        with open(self.fout_path, 'wb') as outfile:
+            with ColumnarItemWriter(outfile, 'arrow', batch_size=4) as writer:
+                for x in range(10):
+                    writer.write(make_item(x))
+
+        reader = pyarrow.ipc.open_file(self.fout_path)
+        self.assertEqual(reader.num_record_batches, 3)
+        self._check_table(reader.read_all(), 10)
+
+    def test_classified_fields(self):
+        """Test whether the list of filtered fields is stored"""
+
+        item = make_item(0)
+        item['classified_fields_filtered'] = ['author', 'email']
+
+        with open(self.fout_path, 'wb') as outfile:
+            with ColumnarItemWriter(outfile, 'parquet') as writer:
+                writer.write(item)
+
+        table = pyarrow.parquet.read_table(self.fout_path)
+        self.assertListEqual(table.column('classified_fields_filtered').to_pylist(),
+                             [['author', 'email']])
+
+    def test_no_items(self):
+        """Test whether an empty file with the schema is written when there are no items"""
+
+        with open(self.fout_path, 'wb') as outfile:
+            with ColumnarItemWriter(outfile, 'parquet') as writer:
+                pass
+
+        table = pyarrow.parquet.read_table(self.fout_path)
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema, writer.schema)
+
+    def test_unknown_format(self):
+        """Test whether an exception is raised with an unknown format"""
+
+        with self.assertRaisesRegex(ValueError, "unknown columnar format orc"):
+            ColumnarItemWriter(io.BytesIO(), 'orc')
+
+    @unittest.mock.patch('perceval.output._import_pyarrow', return_value=None)
+    def test_pyarrow_not_installed(self, mock_import):
+        """Test whether an exception is raised when pyarrow is not installed"""
+
+        with self.assertRaisesRegex(ValueError, "parquet format requires 'pyarrow' package"):
+            ColumnarItemWriter(io.BytesIO(), 'parquet')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -624,6 +624,21 @@ class TestPagureClient(unittest.TestCase):
         self.assertDictEqual(httpretty.last_request().querystring, expected)
         self.assertEqual(httpretty.last_request().headers["Authorization"], "token aaa")
 
+    def test_get_issues_unsuccessful_response(self):
+        """Test whether pagination stops when a response is not successful"""
+
+        response = requests.Response()
+        response.status_code = 404
+        response._content = b'{"error": "Project not found"}'
+
+        client = PagureClient(namespace=None, repository="Project-example", token="aaa")
+
+        with unittest.mock.patch.object(client, 'fetch', return_value=response) as mock_fetch:
+            issues = [issues for issues in client.issues()]
+
+        self.assertListEqual(issues, [])
+        mock_fetch.assert_called_once()
+
     def test_sanitize_for_archive(self):
         """Test whether the sanitize method works properly"""
 
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+from perceval.profiling import Profiler, stats_basepath
+
+
+def allocate():
+    return [str(i) * 10 for i in range(10000)]
+
+
+class TestProfiler(unittest.TestCase):
+    """Unit tests for Profiler"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='perceval_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_profile(self):
+        """Test whether the stats of cProfile are written"""
+
+        basepath = os.path.join(self.tmp_path, 'items.json')
+
+        with Profiler(basepath) as profiler:
+            allocate()
+
+        self.assertListEqual(profiler.files, [basepath + '.prof'])
+        self.assertFalse(os.path.exists(basepath + '.malloc.txt'))
+
+        stats = pstats.Stats(profiler.profile_path)
+        functions = [func[2] for func in stats.stats]
+        self.assertIn('allocate', functions)
+
+    def test_trace_malloc(self):
+        """Test whether the memory stats are written"""
+
+        basepath = os.path.join(self.tmp_path, 'items.json')
+
+        with Profiler(basepath, profile=False, trace_malloc=True) as profiler:
+            data = allocate()
+
+        self.assertListEqual(profiler.files, [basepath + '.malloc.txt'])
+        self.assertFalse(os.path.exists(basepath + '.prof'))
+        self.assertFalse(tracemalloc.is_tracing())
+
+        with open(profiler.trace_malloc_path) as fd:
+            lines = fd.readlines()
+
+        self.assertRegex(lines[0], r'^Current memory traced: \d+ bytes$')
+        self.assertRegex(lines[1], r'^Peak memory traced: \d+ bytes$')
+        self.assertEqual(lines[2], "Top 25 lines allocating memory still in use:\n")
+        self.assertIn(__file__, lines[3])
+        self.assertEqual(len(data), 10000)
+
+    def test_stats_written_on_error(self):
+        """Test whether the stats are written when the code fails"""
+
+        basepath = os.path.join(self.tmp_path, 'output', 'perceval-git')
+
+        with self.assertRaises(RuntimeError):
+            with Profiler(basepath, trace_malloc=True) as profiler:
+                raise RuntimeError("fetch failed")
+
+        self.assertListEqual(profiler.files,
+                             [basepath + '.prof', basepath + '.malloc.txt'])
+        for path in profiler.files:
+            self.assertTrue(os.path.exists(path))
+
+
+class TestStatsBasepath(unittest.TestCase):
+    """Unit tests for stats_basepath"""
+
+    def test_output_file(self):
+        """Test whether stats are named after the output file"""
+
+        with tempfile.NamedTemporaryFile('w') as outfile:
+            basepath = stats_basepath(outfile)
+            self.assertEqual(basepath, outfile.name)
+
+    def test_output_dir(self):
+        """Test whether stats are written in the output directory"""
+
+        basepath = stats_basepath(sys.stdout, output_dir='/tmp/items', name='perceval-git')
+        self.assertEqual(basepath, '/tmp/items/perceval-git')
+
+    def test_stdout(self):
+        """Test whether stats are written in the current directory"""
+
+        basepath = stats_basepath(sys.stdout, name='perceval-git')
+        self.assertEqual(basepath, os.path.join(os.getcwd(), 'perceval-git'))
+
+        basepath = stats_basepath(None)
+        self.assertEqual(basepath, os.path.join(os.getcwd(), 'perceval'))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from grimoirelab_toolkit.datetime import str_to_datetime
+
+from perceval.errors import StateStoreError
+from perceval.state import FetchState, FetchStateStore
+
+
+class TestFetchStateStore(unittest.TestCase):
+    """Unit tests for FetchStateStore"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.state_path = os.path.join(self.test_path, 'state.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def test_init(self):
+        """Test whether the database is created on initialization"""
+
+        store = FetchStateStore(self.state_path)
+
+        self.assertEqual(store.path, self.state_path)
+        self.assertTrue(os.path.exists(self.state_path))
+
+        # Opening an existing store keeps its data
+        store.update('Git', 'http://example.com/', 'commit', max_offset=1)
+        store = FetchStateStore(self.state_path)
+        self.assertIsNotNone(store.get('Git', 'http://example.com/', 'commit'))
+
+    def test_init_error(self):
+        """Test whether an exception is raised when the database cannot be created"""
+
+        path = os.path.join(self.test_path, 'notfound', 'state.sqlite3')
+
+        with self.assertRaisesRegex(StateStoreError, "state store .+ initialization error"):
+            FetchStateStore(path)
+
+    def test_get_not_found(self):
+        """Test whether None is returned when there is no state"""
+
+        store = FetchStateStore(self.state_path)
+        self.assertIsNone(store.get('Git', 'http://example.com/', 'commit'))
+
+    def test_update(self):
+        """Test whether the state is stored and merged with the previous one"""
+
+        store = FetchStateStore(self.state_path)
+        dt = str_to_datetime('2016-01-01 10:00:00')
+
+        state = store.update('Git', 'http://example.com/', 'commit', max_updated_on=dt)
+
+        self.assertIsInstance(state, FetchState)
+        self.assertEqual(state.backend_name, 'Git')
+        self.assertEqual(state.origin, 'http://example.com/')
+        self.assertEqual(state.category, 'commit')
+        self.assertEqual(state.max_updated_on, dt)
+        self.assertIsNone(state.max_offset)
+        self.assertIsNotNone(state.updated_on)
+        self.assertEqual(store.get('Git', 'http://example.com/', 'commit'), state)
+
+        # Older values do not replace newer ones
+        older = str_to_datetime('2015-01-01')
+        state = store.update('Git', 'http://example.com/', 'commit', max_updated_on=older)
+        self.assertEqual(state.max_updated_on, dt)
+
+        newer = str_to_datetime('2017-01-01')
+        state = store.update('Git', 'http://example.com/', 'commit', max_updated_on=newer)
+        self.assertEqual(state.max_updated_on, newer)
+
+        state = store.get('Git', 'http://example.com/', 'commit')
+        self.assertEqual(state.max_updated_on, newer)
+
+    def test_update_offset(self):
+        """Test whether offsets are stored"""
+
+        store = FetchStateStore(self.state_path)
+
+        store.update('NNTP', 'nntp.example.com-group', 'article', max_offset=10)
+        store.update('NNTP', 'nntp.example.com-group', 'article', max_offset=5)
+
+        state = store.get('NNTP', 'nntp.example.com-group', 'article')
+        self.assertIsNone(state.max_updated_on)
+        self.assertEqual(state.max_offset, 10)
+
+    def test_keys(self):
+        """Test whether states are stored by backend, origin and category"""
+
+        store = FetchStateStore(self.state_path)
+
+        store.update('GitHub', 'https://github.com/chaoss/perceval', 'issue', max_offset=1)
+        store.update('GitHub', 'https://github.com/chaoss/perceval', 'pull_request', max_offset=2)
+        store.update('GitHub', 'https://github.com/chaoss/toolkit', 'issue', max_offset=3)
+        store.update('GitLab', 'https://github.com/chaoss/perceval', 'issue', max_offset=4)
+
+        self.assertEqual(store.get('GitHub', 'https://github.com/chaoss/perceval', 'issue').max_offset, 1)
+        self.assertEqual(store.get('GitHub', 'https://github.com/chaoss/perceval', 'pull_request').max_offset, 2)
+        self.assertEqual(store.get('GitHub', 'https://github.com/chaoss/toolkit', 'issue').max_offset, 3)
+        self.assertEqual(store.get('GitLab', 'https://github.com/chaoss/perceval', 'issue').max_offset, 4)
+
+    def test_remove(self):
+        """Test whether a state is removed"""
+
+        store = FetchStateStore(self.state_path)
+
+        store.update('Git', 'http://example.com/', 'commit', max_offset=1)
+        store.update('Git', 'http://example.org/', 'commit', max_offset=1)
+        store.remove('Git', 'http://example.com/', 'commit')
+
+        self.assertIsNone(store.get('Git', 'http://example.com/', 'commit'))
+        self.assertIsNotNone(store.get('Git', 'http://example.org/', 'commit'))
+
+
+if __name__ == "__main__":
+    unittest.main()
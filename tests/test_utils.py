@@ -29,6 +29,7 @@ import email
 import gzip
 import os
 import shutil
+import sqlite3
 import tempfile
 import unittest
 import zipfile
@@ -38,6 +39,8 @@ from perceval.utils import (check_compressed_file_type,
                             message_to_dict,
                             months_range,
                             remove_invalid_xml_chars,
+                            sqlite_connect,
+                            sqlite_transaction,
                             xml_to_dict)
 
 
@@ -277,5 +280,75 @@ class TestXMLtoDict(unittest.TestCase):
         self.assertRaises(ParseError, xml_to_dict, raw_xml)
 
 
+class TestSQLite(unittest.TestCase):
+    """Unit tests for SQLite helpers"""
+
+    def setUp(self):
+        self.test_path = tempfile.mkdtemp(prefix='perceval_')
+        self.db_path = os.path.join(self.test_path, 'test.db')
+
+        with sqlite_connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE items (id INTEGER)")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_path)
+
+    def read_items(self):
+        with sqlite_connect(self.db_path) as conn:
+            return [row[0] for row in conn.execute("SELECT id FROM items ORDER BY id")]
+
+    def test_connect(self):
+        """Test whether statements are committed right away"""
+
+        with sqlite_connect(self.db_path) as conn:
+            conn.execute("INSERT INTO items VALUES (1)")
+            self.assertFalse(conn.in_transaction)
+            self.assertListEqual(self.read_items(), [1])
+
+        # The connection is closed on exit
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT id FROM items")
+
+    def test_transaction(self):
+        """Test whether the statements of a transaction are committed together"""
+
+        with sqlite_connect(self.db_path) as conn:
+            with sqlite_transaction(conn):
+                conn.execute("INSERT INTO items VALUES (1)")
+                conn.execute("INSERT INTO items VALUES (2)")
+                self.assertListEqual(self.read_items(), [])
+
+            self.assertFalse(conn.in_transaction)
+
+        self.assertListEqual(self.read_items(), [1, 2])
+
+    def test_transaction_rollback(self):
+        """Test whether a transaction is rolled back when an exception is raised"""
+
+        with sqlite_connect(self.db_path) as conn:
+            with self.assertRaisesRegex(ValueError, 'failed'):
+                with sqlite_transaction(conn):
+                    conn.execute("INSERT INTO items VALUES (1)")
+                    raise ValueError('failed')
+
+            self.assertFalse(conn.in_transaction)
+
+        self.assertListEqual(self.read_items(), [])
+
+    def test_transaction_locked(self):
+        """Test whether a transaction waits for the lock until the timeout"""
+
+        with sqlite_connect(self.db_path) as conn, sqlite_transaction(conn):
+            conn.execute("INSERT INTO items VALUES (1)")
+
+            with sqlite_connect(self.db_path, timeout=0.1) as other:
+                with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+                    with sqlite_transaction(other):
+                        pass
+                self.assertFalse(other.in_transaction)
+
+        self.assertListEqual(self.read_items(), [1])
+
+
 if __name__ == "__main__":
     unittest.main()